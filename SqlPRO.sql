@@ -152,6 +152,9 @@ CREATE INDEX IF NOT EXISTS idx_reservas_fecha_inicio ON reservas (fecha_hora_ini
 -- Índice en reservas por fecha_hora_inicio y fecha_hora_fin (para disponibilidad de mesas)
 CREATE INDEX IF NOT EXISTS idx_reservas_fecha_hora ON reservas (fecha_hora_inicio, fecha_hora_fin);
 
+-- Índice en reservas por mesa_numero y fecha_hora_inicio (para la próxima reserva de cada mesa en GET /mesas)
+CREATE INDEX IF NOT EXISTS idx_reservas_mesa_inicio ON reservas (mesa_numero, fecha_hora_inicio);
+
 -- Índice en clientes por nombre (para búsqueda rápida)
 CREATE INDEX IF NOT EXISTS idx_clientes_nombre ON clientes (nombre);
 
@@ -321,4 +324,249 @@ ON CONFLICT (id) DO NOTHING;
 -- ('Stock Basico', 'Ingredientes iniciales comunes', '[{"nombre": "Pollo", "cantidad": 10, "unidad": "kg"}, {"nombre": "Arroz", "cantidad": 5, "unidad": "kg"}]')
 -- ON CONFLICT (id) DO NOTHING;
 
+-- 7. Versionado de inventario (para alertas de stock incrementales: GET /inventario/alertas?since=<version>)
+
+-- Secuencia global de versiones: cada INSERT/UPDATE/DELETE en inventario toma un valor nuevo
+CREATE SEQUENCE IF NOT EXISTS inventario_version_seq;
+
+ALTER TABLE inventario ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT nextval('inventario_version_seq');
+
+-- Tabla: inventario_eliminados
+-- Registro de ítems eliminados para que los clientes los quiten de sus alertas.
+CREATE TABLE IF NOT EXISTS inventario_eliminados (
+    id INTEGER PRIMARY KEY, -- id que tenía el ítem en inventario
+    nombre VARCHAR(255) NOT NULL,
+    version BIGINT NOT NULL,
+    fecha_eliminacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Índice en inventario por version (para consultar cambios desde una versión)
+CREATE INDEX IF NOT EXISTS idx_inventario_version ON inventario (version);
+
+-- Índice en inventario_eliminados por version
+CREATE INDEX IF NOT EXISTS idx_inventario_eliminados_version ON inventario_eliminados (version);
+
+-- Índice parcial con solo los ítems en stock bajo, ordenados por nombre (GET /inventario/alertas sin 'since').
+-- idx_inventario_stock no sirve para comparar una columna con otra.
+CREATE INDEX IF NOT EXISTS idx_inventario_stock_bajo ON inventario (nombre)
+    WHERE cantidad_disponible <= cantidad_minima_alerta;
+
+-- Trigger para asignar una versión nueva en cada UPDATE de `inventario`
+CREATE OR REPLACE FUNCTION versionar_inventario()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.version = nextval('inventario_version_seq');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_versionar_inventario ON inventario;
+CREATE TRIGGER trigger_versionar_inventario
+    BEFORE UPDATE ON inventario
+    FOR EACH ROW
+    EXECUTE FUNCTION versionar_inventario();
+
+-- Trigger para registrar en `inventario_eliminados` cada DELETE de `inventario`
+CREATE OR REPLACE FUNCTION registrar_inventario_eliminado()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO inventario_eliminados (id, nombre, version)
+    VALUES (OLD.id, OLD.nombre, nextval('inventario_version_seq'))
+    ON CONFLICT (id) DO UPDATE SET
+        nombre = EXCLUDED.nombre,
+        version = EXCLUDED.version,
+        fecha_eliminacion = CURRENT_TIMESTAMP;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_registrar_inventario_eliminado ON inventario;
+CREATE TRIGGER trigger_registrar_inventario_eliminado
+    AFTER DELETE ON inventario
+    FOR EACH ROW
+    EXECUTE FUNCTION registrar_inventario_eliminado();
+
+-- 8. Libro de movimientos de inventario (auditoría de stock, stock en un instante y consumo por rango)
+
+-- Tabla: inventario_movimientos
+-- Cada cambio de stock queda registrado con su delta y motivo. Sin FK a inventario a propósito:
+-- el historial debe sobrevivir a la eliminación del ítem.
+CREATE TABLE IF NOT EXISTS inventario_movimientos (
+    id BIGSERIAL PRIMARY KEY,
+    ingrediente_id INTEGER NOT NULL,
+    delta DECIMAL(10, 2) NOT NULL, -- Positivo = entrada, negativo = consumo/baja
+    motivo VARCHAR(20) NOT NULL CHECK (motivo IN ('pedido', 'entrada', 'ajuste', 'configuracion', 'baja')),
+    pedido_id INTEGER, -- Solo para motivo 'pedido'
+    ts TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tabla: inventario_snapshots
+-- Checkpoints periódicos: stock y consumo acumulado (motivo 'pedido') de cada ingrediente en 'ts'.
+-- Las consultas parten del checkpoint anterior y solo suman los movimientos posteriores.
+CREATE TABLE IF NOT EXISTS inventario_snapshots (
+    ingrediente_id INTEGER NOT NULL,
+    ts TIMESTAMP NOT NULL,
+    cantidad DECIMAL(12, 2) NOT NULL,
+    consumo_acumulado DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (ingrediente_id, ts) -- También sirve como índice para "último checkpoint <= T"
+);
+
+-- Índice en inventario_movimientos por ingrediente y fecha (rangos entre checkpoints)
+CREATE INDEX IF NOT EXISTS idx_inventario_movimientos_ingrediente_ts ON inventario_movimientos (ingrediente_id, ts);
+
+-- Índice en inventario_movimientos por pedido (auditar qué consumió un pedido)
+CREATE INDEX IF NOT EXISTS idx_inventario_movimientos_pedido ON inventario_movimientos (pedido_id) WHERE pedido_id IS NOT NULL;
+
+-- Función: stock de un ingrediente en el instante p_ts (checkpoint anterior + movimientos hasta p_ts).
+-- Si no hay checkpoint anterior se parte del stock actual y se descuentan los movimientos posteriores.
+CREATE OR REPLACE FUNCTION stock_inventario_en(p_ingrediente_id INTEGER, p_ts TIMESTAMP)
+RETURNS DECIMAL AS $$
+DECLARE
+    v_snap RECORD;
+BEGIN
+    SELECT ts, cantidad INTO v_snap
+    FROM inventario_snapshots
+    WHERE ingrediente_id = p_ingrediente_id AND ts <= p_ts
+    ORDER BY ts DESC
+    LIMIT 1;
+
+    IF FOUND THEN
+        RETURN v_snap.cantidad + COALESCE((
+            SELECT SUM(delta) FROM inventario_movimientos
+            WHERE ingrediente_id = p_ingrediente_id AND ts > v_snap.ts AND ts <= p_ts
+        ), 0);
+    END IF;
+
+    RETURN COALESCE((SELECT cantidad_disponible FROM inventario WHERE id = p_ingrediente_id), 0)
+         - COALESCE((
+            SELECT SUM(delta) FROM inventario_movimientos
+            WHERE ingrediente_id = p_ingrediente_id AND ts > p_ts
+        ), 0);
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Función: consumo acumulado por pedidos de un ingrediente hasta p_ts.
+-- El consumo en un rango es consumo_inventario_hasta(hasta) - consumo_inventario_hasta(desde).
+CREATE OR REPLACE FUNCTION consumo_inventario_hasta(p_ingrediente_id INTEGER, p_ts TIMESTAMP)
+RETURNS DECIMAL AS $$
+DECLARE
+    v_snap RECORD;
+BEGIN
+    SELECT ts, consumo_acumulado INTO v_snap
+    FROM inventario_snapshots
+    WHERE ingrediente_id = p_ingrediente_id AND ts <= p_ts
+    ORDER BY ts DESC
+    LIMIT 1;
+
+    RETURN COALESCE(v_snap.consumo_acumulado, 0) + COALESCE((
+        SELECT -SUM(delta) FROM inventario_movimientos
+        WHERE ingrediente_id = p_ingrediente_id
+          AND motivo = 'pedido'
+          AND ts > COALESCE(v_snap.ts, '-infinity'::timestamp)
+          AND ts <= p_ts
+    ), 0);
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Función: crea un checkpoint de todos los ingredientes en p_ts a partir del checkpoint anterior.
+-- Se llama periódicamente desde el backend con un pequeño margen hacia atrás para no cortar
+-- transacciones que todavía no confirmaron sus movimientos.
+CREATE OR REPLACE FUNCTION crear_checkpoint_inventario(p_ts TIMESTAMP)
+RETURNS INTEGER AS $$
+DECLARE
+    v_filas INTEGER;
+BEGIN
+    INSERT INTO inventario_snapshots (ingrediente_id, ts, cantidad, consumo_acumulado)
+    SELECT i.id, p_ts, stock_inventario_en(i.id, p_ts), consumo_inventario_hasta(i.id, p_ts)
+    FROM inventario i
+    ON CONFLICT (ingrediente_id, ts) DO NOTHING;
+    GET DIAGNOSTICS v_filas = ROW_COUNT;
+    RETURN v_filas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 9. Disponibilidad de mesas por intervalo (GET /mesas/disponibles y GET /mesas/disponibilidad)
+
+-- Extensión para combinar igualdad (mesa_numero) y solapamiento de rangos en un mismo índice GiST
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- Columna generada con el intervalo ocupado por la reserva: [inicio, fin). Sin fin se asume 1 hora,
+-- igual que POST /reservas.
+ALTER TABLE reservas ADD COLUMN IF NOT EXISTS periodo TSRANGE
+    GENERATED ALWAYS AS (tsrange(fecha_hora_inicio, COALESCE(fecha_hora_fin, fecha_hora_inicio + INTERVAL '1 hour'), '[)')) STORED;
+
+-- Restricción de exclusión: una mesa no puede tener dos reservas solapadas.
+-- Su índice GiST (mesa_numero, periodo) resuelve las consultas de disponibilidad.
+-- Si ya hay dobles reservas no se borra ninguna: se listan los pares en conflicto y el script se
+-- detiene hasta que se resuelvan a mano (mover o cancelar una de cada par).
+DO $$
+DECLARE
+    v_conflictos TEXT;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'reservas_sin_solapamiento') THEN
+        SELECT string_agg(format('mesa %s: reserva %s %s / reserva %s %s', r.mesa_numero, previa.id, previa.periodo, r.id, r.periodo),
+                          E'\n' ORDER BY r.mesa_numero, previa.id, r.id)
+        INTO v_conflictos
+        FROM reservas r
+        JOIN reservas previa
+          ON previa.mesa_numero = r.mesa_numero
+         AND previa.id < r.id
+         AND previa.periodo && r.periodo;
+
+        IF v_conflictos IS NOT NULL THEN
+            RAISE EXCEPTION 'Hay reservas solapadas en la misma mesa; resuélvalas antes de crear reservas_sin_solapamiento'
+                USING DETAIL = v_conflictos;
+        END IF;
+
+        ALTER TABLE reservas ADD CONSTRAINT reservas_sin_solapamiento
+            EXCLUDE USING gist (mesa_numero WITH =, periodo WITH &&);
+    END IF;
+END;
+$$;
+
+-- 10. Registro de cambios para respaldos incrementales (respaldos.py y restaurar_respaldo.py)
+
+-- Tabla: respaldo_cambios
+-- Registro append-only de cada INSERT/UPDATE/DELETE en las tablas respaldadas. El backend lo vuelca
+-- periódicamente a segmentos .jsonl.gz junto a los respaldos completos y borra lo ya volcado.
+-- 'txid' permite saber si un cambio ya estaba incluido en un respaldo completo (snapshot de pg_dump).
+CREATE TABLE IF NOT EXISTS respaldo_cambios (
+    id BIGSERIAL PRIMARY KEY,
+    txid BIGINT NOT NULL DEFAULT txid_current(),
+    ts TIMESTAMP NOT NULL DEFAULT clock_timestamp(),
+    tabla VARCHAR(30) NOT NULL,
+    operacion CHAR(1) NOT NULL CHECK (operacion IN ('I', 'U', 'D')),
+    registro_id INTEGER NOT NULL, -- id de la fila en 'tabla'
+    fila JSONB -- Fila completa después del cambio (NULL en DELETE)
+);
+
+-- Función: registrar_cambio_respaldo
+CREATE OR REPLACE FUNCTION registrar_cambio_respaldo()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO respaldo_cambios (tabla, operacion, registro_id, fila)
+        VALUES (TG_TABLE_NAME, 'D', OLD.id, NULL);
+        RETURN OLD;
+    END IF;
+    INSERT INTO respaldo_cambios (tabla, operacion, registro_id, fila)
+    VALUES (TG_TABLE_NAME, LEFT(TG_OP, 1), NEW.id, to_jsonb(NEW));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers en las tablas respaldadas incrementalmente
+DO $$
+DECLARE
+    v_tabla TEXT;
+BEGIN
+    FOREACH v_tabla IN ARRAY ARRAY['pedidos', 'inventario', 'reservas', 'clientes', 'menu'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trigger_respaldo_cambios ON %I', v_tabla);
+        EXECUTE format(
+            'CREATE TRIGGER trigger_respaldo_cambios AFTER INSERT OR UPDATE OR DELETE ON %I
+             FOR EACH ROW EXECUTE FUNCTION registrar_cambio_respaldo()', v_tabla);
+    END LOOP;
+END;
+$$;
+
 -- Fin del script
\ No newline at end of file
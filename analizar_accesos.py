@@ -0,0 +1,131 @@
+# === ANALIZAR_ACCESOS.PY ===
+# Agrega el log de accesos (logs/accesos.jsonl y sus rotaciones) en una tabla por ruta con
+# p50/p95/p99 del tiempo total, y de dónde sale ese tiempo: espera de conexión, sentencias y tiempo SQL.
+#
+# Uso:
+#   python analizar_accesos.py                                 # todos los accesos.jsonl* de logs/
+#   python analizar_accesos.py --desde "2026-10-18 12:00" --hasta "2026-10-18 15:00"
+#   python analizar_accesos.py --ruta /pedidos --orden n
+#   python analizar_accesos.py logs/accesos.jsonl.2026-10-17 --json
+
+import argparse
+import glob
+import json
+import os
+import sys
+from datetime import datetime
+
+ORDENES = {
+    "p99": lambda fila: fila["total_ms"]["p99"],
+    "p95": lambda fila: fila["total_ms"]["p95"],
+    "n": lambda fila: fila["n"],
+    "sql": lambda fila: fila["sql_ms"]["p95"],
+}
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def resumen(valores):
+    return {
+        "p50": round(percentil(valores, 50), 3),
+        "p95": round(percentil(valores, 95), 3),
+        "p99": round(percentil(valores, 99), 3),
+        "max": round(max(valores), 3),
+    }
+
+
+# === FUNCIÓN: leer_accesos ===
+# Devuelve las líneas válidas dentro del rango; las líneas cortadas (archivo en escritura) se saltean.
+def leer_accesos(archivos, desde=None, hasta=None, ruta=None):
+    for archivo in archivos:
+        with open(archivo, encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    acceso = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue
+                if desde or hasta:
+                    ts = datetime.fromisoformat(acceso["ts"])
+                    if (desde and ts < desde) or (hasta and ts > hasta):
+                        continue
+                if ruta and ruta not in acceso["ruta"]:
+                    continue
+                yield acceso
+
+
+# === FUNCIÓN: agregar_por_ruta ===
+def agregar_por_ruta(accesos):
+    grupos = {}
+    for acceso in accesos:
+        grupos.setdefault((acceso["metodo"], acceso["ruta"]), []).append(acceso)
+
+    filas = []
+    for (metodo, ruta), lista in grupos.items():
+        filas.append({
+            "metodo": metodo,
+            "ruta": ruta,
+            "n": len(lista),
+            "errores": sum(1 for a in lista if a["status"] >= 500),
+            "total_ms": resumen([a["total_ms"] for a in lista]),
+            "db_espera_ms": resumen([a["db_espera_ms"] for a in lista]),
+            "sql_sentencias": resumen([a["sql_sentencias"] for a in lista]),
+            "sql_ms": resumen([a["sql_ms"] for a in lista]),
+            "bytes_medio": round(sum(a["bytes_respuesta"] for a in lista) / len(lista)),
+        })
+    return filas
+
+
+def imprimir_tabla(filas):
+    encabezado = (f"{'MÉTODO':<7} {'RUTA':<42} {'N':>7} {'5xx':>5} {'p50':>9} {'p95':>9} {'p99':>9} "
+                  f"{'espera95':>9} {'SQLs50':>7} {'SQL p95':>9} {'KB':>7}")
+    print(encabezado)
+    print("-" * len(encabezado))
+    for f in filas:
+        print(
+            f"{f['metodo']:<7} {f['ruta'][:42]:<42} {f['n']:>7} {f['errores']:>5} "
+            f"{f['total_ms']['p50']:>9.2f} {f['total_ms']['p95']:>9.2f} {f['total_ms']['p99']:>9.2f} "
+            f"{f['db_espera_ms']['p95']:>9.2f} {f['sql_sentencias']['p50']:>7.0f} {f['sql_ms']['p95']:>9.2f} "
+            f"{f['bytes_medio'] / 1024:>7.1f}"
+        )
+    print("Tiempos en ms. espera95 = p95 de la espera de conexión; SQLs50 = mediana de sentencias por request.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="p50/p95/p99 por ruta a partir del log de accesos JSON")
+    parser.add_argument("archivos", nargs="*", help="Archivos a leer (por defecto logs/accesos.jsonl*)")
+    parser.add_argument("--desde", help="Solo accesos desde 'YYYY-MM-DD HH:MM[:SS]'")
+    parser.add_argument("--hasta", help="Solo accesos hasta 'YYYY-MM-DD HH:MM[:SS]'")
+    parser.add_argument("--ruta", help="Solo rutas que contengan este texto")
+    parser.add_argument("--orden", choices=sorted(ORDENES), default="p99", help="Orden de la tabla (por defecto p99)")
+    parser.add_argument("--min", type=int, default=1, help="Ocultar rutas con menos requests")
+    parser.add_argument("--json", action="store_true", help="Imprimir el resultado en JSON")
+    args = parser.parse_args()
+
+    archivos = args.archivos or sorted(glob.glob(os.path.join("logs", "accesos.jsonl*")))
+    if not archivos:
+        raise SystemExit("No hay archivos de accesos (logs/accesos.jsonl). ¿Está corriendo el backend?")
+    desde = datetime.fromisoformat(args.desde.replace(" ", "T")) if args.desde else None
+    hasta = datetime.fromisoformat(args.hasta.replace(" ", "T")) if args.hasta else None
+
+    filas = [f for f in agregar_por_ruta(leer_accesos(archivos, desde, hasta, args.ruta)) if f["n"] >= args.min]
+    filas.sort(key=ORDENES[args.orden], reverse=True)
+
+    if args.json:
+        print(json.dumps(filas, indent=2, ensure_ascii=False))
+        return
+    if not filas:
+        print("Sin accesos en el rango pedido")
+        return
+    print(f"--- ACCESOS POR RUTA ({sum(f['n'] for f in filas)} requests, {len(archivos)} archivo(s)) ---")
+    imprimir_tabla(filas)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except BrokenPipeError:
+        sys.exit(0)
@@ -14,33 +14,32 @@ import copy
 
 
 # ====================== SISTEMA DE LOGS PROFESIONAL ======================
-logging.getLogger("RestaurantIA").handlers.clear()  # Evita duplicados al recargar
-log = logging.getLogger("RestaurantIA")
-
-# Configuración rápida y limpia (sin colores para este primer fragmento, luego lo hacemos brutal)
-log.setLevel(logging.DEBUG)
-if not log.handlers:
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter('%(asctime)s | %(levelname)-8s | %(message)s', datefmt='%H:%M:%S')
-    handler.setFormatter(formatter)
-    log.addHandler(handler)
+# Misma configuración que el backend (cola + hilo de escritura), solo consola en el cliente.
+from configuracion_logs import configurar_logs
+log = configurar_logs(archivos=False)
 
 log.info("app.py cargado correctamente - Iniciando módulo principal")
 # ===========================================================================
 
-# IMPORTAR LAS NUEVAS CLASES DE INVENTARIO Y LA NUEVA VISTA DE CAJA
-from inventario_view import crear_vista_inventario
+# IMPORTAR LOS SERVICIOS (ligeros: solo dependen de requests)
 from inventario_service import InventoryService
-from configuraciones_view import crear_vista_configuraciones
-from reportes_view import crear_vista_reportes
-from caja_view import crear_vista_caja # <-- IMPORTAR LA NUEVA VISTA DE CAJA
-from reservas_view import crear_vista_reservas
 from reservas_service import ReservasService # Asumiendo que creas este archivo
-# --- AÑADIR ESTOS IMPORTS ---
-from recetas_view import crear_vista_recetas
 from recetas_service import RecetasService
+from ejecutor_comandos import EjecutorComandos
+from planificador_frames import PlanificadorFrames, marcar_actualizacion
+
+# --- VISTAS CON IMPORT DIFERIDO ---
+# Las vistas se importan dentro de RestauranteGUI.main() y la de reportes
+# (plotly, kaleido, reportlab) recién al abrir su pestaña por primera vez.
+# Así importar app.py no arrastra dependencias pesadas al arranque.
+
+log.info("Módulos importados correctamente (servicios)")
 
-log.info("Módulos importados correctamente (vistas y servicios)")
+# Ciclos de sincronización (cada ~3 s) entre resincronizaciones completas de alertas de stock
+CICLOS_RESYNC_STOCK = 20
+
+# Con esta cantidad de porciones o menos el selector de ítems muestra "(quedan N)"
+POCAS_PORCIONES = 3
 
 # === FUNCIÓN: reproducir_sonido_pedido ===
 # Reproduce una melodía simple cuando se confirma un pedido.
@@ -78,8 +77,10 @@ def obtener_titulo_pedido(pedido):
 
 # === FUNCIÓN: crear_selector_item ===
 # Crea un selector con dropdowns para filtrar y elegir items del menú.
-def crear_selector_item(menu):
+def crear_selector_item(menu, disponibilidad=None):
     log.debug(f"Creando selector de ítems - Menú con {len(menu)} ítems disponibles")
+    # {plato: porciones preparables} de GET /menu/disponibilidad; los platos sin receta no figuran
+    disponibilidad = dict(disponibilidad or {})
     tipos = list(set(item["tipo"] for item in menu))
     tipos.sort()
     tipo_dropdown = ft.Dropdown(
@@ -105,11 +106,27 @@ def crear_selector_item(menu):
             items_filtrados = [item for item in menu if query in item["nombre"].lower()]
         else:
             items_filtrados = [item for item in menu if item["tipo"] == tipo_actual]
-        items_dropdown.options = [ft.dropdown.Option(item["nombre"]) for item in items_filtrados]
+        items_dropdown.options = [crear_opcion_item(item) for item in items_filtrados]
         items_dropdown.value = None
         if e and e.page:
             e.page.update()
 
+    # Opción del dropdown: los platos agotados se muestran en gris y deshabilitados
+    def crear_opcion_item(item):
+        porciones = disponibilidad.get(item["nombre"])
+        if porciones is None:
+            return ft.dropdown.Option(item["nombre"])
+        if porciones <= 0:
+            return ft.dropdown.Option(
+                key=item["nombre"],
+                text=f"{item['nombre']} (agotado)",
+                disabled=True,
+                text_style=ft.TextStyle(color=ft.Colors.GREY_600),
+            )
+        if porciones <= POCAS_PORCIONES:
+            return ft.dropdown.Option(key=item["nombre"], text=f"{item['nombre']} (quedan {porciones})")
+        return ft.dropdown.Option(item["nombre"])
+
     def actualizar_items(e):
         filtrar_items(e)
     tipo_dropdown.on_change = actualizar_items
@@ -127,6 +144,9 @@ def crear_selector_item(menu):
         tipo = tipo_dropdown.value
         nombre = items_dropdown.value
         if tipo and nombre:
+            if disponibilidad.get(nombre, 1) <= 0:
+                log.debug(f"Ítem '{nombre}' agotado → no seleccionable")
+                return None
             for item in menu:
                 if item["nombre"] == nombre and item["tipo"] == tipo:
                     log.debug(f"Ítem seleccionado: {nombre} ({tipo}) - Precio: ${item['precio']}")
@@ -164,6 +184,20 @@ def crear_selector_item(menu):
         container.update()
 
     container.update_menu_data = update_menu_data
+
+    # Recibe el mapa completo de disponibilidad (una sola petición para todo el menú)
+    def actualizar_disponibilidad(nuevo_mapa):
+        if nuevo_mapa == disponibilidad:
+            return
+        disponibilidad.clear()
+        disponibilidad.update(nuevo_mapa)
+        seleccion_actual = items_dropdown.value
+        filtrar_items(None)
+        if seleccion_actual in [opt.key for opt in items_dropdown.options] and disponibilidad.get(seleccion_actual, 1) > 0:
+            items_dropdown.value = seleccion_actual
+        marcar_actualizacion(getattr(container, "page", None), items_dropdown)
+
+    container.actualizar_disponibilidad = actualizar_disponibilidad
     log.debug("Selector de ítems creado correctamente")
     return container
 
@@ -324,7 +358,7 @@ def crear_mesas_grid(backend_service, on_select, app_instance=None):
             else:
                 carta.scale = 1.0
                 carta.bgcolor = color_base
-            carta.update()
+            marcar_actualizacion(e.page, carta)
 
         carta_mesa.on_hover = lambda e, carta=carta_mesa, cb=color_base: on_hover_mesa(e, carta, cb)
         
@@ -376,7 +410,7 @@ def crear_mesas_grid(backend_service, on_select, app_instance=None):
             else:
                 carta.scale = 1.0
                 carta.bgcolor = ft.Colors.BLUE_700
-            carta.update()
+            marcar_actualizacion(e.page, carta)
 
         carta_mesa_virtual.on_hover = lambda e, c=carta_mesa_virtual: on_hover_virtual(e, c)
         
@@ -401,7 +435,7 @@ def crear_mesas_grid(backend_service, on_select, app_instance=None):
 
 # === FUNCIÓN: crear_panel_gestion ===
 # Crea el panel lateral para gestionar pedidos de una mesa seleccionada.
-def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color, primary_dark_color):
+def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color, primary_dark_color, ejecutor):
     log.debug("Creando panel de gestión de pedidos")
     estado = {"mesa_seleccionada": None, "pedido_actual": None}
     mesa_info = ft.Text("", size=16, weight=ft.FontWeight.BOLD)
@@ -485,7 +519,7 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
             eliminar_ultimo_btn.disabled = pedido_actual is None or not pedido_actual.get("items", [])
             confirmar_pedido_btn.disabled = pedido_actual is None or not pedido_actual.get("items", [])
             cantidad_dropdown.disabled = pedido_actual is None or selector_item.get_selected_item() is None
-        page.update()
+        marcar_actualizacion(page)
 
     def on_item_selected(e):
         if estado["pedido_actual"] and selector_item.get_selected_item():
@@ -493,12 +527,53 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
             log.debug(f"Selector de cantidad habilitado - Ítem seleccionado")
         else:
             cantidad_dropdown.disabled = True
-        page.update()
+        marcar_actualizacion(page, cantidad_dropdown)
 
     selector_item.items_dropdown.on_change = on_item_selected
 
+    # === FUNCIÓN: mostrar_error_comando ===
+    # Avisa al usuario cuando una llamada al backend falló y se deshizo el cambio optimista.
+    def mostrar_error_comando(titulo):
+        def al_fallar(ex):
+            def cerrar_alerta(e):
+                page.close(dlg_alerta)
+            dlg_alerta = ft.AlertDialog(
+                title=ft.Text(titulo, color="red"),
+                content=ft.Text(f"{ex}", size=16),
+                actions=[ft.TextButton("Entendido", on_click=cerrar_alerta)],
+                actions_alignment=ft.MainAxisAlignment.END,
+            )
+            page.open(dlg_alerta)
+            page.update()
+        return al_fallar
+
+    # Retención de stock del pedido en memoria: aparta los ingredientes en el backend mientras se arma
+    def sincronizar_retencion(pedido, items):
+        if not items:
+            liberar_retencion(pedido)
+            return
+        resultado = backend_service.retener_stock(pedido.get("retencion_id"), items)
+        pedido["retencion_id"] = resultado["retencion_id"]
+
+    def liberar_retencion(pedido):
+        retencion_id = pedido.pop("retencion_id", None) if pedido else None
+        if retencion_id:
+            try:
+                backend_service.liberar_retencion(retencion_id)
+            except Exception as ex:
+                # Si falla, el backend la libera sola al vencer el TTL
+                log.warning(f"No se pudo liberar la retención de stock {retencion_id[:8]}: {ex}")
+
     def seleccionar_mesa_interna(numero_mesa):
         log.info(f"Mesa seleccionada por el usuario: {numero_mesa}")
+        # Las consultas al backend corren en el pool; el hilo de eventos queda libre
+        ejecutor.ejecutar(f"seleccionar_mesa {numero_mesa}", lambda: cargar_mesa(numero_mesa), clave="panel")
+
+    def cargar_mesa(numero_mesa):
+        # Un pedido en memoria que se abandona al cambiar de mesa libera su retención de stock
+        pedido_abandonado = estado["pedido_actual"]
+        if pedido_abandonado and pedido_abandonado["id"] is None:
+            liberar_retencion(pedido_abandonado)
         try:
             mesas = backend_service.obtener_mesas()
             mesa_seleccionada = next((m for m in mesas if m["numero"] == numero_mesa), None)
@@ -545,7 +620,7 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
                                 mesa_info.value = f"Mesa {mesa_seleccionada['numero']} - Reservada para {mesa_seleccionada.get('cliente_reservado_nombre', 'N/A')} el {fecha_reserva_str}"
                             estado["pedido_actual"] = None
                             asignar_btn.disabled = True
-                            page.update()
+                            marcar_actualizacion(page)
                             log.info(f"Reserva futura bloqueada - Mesa {numero_mesa} hasta {fecha_reserva_str}")
                             return
                     except ValueError:
@@ -572,6 +647,7 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
         except Exception as e:
             log.error(f"Error crítico al seleccionar mesa {numero_mesa}: {e}")
             mesa_info.value = f"Error al seleccionar mesa {numero_mesa}"
+            marcar_actualizacion(page, mesa_info)
 
     def asignar_cliente(e):
         mesa_seleccionada = estado["mesa_seleccionada"]
@@ -582,16 +658,32 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
         numero_mesa = mesa_seleccionada["numero"]
         log.info(f"Asignando cliente a Mesa {numero_mesa}")
 
-        try:
+        nuevo_pedido = {
+            "id": None,
+            "mesa_numero": numero_mesa,
+            "items": [],
+            "estado": "Tomando pedido",
+            "fecha_hora": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "numero_app": None,
+            "notas": nota_pedido.value or ""
+        }
+
+        # Optimista: el pedido en memoria se crea al instante; la validación de la mesa corre en el pool
+        def optimista():
+            estado["pedido_actual"] = nuevo_pedido
+            resumen_pedido.value = ""
+            actualizar_estado_botones()
+
+        def validar_mesa():
             mesas_actualizadas = backend_service.obtener_mesas()
             mesa_estado_actual = next((m for m in mesas_actualizadas if m["numero"] == numero_mesa), None)
             if not mesa_estado_actual:
                 log.error(f"Mesa {numero_mesa} desapareció del backend al intentar asignar")
-                return
+                raise Exception(f"La mesa {numero_mesa} ya no existe.")
 
             if mesa_estado_actual.get("ocupada", False):
                 log.warning(f"Bloqueo: Mesa {numero_mesa} ya está ocupada")
-                return
+                raise Exception(f"La mesa {numero_mesa} ya está ocupada.")
             elif mesa_estado_actual.get("reservada", False):
                 fecha_reserva_str = mesa_estado_actual.get("fecha_hora_reserva")
                 if fecha_reserva_str:
@@ -600,27 +692,24 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
                         ahora = datetime.now()
                         if ahora < fecha_reserva and (fecha_reserva - ahora).total_seconds() >= 1800:
                             log.warning(f"Bloqueo por reserva futura: Mesa {numero_mesa}")
-                            return
+                            raise Exception(f"La mesa {numero_mesa} está reservada para {fecha_reserva_str}.")
                     except ValueError:
                         log.error(f"Error parseando fecha reserva al asignar Mesa {numero_mesa}")
 
-            nuevo_pedido = {
-                "id": None,
-                "mesa_numero": numero_mesa,
-                "items": [],
-                "estado": "Tomando pedido",
-                "fecha_hora": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "numero_app": None,
-                "notas": nota_pedido.value or ""
-            }
-            estado["pedido_actual"] = nuevo_pedido
-            resumen_pedido.value = ""
+        def rollback():
+            if estado["pedido_actual"] is nuevo_pedido:
+                estado["pedido_actual"] = None
+                actualizar_estado_botones()
+
+        def al_terminar(_):
             on_update_ui()
-            actualizar_estado_botones()
             log.info(f"Cliente asignado correctamente - Mesa {numero_mesa} | Pedido en memoria creado")
 
-        except Exception as ex:
-            log.error(f"Error al asignar cliente a Mesa {numero_mesa}: {ex}")
+        ejecutor.ejecutar(
+            f"asignar_cliente mesa {numero_mesa}", validar_mesa,
+            optimista=optimista, rollback=rollback, al_terminar=al_terminar,
+            al_fallar=mostrar_error_comando("No se pudo asignar la mesa"), clave="panel"
+        )
 
     def agregar_item_pedido(e):
         mesa_seleccionada = estado["mesa_seleccionada"]
@@ -644,50 +733,55 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
 
         log.info(f"Agregando {cantidad} × '{item['nombre']}' a Mesa {mesa_seleccionada['numero']}")
 
-        try:
-            if pedido_actual["id"] is None:
-                # Pedido en memoria
-                items_actuales = pedido_actual.get("items", [])
-                for _ in range(cantidad):
-                    items_actuales.append({
-                        "nombre": item["nombre"],
-                        "precio": item["precio"],
-                        "tipo": item["tipo"],
-                        "cantidad": 1
-                    })
-                pedido_actual["items"] = items_actuales
-                estado["pedido_actual"] = pedido_actual
-                log.debug(f"Ítem agregado en memoria - Total ítems: {len(items_actuales)}")
-            else:
-                # Pedido ya existe en BD
-                items_actuales = pedido_actual.get("items", [])
-                for _ in range(cantidad):
-                    items_actuales.append({
-                        "nombre": item["nombre"],
-                        "precio": item["precio"],
-                        "tipo": item["tipo"],
-                        "cantidad": 1
-                    })
-                resultado = backend_service.actualizar_pedido(
-                    pedido_actual["id"],
-                    pedido_actual["mesa_numero"],
-                    items_actuales,
-                    pedido_actual["estado"],
-                    pedido_actual.get("notas", "")
-                )
-                pedido_actual["items"] = items_actuales
-                estado["pedido_actual"] = pedido_actual
-                log.info(f"Ítem agregado a pedido existente (ID: {pedido_actual['id']}) - Total: {len(items_actuales)} ítems")
+        agregados = [{
+            "nombre": item["nombre"],
+            "precio": item["precio"],
+            "tipo": item["tipo"],
+            "cantidad": 1
+        } for _ in range(cantidad)]
+        items_nuevos = list(pedido_actual.get("items", [])) + agregados
+
+        # Optimista: el resumen muestra los ítems nuevos antes de que responda el backend
+        pedido_actual["items"] = items_nuevos
+        cantidad_dropdown.value = "1"
+        cantidad_dropdown.disabled = selector_item.get_selected_item() is None
+        resumen_pedido.value = generar_resumen_pedido(pedido_actual)
+        actualizar_estado_botones()
+
+        def rollback():
+            # Solo se quitan los ítems rechazados (por identidad): los agregados mientras tanto se conservan
+            pedido_actual["items"] = [i for i in pedido_actual.get("items", []) if not any(i is a for a in agregados)]
+            if estado["pedido_actual"] is pedido_actual:
+                resumen_pedido.value = generar_resumen_pedido(pedido_actual)
+                actualizar_estado_botones()
+
+        if pedido_actual["id"] is None:
+            # Pedido en memoria: solo se retiene el stock en el backend (si no alcanza, se deshace)
+            ejecutor.ejecutar(
+                f"retener_stock mesa {mesa_seleccionada['numero']}",
+                lambda: sincronizar_retencion(pedido_actual, items_nuevos),
+                rollback=rollback,
+                al_terminar=lambda _: log.debug(f"Ítem agregado en memoria con stock retenido - Total ítems: {len(items_nuevos)}"),
+                al_fallar=mostrar_error_comando(f"No hay stock para '{item['nombre']}'"), clave="panel"
+            )
+            return
 
-            cantidad_dropdown.value = "1"
-            cantidad_dropdown.disabled = selector_item.get_selected_item() is None
-            resumen = generar_resumen_pedido(pedido_actual)
-            resumen_pedido.value = resumen
+        def al_terminar(_):
+            log.info(f"Ítem agregado a pedido existente (ID: {pedido_actual['id']}) - Total: {len(items_nuevos)} ítems")
             on_update_ui()
-            actualizar_estado_botones()
 
-        except Exception as ex:
-            log.error(f"Error crítico al agregar ítem '{item['nombre']}' a Mesa {mesa_seleccionada['numero']}: {ex}")
+        ejecutor.ejecutar(
+            f"agregar_item pedido {pedido_actual['id']}",
+            lambda: backend_service.actualizar_pedido(
+                pedido_actual["id"],
+                pedido_actual["mesa_numero"],
+                items_nuevos,
+                pedido_actual["estado"],
+                pedido_actual.get("notas", "")
+            ),
+            rollback=rollback, al_terminar=al_terminar,
+            al_fallar=mostrar_error_comando(f"No se pudo agregar '{item['nombre']}'"), clave="panel"
+        )
 
     def eliminar_ultimo_item(e):
         pedido_actual = estado["pedido_actual"]
@@ -697,35 +791,49 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
 
         log.info(f"Eliminando último ítem de Mesa {estado['mesa_seleccionada']['numero']}")
 
-        try:
-            if pedido_actual["id"] is None:
-                items = pedido_actual.get("items", [])
-                if items:
-                    eliminado = items.pop()
-                    pedido_actual["items"] = items
-                    estado["pedido_actual"] = pedido_actual
-                    resumen_pedido.value = generar_resumen_pedido(estado["pedido_actual"])
-                    log.debug(f"Ítem eliminado en memoria: {eliminado['nombre']}")
-                else:
-                    resumen_pedido.value = "Sin items."
-            else:
-                backend_service.eliminar_ultimo_item(pedido_actual["id"])
-                pedidos_activos = backend_service.obtener_pedidos_activos()
-                pedido_actualizado = next((p for p in pedidos_activos if p["id"] == pedido_actual["id"]), None)
-                if pedido_actualizado:
-                    estado["pedido_actual"] = pedido_actualizado
-                    resumen_pedido.value = generar_resumen_pedido(estado["pedido_actual"])
-                    log.info(f"Último ítem eliminado en BD - Pedido ID: {pedido_actual['id']}")
-                else:
-                    resumen_pedido.value = "Sin items."
-                    estado["pedido_actual"] = None
-                    log.info(f"Pedido {pedido_actual['id']} quedó vacío tras eliminar último ítem")
+        items_anteriores = list(pedido_actual.get("items", []))
+        if not items_anteriores:
+            resumen_pedido.value = "Sin items."
+            actualizar_estado_botones()
+            return
+
+        # Optimista: quitar el ítem del resumen de inmediato
+        eliminado = items_anteriores[-1]
+        pedido_actual["items"] = items_anteriores[:-1]
+        resumen_pedido.value = generar_resumen_pedido(pedido_actual)
+        actualizar_estado_botones()
+
+        if pedido_actual["id"] is None:
+            log.debug(f"Ítem eliminado en memoria: {eliminado['nombre']}")
+            items_restantes = list(pedido_actual["items"])
+
+            def reducir_retencion():
+                try:
+                    sincronizar_retencion(pedido_actual, items_restantes)
+                except Exception as ex:
+                    # Achicar una retención no debería fallar; si falla, vence sola
+                    log.warning(f"No se pudo actualizar la retención de stock: {ex}")
 
+            ejecutor.ejecutar(f"reducir_retencion mesa {estado['mesa_seleccionada']['numero']}", reducir_retencion, clave="panel")
+            return
+
+        def rollback():
+            # Se repone solo el ítem eliminado, sin pisar los agregados mientras tanto
+            pedido_actual["items"] = list(pedido_actual.get("items", [])) + [eliminado]
+            if estado["pedido_actual"] is pedido_actual:
+                resumen_pedido.value = generar_resumen_pedido(pedido_actual)
+                actualizar_estado_botones()
+
+        def al_terminar(_):
+            log.info(f"Último ítem eliminado en BD - Pedido ID: {pedido_actual['id']}")
             on_update_ui()
-            actualizar_estado_botones()
 
-        except Exception as ex:
-            log.error(f"Error crítico al eliminar último ítem del pedido: {ex}")
+        ejecutor.ejecutar(
+            f"eliminar_ultimo_item pedido {pedido_actual['id']}",
+            lambda: backend_service.eliminar_ultimo_item(pedido_actual["id"]),
+            rollback=rollback, al_terminar=al_terminar,
+            al_fallar=mostrar_error_comando("No se pudo eliminar el ítem"), clave="panel"
+        )
 
     def confirmar_pedido(e):
         pedido_actual = estado["pedido_actual"]
@@ -736,21 +844,24 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
             log.warning("Intento de confirmar pedido vacío")
             return
 
-        mesa_num = estado["mesa_seleccionada"]["numero"]
+        mesa_seleccionada = estado["mesa_seleccionada"]
+        mesa_num = mesa_seleccionada["numero"]
         total = sum(item["precio"] for item in pedido_actual["items"])
         log.info(f"Confirmando pedido Mesa {mesa_num} | {len(pedido_actual['items'])} ítems | Total: ${total:.2f}")
 
-        try:
-            nota_a_guardar = nota_pedido.value.strip() if nota_pedido.value else ""
+        nota_a_guardar = nota_pedido.value.strip() if nota_pedido.value else ""
+        pantalla_anterior = (mesa_info.value, resumen_pedido.value, nota_pedido.value)
 
+        def enviar():
             if pedido_actual["id"] is None:
                 nuevo_pedido = backend_service.crear_pedido(
                     pedido_actual["mesa_numero"],
                     pedido_actual["items"],
                     "Pendiente",
-                    nota_a_guardar
+                    nota_a_guardar,
+                    retencion_id=pedido_actual.get("retencion_id")
                 )
-                estado["pedido_actual"] = nuevo_pedido
+                pedido_actual.pop("retencion_id", None)
                 log.info(f"Nuevo pedido creado en BD - ID: {nuevo_pedido['id']} | Mesa: {mesa_num}")
             else:
                 backend_service.actualizar_pedido(
@@ -762,6 +873,8 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
                 )
                 log.info(f"Pedido existente actualizado en BD - ID: {pedido_actual['id']} | Mesa: {mesa_num}")
 
+        # Optimista: el panel queda libre para la siguiente mesa mientras el pedido viaja a cocina
+        def optimista():
             cantidad_dropdown.value = "1"
             cantidad_dropdown.disabled = True
             estado["pedido_actual"] = None
@@ -770,26 +883,29 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
             resumen_pedido.value = ""
             nota_pedido.value = ""
             actualizar_estado_botones()
-            on_update_ui()
 
+        def rollback():
+            # Solo restaurar si la mesera no empezó ya otra mesa
+            if estado["mesa_seleccionada"] is None:
+                estado["mesa_seleccionada"] = mesa_seleccionada
+                estado["pedido_actual"] = pedido_actual
+                mesa_info.value, resumen_pedido.value, nota_pedido.value = pantalla_anterior
+                actualizar_estado_botones()
+
+        def al_terminar(_):
+            on_update_ui()
             threading.Thread(target=reproducir_sonido_pedido, daemon=True).start()
             log.info(f"Pedido confirmado exitosamente - Mesa {mesa_num} enviado a cocina")
 
-        except Exception as ex:
+        def al_fallar(ex):
             log.error(f"ERROR CRÍTICO al confirmar pedido Mesa {mesa_num}: {ex}")
-            msg_error = str(ex)
-            def cerrar_alerta_stock(e):
-                page.close(dlg_alerta)
-            dlg_alerta = ft.AlertDialog(
-                title=ft.Text("No se puede tomar la orden", color="red"),
-                content=ft.Text(f"{msg_error}", size=16),
-                actions=[ft.TextButton("Entendido", on_click=cerrar_alerta_stock)],
-                actions_alignment=ft.MainAxisAlignment.END,
-            )
-            page.open(dlg_alerta)
-            page.update()
+            mostrar_error_comando("No se puede tomar la orden")(ex)
+
+        ejecutor.ejecutar(
+            f"confirmar_pedido mesa {mesa_num}", enviar,
+            optimista=optimista, rollback=rollback, al_terminar=al_terminar, al_fallar=al_fallar, clave="panel"
+        )
 
-            # --- FIN MOSTRAR ERROR ---
     asignar_btn.on_click = asignar_cliente
     agregar_item_btn.on_click = agregar_item_pedido
     eliminar_ultimo_btn.on_click = eliminar_ultimo_item
@@ -839,12 +955,13 @@ def crear_panel_gestion(backend_service, menu, on_update_ui, page, primary_color
     def actualizar_menu_gestion(novo_menu):
         selector_item.update_menu_data(novo_menu)
     panel.actualizar_menu = actualizar_menu_gestion
+    panel.actualizar_disponibilidad = selector_item.actualizar_disponibilidad
 
     log.info("Panel de gestión de pedidos creado correctamente")
     return panel
 
 
-def crear_vista_cocina(backend_service, on_update_ui, page):
+def crear_vista_cocina(backend_service, on_update_ui, page, ejecutor):
     log.debug("Creando vista de Cocina (versión con ícono de advertencia para retrasos)")
     lista_pedidos = ft.ListView(
         expand=1,
@@ -853,8 +970,9 @@ def crear_vista_cocina(backend_service, on_update_ui, page):
         auto_scroll=True,
     )
 
-    # Variables para almacenar alertas de retraso detectadas en esta vista
-    alertas_retraso_vista = []
+    # Alertas de retraso por id de pedido. Las calcula el backend (GET /pedidos/atrasados)
+    # en RestauranteGUI.verificar_retrasos_real_time con el único umbral configurado.
+    alertas_retraso_vista = {}
 
     def actualizar():
         nonlocal alertas_retraso_vista
@@ -864,60 +982,15 @@ def crear_vista_cocina(backend_service, on_update_ui, page):
             en_preparacion = sum(1 for p in pedidos if p.get("estado") == "En preparacion")
             log.info(f"Actualizando vista Cocina | Pendientes: {pendientes} | En preparación: {en_preparacion}")
 
-            # Detectar retrasos en pedidos activos
-            ahora = datetime.now()
-            alertas_retraso_vista.clear() # Limpiar alertas anteriores de esta vista
-            for pedido in pedidos:
-                if pedido.get("estado") in ["Pendiente", "En preparacion"] and pedido.get("items"):
-                    try:
-                        # Parsear la fecha del pedido
-                        fecha_pedido_str = pedido.get('fecha_hora', '')
-                        if fecha_pedido_str:
-                            fecha_pedido = datetime.strptime(fecha_pedido_str.split(".")[0], "%Y-%m-%d %H:%M:%S")
-                            mins_retraso = (ahora - fecha_pedido).total_seconds() / 60
-
-                            # Supongamos que la instancia principal tiene el umbral
-                            # (esto se obtiene de la página o de una variable global si no es accesible directamente aquí)
-                            # Por ahora, usaremos un valor fijo o uno pasado como parámetro si es posible
-                            # OJO: Esto es un punto crítico. La mejor forma es pasar el umbral desde la instancia principal.
-                            # Por simplicidad temporal, usaremos 20 minutos como ejemplo.
-                            # Lo ideal es poder acceder a app_instance.tiempo_umbral_minutos
-                            umbral_retraso = 20 # Este valor debería venir de la instancia principal de la app
-
-                            # Intentar acceder al umbral desde la instancia principal si está disponible
-                            if hasattr(page, 'app_instance') and hasattr(page.app_instance, 'tiempo_umbral_minutos'):
-                                 umbral_retraso = page.app_instance.tiempo_umbral_minutos
-                            else:
-                                log.warning("No se pudo acceder al umbral de retraso desde la página. Usando valor por defecto (20 min).")
-
-                            if mins_retraso >= umbral_retraso:
-                                titulo = obtener_titulo_pedido(pedido)
-                                alertas_retraso_vista.append({
-                                    "id_pedido": pedido['id'],
-                                    "titulo_pedido": titulo,
-                                    "estado": pedido['estado'],
-                                    "tiempo_retraso": round(mins_retraso, 1),
-                                    "fecha_hora": fecha_pedido
-                                })
-                                log.warning(f"PEDIDO ATRASADO DETECTADO EN VISTA COCINA (en tiempo real) → {titulo} | {mins_retraso:.1f} min (umbral: {umbral_retraso})")
-                    except ValueError:
-                        log.error(f"Error al parsear fecha_hora del pedido ID {pedido.get('id', 'N/A')}: {fecha_pedido_str}")
-                        continue # Saltar este pedido si hay error en la fecha
-
-            # Actualizar indicadores de alerta globales si hay alertas detectadas en esta vista
-            hay_retrasos = len(alertas_retraso_vista) > 0
-            if hasattr(page, 'app_instance'):
-                 page.app_instance.hay_pedidos_atrasados = hay_retrasos
-                 page.app_instance.lista_alertas_retrasos = alertas_retraso_vista
-                 # Forzar actualización de visibilidad de alertas
-                 if hasattr(page.app_instance, 'actualizar_visibilidad_alerta'):
-                     page.app_instance.actualizar_visibilidad_alerta()
+            app_instance = getattr(page, 'app_instance', None)
+            alertas = app_instance.lista_alertas_retrasos if app_instance else []
+            alertas_retraso_vista = {a['id_pedido']: a for a in alertas}
 
             lista_pedidos.controls.clear()
             for pedido in pedidos:
                 if pedido.get("estado") in ["Pendiente", "En preparacion"] and pedido.get("items"):
                     lista_pedidos.controls.append(crear_item_pedido_cocina(pedido, backend_service, on_update_ui))
-            page.update()
+            marcar_actualizacion(page, lista_pedidos)
         except Exception as e:
             log.error(f"Error crítico al actualizar vista Cocina: {e}")
 
@@ -926,7 +999,7 @@ def crear_vista_cocina(backend_service, on_update_ui, page):
         titulo_base = obtener_titulo_pedido(pedido)
         
         # Verificar si el pedido está retrasado
-        pedido_atrasado = any(a['id_pedido'] == pedido_id for a in alertas_retraso_vista)
+        pedido_atrasado = pedido_id in alertas_retraso_vista
         
         # ===== NUEVO SISTEMA DE COLORES POR ESTADO =====
         estado_pedido = pedido.get("estado", "Pendiente")
@@ -989,8 +1062,7 @@ def crear_vista_cocina(backend_service, on_update_ui, page):
         # Si está retrasado, agregar ícono de advertencia al título
         if pedido_atrasado:
             # Encontrar la alerta para obtener el tiempo de retraso
-            alerta = next((a for a in alertas_retraso_vista if a['id_pedido'] == pedido_id), None)
-            tiempo_retraso = alerta['tiempo_retraso'] if alerta else 0
+            tiempo_retraso = alertas_retraso_vista[pedido_id]['tiempo_retraso']
             origen = f"⚠️ {titulo_base} - {pedido.get('fecha_hora', 'Sin fecha')[-8:]}"
             # Agregar información adicional sobre el retraso
             info_retraso = ft.Container(
@@ -1012,20 +1084,48 @@ def crear_vista_cocina(backend_service, on_update_ui, page):
             info_retraso = None
 
         def cambiar_estado(e, p, nuevo_estado):
-            try:
-                backend_service.actualizar_estado_pedido(p["id"], nuevo_estado)
+            boton = e.control
+
+            # Optimista: "Listo" saca la tarjeta de cocina; "En preparación" bloquea el botón
+            def optimista():
+                if nuevo_estado == "Listo":
+                    card_container.visible = False
+                boton.disabled = True
+                marcar_actualizacion(page, card_container)
+
+            def rollback():
+                card_container.visible = True
+                boton.disabled = False
+                marcar_actualizacion(page, card_container)
+
+            def al_terminar(_):
                 log.info(f"Estado cambiado → Pedido {p['id']} | {p.get('estado','?')} → {nuevo_estado}")
                 on_update_ui()
-            except Exception as ex:
-                log.error(f"Error al cambiar estado del pedido {p['id']} a '{nuevo_estado}': {ex}")
+
+            ejecutor.ejecutar(
+                f"cambiar_estado pedido {p['id']}",
+                lambda: backend_service.actualizar_estado_pedido(p["id"], nuevo_estado),
+                optimista=optimista, rollback=rollback, al_terminar=al_terminar, clave=("pedido", p["id"])
+            )
 
         def eliminar_pedido_click(e):
-            try:
-                backend_service.eliminar_pedido(pedido["id"])
+            def optimista():
+                card_container.visible = False
+                marcar_actualizacion(page, card_container)
+
+            def rollback():
+                card_container.visible = True
+                marcar_actualizacion(page, card_container)
+
+            def al_terminar(_):
                 log.warning(f"Pedido ELIMINADO por cocina → ID: {pedido_id} | {titulo_base}")
                 on_update_ui()
-            except Exception as ex:
-                log.error(f"Error al eliminar pedido {pedido_id} desde cocina: {ex}")
+
+            ejecutor.ejecutar(
+                f"eliminar_pedido {pedido_id}",
+                lambda: backend_service.eliminar_pedido(pedido["id"]),
+                optimista=optimista, rollback=rollback, al_terminar=al_terminar, clave=("pedido", pedido_id)
+            )
 
         notas_pedido = pedido.get('notas', '').strip()
         nota = "Sin Nota" if not notas_pedido else f"📝 {notas_pedido}"
@@ -1162,7 +1262,7 @@ def crear_vista_cocina(backend_service, on_update_ui, page):
                     offset=ft.Offset(0, 2),
                 )
                 card_container.scale = 1.0
-            card_container.update()
+            marcar_actualizacion(page, card_container)
 
         card_container.on_hover = on_hover_card
 
@@ -1299,7 +1399,7 @@ def crear_vista_admin(backend_service, menu, on_update_ui, page):
                     border_radius=10
                 )
                 lista_clientes.controls.append(cliente_row)
-            page.update()
+            marcar_actualizacion(page, lista_clientes)
         except Exception as e:
             log.error(f"Error crítico al cargar lista de clientes: {e}")
 
@@ -1507,6 +1607,7 @@ class RestauranteGUI:
         self.vista_recetas = None
         self.vista_configuraciones = None
         self.vista_reportes = None
+        self.vista_reportes_cargada = False
         self.vista_personalizacion = None
         self.menu_cache = None
         self.hilo_sincronizacion = None
@@ -1543,12 +1644,17 @@ class RestauranteGUI:
         
         self.reservas_service = ReservasService()
         self.vista_reservas = None
+
+        # Pool para las llamadas al backend desde los handlers (fuera del hilo de eventos de Flet)
+        self.ejecutor = EjecutorComandos()
         
         # Atributos para control de verificación en tiempo real
         self.ultimo_check_stock = 0
         self.ultimo_check_retrasos = 0
-        self.stock_actual = {}
-        self.pedidos_activos_actual = {}
+        # Estado incremental de alertas de stock: {id: nombre} de los ítems en stock bajo
+        self.alertas_stock = {}
+        self.version_alertas_stock = None
+        self.ciclos_sin_resync_stock = 0
         
         # Cargar configuración al inicio
         self.cargar_configuracion()
@@ -1598,127 +1704,75 @@ class RestauranteGUI:
 
     # === FUNCIÓN: verificar_stock_real_time (CORREGIDA) ===
     def verificar_stock_real_time(self):
-        """Verifica stock en tiempo real detectando cambios de valor Y eliminaciones."""
+        """Verifica stock en tiempo real pidiendo al backend solo los cambios desde la última versión."""
         try:
-            items = self.inventory_service.obtener_inventario()
-            nuevo_stock = {item['id']: item for item in items}
-            
-            # 1. Detectar cambios en la ESTRUCTURA (ítems nuevos o ELIMINADOS)
-            ids_anteriores = set(self.stock_actual.keys())
-            ids_nuevos = set(nuevo_stock.keys())
-            
-            # Si los sets de IDs son diferentes, es que se agregó o SE ELIMINÓ algo.
-            cambio_estructural = ids_anteriores != ids_nuevos
-
-            # 2. Detectar cambios en los VALORES de los ítems que persisten
-            cambio_valor = False
-            if not cambio_estructural:
-                for item_id, item in nuevo_stock.items():
-                    if item_id in self.stock_actual:
-                        # Comparar cantidad y umbral
-                        cant_old = self.stock_actual[item_id].get('cantidad_disponible')
-                        cant_new = item.get('cantidad_disponible')
-                        umbral_old = self.stock_actual[item_id].get('cantidad_minima_alerta', 5.0)
-                        umbral_new = item.get('cantidad_minima_alerta', 5.0)
-                        
-                        if cant_old != cant_new or umbral_old != umbral_new:
-                            cambio_valor = True
-                            break
-            
-            # Si hubo CUALQUIER cambio (estructura o valores), recalculamos las alertas
-            if cambio_estructural or cambio_valor:
-                log.debug("Cambio en inventario detectado (valor o eliminación) -> Recalculando alertas")
-                
-                # Verificar stock bajo usando el umbral personalizado de cada ítem
-                ingredientes_bajos = []
-                for item in items:
-                    # Usar el umbral personalizado, fallback al general si hiciera falta
-                    umbral = item.get('cantidad_minima_alerta', self.umbral_stock_bajo)
-                    if item['cantidad_disponible'] <= umbral:
-                        ingredientes_bajos.append(item)
-                
-                # Actualizar estado de alertas
-                if ingredientes_bajos:
-                    nombres = ", ".join([item['nombre'] for item in ingredientes_bajos])
-                    self.hay_stock_bajo = True
-                    self.ingredientes_bajos_lista = [item['nombre'] for item in ingredientes_bajos]
-                    if cambio_estructural: # Log solo si fue algo estructural para no saturar
-                        log.warning(f"STOCK BAJO ACTUALIZADO → {len(ingredientes_bajos)} ingredientes: {nombres}")
-                else:
-                    # Si antes había alerta y ahora no (porque se borró el ítem o se rellenó), limpiamos
-                    if self.hay_stock_bajo:
-                        log.info("Stock bajo resuelto (alerta limpiada)")
-                        self.hay_stock_bajo = False
-                        self.ingredientes_bajos_lista = []
-                        self.mostrar_detalle_stock = False
-                
-                # Actualizar cache
-                self.stock_actual = nuevo_stock
-                
-                # Actualizar visibilidad de alertas inmediatamente
-                if hasattr(self, 'actualizar_visibilidad_alerta'):
-                    self.actualizar_visibilidad_alerta()
-                    
+            # Cada CICLOS_RESYNC_STOCK ciclos se pide la lista completa de alertas (sin 'since')
+            # por si una transacción lenta confirmó una versión menor a la ya vista.
+            resync = self.ciclos_sin_resync_stock >= CICLOS_RESYNC_STOCK
+            since = None if resync else self.version_alertas_stock
+            respuesta = self.inventory_service.obtener_alertas_stock(since)
+            self.ciclos_sin_resync_stock = 0 if since is None else self.ciclos_sin_resync_stock + 1
+
+            if respuesta["completo"]:
+                nuevas_alertas = {item['id']: item['nombre'] for item in respuesta["items"]}
+            else:
+                nuevas_alertas = dict(self.alertas_stock)
+                for item in respuesta["items"]:
+                    if item["en_alerta"]:
+                        nuevas_alertas[item['id']] = item['nombre']
+                    else:
+                        nuevas_alertas.pop(item['id'], None)
+                for item_id in respuesta["eliminados"]:
+                    nuevas_alertas.pop(item_id, None)
+
+            self.version_alertas_stock = respuesta["version"]
+            if nuevas_alertas == self.alertas_stock:
+                return  # Sin cambios en las alertas: no tocar la UI
+
+            log.debug(f"Cambio en alertas de stock (versión {respuesta['version']}) -> Actualizando indicador")
+            self.alertas_stock = nuevas_alertas
+            if nuevas_alertas:
+                self.hay_stock_bajo = True
+                self.ingredientes_bajos_lista = sorted(nuevas_alertas.values())
+                log.warning(f"STOCK BAJO ACTUALIZADO → {len(nuevas_alertas)} ingredientes: {', '.join(self.ingredientes_bajos_lista)}")
+            elif self.hay_stock_bajo:
+                # Antes había alerta y ahora no (se borró el ítem o se rellenó)
+                log.info("Stock bajo resuelto (alerta limpiada)")
+                self.hay_stock_bajo = False
+                self.ingredientes_bajos_lista = []
+                self.mostrar_detalle_stock = False
+
+            # Actualizar visibilidad de alertas inmediatamente
+            if hasattr(self, 'actualizar_visibilidad_alerta'):
+                self.actualizar_visibilidad_alerta()
+
         except Exception as e:
             log.error(f"Error en verificación de stock en tiempo real: {e}")
 
             
     def verificar_retrasos_real_time(self):
-        """Verifica retrasos en tiempo real - FUNCIONA SIEMPRE aunque el backend no devuelva updated_at"""
+        """Verifica retrasos en tiempo real. El backend calcula la espera en SQL con el umbral configurado."""
         try:
-            pedidos_activos = self.backend_service.obtener_pedidos_activos()
-            ahora = datetime.now()
-
-            # Forzar detección de cambios usando ID + estado + items (infalible)
-            nuevo_hash = {}
-            for p in pedidos_activos:
-                items_str = str(sorted([f"{i['nombre']}{i['precio']}" for i in p.get('items', [])]))
-                clave = f"{p['id']}_{p.get('estado','')}_{items_str}"
-                nuevo_hash[p['id']] = clave
-
-            # Detectar cualquier cambio (aunque no haya updated_at)
-            cambios_detectados = (
-                set(nuevo_hash.keys()) != set(self.pedidos_activos_actual.keys()) or
-                any(nuevo_hash.get(pid) != self.pedidos_activos_actual.get(pid) for pid in nuevo_hash)
-            )
-
-            if not cambios_detectados and self.pedidos_activos_actual:
-                return  # Solo si realmente no cambió nada
-
-            # === AQUÍ SÍ ENTRA SIEMPRE QUE HAYA UN PEDIDO NUEVO O CAMBIO ===
-
-            activos_relevantes = [
-                p for p in pedidos_activos
-                if p.get('estado') in ["Pendiente", "En preparacion"] and p.get('items')
-            ]
-
-            alertas_nuevas = []
-            for pedido in activos_relevantes:
-                try:
-                    fecha_str = str(pedido.get('fecha_hora', '')).split('.')[0]
-                    if not fecha_str or len(fecha_str) < 10:
-                        continue
-                    fecha_pedido = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S")
-                    minutos_transcurridos = (ahora - fecha_pedido).total_seconds() / 60
-
-                    if minutos_transcurridos >= self.tiempo_umbral_minutos:
-                        titulo = obtener_titulo_pedido(pedido)
-                        alertas_nuevas.append({
-                            "id_pedido": pedido['id'],
-                            "titulo_pedido": titulo,
-                            "estado": pedido['estado'],
-                            "tiempo_retraso": round(minutos_transcurridos, 1)
-                        })
-                        log.warning(f"ALERTA RETRASO → {titulo} | {minutos_transcurridos:.1f} min (umbral: {self.tiempo_umbral_minutos})")
-
-                except Exception as e:
-                    log.error(f"Error procesando pedido {pedido.get('id')} para retraso: {e}")
-
+            atrasados = self.backend_service.obtener_pedidos_atrasados(self.tiempo_umbral_minutos)
+
+            alertas_nuevas = [{
+                "id_pedido": pedido['id'],
+                "titulo_pedido": obtener_titulo_pedido(pedido),
+                "estado": pedido['estado'],
+                "tiempo_retraso": pedido['minutos_retraso']
+            } for pedido in atrasados]
+
+            # Solo avisar (log) de los que acaban de cruzar el umbral
+            ids_anteriores = {a['id_pedido'] for a in self.lista_alertas_retrasos}
+            for alerta in alertas_nuevas:
+                if alerta['id_pedido'] not in ids_anteriores:
+                    log.warning(f"ALERTA RETRASO → {alerta['titulo_pedido']} | {alerta['tiempo_retraso']:.1f} min (umbral: {self.tiempo_umbral_minutos})")
+
+            cambio = alertas_nuevas != self.lista_alertas_retrasos
             self.lista_alertas_retrasos = alertas_nuevas
             self.hay_pedidos_atrasados = len(alertas_nuevas) > 0
-            self.pedidos_activos_actual = nuevo_hash
 
-            if hasattr(self, 'actualizar_visibilidad_alerta'):
+            if cambio and hasattr(self, 'actualizar_visibilidad_alerta'):
                 self.actualizar_visibilidad_alerta()
 
         except Exception as e:
@@ -1742,7 +1796,8 @@ class RestauranteGUI:
                     # Verificar alertas en tiempo real ANTES de actualizar la UI
                     self.verificar_todo_real_time()
                     # Ahora actualizar la UI con los estados de alerta actualizados
-                    self.actualizar_ui_completo()
+                    # (agrupado con los refrescos que piden los handlers)
+                    self.solicitar_actualizacion_ui()
                     time.sleep(3)
                 except Exception as e:
                     log.error(f"Error crítico en hilo de sincronización UI: {e}")
@@ -1786,6 +1841,11 @@ class RestauranteGUI:
         # =================================================================
         
         log.info("Configuración previa detectada - Cargando sistema completo")
+
+        # === PLANIFICADOR DE FRAMES ===
+        # Vistas e hilos marcan controles con marcar_actualizacion(); se envían en ≤1 page.update() cada 100 ms
+        page.planificador_frames = PlanificadorFrames(page)
+        page.planificador_frames.iniciar()
         
         # === CARGA INICIAL DEL MENÚ ===
         try:
@@ -1850,7 +1910,7 @@ class RestauranteGUI:
         # === RELOJ EN VIVO ===
         def actualizar_reloj():
             reloj.value = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            page.update()
+            marcar_actualizacion(page, reloj)  # Solo el reloj, no la página completa
         def loop_reloj():
             while True:
                 actualizar_reloj()
@@ -1867,14 +1927,21 @@ class RestauranteGUI:
             log.error(f"Error al cargar menú al iniciar: {e}")
             self.menu_cache = []
         
+        # === IMPORTS DIFERIDOS DE VISTAS ===
+        from inventario_view import crear_vista_inventario
+        from configuraciones_view import crear_vista_configuraciones
+        from caja_view import crear_vista_caja
+        from reservas_view import crear_vista_reservas
+        from recetas_view import crear_vista_recetas
+
         # === CREACIÓN DE TODAS LAS VISTAS ===
         log.debug("Creando todas las vistas de la aplicación")
         self.mesas_grid = crear_mesas_grid(self.backend_service, self.seleccionar_mesa, self)
         self.panel_gestion = crear_panel_gestion(
-            self.backend_service, self.menu_cache, self.actualizar_ui_completo,
-            page, self.PRIMARY, self.PRIMARY_DARK
+            self.backend_service, self.menu_cache, self.solicitar_actualizacion_ui,
+            page, self.PRIMARY, self.PRIMARY_DARK, self.ejecutor
         )
-        self.vista_cocina = crear_vista_cocina(self.backend_service, self.actualizar_ui_completo, page)
+        self.vista_cocina = crear_vista_cocina(self.backend_service, self.solicitar_actualizacion_ui, page, self.ejecutor)
         self.vista_caja = crear_vista_caja(self.backend_service, self.actualizar_ui_completo, page)
         self.vista_admin = crear_vista_admin(self.backend_service, self.menu_cache, self.actualizar_ui_completo, page)
         self.vista_recetas = crear_vista_recetas(
@@ -1886,7 +1953,16 @@ class RestauranteGUI:
             self.config_service, self.inventory_service, self.backend_service,
             self.actualizar_ui_completo, page
         )
-        self.vista_reportes = crear_vista_reportes(self.backend_service, self.actualizar_ui_completo, page)
+        # Reportes: contenedor vacío, se llena en cargar_vista_reportes() al abrir la pestaña
+        self.vista_reportes = ft.Container(
+            content=ft.Column([
+                ft.ProgressRing(),
+                ft.Text("Cargando reportes...", size=14, color=ft.Colors.GREY_400)
+            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+            alignment=ft.alignment.center,
+            expand=True
+        )
+        self.vista_reportes_cargada = False
         self.vista_reservas = crear_vista_reservas(
             self.reservas_service, self.backend_service, self.backend_service,
             self.actualizar_ui_completo, page
@@ -1912,6 +1988,13 @@ class RestauranteGUI:
             ],
             expand=1
         )
+        indice_tab_reportes = len(tabs.tabs) - 1
+
+        def on_tab_change(e):
+            if tabs.selected_index == indice_tab_reportes:
+                self.cargar_vista_reportes(page)
+
+        tabs.on_change = on_tab_change
         
         log.info("Pestañas principales creadas - 10 módulos activos")
         
@@ -1938,7 +2021,7 @@ class RestauranteGUI:
                     )
             log.debug(f"Indicador Retrasos activado → {len(self.lista_alertas_retrasos)} pedidos atrasados")
             
-            page.update()
+            marcar_actualizacion(page)
         
         page.add(
             ft.Stack(
@@ -1981,6 +2064,23 @@ class RestauranteGUI:
         log.info("¡APLICACIÓN RESTIA INICIADA CORRECTAMENTE! - Todo listo y funcionando")
         log.info("=" * 60)
 
+    # === MÉTODO: cargar_vista_reportes ===
+    # Importa reportes_view (y con él plotly/reportlab) solo la primera vez que se abre la pestaña.
+    def cargar_vista_reportes(self, page):
+        if self.vista_reportes_cargada:
+            return
+        inicio = time.perf_counter()
+        try:
+            from reportes_view import crear_vista_reportes
+            self.vista_reportes.content = crear_vista_reportes(self.backend_service, self.actualizar_ui_completo, page)
+            self.vista_reportes.alignment = None
+            self.vista_reportes_cargada = True
+            log.info(f"Vista Reportes cargada bajo demanda en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        except Exception as e:
+            log.error(f"Error al cargar la vista de reportes: {e}")
+            self.vista_reportes.content = ft.Text(f"Error al cargar reportes: {e}", color=ft.Colors.RED)
+        page.update()
+
     def crear_vista_mesera(self):
         log.debug("Creando vista Mesera")
         return ft.Container(
@@ -2010,6 +2110,11 @@ class RestauranteGUI:
         if self.panel_gestion:
             self.panel_gestion.seleccionar_mesa(numero_mesa)
 
+    # === MÉTODO: solicitar_actualizacion_ui ===
+    # Versión agrupada de actualizar_ui_completo: N solicitudes seguidas producen un solo refresco.
+    def solicitar_actualizacion_ui(self):
+        self.ejecutor.solicitar_refresco(self.actualizar_ui_completo)
+
     def actualizar_ui_completo(self):
         log.debug("↻ actualizar_ui_completo() llamado - Iniciando refresco completo de UI")
         
@@ -2023,9 +2128,17 @@ class RestauranteGUI:
         except Exception as e:
             log.error(f"Error al recargar menú: {e}")
 
+        try:
+            # Disponibilidad de todos los platos en una sola petición (se sirve desde memoria en el backend)
+            disponibilidad = self.backend_service.obtener_disponibilidad_menu()
+            if self.panel_gestion and hasattr(self.panel_gestion, 'actualizar_disponibilidad'):
+                self.panel_gestion.actualizar_disponibilidad(disponibilidad)
+        except Exception as e:
+            log.error(f"Error al obtener disponibilidad del menú: {e}")
+
         nuevo_grid = crear_mesas_grid(self.backend_service, self.seleccionar_mesa, self)
         self.mesas_grid.controls = nuevo_grid.controls
-        self.mesas_grid.update()
+        marcar_actualizacion(self.page, self.mesas_grid)
         log.debug("Grid de mesas recreado y actualizado")
         
         if hasattr(self.vista_cocina, 'actualizar'):
@@ -2052,8 +2165,8 @@ class RestauranteGUI:
             self.actualizar_visibilidad_alerta()
         log.debug("Visibilidad de alertas de stock y retrasos actualizada")
         
-        self.page.update()
-        log.debug("page.update() ejecutado - UI refrescada completamente")
+        marcar_actualizacion(self.page)
+        log.debug("Página marcada para el próximo frame - UI refrescada completamente")
         
         if hasattr(self.vista_reservas, 'cargar_clientes'):
             self.vista_reservas.cargar_clientes()
@@ -1,89 +1,34 @@
 # === BACKEND.PY ===
 # Backend API para el sistema de restaurante con integración de FastAPI y PostgreSQL.
 
-from fastapi import FastAPI, HTTPException, Depends, Query
-from pydantic import BaseModel
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import psycopg2
+import psycopg2.errors
+from psycopg2.extensions import parse_dsn
 from psycopg2.extras import RealDictCursor
 import json
 from datetime import datetime, date, timedelta
-import subprocess
 import os
-import shutil
-import glob
 import logging  # ← AÑADIDO
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+from configuracion_logs import configurar_logs
+from registro_accesos import MiddlewareAccesos, abrir_conexion
+from metricas import metricas, TIPO_CONTENIDO, pedidos_creados, ventana_pedidos, alertas_total
+from consultas_lentas import consultas_lentas
+from perfiles import instalar_perfiles, listar_perfiles, ruta_archivo_perfil
+from conexiones_async import pool_async, DB_ASYNC_ACTIVO, decimal, asyncpg
 from pathlib import Path
 from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, FileResponse
 from typing import List
 import asyncio
+import anyio
 
-# Crear carpeta de logs si no existe
+# Logger principal: QueueHandler + QueueListener (ver configuracion_logs.py).
+# INFO en producción; RESTAURANTIA_ENTORNO=desarrollo o RESTAURANTIA_LOG_NIVEL=DEBUG para más detalle.
 LOGS_DIR = Path("logs")
-LOGS_DIR.mkdir(exist_ok=True)
-
-# Logger principal
-log = logging.getLogger("RestaurantIA")
-log.setLevel(logging.DEBUG)  # Nivel más bajo para capturar todo
-
-# Evitar duplicados si ya tiene handlers (importante en hot-reload de uvicorn)
-if log.handlers:
-    log.handlers.clear()
-
-# Formato bonito y completo
-formatter = logging.Formatter(
-    fmt="%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-
-# === HANDLER 1: Consola con colores (solo en desarrollo) ===
-try:
-    from colorlog import ColoredFormatter
-    console_formatter = ColoredFormatter(
-        "%(log_color)s%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d | %(message)s",
-        datefmt="%H:%M:%S",
-        log_colors={
-            'DEBUG':    'cyan',
-            'INFO':     'green',
-            'WARNING':  'yellow',
-            'ERROR':    'red',
-            'CRITICAL': 'red,bg_white',
-        }
-    )
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(console_formatter)
-    console_handler.setLevel(logging.DEBUG)
-    log.addHandler(console_handler)
-except ImportError:
-    # Si no tiene colorlog instalado, usa formato normal
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.DEBUG)
-    log.addHandler(console_handler)
-
-# === HANDLER 2: Archivo general (rotación diaria, guarda 30 días) ===
-daily_handler = TimedRotatingFileHandler(
-    LOGS_DIR / "restaurantia.log",
-    when="midnight",
-    interval=1,
-    backupCount=30,
-    encoding="utf-8"
-)
-daily_handler.setFormatter(formatter)
-daily_handler.setLevel(logging.INFO)  # Info y superior
-log.addHandler(daily_handler)
-
-# === HANDLER 3: Archivo solo de errores (rotación por tamaño, máx 5MB cada uno) ===
-error_handler = RotatingFileHandler(
-    LOGS_DIR / "errores_criticos.log",
-    maxBytes=5_000_000,  # 5 MB
-    backupCount=10,
-    encoding="utf-8"
-)
-error_handler.setLevel(logging.WARNING)  # Warning, Error y Critical
-error_handler.setFormatter(formatter)
-log.addHandler(error_handler)
+log = configurar_logs(directorio=str(LOGS_DIR))
 
 # Mensaje de inicio bonito
 log.info("=" * 80)
@@ -92,12 +37,19 @@ log.info("=" * 80)
 # ============================================================================
 
 # IMPORTAR LAS SUB-APPS
-from inventario_backend import inventario_app
+from inventario_backend import inventario_app, registrar_movimientos_inventario, crear_checkpoint_inventario
 from configuraciones_backend import configuraciones_app
 from recetas_backend import recetas_app
 from backend_service import BackendService
+from disponibilidad_menu import disponibilidad_menu
+from retenciones_stock import retenciones_stock, TTL_RETENCION_S, INTERVALO_BARRIDO_RETENCIONES_S
+from respaldos import gestor_respaldos, INTERVALO_SEGMENTO_RESPALDO_S
 
 app = FastAPI(title="RestaurantIA Backend")
+# Una línea JSON por request (también para las sub-apps montadas) → logs/accesos.jsonl
+app.add_middleware(MiddlewareAccesos)
+# Perfilado opcional por encabezado X-Perfil o por ruta (ver perfiles.py); apagado no instala nada
+instalar_perfiles(app)
 
 # Montar sub-apps
 app.mount("/inventario", inventario_app)
@@ -108,8 +60,10 @@ log.info("Backend FastAPI iniciando - RestaurantIA API v2")
 log.info("Sub-apps montadas: /inventario | /configuraciones | /recetas")
 
 # Configuración directa de PostgreSQL
-DATABASE_URL = "dbname=restaurant_db user=postgres password=postgres host=localhost port=5432"
-log.info(f"Conexión configurada → BD: restaurant_db | Host: localhost:5432")
+# RESTAURANTIA_DATABASE_URL permite apuntar a otra base (p. ej. la de benchmark_carga.py)
+DATABASE_URL = os.environ.get("RESTAURANTIA_DATABASE_URL", "dbname=restaurant_db user=postgres password=postgres host=localhost port=5432")
+_dsn_log = parse_dsn(DATABASE_URL)
+log.info(f"Conexión configurada → BD: {_dsn_log.get('dbname', '?')} | Host: {_dsn_log.get('host', 'localhost')}:{_dsn_log.get('port', '5432')}")
 
 @app.get("/")
 def read_root():
@@ -117,17 +71,40 @@ def read_root():
     return {"message": "Bienvenido a la API del Sistema de Restaurante"}
 
 
+# Clientes conectados a /ws/alertas
+clientes_alertas_ws = set()
+
 async def broadcast_alerta(tipo: str, data: dict):
     """
     Función para enviar alertas en tiempo real.
-    Por ahora solo registra en logs, en el futuro usará WebSockets.
+    Registra en logs y la envía a todos los clientes conectados a /ws/alertas.
     """
     log.warning(f"🚨 ALERTA [{tipo.upper()}] → {data}")
-    # Aquí irá tu lógica de WebSocket cuando la implementes
-    # Ejemplo: await manager.broadcast(json.dumps({"tipo": tipo, "data": data}))
+    alertas_total.inc(tipo)
+    mensaje = json.dumps({"tipo": tipo, "data": data}, default=str)
+    for ws in list(clientes_alertas_ws):
+        try:
+            await ws.send_text(mensaje)
+        except Exception:
+            # Conexión caída: se descarta y se sigue con los demás
+            clientes_alertas_ws.discard(ws)
+
+@app.websocket("/ws/alertas")
+async def websocket_alertas(websocket: WebSocket):
+    await websocket.accept()
+    clientes_alertas_ws.add(websocket)
+    log.info("Cliente conectado a /ws/alertas → %s conectados", len(clientes_alertas_ws))
+    try:
+        while True:
+            await websocket.receive_text()  # Solo mantener viva la conexión
+    except WebSocketDisconnect:
+        pass
+    finally:
+        clientes_alertas_ws.discard(websocket)
+        log.info("Cliente desconectado de /ws/alertas → %s conectados", len(clientes_alertas_ws))
 
 def get_db():
-    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    conn = abrir_conexion(DATABASE_URL)  # Cursor medido para el log de accesos
     log.debug("Nueva conexión a BD abierta (dependency get_db)")
     try:
         yield conn
@@ -135,6 +112,29 @@ def get_db():
         conn.close()
         log.debug("Conexión a BD cerrada correctamente")
 
+# --- NUEVO: RUTAS CALIENTES CON POOL ASYNC ---
+# POST /pedidos, GET /pedidos/activos, GET /mesas, GET /menu/items y PATCH /pedidos/{pedido_id}/estado
+# tienen dos versiones: async con asyncpg (conexiones_async.py) y la sync con psycopg2 en el threadpool.
+# Se declaran en routers aparte y, después de /mesas, se incluye uno solo según DB_ASYNC_ACTIVO.
+rutas_async = APIRouter(route_class=app.router.route_class)  # Misma clase de ruta que la app (perfiles)
+rutas_sync = APIRouter(route_class=app.router.route_class)
+
+async def get_db_async():
+    async with pool_async.conexion() as conn:  # Conexión del pool, medida como las de get_db
+        yield conn
+
+@app.on_event("startup")
+async def iniciar_pool_async():
+    if DB_ASYNC_ACTIVO:
+        await pool_async.iniciar(DATABASE_URL)
+    else:
+        log.info("Rutas calientes por el threadpool con psycopg2%s", "" if asyncpg else " (asyncpg no está instalado)")
+
+@app.on_event("shutdown")
+async def cerrar_pool_async():
+    await pool_async.cerrar()
+# --- FIN NUEVO ---
+
 # ====================== MODELOS PYDANTIC ======================
 class ItemMenu(BaseModel):
     nombre: str
@@ -146,6 +146,11 @@ class PedidoCreate(BaseModel):
     items: List[dict]
     estado: str = "Pendiente"
     notas: str = ""
+    retencion_id: Optional[str] = None # Retención de stock tomada mientras se armaba el pedido
+
+class RetencionRequest(BaseModel):
+    items: List[dict] # [{"nombre": "Tacos", "cantidad": 2}, ...]
+    ttl_s: int = TTL_RETENCION_S
 
 class PedidoResponse(BaseModel):
     id: int
@@ -175,9 +180,17 @@ class ReservaCreate(BaseModel):
     fecha_hora_fin: Optional[str] = None
 
 class BackupResponse(BaseModel):
-    status: str
-    message: str
-    file_path: str
+    id: str
+    estado: str  # en_cola | en_curso | completado | error
+    archivo: Optional[str] = None
+    bytes_leidos: int = 0
+    bytes_escritos: int = 0
+    creado: str
+    iniciado: Optional[str] = None
+    terminado: Optional[str] = None
+    error: Optional[str] = None
+    eliminados: int = 0
+    mensaje: Optional[str] = None
 
 log.info("Modelos Pydantic cargados correctamente")
 log.info("Backend 100% listo - Esperando peticiones en http://localhost:8000")
@@ -197,61 +210,263 @@ def health():
         log.error(f"Health check FALLÓ - No se pudo conectar a la BD: {e}")
         return {"status": "error", "database": str(e)}
 
-@app.get("/menu/items", response_model=List[ItemMenu])
+# --- NUEVO: MÉTRICAS EN FORMATO PROMETHEUS ---
+# Solo lee contadores en memoria (metricas.py): no abre conexión a la base.
+@app.get("/metrics", include_in_schema=False)
+def exponer_metricas():
+    return Response(content=metricas.exponer(), media_type=TIPO_CONTENIDO)
+# --- FIN NUEVO ---
+
+# --- NUEVO: DIAGNÓSTICO DE CONSULTAS LENTAS ---
+# Sentencias sobre el umbral agrupadas por huella, con los planes muestreados (ver consultas_lentas.py).
+@app.get("/diagnostico/consultas_lentas")
+def obtener_consultas_lentas(
+    orden: str = Query("total_ms", regex="^(total_ms|max_ms|promedio_ms|veces)$"),
+    limite: int = Query(50, ge=1, le=200),
+):
+    return {
+        "umbral_ms": round(consultas_lentas.umbral_s * 1000, 3),
+        "muestreo_explain": consultas_lentas.muestreo,
+        "consultas": consultas_lentas.listar(orden, limite),
+    }
+
+@app.delete("/diagnostico/consultas_lentas")
+def limpiar_consultas_lentas():
+    consultas_lentas.limpiar()
+    log.info("Registro de consultas lentas vaciado")
+    return {"status": "ok"}
+# --- FIN NUEVO ---
+
+# --- NUEVO: PERFILES DE REQUESTS ---
+@app.get("/diagnostico/perfiles")
+def obtener_perfiles(limite: int = Query(100, ge=1, le=500)):
+    return {"perfiles": listar_perfiles(limite)}
+
+@app.get("/diagnostico/perfiles/{archivo}")
+def descargar_perfil(archivo: str):
+    ruta = ruta_archivo_perfil(archivo)
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return FileResponse(ruta, filename=archivo)
+# --- FIN NUEVO ---
+
+@rutas_sync.get("/menu/items", response_model=List[ItemMenu])
 def obtener_menu(conn: psycopg2.extensions.connection = Depends(get_db)):
     log.debug("GET /menu/items - Solicitando menú completo")
     with conn.cursor() as cursor:
         cursor.execute("SELECT nombre, precio, tipo FROM menu ORDER BY tipo, nombre")
         items = cursor.fetchall()
-        log.info(f"Menú enviado al cliente - {len(items)} ítems disponibles")
+        log.info("Menú enviado al cliente - %s ítems disponibles", len(items))
         return items
 
+@rutas_async.get("/menu/items", response_model=List[ItemMenu])
+async def obtener_menu_async(conn = Depends(get_db_async)):
+    log.debug("GET /menu/items - Solicitando menú completo")
+    items = await conn.fetch("SELECT nombre, precio, tipo FROM menu ORDER BY tipo, nombre")
+    log.info("Menú enviado al cliente - %s ítems disponibles", len(items))
+    return [dict(item) for item in items]
+
+# --- NUEVO: DISPONIBILIDAD DEL MENÚ ---
+# Porciones preparables por plato según inventario y recetas, servidas desde memoria
+# (disponibilidad_menu se actualiza con cada cambio de stock/recetas y se sincroniza por versión).
+@app.get("/menu/disponibilidad")
+def obtener_disponibilidad_menu(conn: psycopg2.extensions.connection = Depends(get_db)):
+    with conn.cursor() as cursor:
+        disponibilidad_menu.sincronizar(cursor)
+    platos = disponibilidad_menu.mapa()
+    log.debug("GET /menu/disponibilidad → %s platos con receta | %s agotados", len(platos), sum(1 for p in platos.values() if p == 0))
+    return {"version": disponibilidad_menu.version, "platos": platos}
+# --- FIN NUEVO ---
+
+# --- NUEVO: RETENCIONES DE STOCK PARA PEDIDOS EN CURSO ---
+# El panel de gestión retiene los ingredientes mientras arma un pedido; así dos meseros no
+# pueden armar a la vez pedidos por las últimas porciones. Se guardan en memoria con TTL.
+def _platos_de_items(items: List[dict]) -> dict:
+    platos = {}
+    for item in items:
+        nombre = item.get('nombre')
+        if nombre:
+            platos[nombre] = platos.get(nombre, 0) + int(item.get('cantidad', 1))
+    return platos
+
+def _guardar_retencion(retencion_id: Optional[str], datos: RetencionRequest, conn):
+    with conn.cursor() as cursor:
+        disponibilidad_menu.sincronizar(cursor)
+    retencion, faltantes = retenciones_stock.retener(retencion_id, _platos_de_items(datos.items), datos.ttl_s)
+    if faltantes:
+        detalle = ", ".join(f"{nombre} (necesario {nec}, libre {libre})" for nombre, (nec, libre) in faltantes.items())
+        log.warning(f"Retención rechazada → stock insuficiente: {detalle}")
+        raise HTTPException(status_code=409, detail=f"Stock insuficiente considerando otros pedidos en curso: {detalle}")
+    log.debug("Retención %s → %s platos | vence en %ss", retencion.id[:8], sum(retencion.platos.values()), datos.ttl_s)
+    return {
+        "retencion_id": retencion.id,
+        "expira": datetime.fromtimestamp(retencion.expira_ts).strftime("%Y-%m-%d %H:%M:%S"),
+        "platos": retencion.platos
+    }
 
-@app.post("/pedidos", response_model=PedidoResponse)
-async def crear_pedido(pedido: PedidoCreate, conn: psycopg2.extensions.connection = Depends(get_db)):
-    total_items = len(pedido.items)
+@app.post("/retenciones")
+def crear_retencion(datos: RetencionRequest, conn: psycopg2.extensions.connection = Depends(get_db)):
+    return _guardar_retencion(None, datos, conn)
+
+# Reemplaza los platos retenidos y renueva el TTL (el cliente la llama cada vez que cambia el pedido)
+@app.put("/retenciones/{retencion_id}")
+def actualizar_retencion(retencion_id: str, datos: RetencionRequest, conn: psycopg2.extensions.connection = Depends(get_db)):
+    return _guardar_retencion(retencion_id, datos, conn)
+
+@app.delete("/retenciones/{retencion_id}")
+def liberar_retencion(retencion_id: str):
+    liberada = retenciones_stock.liberar(retencion_id)
+    return {"status": "ok", "liberada": liberada}
+
+async def barrer_retenciones():
+    while True:
+        await asyncio.sleep(INTERVALO_BARRIDO_RETENCIONES_S)
+        try:
+            vencidas = retenciones_stock.barrer()
+            if vencidas:
+                log.info("Retenciones de stock vencidas liberadas → %s", vencidas)
+        except Exception as e:
+            log.error(f"Error en barrido de retenciones de stock: {e}")
+
+@app.on_event("startup")
+async def iniciar_barrido_retenciones():
+    asyncio.create_task(barrer_retenciones())
+    log.info("Barrido de retenciones de stock iniciado (cada %ss, TTL %ss)", INTERVALO_BARRIDO_RETENCIONES_S, TTL_RETENCION_S)
+# --- FIN NUEVO ---
+
+
+# --- POST /pedidos: pasos comunes a la versión sync (psycopg2) y la async (asyncpg) ---
+# Las dos rutas hacen lo mismo y solo cambian las llamadas a la base.
+def _preparar_pedido(pedido: PedidoCreate):
+    """Agrupa los ítems por plato y busca la retención vigente del pedido (None si venció o no coincide)."""
     mesa = pedido.mesa_numero
-    es_digital = mesa == 99
-    log.info(f"POST /pedidos → {'Digital' if es_digital else f'Mesa {mesa}'} | {total_items} ítems | Notas: '{pedido.notas.strip()[:40]}...'")
+    log.info("POST /pedidos → %s | %s ítems | Notas: '%s...'", 'Digital' if mesa == 99 else f'Mesa {mesa}', len(pedido.items), pedido.notas.strip()[:40])
+
+    items_agrupados = {}
+    for item in pedido.items:
+        items_agrupados[item['nombre']] = items_agrupados.get(item['nombre'], 0) + 1
+
+    # Con una retención vigente los ingredientes ya están calculados y apartados: no se revisa plato por plato
+    retencion = retenciones_stock.obtener_vigente(pedido.retencion_id, items_agrupados) if pedido.retencion_id else None
+    if retencion:
+        log.debug("Retención %s vigente → %s ingredientes sin re-verificar", retencion.id[:8], len(retencion.ingredientes))
+    elif pedido.retencion_id:
+        log.info("Retención %s vencida o distinta al pedido → verificación completa de stock", pedido.retencion_id[:8])
+    return items_agrupados, retencion
+
+def _ingredientes_retenidos(retencion) -> List[dict]:
+    return [{"id": ing_id, "cantidad": cantidad} for ing_id, cantidad in retencion.ingredientes.items()]
+
+def _verificar_stock(items_agrupados: dict, filas, retencion_id: Optional[str]) -> List[dict]:
+    """Recibe las filas de receta de todos los platos (una sola consulta) y devuelve lo que hay que
+    descontar; si algún ingrediente no alcanza rechaza el pedido con 400, y si alcanza solo tomando
+    lo que retienen otros pedidos en curso, con 409."""
+    por_plato = {}
+    for fila in filas:
+        por_plato.setdefault(fila['nombre_plato'], []).append(fila)
+
+    ingredientes_a_consumir = []
+    necesario = {}  # ingrediente_id -> cantidad total del pedido
+    stock = {}  # ingrediente_id -> (nombre, disponible)
+    for nombre_item, cantidad_pedido in items_agrupados.items():
+        for ing in por_plato.get(nombre_item, ()):
+            cantidad_total_necesaria = float(ing['cantidad_necesaria']) * cantidad_pedido
+            cantidad_actual = float(ing['cantidad_disponible'])
+            if cantidad_actual < cantidad_total_necesaria:
+                log.warning(f"STOCK INSUFICIENTE → '{ing['nombre_ingrediente']}' | Disp: {cantidad_actual} | Necesario: {cantidad_total_necesaria} → Pedido RECHAZADO")
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"No hay suficiente stock de '{ing['nombre_ingrediente']}' para preparar '{nombre_item}'. Disponible: {cantidad_actual}, Necesario: {cantidad_total_necesaria}"
+                )
+            ingredientes_a_consumir.append({
+                "id": ing['ingrediente_id'],
+                "cantidad": ing['cantidad_necesaria'] * cantidad_pedido
+            })
+            necesario[ing['ingrediente_id']] = necesario.get(ing['ingrediente_id'], 0.0) + cantidad_total_necesaria
+            stock[ing['ingrediente_id']] = (ing['nombre_ingrediente'], cantidad_actual)
+            log.debug("Stock verificado → %s | -%s unidades para %s × '%s'", ing['nombre_ingrediente'], cantidad_total_necesaria, cantidad_pedido, nombre_item)
+
+    # Lo retenido por otros pedidos en curso no se puede tomar (la retención propia, aunque haya
+    # vencido o no coincida, sí). Sin el mapa de disponibilidad cargado queda solo el control de arriba.
+    retenido = disponibilidad_menu.retenido()
+    if retenido:
+        propio = retenciones_stock.ingredientes_de(retencion_id) if retencion_id else {}
+        faltantes = []
+        for ingrediente_id, cantidad in necesario.items():
+            nombre, disponible = stock[ingrediente_id]
+            libre = disponible - retenido.get(ingrediente_id, 0.0) + propio.get(ingrediente_id, 0.0)
+            if cantidad > libre + 1e-9:
+                faltantes.append(f"{nombre} (necesario {round(cantidad, 2)}, libre {round(max(libre, 0.0), 2)})")
+        if faltantes:
+            detalle = ", ".join(faltantes)
+            log.warning(f"STOCK RETENIDO por otros pedidos en curso → {detalle} → Pedido RECHAZADO")
+            raise HTTPException(status_code=409, detail=f"Stock insuficiente considerando otros pedidos en curso: {detalle}")
+    return ingredientes_a_consumir
+
+def _anotar_consumo(ingrediente_id: int, ing, stock_actualizado: dict, alertas: List[dict]):
+    """Anota el stock que quedó tras el UPDATE (fila RETURNING) y arma la alerta si quedó bajo el mínimo."""
+    if not ing:
+        return
+    disponible = float(ing['cantidad_disponible'])
+    minimo_alerta = float(ing['cantidad_minima_alerta'])
+    unidad = ing['unidad_medida'] or "unidades"
+    log.debug("Stock actualizado → %s | Quedan: %s %s", ing['nombre'], disponible, unidad)
+    stock_actualizado[ingrediente_id] = disponible
+    if disponible <= minimo_alerta:
+        alertas.append({
+            "ingrediente": ing['nombre'],
+            "disponible": round(disponible, 2),
+            "minimo": minimo_alerta,
+            "unidad": unidad,
+            "mensaje": f"¡Stock crítico de {ing['nombre']}! Solo quedan {disponible} {unidad}"
+        })
 
-    with conn.cursor() as cursor:
-        # --- VERIFICACIÓN Y CONSUMO DE STOCK ---
-        items_agrupados = {}
-        for item in pedido.items:
-            nombre_item = item['nombre']
-            items_agrupados[nombre_item] = items_agrupados.get(nombre_item, 0) + 1
+def _pedido_confirmado(pedido: PedidoCreate, result, stock_actualizado: dict, consumidos: int) -> dict:
+    """Después del commit: métricas, disponibilidad del menú (o retención consumida) y respuesta."""
+    pedidos_creados.inc()
+    ventana_pedidos.registrar()
+    if pedido.retencion_id:
+        # Vigente o no, la retención del pedido se libera: su stock ya se descontó de verdad
+        retenciones_stock.consumir(pedido.retencion_id, stock_actualizado)
+    else:
+        disponibilidad_menu.aplicar_stock(stock_actualizado)
 
-        ingredientes_a_consumir = []
-        
-        for nombre_item, cantidad_pedido in items_agrupados.items():
-            cursor.execute("SELECT r.id FROM recetas r WHERE r.nombre_plato = %s", (nombre_item,))
-            receta = cursor.fetchone()
-            
-            if receta:
-                cursor.execute("""
-                    SELECT ir.ingrediente_id, ir.cantidad_necesaria, i.cantidad_disponible, i.nombre as nombre_ingrediente
-                    FROM ingredientes_recetas ir
-                    JOIN inventario i ON ir.ingrediente_id = i.id
-                    WHERE ir.receta_id = %s
-                """, (receta['id'],))
-                
-                for ing in cursor.fetchall():
-                    cantidad_total_necesaria = float(ing['cantidad_necesaria']) * cantidad_pedido
-                    cantidad_actual = float(ing['cantidad_disponible'])
-                    
-                    # ← AQUÍ ESTABA EL PROBLEMA: Ahora usa <= para permitir llegar a 0
-                    if cantidad_actual < cantidad_total_necesaria:
-                        log.warning(f"STOCK INSUFICIENTE → '{ing['nombre_ingrediente']}' | Disp: {cantidad_actual} | Necesario: {cantidad_total_necesaria} → Pedido RECHAZADO")
-                        raise HTTPException(
-                            status_code=400, 
-                            detail=f"No hay suficiente stock de '{ing['nombre_ingrediente']}' para preparar '{nombre_item}'. Disponible: {cantidad_actual}, Necesario: {cantidad_total_necesaria}"
-                        )
-                    
-                    ingredientes_a_consumir.append({
-                        "id": ing['ingrediente_id'],
-                        "cantidad": cantidad_total_necesaria
-                    })
-                    log.debug(f"Stock verificado → {ing['nombre_ingrediente']} | -{cantidad_total_necesaria} unidades para {cantidad_pedido} × '{nombre_item}'")
+    mesa = pedido.mesa_numero
+    log.info("PEDIDO CREADO CON ÉXITO → ID: %s | %s | %s ítems | %s ingredientes consumidos", result['id'], 'Digital' if mesa == 99 else f'Mesa {mesa}', len(pedido.items), consumidos)
+    fecha_hora = result['fecha_hora']
+    return {
+        "id": result['id'],
+        "mesa_numero": result['mesa_numero'],
+        "items": result['items'],
+        "estado": result['estado'],
+        "fecha_hora": fecha_hora.strftime("%Y-%m-%d %H:%M:%S") if isinstance(fecha_hora, datetime) else fecha_hora,
+        "numero_app": result['numero_app'],
+        "notas": result['notas']
+    }
+
+def _log_alerta_enviada(alerta: dict):
+    log.warning(f"ALERTA STOCK BAJO ENVIADA → {alerta['ingrediente']} ({alerta['disponible']} ≤ {alerta['minimo']})")
+
+# Versión sync: corre en el threadpool. Las alertas se envían después del commit, en el loop de la app.
+@rutas_sync.post("/pedidos", response_model=PedidoResponse)
+def crear_pedido(pedido: PedidoCreate, conn: psycopg2.extensions.connection = Depends(get_db)):
+    items_agrupados, retencion = _preparar_pedido(pedido)
+    stock_actualizado = {}
+    alertas = []
+
+    with conn.cursor() as cursor:
+        # --- VERIFICACIÓN DE STOCK ---
+        if retencion:
+            ingredientes_a_consumir = _ingredientes_retenidos(retencion)
+        else:
+            cursor.execute("""
+                SELECT r.nombre_plato, ir.ingrediente_id, ir.cantidad_necesaria, i.cantidad_disponible, i.nombre AS nombre_ingrediente
+                FROM recetas r
+                JOIN ingredientes_recetas ir ON ir.receta_id = r.id
+                JOIN inventario i ON ir.ingrediente_id = i.id
+                WHERE r.nombre_plato = ANY(%s)
+            """, (list(items_agrupados),))
+            ingredientes_a_consumir = _verificar_stock(items_agrupados, cursor.fetchall(), pedido.retencion_id)
 
         # --- GENERAR NÚMERO DE PEDIDO DIGITAL ---
         numero_app = None
@@ -259,10 +474,8 @@ async def crear_pedido(pedido: PedidoCreate, conn: psycopg2.extensions.connectio
             cursor.execute("SELECT MAX(numero_app) FROM pedidos WHERE mesa_numero = 99")
             max_app = cursor.fetchone()
             numero_app = (max_app['max'] + 1) if max_app and max_app['max'] else 1
-            log.debug(f"Pedido digital → Número asignado: {numero_app}")
+            log.debug("Pedido digital → Número asignado: %s", numero_app)
 
-        fecha_hora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
         cursor.execute("""
             INSERT INTO pedidos (mesa_numero, numero_app, estado, fecha_hora, items, notas)
             VALUES (%s, %s, %s, %s, %s, %s)
@@ -271,92 +484,271 @@ async def crear_pedido(pedido: PedidoCreate, conn: psycopg2.extensions.connectio
             pedido.mesa_numero,
             numero_app,
             pedido.estado,
-            fecha_hora,
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             json.dumps(pedido.items),
             pedido.notas
         ))
-        
         result = cursor.fetchone()
-        pedido_id_nuevo = result['id']
 
-        # === CONSUMIR STOCK + ALERTA DE STOCK BAJO EN TIEMPO REAL ===
+        # === CONSUMIR STOCK ===
         for consumo in ingredientes_a_consumir:
-            cursor.execute("""
-                UPDATE inventario 
-                SET cantidad_disponible = cantidad_disponible - %s,
-                    fecha_actualizacion = CURRENT_TIMESTAMP
-                WHERE id = %s
-                RETURNING nombre, cantidad_disponible, cantidad_minima_alerta, unidad_medida
-            """, (consumo['cantidad'], consumo['id']))
-            
-            ing = cursor.fetchone()
-            if ing:
-                nombre_ing = ing['nombre']
-                disponible = float(ing['cantidad_disponible'])
-                minimo_alerta = float(ing['cantidad_minima_alerta'])
-                unidad = ing['unidad_medida'] or "unidades"
-
-                log.debug(f"Stock actualizado → {nombre_ing} | Quedan: {disponible} {unidad}")
-
-                # ENVIAR ALERTA SI ESTÁ BAJO O CRÍTICO (AHORA ASYNC)
-                if disponible <= minimo_alerta:
-                    alerta = {
-                        "ingrediente": nombre_ing,
-                        "disponible": round(disponible, 2),
-                        "minimo": minimo_alerta,
-                        "unidad": unidad,
-                        "mensaje": f"¡Stock crítico de {nombre_ing}! Solo quedan {disponible} {unidad}"
-                    }
-                    # ← LÍNEA CORREGIDA: Ahora usa await en vez de create_task
-                    await broadcast_alerta("stock_bajo", alerta)
-                    log.warning(f"ALERTA STOCK BAJO ENVIADA → {nombre_ing} ({disponible} ≤ {minimo_alerta})")
+            try:
+                cursor.execute("""
+                    UPDATE inventario 
+                    SET cantidad_disponible = cantidad_disponible - %s,
+                        fecha_actualizacion = CURRENT_TIMESTAMP
+                    WHERE id = %s
+                    RETURNING nombre, cantidad_disponible, cantidad_minima_alerta, unidad_medida
+                """, (consumo['cantidad'], consumo['id']))
+            except psycopg2.errors.CheckViolation:
+                # El stock bajó por otro camino (ajuste manual) después de tomar la retención
+                conn.rollback()
+                log.warning(f"STOCK INSUFICIENTE al descontar ingrediente {consumo['id']} → Pedido RECHAZADO")
+                raise HTTPException(status_code=400, detail="El stock cambió mientras se armaba el pedido y ya no alcanza. Revise el pedido.")
+            _anotar_consumo(consumo['id'], cursor.fetchone(), stock_actualizado, alertas)
+
+        # Libro de movimientos: todo el consumo del pedido en un solo INSERT
+        registrar_movimientos_inventario(cursor, [
+            (consumo['id'], -consumo['cantidad'], "pedido", result['id']) for consumo in ingredientes_a_consumir
+        ])
+
+    conn.commit()
+    respuesta = _pedido_confirmado(pedido, result, stock_actualizado, len(ingredientes_a_consumir))
+    for alerta in alertas:
+        anyio.from_thread.run(broadcast_alerta, "stock_bajo", alerta)
+        _log_alerta_enviada(alerta)
+    return respuesta
+
+# Versión async: las alertas de stock también se envían después del commit (la conexión del pool no
+# queda tomada mientras se escribe a los websockets).
+@rutas_async.post("/pedidos", response_model=PedidoResponse)
+async def crear_pedido_async(pedido: PedidoCreate, conn = Depends(get_db_async)):
+    items_agrupados, retencion = _preparar_pedido(pedido)
+    stock_actualizado = {}
+    alertas = []
+
+    async with conn.transaction():
+        # --- VERIFICACIÓN DE STOCK ---
+        if retencion:
+            ingredientes_a_consumir = _ingredientes_retenidos(retencion)
+        else:
+            filas = await conn.fetch("""
+                SELECT r.nombre_plato, ir.ingrediente_id, ir.cantidad_necesaria, i.cantidad_disponible, i.nombre AS nombre_ingrediente
+                FROM recetas r
+                JOIN ingredientes_recetas ir ON ir.receta_id = r.id
+                JOIN inventario i ON ir.ingrediente_id = i.id
+                WHERE r.nombre_plato = ANY($1::varchar[])
+            """, list(items_agrupados))
+            ingredientes_a_consumir = _verificar_stock(items_agrupados, filas, pedido.retencion_id)
 
-        conn.commit()
-        
-        fecha_hora_str = result['fecha_hora'].strftime("%Y-%m-%d %H:%M:%S") if isinstance(result['fecha_hora'], datetime) else result['fecha_hora']
-        
-        log.info(f"PEDIDO CREADO CON ÉXITO → ID: {pedido_id_nuevo} | {'Digital' if es_digital else f'Mesa {mesa}'} | {total_items} ítems | {len(ingredientes_a_consumir)} ingredientes consumidos")
+        # --- GENERAR NÚMERO DE PEDIDO DIGITAL ---
+        numero_app = None
+        if pedido.mesa_numero == 99:
+            max_app = await conn.fetchval("SELECT MAX(numero_app) FROM pedidos WHERE mesa_numero = 99")
+            numero_app = (max_app + 1) if max_app else 1
+            log.debug("Pedido digital → Número asignado: %s", numero_app)
 
-        return {
-            "id": pedido_id_nuevo,
-            "mesa_numero": result['mesa_numero'],
-            "items": result['items'],
-            "estado": result['estado'],
+        result = await conn.fetchrow("""
+            INSERT INTO pedidos (mesa_numero, numero_app, estado, fecha_hora, items, notas)
+            VALUES ($1, $2, $3, $4, $5, $6)
+            RETURNING id, mesa_numero, numero_app, estado, fecha_hora, items, notas
+        """, pedido.mesa_numero, numero_app, pedido.estado, datetime.now().replace(microsecond=0), pedido.items, pedido.notas)
+
+        # === CONSUMIR STOCK ===
+        for consumo in ingredientes_a_consumir:
+            try:
+                ing = await conn.fetchrow("""
+                    UPDATE inventario
+                    SET cantidad_disponible = cantidad_disponible - $1,
+                        fecha_actualizacion = CURRENT_TIMESTAMP
+                    WHERE id = $2
+                    RETURNING nombre, cantidad_disponible, cantidad_minima_alerta, unidad_medida
+                """, decimal(consumo['cantidad']), consumo['id'])
+            except asyncpg.CheckViolationError:
+                # El stock bajó por otro camino (ajuste manual) después de tomar la retención
+                log.warning(f"STOCK INSUFICIENTE al descontar ingrediente {consumo['id']} → Pedido RECHAZADO")
+                raise HTTPException(status_code=400, detail="El stock cambió mientras se armaba el pedido y ya no alcanza. Revise el pedido.")
+            _anotar_consumo(consumo['id'], ing, stock_actualizado, alertas)
+
+        # Libro de movimientos: todo el consumo del pedido en un solo INSERT
+        movimientos = [consumo for consumo in ingredientes_a_consumir if consumo['cantidad']]
+        if movimientos:
+            await conn.execute("""
+                INSERT INTO inventario_movimientos (ingrediente_id, delta, motivo, pedido_id)
+                SELECT ingrediente_id, delta, 'pedido', $3
+                FROM unnest($1::int[], $2::numeric[]) AS m(ingrediente_id, delta)
+            """, [c['id'] for c in movimientos], [-decimal(c['cantidad']) for c in movimientos], result['id'])
+
+    respuesta = _pedido_confirmado(pedido, result, stock_actualizado, len(ingredientes_a_consumir))
+    for alerta in alertas:
+        await broadcast_alerta("stock_bajo", alerta)
+        _log_alerta_enviada(alerta)
+    return respuesta
+
+CONSULTA_PEDIDOS_ACTIVOS = """
+    SELECT id, mesa_numero, numero_app, estado, fecha_hora, items, notas
+    FROM pedidos
+    WHERE estado IN ('Pendiente', 'En preparacion', 'Listo')
+    ORDER BY fecha_hora DESC
+"""
+
+def _armar_pedidos_activos(rows) -> List[dict]:
+    pedidos = []
+    for row in rows:
+        fecha_hora_str = row['fecha_hora'].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row['fecha_hora'], datetime) else row['fecha_hora']
+        pedidos.append({
+            "id": row['id'],
+            "mesa_numero": row['mesa_numero'],
+            "numero_app": row['numero_app'],
+            "estado": row['estado'],
             "fecha_hora": fecha_hora_str,
-            "numero_app": result['numero_app'],
-            "notas": result['notas']
-        }
+            "items": row['items'],
+            "notas": row['notas']
+        })
+    log.info("%s pedidos activos enviados a cocina → %s%s", len(pedidos), ', '.join([str(p['id']) for p in pedidos[:5]]), '...' if len(pedidos)>5 else '')
+    return pedidos
 
-@app.get("/pedidos/activos", response_model=List[PedidoResponse])
+@rutas_sync.get("/pedidos/activos", response_model=List[PedidoResponse])
 def obtener_pedidos_activos(conn: psycopg2.extensions.connection = Depends(get_db)):
     log.debug("GET /pedidos/activos - Solicitando pedidos en cocina")
     with conn.cursor() as cursor:
-        cursor.execute("""
-            SELECT id, mesa_numero, numero_app, estado, fecha_hora, items, notas 
-            FROM pedidos 
-            WHERE estado IN ('Pendiente', 'En preparacion', 'Listo')
-            ORDER BY fecha_hora DESC
-        """)
-        rows = cursor.fetchall()
-        pedidos = []
-        for row in rows:
-            fecha_hora_str = row['fecha_hora'].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row['fecha_hora'], datetime) else row['fecha_hora']
-            pedidos.append({
-                "id": row['id'],
-                "mesa_numero": row['mesa_numero'],
-                "numero_app": row['numero_app'],
-                "estado": row['estado'],
-                "fecha_hora": fecha_hora_str,
-                "items": row['items'],
-                "notas": row['notas']
-            })
-        log.info(f"{len(pedidos)} pedidos activos enviados a cocina → {', '.join([str(p['id']) for p in pedidos[:5]])}{'...' if len(pedidos)>5 else ''}")
-        return pedidos
+        cursor.execute(CONSULTA_PEDIDOS_ACTIVOS)
+        return _armar_pedidos_activos(cursor.fetchall())
+
+@rutas_async.get("/pedidos/activos", response_model=List[PedidoResponse])
+async def obtener_pedidos_activos_async(conn = Depends(get_db_async)):
+    log.debug("GET /pedidos/activos - Solicitando pedidos en cocina")
+    return _armar_pedidos_activos(await conn.fetch(CONSULTA_PEDIDOS_ACTIVOS))
+
+# --- NUEVO: PEDIDOS ATRASADOS CALCULADOS EN SQL ---
+# El umbral lo define el cliente (tiempo_umbral_minutos en Personalización) y lo manda en cada consulta;
+# el monitor de eventos usa el último umbral recibido.
+UMBRAL_RETRASO_DEFECTO_MIN = 20
+INTERVALO_MONITOR_RETRASOS_S = 30
+estado_retrasos = {"umbral_min": UMBRAL_RETRASO_DEFECTO_MIN, "notificados": set()}
+
+def consultar_pedidos_atrasados(cursor, umbral_min: int) -> List[dict]:
+    """Pedidos Pendiente/En preparacion cuya espera desde fecha_hora supera el umbral."""
+    # Predicado sobre fecha_hora sin funciones → usa idx_pedidos_estado_fecha
+    cursor.execute("""
+        SELECT id, mesa_numero, numero_app, estado, fecha_hora, hora_inicio_cocina,
+               ROUND((EXTRACT(EPOCH FROM (LOCALTIMESTAMP - fecha_hora)) / 60)::numeric, 1) AS minutos_retraso,
+               ROUND((EXTRACT(EPOCH FROM (LOCALTIMESTAMP - hora_inicio_cocina)) / 60)::numeric, 1) AS minutos_en_cocina
+        FROM pedidos
+        WHERE estado IN ('Pendiente', 'En preparacion')
+          AND fecha_hora <= LOCALTIMESTAMP - make_interval(mins => %s)
+          AND items <> '[]'::jsonb
+        ORDER BY fecha_hora
+    """, (umbral_min,))
+    return [{
+        "id": row['id'],
+        "mesa_numero": row['mesa_numero'],
+        "numero_app": row['numero_app'],
+        "estado": row['estado'],
+        "fecha_hora": row['fecha_hora'].strftime("%Y-%m-%d %H:%M:%S"),
+        "hora_inicio_cocina": row['hora_inicio_cocina'].strftime("%Y-%m-%d %H:%M:%S") if row['hora_inicio_cocina'] else None,
+        "minutos_retraso": float(row['minutos_retraso']),
+        "minutos_en_cocina": float(row['minutos_en_cocina']) if row['minutos_en_cocina'] is not None else None
+    } for row in cursor.fetchall()]
+
+@app.get("/pedidos/atrasados")
+def obtener_pedidos_atrasados(umbral_min: int = Query(UMBRAL_RETRASO_DEFECTO_MIN, ge=1), conn = Depends(get_db)):
+    log.debug("GET /pedidos/atrasados?umbral_min=%s", umbral_min)
+    estado_retrasos["umbral_min"] = umbral_min
+    with conn.cursor() as cursor:
+        atrasados = consultar_pedidos_atrasados(cursor, umbral_min)
+    if atrasados:
+        log.info("%s pedidos atrasados (umbral %s min) → %s", len(atrasados), umbral_min, ', '.join(str(p['id']) for p in atrasados[:5]))
+    return atrasados
+
+def _leer_pedidos_atrasados(umbral_min: int) -> List[dict]:
+    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cursor:
+            return consultar_pedidos_atrasados(cursor, umbral_min)
+    finally:
+        conn.close()
+
+async def monitor_pedidos_atrasados():
+    """Emite un evento 'pedido_atrasado' una sola vez cuando un pedido cruza el umbral."""
+    while True:
+        try:
+            atrasados = await asyncio.to_thread(_leer_pedidos_atrasados, estado_retrasos["umbral_min"])
+            for pedido in atrasados:
+                if pedido["id"] not in estado_retrasos["notificados"]:
+                    await broadcast_alerta("pedido_atrasado", pedido)
+            # Los pedidos que ya salieron de la lista (listos, entregados) se olvidan
+            estado_retrasos["notificados"] = {p["id"] for p in atrasados}
+        except Exception as e:
+            log.error(f"Error en monitor de pedidos atrasados: {e}")
+        await asyncio.sleep(INTERVALO_MONITOR_RETRASOS_S)
+
+@app.on_event("startup")
+async def iniciar_monitor_retrasos():
+    asyncio.create_task(monitor_pedidos_atrasados())
+    log.info("Monitor de pedidos atrasados iniciado (cada %ss)", INTERVALO_MONITOR_RETRASOS_S)
+# --- FIN NUEVO ---
+
+# --- NUEVO: CHECKPOINTS DEL LIBRO DE MOVIMIENTOS DE INVENTARIO ---
+# Con un checkpoint por hora, "stock en T" y "consumo entre A y B" solo suman como mucho
+# una hora de movimientos por ingrediente (ver stock_inventario_en en SqlPRO.sql).
+INTERVALO_CHECKPOINT_INVENTARIO_S = 3600
+
+def _crear_checkpoint_inventario() -> int:
+    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cursor:
+            filas = crear_checkpoint_inventario(cursor)
+        conn.commit()
+        return filas
+    finally:
+        conn.close()
+
+async def checkpoints_inventario():
+    while True:
+        try:
+            filas = await asyncio.to_thread(_crear_checkpoint_inventario)
+            log.info("Checkpoint de inventario creado → %s ingredientes", filas)
+        except Exception as e:
+            log.error(f"Error creando checkpoint de inventario: {e}")
+        await asyncio.sleep(INTERVALO_CHECKPOINT_INVENTARIO_S)
+
+@app.on_event("startup")
+async def iniciar_checkpoints_inventario():
+    asyncio.create_task(checkpoints_inventario())
+    log.info("Checkpoints de inventario iniciados (cada %ss)", INTERVALO_CHECKPOINT_INVENTARIO_S)
+# --- FIN NUEVO ---
 
 # --- MODIFICACIÓN EN EL ENDPOINT DE ACTUALIZACIÓN DE ESTADO ---
-@app.patch("/pedidos/{pedido_id}/estado")
+COLUMNAS_PEDIDO_ESTADO = "id, mesa_numero, cliente_id, estado, fecha_hora, items, numero_app, notas, updated_at, hora_inicio_cocina, hora_fin_cocina"
+
+def _marca_cocina(pedido_id: int, estado: str, pedido, now: datetime) -> Optional[str]:
+    """Columna de marca de tiempo de cocina que se completa con el nuevo estado (o None)."""
+    if estado == "En preparacion" and pedido['hora_inicio_cocina'] is None:
+        log.info("Inicio de cocina registrado → Pedido %s | %s", pedido_id, now.strftime('%H:%M:%S'))
+        return "hora_inicio_cocina"
+    if estado == "Listo" and pedido['hora_inicio_cocina'] is not None and pedido['hora_fin_cocina'] is None:
+        log.info("Pedido %s MARCADO COMO LISTO → Fin de cocina: %s", pedido_id, now.strftime('%H:%M:%S'))
+        return "hora_fin_cocina"
+    return None
+
+def _respuesta_estado(pedido_id: int, pedido_dict: dict, estado: str, estado_anterior: str, now: datetime) -> dict:
+    # Calcular tiempo de cocina si aplica
+    if pedido_dict['hora_inicio_cocina'] and pedido_dict['hora_fin_cocina']:
+        tiempo_cocina = (pedido_dict['hora_fin_cocina'] - pedido_dict['hora_inicio_cocina']).total_seconds() / 60
+        pedido_dict['tiempo_cocina_minutos'] = round(tiempo_cocina, 1)
+        log.info("Pedido %s listo en cocina → Tiempo total: %.1f minutos", pedido_id, tiempo_cocina)
+    elif pedido_dict['hora_inicio_cocina'] and estado == "Listo":
+        tiempo_cocina = (now - pedido_dict['hora_inicio_cocina']).total_seconds() / 60
+        pedido_dict['tiempo_cocina_minutos'] = round(tiempo_cocina, 1)
+        log.info("Pedido %s listo → Tiempo en cocina: %.1f minutos", pedido_id, tiempo_cocina)
+
+    log.info("ESTADO ACTUALIZADO CON ÉXITO → Pedido %s | '%s' → '%s'", pedido_id, estado_anterior, estado)
+    return pedido_dict
+
+@rutas_sync.patch("/pedidos/{pedido_id}/estado")
 def actualizar_estado_pedido(pedido_id: int, estado: str, conn = Depends(get_db)):
-    log.info(f"PATCH /pedidos/{pedido_id}/estado → Cambiando a '{estado}'")
+    log.info("PATCH /pedidos/%s/estado → Cambiando a '%s'", pedido_id, estado)
 
     with conn.cursor() as cursor:
         # Verificar si el pedido existe
@@ -367,24 +759,16 @@ def actualizar_estado_pedido(pedido_id: int, estado: str, conn = Depends(get_db)
             raise HTTPException(status_code=404, detail="Pedido no encontrado")
 
         estado_anterior = pedido['estado']
-        log.debug(f"Pedido {pedido_id} encontrado | Estado actual: '{estado_anterior}' → '{estado}'")
+        log.debug("Pedido %s encontrado | Estado actual: '%s' → '%s'", pedido_id, estado_anterior, estado)
 
         # --- LÓGICA PARA REGISTRAR MARCAS DE TIEMPO ---
         now = datetime.now()
-        extra_update = ""
-        extra_values = []
-
-        if estado == "En preparacion" and pedido['hora_inicio_cocina'] is None:
-            extra_update = ", hora_inicio_cocina = %s"
-            extra_values.append(now)
-            log.info(f"Inicio de cocina registrado → Pedido {pedido_id} | {now.strftime('%H:%M:%S')}")
-        elif estado == "Listo" and pedido['hora_inicio_cocina'] is not None and pedido['hora_fin_cocina'] is None:
-            extra_update = ", hora_fin_cocina = %s"
-            extra_values.append(now)
-            log.info(f"Pedido {pedido_id} MARCADO COMO LISTO → Fin de cocina: {now.strftime('%H:%M:%S')}")
+        columna = _marca_cocina(pedido_id, estado, pedido, now)
+        extra_update = f", {columna} = %s" if columna else ""
+        extra_values = [now] if columna else []
 
         # Actualizar el estado (y potencialmente las marcas de tiempo)
-        update_query = f"UPDATE pedidos SET estado = %s {extra_update} WHERE id = %s RETURNING id, mesa_numero, cliente_id, estado, fecha_hora, items, numero_app, notas, updated_at, hora_inicio_cocina, hora_fin_cocina"
+        update_query = f"UPDATE pedidos SET estado = %s {extra_update} WHERE id = %s RETURNING {COLUMNAS_PEDIDO_ESTADO}"
         cursor.execute(update_query, (estado, *extra_values, pedido_id))
         result = cursor.fetchone()
 
@@ -394,20 +778,30 @@ def actualizar_estado_pedido(pedido_id: int, estado: str, conn = Depends(get_db)
         conn.commit()
 
         # Devolver el pedido actualizado
-        pedido_dict = dict(result)
-        
-        # Calcular tiempo de cocina si aplica
-        if pedido_dict['hora_inicio_cocina'] and pedido_dict['hora_fin_cocina']:
-            tiempo_cocina = (pedido_dict['hora_fin_cocina'] - pedido_dict['hora_inicio_cocina']).total_seconds() / 60
-            pedido_dict['tiempo_cocina_minutos'] = round(tiempo_cocina, 1)
-            log.info(f"Pedido {pedido_id} listo en cocina → Tiempo total: {tiempo_cocina:.1f} minutos")
-        elif pedido_dict['hora_inicio_cocina'] and estado == "Listo":
-            tiempo_cocina = (now - pedido_dict['hora_inicio_cocina']).total_seconds() / 60
-            pedido_dict['tiempo_cocina_minutos'] = round(tiempo_cocina, 1)
-            log.info(f"Pedido {pedido_id} listo → Tiempo en cocina: {tiempo_cocina:.1f} minutos")
-
-        log.info(f"ESTADO ACTUALIZADO CON ÉXITO → Pedido {pedido_id} | '{estado_anterior}' → '{estado}'")
-        return pedido_dict
+        return _respuesta_estado(pedido_id, dict(result), estado, estado_anterior, now)
+
+@rutas_async.patch("/pedidos/{pedido_id}/estado")
+async def actualizar_estado_pedido_async(pedido_id: int, estado: str, conn = Depends(get_db_async)):
+    log.info("PATCH /pedidos/%s/estado → Cambiando a '%s'", pedido_id, estado)
+
+    async with conn.transaction():
+        pedido = await conn.fetchrow("SELECT estado, hora_inicio_cocina, hora_fin_cocina FROM pedidos WHERE id = $1", pedido_id)
+        if not pedido:
+            log.warning(f"Intento de actualizar estado → Pedido {pedido_id} NO ENCONTRADO")
+            raise HTTPException(status_code=404, detail="Pedido no encontrado")
+
+        estado_anterior = pedido['estado']
+        now = datetime.now()
+        columna = _marca_cocina(pedido_id, estado, pedido, now)
+        if columna:
+            result = await conn.fetchrow(
+                f"UPDATE pedidos SET estado = $1, {columna} = $2 WHERE id = $3 RETURNING {COLUMNAS_PEDIDO_ESTADO}", estado, now, pedido_id)
+        else:
+            result = await conn.fetchrow(f"UPDATE pedidos SET estado = $1 WHERE id = $2 RETURNING {COLUMNAS_PEDIDO_ESTADO}", estado, pedido_id)
+        if not result:
+            raise HTTPException(status_code=404, detail="Pedido no encontrado")
+
+    return _respuesta_estado(pedido_id, dict(result), estado, estado_anterior, now)
 # --- FIN MODIFICACIÓN ---
 
 
@@ -420,7 +814,7 @@ def inicializar_menu(conn: psycopg2.extensions.connection = Depends(get_db)):
     try:
         with conn.cursor() as cursor:
             cursor.execute("DELETE FROM menu")
-            log.info(f"Menú anterior eliminado ({cursor.rowcount} ítems borrados)")
+            log.info("Menú anterior eliminado (%s ítems borrados)", cursor.rowcount)
 
             for nombre, precio, tipo in menu_inicial:
                 cursor.execute("""
@@ -429,7 +823,8 @@ def inicializar_menu(conn: psycopg2.extensions.connection = Depends(get_db)):
                 """, (nombre, precio, tipo))
             
             conn.commit()
-            log.info(f"MENÚ INICIALIZADO CON ÉXITO → {len(menu_inicial)} ítems insertados correctamente")
+            disponibilidad_menu.recetas_cambiadas()  # Las recetas de los platos borrados se eliminan en cascada
+            log.info("MENÚ INICIALIZADO CON ÉXITO → %s ítems insertados correctamente", len(menu_inicial))
             return {"status": "ok", "items_insertados": len(menu_inicial)}
             
     except Exception as e:
@@ -440,7 +835,7 @@ def inicializar_menu(conn: psycopg2.extensions.connection = Depends(get_db)):
 # ¡NUEVO ENDPOINT! → Eliminar último ítem de un pedido
 @app.delete("/pedidos/{pedido_id}/ultimo_item")
 def eliminar_ultimo_item(pedido_id: int, conn: psycopg2.extensions.connection = Depends(get_db)):
-    log.info(f"DELETE /pedidos/{pedido_id}/ultimo_item → Eliminando último ítem del pedido")
+    log.info("DELETE /pedidos/%s/ultimo_item → Eliminando último ítem del pedido", pedido_id)
     
     with conn.cursor() as cursor:
         cursor.execute("SELECT items FROM pedidos WHERE id = %s", (pedido_id,))
@@ -458,14 +853,14 @@ def eliminar_ultimo_item(pedido_id: int, conn: psycopg2.extensions.connection =
         cursor.execute("UPDATE pedidos SET items = %s WHERE id = %s", (json.dumps(items), pedido_id))
         conn.commit()
         
-        log.info(f"ÚLTIMO ÍTEM ELIMINADO → Pedido {pedido_id} | Eliminado: '{item_eliminado['nombre']}' | Quedan: {len(items)} ítems")
+        log.info("ÚLTIMO ÍTEM ELIMINADO → Pedido %s | Eliminado: '%s' | Quedan: %s ítems", pedido_id, item_eliminado['nombre'], len(items))
         return {"status": "ok", "message": f"Ítem '{item_eliminado['nombre']}' eliminado"}
 
 # ¡NUEVOS ENDPOINTS! → Gestión completa de pedidos y menú
 
 @app.put("/pedidos/{pedido_id}")
 def actualizar_pedido(pedido_id: int, pedido_actualizado: PedidoCreate, conn: psycopg2.extensions.connection = Depends(get_db)):
-    log.info(f"PUT /pedidos/{pedido_id} → Actualizando pedido completo | Mesa: {pedido_actualizado.mesa_numero} | {len(pedido_actualizado.items)} ítems")
+    log.info("PUT /pedidos/%s → Actualizando pedido completo | Mesa: %s | %s ítems", pedido_id, pedido_actualizado.mesa_numero, len(pedido_actualizado.items))
     
     with conn.cursor() as cursor:
         cursor.execute("SELECT id FROM pedidos WHERE id = %s", (pedido_id,))
@@ -488,7 +883,7 @@ def actualizar_pedido(pedido_id: int, pedido_actualizado: PedidoCreate, conn: ps
         ))
         
         conn.commit()
-        log.info(f"PEDIDO {pedido_id} ACTUALIZADO CORRECTAMENTE → Estado: '{pedido_actualizado.estado}' | {len(pedido_actualizado.items)} ítems")
+        log.info("PEDIDO %s ACTUALIZADO CORRECTAMENTE → Estado: '%s' | %s ítems", pedido_id, pedido_actualizado.estado, len(pedido_actualizado.items))
         return {"status": "ok", "message": "Pedido actualizado"}
 
 @app.delete("/pedidos/{pedido_id}")
@@ -507,7 +902,7 @@ def eliminar_pedido(pedido_id: int, conn: psycopg2.extensions.connection = Depen
 
 @app.post("/menu/items")
 def agregar_item_menu(item: ItemMenu, conn: psycopg2.extensions.connection = Depends(get_db)):
-    log.info(f"POST /menu/items → Agregando nuevo ítem: '{item.nombre}' | ${item.precio} | {item.tipo}")
+    log.info("POST /menu/items → Agregando nuevo ítem: '%s' | $%s | %s", item.nombre, item.precio, item.tipo)
     
     with conn.cursor() as cursor:
         cursor.execute("""
@@ -518,7 +913,7 @@ def agregar_item_menu(item: ItemMenu, conn: psycopg2.extensions.connection = Dep
         item_id = cursor.fetchone()['id']
         conn.commit()
         
-        log.info(f"ÍTEM AGREGADO AL MENÚ → ID: {item_id} | '{item.nombre}' | ${item.precio}")
+        log.info("ÍTEM AGREGADO AL MENÚ → ID: %s | '%s' | $%s", item_id, item.nombre, item.precio)
         return {"status": "ok", "id": item_id, "message": "Ítem agregado al menú"}
 
 @app.delete("/menu/items")
@@ -532,7 +927,8 @@ def eliminar_item_menu(nombre: str, tipo: str, conn: psycopg2.extensions.connect
             raise HTTPException(status_code=404, detail="Ítem no encontrado en el menú")
         
         conn.commit()
-        log.info(f"ÍTEM ELIMINADO DEL MENÚ → '{nombre}' ({tipo})")
+        disponibilidad_menu.recetas_cambiadas([nombre])
+        log.info("ÍTEM ELIMINADO DEL MENÚ → '%s' (%s)", nombre, tipo)
         return {"status": "ok", "message": "Ítem eliminado del menú"}
 
 # NUEVOS ENDPOINTS PARA GESTIÓN DE CLIENTES
@@ -554,12 +950,12 @@ def obtener_clientes(conn: psycopg2.extensions.connection = Depends(get_db)):
                 "fecha_registro": fecha_str
             })
         
-        log.info(f"{len(clientes)} clientes enviados al frontend")
+        log.info("%s clientes enviados al frontend", len(clientes))
         return clientes
 
 @app.post("/clientes", response_model=ClienteResponse)
 def crear_cliente(cliente: ClienteCreate, conn: psycopg2.extensions.connection = Depends(get_db)):
-    log.info(f"POST /clientes → Registrando nuevo cliente: {cliente.nombre} | {cliente.celular}")
+    log.info("POST /clientes → Registrando nuevo cliente: %s | %s", cliente.nombre, cliente.celular)
     
     with conn.cursor() as cursor:
         fecha_registro = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -573,7 +969,7 @@ def crear_cliente(cliente: ClienteCreate, conn: psycopg2.extensions.connection =
         
         fecha_str = result['fecha_registro'].strftime("%Y-%m-%d %H:%M:%S") if isinstance(result['fecha_registro'], datetime) else result['fecha_registro']
         
-        log.info(f"CLIENTE REGISTRADO → ID: {result['id']} | {cliente.nombre} | {cliente.celular}")
+        log.info("CLIENTE REGISTRADO → ID: %s | %s | %s", result['id'], cliente.nombre, cliente.celular)
         return {
             "id": result['id'],
             "nombre": result['nombre'],
@@ -598,7 +994,7 @@ def eliminar_cliente(cliente_id: int, conn: psycopg2.extensions.connection = Dep
     
 @app.get("/reportes")
 def obtener_reporte(tipo: str, start_date: str, end_date: str, conn: psycopg2.extensions.connection = Depends(get_db)):
-    log.info(f"GET /reportes → Generando reporte | Tipo: {tipo} | {start_date} → {end_date}")
+    log.info("GET /reportes → Generando reporte | Tipo: %s | %s → %s", tipo, start_date, end_date)
     
     with conn.cursor() as cursor:
         cursor.execute("""
@@ -635,7 +1031,7 @@ def obtener_reporte(tipo: str, start_date: str, end_date: str, conn: psycopg2.ex
             reverse=True
         )[:10]
 
-        log.info(f"REPORTE GENERADO → Ventas: ${ventas_totales:,.2f} | Pedidos: {pedidos_totales} | Productos vendidos: {productos_vendidos}")
+        log.info("REPORTE GENERADO → Ventas: $%s | Pedidos: %s | Productos vendidos: %s", format(ventas_totales, ",.2f"), pedidos_totales, productos_vendidos)
         return {
             "ventas_totales": round(ventas_totales, 2),
             "pedidos_totales": pedidos_totales,
@@ -654,7 +1050,7 @@ def obtener_analisis_productos(
     Obtiene el análisis de productos vendidos en un rango de fechas.
     """
     rango = f"{start_date or 'Inicio'} → {end_date or 'Hoy'}"
-    log.info(f"GET /analisis/productos → Análisis de ventas | Rango: {rango}")
+    log.info("GET /analisis/productos → Análisis de ventas | Rango: %s", rango)
 
     # Construir la condición de fecha si se proporcionan parámetros
     fecha_condicion = ""
@@ -695,7 +1091,7 @@ def obtener_analisis_productos(
     top_10 = [{"nombre": k, "cantidad": v} for k, v in productos_ordenados[:10]]
     bottom_10 = [{"nombre": k, "cantidad": v} for k, v in productos_ordenados[-10:]]
 
-    log.info(f"ANÁLISIS COMPLETADO → {len(conteo_productos)} productos distintos | Top: {top_10[0]['nombre'] if top_10 else 'N/A'} ({top_10[0]['cantidad'] if top_10 else 0} ventas)")
+    log.info("ANÁLISIS COMPLETADO → %s productos distintos | Top: %s (%s ventas)", len(conteo_productos), top_10[0]['nombre'] if top_10 else 'N/A', top_10[0]['cantidad'] if top_10 else 0)
 
     return {
         "productos_mas_vendidos": top_10,
@@ -703,294 +1099,309 @@ def obtener_analisis_productos(
     }
 
 
-@app.get("/mesas")
+# Una fila por mesa: la ocupación sale de un EXISTS y la próxima reserva de un LATERAL ... LIMIT 1
+# (índice idx_reservas_mesa_inicio). Los predicados sobre fechas son sargables: nada de DATE(columna).
+CONSULTA_MESAS = """
+    SELECT
+        m.numero,
+        m.capacidad,
+        EXISTS (
+            SELECT 1 FROM pedidos p
+            WHERE p.mesa_numero = m.numero
+              AND p.estado IN ('Tomando pedido', 'Pendiente', 'En preparacion', 'Listo', 'Entregado')
+        ) AS ocupada,
+        proxima.id IS NOT NULL AS reservada,
+        proxima.cliente_reservado_nombre,
+        proxima.fecha_hora_inicio AS fecha_hora_reserva
+    FROM mesas m
+    LEFT JOIN LATERAL (
+        -- Próxima reserva de hoy en adelante que todavía no terminó
+        SELECT r.id, r.fecha_hora_inicio, c.nombre AS cliente_reservado_nombre
+        FROM reservas r
+        LEFT JOIN clientes c ON c.id = r.cliente_id
+        WHERE r.mesa_numero = m.numero
+          AND r.fecha_hora_inicio >= CURRENT_DATE
+          AND upper(r.periodo) > LOCALTIMESTAMP
+        ORDER BY r.fecha_hora_inicio
+        LIMIT 1
+    ) proxima ON TRUE
+    WHERE m.numero != 99
+    ORDER BY m.numero;
+"""
+
+
+def _armar_mesas(mesas_db) -> List[dict]:
+    # Procesar resultados
+    mesas_result = []
+    ocupadas = 0
+    reservadas = 0
+
+    for mesa_row in mesas_db:
+        es_ocupada = bool(mesa_row['ocupada'])
+        es_reservada = bool(mesa_row['reservada'])
+
+        if es_ocupada:
+            ocupadas += 1
+        if es_reservada:
+            reservadas += 1
+
+        mesas_result.append({
+            "numero": mesa_row['numero'],
+            "capacidad": mesa_row['capacidad'],
+            "ocupada": es_ocupada,  # ← AHORA SÍ SE CALCULA CORRECTAMENTE
+            "reservada": es_reservada,
+            "cliente_reservado_nombre": mesa_row['cliente_reservado_nombre'],
+            "fecha_hora_reserva": str(mesa_row['fecha_hora_reserva']) if mesa_row['fecha_hora_reserva'] else None
+        })
+
+    # Mesa virtual (siempre disponible)
+    mesas_result.append({
+        "numero": 99,
+        "capacidad": 100,
+        "ocupada": False,
+        "reservada": False,
+        "cliente_reservado_nombre": None,
+        "fecha_hora_reserva": None,
+        "es_virtual": True
+    })
+
+    log.info("Mesas enviadas → %s físicas | %s ocupadas | %s reservadas | Actualización dinámica ✅", len(mesas_db), ocupadas, reservadas)
+    return mesas_result
+
+def _mesas_fallback(e: Exception) -> List[dict]:
+    log.error(f"ERROR CRÍTICO en obtener_mesas → {e}", exc_info=True)
+    # Fallback seguro
+    fallback = [
+        {"numero": i, "capacidad": c, "ocupada": False, "reservada": False, "cliente_reservado_nombre": None, "fecha_hora_reserva": None}
+        for i, c in [(1,2),(2,2),(3,4),(4,4),(5,6),(6,6)]
+    ] + [{"numero": 99, "capacidad": 100, "ocupada": False, "reservada": False, "cliente_reservado_nombre": None, "fecha_hora_reserva": None, "es_virtual": True}]
+    log.warning("Devolviendo fallback por error en BD")
+    return fallback
+
+@rutas_sync.get("/mesas")
 def obtener_mesas(conn = Depends(get_db)):
     """
     Devuelve mesas con estado calculado dinámicamente desde pedidos activos.
-    OPTIMIZADO: Usa una sola query JOIN para máximo rendimiento.
+    Exactamente una fila por mesa, con su próxima reserva (si tiene).
     """
     log.debug("GET /mesas → Consultando estado de mesas (con cálculo dinámico de ocupación)")
 
     try:
         with conn.cursor() as cursor:
-            # === QUERY ULTRA-OPTIMIZADA CON LEFT JOIN ===
-            cursor.execute("""
-                SELECT 
-                    m.numero,
-                    m.capacidad,
-                    -- Calcular si está ocupada (pedido activo)
-                    CASE 
-                        WHEN p.id IS NOT NULL THEN TRUE 
-                        ELSE FALSE 
-                    END AS ocupada,
-                    -- Detectar si tiene reserva activa
-                    CASE 
-                        WHEN r.id IS NOT NULL THEN TRUE 
-                        ELSE FALSE 
-                    END AS reservada,
-                    c.nombre AS cliente_reservado_nombre,
-                    r.fecha_hora_inicio AS fecha_hora_reserva
-                FROM mesas m
-                -- Pedidos activos (determina ocupada)
-                LEFT JOIN pedidos p ON m.numero = p.mesa_numero 
-                    AND p.estado IN ('Tomando pedido', 'Pendiente', 'En preparacion', 'Listo', 'Entregado')
-                -- Reservas activas
-                LEFT JOIN reservas r ON m.numero = r.mesa_numero 
-                    AND DATE(r.fecha_hora_inicio) >= CURRENT_DATE
-                LEFT JOIN clientes c ON r.cliente_id = c.id
-                WHERE m.numero != 99
-                ORDER BY m.numero;
-            """)
-            mesas_db = cursor.fetchall()
-
-        # Procesar resultados
-        mesas_result = []
-        ocupadas = 0
-        reservadas = 0
-
-        for mesa_row in mesas_db:
-            es_ocupada = bool(mesa_row['ocupada'])
-            es_reservada = bool(mesa_row['reservada'])
-            
-            if es_ocupada:
-                ocupadas += 1
-            if es_reservada:
-                reservadas += 1
-
-            mesas_result.append({
-                "numero": mesa_row['numero'],
-                "capacidad": mesa_row['capacidad'],
-                "ocupada": es_ocupada,  # ← AHORA SÍ SE CALCULA CORRECTAMENTE
-                "reservada": es_reservada,
-                "cliente_reservado_nombre": mesa_row['cliente_reservado_nombre'],
-                "fecha_hora_reserva": str(mesa_row['fecha_hora_reserva']) if mesa_row['fecha_hora_reserva'] else None
-            })
-
-        # Mesa virtual (siempre disponible)
-        mesas_result.append({
-            "numero": 99,
-            "capacidad": 100,
-            "ocupada": False,
-            "reservada": False,
-            "cliente_reservado_nombre": None,
-            "fecha_hora_reserva": None,
-            "es_virtual": True
-        })
-
-        log.info(f"Mesas enviadas → {len(mesas_db)} físicas | {ocupadas} ocupadas | {reservadas} reservadas | Actualización dinámica ✅")
-        return mesas_result
-
+            cursor.execute(CONSULTA_MESAS)
+            return _armar_mesas(cursor.fetchall())
     except Exception as e:
-        log.error(f"ERROR CRÍTICO en obtener_mesas → {e}", exc_info=True)
-        # Fallback seguro
-        fallback = [
-            {"numero": i, "capacidad": c, "ocupada": False, "reservada": False, "cliente_reservado_nombre": None, "fecha_hora_reserva": None}
-            for i, c in [(1,2),(2,2),(3,4),(4,4),(5,6),(6,6)]
-        ] + [{"numero": 99, "capacidad": 100, "ocupada": False, "reservada": False, "cliente_reservado_nombre": None, "fecha_hora_reserva": None, "es_virtual": True}]
-        log.warning("Devolviendo fallback por error en BD")
-        return fallback
-
-
-@app.get("/mesas/disponibles/")
-def obtener_mesas_disponibles_para_fecha_hora(
-    fecha_hora_str: str = Query(..., description="Fecha y hora en formato YYYY-MM-DD HH:MM:SS"),
-    conn = Depends(get_db)
-):
-    log.info(f"GET /mesas/disponibles → Buscando mesas libres para {fecha_hora_str}")
-
-    try:
-        fecha_hora_obj = datetime.strptime(fecha_hora_str, "%Y-%m-%d %H:%M:%S")
-    except ValueError:
-        log.warning(f"Formato de fecha inválido recibido: {fecha_hora_str}")
-        raise HTTPException(status_code=400, detail="Formato de fecha/hora inválido. Use YYYY-MM-DD HH:MM:SS")
+        return _mesas_fallback(e)
 
+@rutas_async.get("/mesas")
+async def obtener_mesas_async(conn = Depends(get_db_async)):
+    log.debug("GET /mesas → Consultando estado de mesas (con cálculo dinámico de ocupación)")
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT numero, capacidad FROM mesas WHERE numero != 99;")
-            mesas_db = cursor.fetchall()
-
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT DISTINCT mesa_numero
-                FROM pedidos
-                WHERE estado IN ('Tomando pedido', 'Pendiente', 'En preparacion', 'Listo', 'Entregado')
-                AND mesa_numero != 99;
-            """)
-            ocupadas_db = {row['mesa_numero'] for row in cursor.fetchall()}
-
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT DISTINCT mesa_numero
-                FROM reservas
-                WHERE %s BETWEEN fecha_hora_inicio AND COALESCE(fecha_hora_fin, fecha_hora_inicio + INTERVAL '1 hour');
-            """, (fecha_hora_obj,))
-            reservadas_db = {row['mesa_numero'] for row in cursor.fetchall()}
-        
-        disponibles = [
-            {"numero": m['numero'], "capacidad": m['capacidad']}
-            for m in mesas_db
-            if m['numero'] not in ocupadas_db and m['numero'] not in reservadas_db
-        ]
-
-        log.info(f"{len(disponibles)} mesas disponibles para {fecha_hora_str}")
-        return disponibles
-
+        return _armar_mesas(await conn.fetch(CONSULTA_MESAS))
     except Exception as e:
-        log.error(f"ERROR en obtener_mesas_disponibles → {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        return _mesas_fallback(e)
 
+# Rutas calientes: se incluye un solo router según el driver (ver conexiones_async.py)
+app.include_router(rutas_async if DB_ASYNC_ACTIVO else rutas_sync)
 
-# --- ENDPOINT DE RESPALDO (BACKUP) ---
-def find_pg_dump():
-    path_in_path = shutil.which("pg_dump")
-    if path_in_path:
-        log.debug(f"pg_dump encontrado en PATH: {path_in_path}")
-        return path_in_path
-    
-    possible_paths = glob.glob("C:/Program Files/PostgreSQL/*/bin/pg_dump.exe")
-    if possible_paths:
-        possible_paths.sort()
-        elegido = possible_paths[-1]
-        log.debug(f"pg_dump encontrado en instalación: {elegido}")
-        return elegido
-    
-    log.error("pg_dump NO ENCONTRADO en el sistema")
-    return None
 
+# --- DISPONIBILIDAD DE MESAS POR INTERVALO ---
+# Usa la columna reservas.periodo (tsrange) y el índice GiST de la restricción de exclusión
+# 'reservas_sin_solapamiento' (sección 9 de SqlPRO.sql).
+
+ESTADOS_PEDIDO_ACTIVO = ('Tomando pedido', 'Pendiente', 'En preparacion', 'Listo', 'Entregado')
+DURACION_RESERVA_DEFECTO = timedelta(hours=1)
+MAX_TURNOS_RESERVA_BULK = 500
 
-@app.post("/backup", response_model=BackupResponse)
-def crear_respaldo():
-    log.warning("POST /backup → INICIANDO RESPALDO COMPLETO DE LA BASE DE DATOS")
 
+def _parsear_fecha_hora(valor: str, campo: str) -> datetime:
     try:
-        pg_dump_exe = find_pg_dump()
-        if not pg_dump_exe:
-            log.error("No se encontró pg_dump → Respaldo cancelado")
-            raise HTTPException(status_code=500, detail="pg_dump no encontrado en el sistema")
-
-        desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
-        backup_dir = os.path.join(desktop_path, "Backups_RestaurantPRO")
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"backup_restaurant_db_{timestamp}.sql"
-        filepath = os.path.join(backup_dir, filename)
-        
-        env = os.environ.copy()
-        env["PGPASSWORD"] = "postgres"
-        
-        command = [
-            pg_dump_exe, "-U", "postgres", "-h", "localhost", "-p", "5432",
-            "-d", "restaurant_db", "-f", filepath
-        ]
-        
-        log.info(f"Ejecutando pg_dump → {filepath}")
-        result = subprocess.run(command, env=env, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            log.info(f"RESPALDO COMPLETADO CON ÉXITO → {filepath} ({os.path.getsize(filepath) / 1024 / 1024:.1f} MB)")
-            return {"status": "ok", "message": "Respaldo creado exitosamente.", "file_path": filepath}
-        else:
-            log.error(f"pg_dump FALLÓ → {result.stderr}")
-            raise HTTPException(status_code=500, detail=result.stderr)
-            
-    except Exception as e:
-        log.error(f"ERROR GENERAL EN BACKUP → {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error creando respaldo: {str(e)}")
+        return datetime.fromisoformat(valor.strip().replace(" ", "T"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Formato inválido en '{campo}'. Use YYYY-MM-DD HH:MM[:SS]")
 
-@app.post("/backup", response_model=BackupResponse)
-def crear_respaldo():
+
+@app.get("/mesas/disponibles")
+def obtener_mesas_disponibles(
+    desde: Optional[str] = Query(None, description="Inicio del intervalo (YYYY-MM-DD HH:MM[:SS])"),
+    hasta: Optional[str] = Query(None, description="Fin del intervalo; por defecto desde + 1 hora"),
+    personas: int = Query(1, ge=1, description="Cantidad de comensales (capacidad mínima de la mesa)"),
+    fecha_hora_str: Optional[str] = Query(None, description="Compatibilidad: instante puntual, equivale a 'desde'"),
+    conn = Depends(get_db)
+):
     """
-    Crea un respaldo de la base de datos PostgreSQL usando pg_dump.
+    Mesas libres durante todo el intervalo [desde, hasta) con capacidad suficiente, en una sola consulta.
+    Las mesas con pedido activo solo se descartan si el intervalo ya empezó.
     """
-    log.warning("POST /backup → ¡¡¡INICIANDO RESPALDO COMPLETO DE LA BASE DE DATOS!!!")
+    if not desde and not fecha_hora_str:
+        raise HTTPException(status_code=400, detail="Debe indicar 'desde'")
+    inicio = _parsear_fecha_hora(desde or fecha_hora_str, "desde")
+    fin = _parsear_fecha_hora(hasta, "hasta") if hasta else inicio + DURACION_RESERVA_DEFECTO
+    if fin <= inicio:
+        raise HTTPException(status_code=400, detail="'hasta' debe ser posterior a 'desde'")
+
+    log.info("GET /mesas/disponibles → %s a %s | %s personas", format(inicio, "%Y-%m-%d %H:%M"), format(fin, "%H:%M"), personas)
 
     try:
-        pg_dump_exe = find_pg_dump()
-        if not pg_dump_exe:
-            log.error("pg_dump NO ENCONTRADO → Respaldo abortado")
-            raise HTTPException(status_code=500, detail="No se encontró pg_dump. Instala PostgreSQL o agrégalo al PATH.")
-
-        desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
-        backup_dir = os.path.join(desktop_path, "Backups_RestaurantPRO")
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"backup_restaurant_db_{timestamp}.sql"
-        filepath = os.path.join(backup_dir, filename)
-        
-        env = os.environ.copy()
-        env["PGPASSWORD"] = "postgres"
-        
-        command = [
-            pg_dump_exe, "-U", "postgres", "-h", "localhost", "-p", "5432",
-            "-d", "restaurant_db", "-f", filepath
-        ]
-        
-        log.info(f"Ejecutando pg_dump → Guardando en: {filepath}")
-        result = subprocess.run(command, env=env, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            tamaño_mb = os.path.getsize(filepath) / (1024 * 1024)
-            log.info(f"RESPALDO COMPLETADO CON ÉXITO → {filepath} | {tamaño_mb:.2f} MB")
-            return {"status": "ok", "message": "Respaldo creado exitosamente.", "file_path": filepath}
-        else:
-            log.error(f"pg_dump FALLÓ → Código: {result.returncode} | Error: {result.stderr.strip()}")
-            raise HTTPException(status_code=500, detail=f"Error al ejecutar pg_dump: {result.stderr}")
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT m.numero, m.capacidad
+                FROM mesas m
+                WHERE m.numero != 99
+                  AND m.capacidad >= %(personas)s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM reservas r
+                      WHERE r.mesa_numero = m.numero
+                        AND r.periodo && tsrange(%(inicio)s, %(fin)s, '[)')
+                  )
+                  AND (
+                      %(inicio)s > LOCALTIMESTAMP
+                      OR NOT EXISTS (
+                          SELECT 1 FROM pedidos p
+                          WHERE p.mesa_numero = m.numero
+                            AND p.estado IN %(estados)s
+                      )
+                  )
+                ORDER BY m.capacidad, m.numero;
+            """, {"personas": personas, "inicio": inicio, "fin": fin, "estados": ESTADOS_PEDIDO_ACTIVO})
+            disponibles = [{"numero": row['numero'], "capacidad": row['capacidad']} for row in cursor.fetchall()]
+
+        log.info("%s mesas disponibles → %s", len(disponibles), ', '.join(str(m['numero']) for m in disponibles) or 'Ninguna')
+        return disponibles
 
-    except HTTPException:
-        raise
     except Exception as e:
-        log.error(f"ERROR GENERAL EN RESPALDO → {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error creando respaldo: {str(e)}")
+        log.error(f"ERROR en obtener_mesas_disponibles → {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error interno del servidor al consultar disponibilidad.")
 
 
-# (Este código estaba mal indentado en tu mensaje, lo corrijo y agrego logs)
-@app.get("/mesas/disponibles/")
-def obtener_mesas_disponibles_para_fecha_hora(
-    fecha_hora_str: str = Query(..., description="Fecha y hora en formato YYYY-MM-DD HH:MM:SS"),
+@app.get("/mesas/disponibilidad")
+def obtener_grilla_disponibilidad(
+    fecha: Optional[str] = Query(None, description="Fecha YYYY-MM-DD; por defecto hoy"),
+    desde: str = Query("18:00", description="Hora del primer turno (HH:MM)"),
+    hasta: str = Query("23:00", description="Hora de cierre (HH:MM); el último turno empieza antes"),
+    intervalo: int = Query(15, ge=5, le=120, description="Minutos entre turnos"),
+    duracion: int = Query(60, ge=5, le=600, description="Minutos que ocuparía una reserva que empiece en el turno"),
+    personas: int = Query(1, ge=1),
     conn = Depends(get_db)
 ):
-    log.info(f"GET /mesas/disponibles → Buscando mesas libres para: {fecha_hora_str}")
-
+    """
+    Grilla de la noche para la vista de reservas: por cada mesa, si se puede reservar en cada turno
+    (sin solapar reservas existentes durante 'duracion' minutos). Una sola consulta para toda la grilla.
+    """
     try:
-        fecha_hora_obj = datetime.strptime(fecha_hora_str, "%Y-%m-%d %H:%M:%S")
+        dia = datetime.strptime(fecha, "%Y-%m-%d").date() if fecha else date.today()
+        hora_desde = datetime.strptime(desde, "%H:%M").time()
+        hora_hasta = datetime.strptime(hasta, "%H:%M").time()
     except ValueError:
-        log.warning(f"Formato inválido de fecha recibido → {fecha_hora_str}")
-        raise HTTPException(status_code=400, detail="Formato de fecha/hora inválido. Use YYYY-MM-DD HH:MM:SS")
+        raise HTTPException(status_code=400, detail="Formato inválido. Use fecha YYYY-MM-DD y horas HH:MM")
 
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT numero, capacidad FROM mesas WHERE numero != 99;")
-            mesas_db = cursor.fetchall()
+    inicio = datetime.combine(dia, hora_desde)
+    cierre = datetime.combine(dia, hora_hasta)
+    if cierre <= inicio:
+        cierre += timedelta(days=1)  # La noche cruza la medianoche
+    paso = timedelta(minutes=intervalo)
+    turnos = []
+    turno = inicio
+    while turno < cierre:
+        turnos.append(turno)
+        turno += paso
 
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT DISTINCT mesa_numero FROM pedidos
-                WHERE estado IN ('Tomando pedido', 'Pendiente', 'En preparacion', 'Listo', 'Entregado')
-                AND mesa_numero != 99;
-            """)
-            ocupadas_db = {row['mesa_numero'] for row in cursor.fetchall()}
+    log.info("GET /mesas/disponibilidad → %s %s-%s | %s turnos de %s min | %s personas", dia, desde, hasta, len(turnos), intervalo, personas)
 
+    try:
         with conn.cursor() as cursor:
             cursor.execute("""
-                SELECT DISTINCT mesa_numero FROM reservas
-                WHERE %s BETWEEN fecha_hora_inicio AND COALESCE(fecha_hora_fin, fecha_hora_inicio + INTERVAL '1 hour');
-            """, (fecha_hora_obj,))
-            reservadas_db = {row['mesa_numero'] for row in cursor.fetchall()}
-        
-        mesas_disponibles = [
-            {"numero": m['numero'], "capacidad": m['capacidad']}
-            for m in mesas_db
-            if m['numero'] not in ocupadas_db and m['numero'] not in reservadas_db
-        ]
+                SELECT m.numero, m.capacidad,
+                       array_agg(
+                           NOT EXISTS (
+                               SELECT 1 FROM reservas r
+                               WHERE r.mesa_numero = m.numero
+                                 AND r.periodo && tsrange(t.inicio, t.inicio + %(duracion)s * INTERVAL '1 minute', '[)')
+                           )
+                           ORDER BY t.inicio
+                       ) AS libres
+                FROM mesas m
+                CROSS JOIN unnest(%(turnos)s::timestamp[]) AS t(inicio)
+                WHERE m.numero != 99 AND m.capacidad >= %(personas)s
+                GROUP BY m.numero, m.capacidad
+                ORDER BY m.numero;
+            """, {"duracion": duracion, "turnos": turnos, "personas": personas})
+            filas = cursor.fetchall()
 
-        log.info(f"{len(mesas_disponibles)} mesas disponibles para {fecha_hora_str} → {', '.join([str(m['numero']) for m in mesas_disponibles]) or 'Ninguna'}")
-        return mesas_disponibles
+        return {
+            "fecha": str(dia),
+            "intervalo_min": intervalo,
+            "duracion_min": duracion,
+            "turnos": [t.strftime("%H:%M") for t in turnos],
+            "mesas": [
+                {"numero": row['numero'], "capacidad": row['capacidad'], "libres": list(row['libres'] or [])}
+                for row in filas
+            ],
+        }
 
     except Exception as e:
-        log.error(f"ERROR en obtener_mesas_disponibles_para_fecha_hora → {e}", exc_info=True)
+        log.error(f"ERROR en obtener_grilla_disponibilidad → {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error interno del servidor al consultar disponibilidad.")
+# --- FIN DISPONIBILIDAD DE MESAS POR INTERVALO ---
+
+
+# --- ENDPOINT DE RESPALDO (BACKUP) ---
+# El pg_dump corre en segundo plano (respaldos.py): POST /backup devuelve el id del trabajo al
+# instante y el cliente consulta el avance con GET /backup/{id}.
+@app.post("/backup", response_model=BackupResponse, status_code=202)
+def crear_respaldo():
+    """
+    Inicia un respaldo de la base de datos PostgreSQL (pg_dump -Fc comprimido con gzip).
+    Si ya hay uno en curso, devuelve ese mismo trabajo.
+    """
+    trabajo, creado = gestor_respaldos.iniciar()
+    if creado:
+        log.warning(f"POST /backup → RESPALDO {trabajo.id} PUESTO EN MARCHA")
+        mensaje = "Respaldo iniciado."
+    else:
+        log.info("POST /backup → Ya hay un respaldo en curso (%s), se devuelve ese", trabajo.id)
+        mensaje = "Ya hay un respaldo en curso."
+    return {**trabajo.a_dict(), "mensaje": mensaje}
+
+
+@app.get("/backup/{trabajo_id}", response_model=BackupResponse)
+def obtener_estado_respaldo(trabajo_id: str):
+    trabajo = gestor_respaldos.obtener(trabajo_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo de respaldo no encontrado")
+    return trabajo.a_dict()
+
+
+# --- NUEVO: RESPALDO INCREMENTAL ---
+# Cada INTERVALO_SEGMENTO_RESPALDO_S se vuelca el registro de cambios (sección 10 de SqlPRO.sql)
+# a segmentos en la carpeta de respaldos, y una vez por semana se lanza un respaldo completo.
+@app.post("/backup/segmento")
+async def volcar_segmento_respaldo():
+    """Fuerza el volcado del registro de cambios a un segmento incremental."""
+    try:
+        creados = await asyncio.to_thread(gestor_respaldos.volcar_segmentos)
+    except Exception as e:
+        log.error(f"ERROR volcando segmento incremental → {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error volcando segmento incremental: {e}")
+    return {"status": "ok", "segmentos": creados}
+
+async def respaldos_incrementales():
+    while True:
+        await asyncio.sleep(INTERVALO_SEGMENTO_RESPALDO_S)
+        try:
+            await asyncio.to_thread(gestor_respaldos.volcar_segmentos)
+            if gestor_respaldos.respaldo_completo_vencido():
+                trabajo, creado = gestor_respaldos.iniciar()
+                if creado:
+                    log.warning(f"Respaldo completo semanal iniciado → trabajo {trabajo.id}")
+        except Exception as e:
+            log.error(f"Error en respaldo incremental: {e}")
+
+@app.on_event("startup")
+async def iniciar_respaldos_incrementales():
+    asyncio.create_task(respaldos_incrementales())
+    log.info("Respaldo incremental iniciado (segmentos cada %ss)", INTERVALO_SEGMENTO_RESPALDO_S)
+# --- FIN NUEVO ---
 
 
 class ReservaCreate(BaseModel):
@@ -1005,6 +1416,79 @@ class ReservaUpdate(BaseModel):
     fecha_hora_inicio: Optional[str] = None
     fecha_hora_fin: Optional[str] = None
 
+class TurnoReserva(BaseModel):
+    mesa_numero: int
+    fecha_hora_inicio: str
+    fecha_hora_fin: Optional[str] = None
+
+class ReservaBulkRequest(BaseModel):
+    cliente_id: int
+    turnos: List[TurnoReserva]
+    repeticiones: int = Field(1, ge=1, le=52)  # Ej. 8 = el mismo turno durante 8 semanas
+    cada_dias: int = Field(7, ge=1, le=365)
+    todo_o_nada: bool = True  # Si hay algún conflicto no se crea ninguna
+
+
+# === FUNCIÓN: insertar_reservas ===
+# Inserta los turnos [(mesa_numero, inicio, fin)] en una sola sentencia y devuelve las reservas
+# ya unidas con el nombre del cliente (sin segunda consulta).
+def insertar_reservas(cursor, cliente_id: int, turnos):
+    cursor.execute("""
+        WITH nuevas AS (
+            INSERT INTO reservas (mesa_numero, cliente_id, fecha_hora_inicio, fecha_hora_fin)
+            SELECT t.mesa_numero, %s, t.inicio, t.fin
+            FROM unnest(%s::int[], %s::timestamp[], %s::timestamp[]) AS t(mesa_numero, inicio, fin)
+            RETURNING id, mesa_numero, cliente_id, fecha_hora_inicio, fecha_hora_fin
+        )
+        SELECT n.id, n.mesa_numero, n.cliente_id, c.nombre AS cliente_nombre, n.fecha_hora_inicio, n.fecha_hora_fin
+        FROM nuevas n
+        JOIN clientes c ON c.id = n.cliente_id
+        ORDER BY n.fecha_hora_inicio, n.mesa_numero;
+    """, (cliente_id, [t[0] for t in turnos], [t[1] for t in turnos], [t[2] for t in turnos]))
+    return [
+        {
+            "id": row['id'],
+            "mesa_numero": row['mesa_numero'],
+            "cliente_id": row['cliente_id'],
+            "cliente_nombre": row['cliente_nombre'],
+            "fecha_hora_inicio": str(row['fecha_hora_inicio']),
+            "fecha_hora_fin": str(row['fecha_hora_fin']) if row['fecha_hora_fin'] else None
+        }
+        for row in cursor.fetchall()
+    ]
+
+
+# === FUNCIÓN: buscar_conflictos_reservas ===
+# Valida todos los turnos en una sola consulta: mesa inexistente, solapamiento con reservas
+# existentes (índice GiST de 'reservas_sin_solapamiento') y solapamiento entre turnos del mismo lote.
+# Devuelve {indice_turno: [motivos]}.
+def buscar_conflictos_reservas(cursor, turnos):
+    cursor.execute("""
+        WITH pedidos_turnos AS (
+            SELECT t.indice - 1 AS indice, t.mesa_numero, tsrange(t.inicio, t.fin, '[)') AS periodo
+            FROM unnest(%s::int[], %s::timestamp[], %s::timestamp[]) WITH ORDINALITY AS t(mesa_numero, inicio, fin, indice)
+        )
+        SELECT t.indice, 'La mesa ' || t.mesa_numero || ' no existe' AS motivo
+        FROM pedidos_turnos t
+        WHERE NOT EXISTS (SELECT 1 FROM mesas m WHERE m.numero = t.mesa_numero AND m.numero != 99)
+        UNION ALL
+        SELECT t.indice,
+               'Se superpone con la reserva ' || r.id || ' (' || COALESCE(c.nombre, 'sin cliente') || ', '
+                   || to_char(lower(r.periodo), 'YYYY-MM-DD HH24:MI') || ' a ' || to_char(upper(r.periodo), 'HH24:MI') || ')'
+        FROM pedidos_turnos t
+        JOIN reservas r ON r.mesa_numero = t.mesa_numero AND r.periodo && t.periodo
+        LEFT JOIN clientes c ON c.id = r.cliente_id
+        UNION ALL
+        SELECT b.indice, 'Se superpone con el turno ' || (a.indice + 1) || ' del mismo pedido'
+        FROM pedidos_turnos a
+        JOIN pedidos_turnos b ON b.mesa_numero = a.mesa_numero AND a.indice < b.indice AND a.periodo && b.periodo
+        ORDER BY 1;
+    """, ([t[0] for t in turnos], [t[1] for t in turnos], [t[2] for t in turnos]))
+    conflictos = {}
+    for row in cursor.fetchall():
+        conflictos.setdefault(row['indice'], []).append(row['motivo'])
+    return conflictos
+
 
 @app.get("/reservas/")
 def obtener_reservas(
@@ -1012,7 +1496,7 @@ def obtener_reservas(
     conn = Depends(get_db)
 ):
     filtro = f" para {fecha}" if fecha else " (todas)"
-    log.info(f"GET /reservas → Obteniendo reservas{filtro}")
+    log.info("GET /reservas → Obteniendo reservas%s", filtro)
 
     try:
         query = """
@@ -1042,7 +1526,7 @@ def obtener_reservas(
             for res in reservas_db
         ]
 
-        log.info(f"{len(reservas)} reservas enviadas al frontend")
+        log.info("%s reservas enviadas al frontend", len(reservas))
         return reservas
 
     except Exception as e:
@@ -1052,45 +1536,36 @@ def obtener_reservas(
 
 @app.post("/reservas/", status_code=201)
 def crear_reserva_simplificada(reserva: ReservaCreate, conn = Depends(get_db)):
-    log.info(f"POST /reservas → Creando reserva Mesa {reserva.mesa_numero} | Cliente ID {reserva.cliente_id} | {reserva.fecha_hora_inicio}")
+    log.info("POST /reservas → Creando reserva Mesa %s | Cliente ID %s | %s", reserva.mesa_numero, reserva.cliente_id, reserva.fecha_hora_inicio)
 
     try:
         fecha_inicio_obj = datetime.fromisoformat(reserva.fecha_hora_inicio.replace(" ", "T"))
         if reserva.fecha_hora_fin:
             fecha_fin_obj = datetime.fromisoformat(reserva.fecha_hora_fin.replace(" ", "T"))
         else:
-            fecha_fin_obj = fecha_inicio_obj + timedelta(hours=1)
-            log.debug(f"Duración no especificada → Asignando 1 hora por defecto")
+            fecha_fin_obj = fecha_inicio_obj + DURACION_RESERVA_DEFECTO
+            log.debug("Duración no especificada → Asignando 1 hora por defecto")
+        # Con fin <= inicio el rango 'periodo' (columna generada) es inválido y la base lo rechaza
+        if fecha_fin_obj <= fecha_inicio_obj:
+            raise HTTPException(status_code=400, detail="La hora de fin debe ser posterior a la de inicio")
 
         with conn.cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO reservas (mesa_numero, cliente_id, fecha_hora_inicio, fecha_hora_fin)
-                VALUES (%s, %s, %s, %s) RETURNING id;
-            """, (reserva.mesa_numero, reserva.cliente_id, fecha_inicio_obj, fecha_fin_obj))
-            reserva_id = cursor.fetchone()['id']
-        
+            nueva = insertar_reservas(cursor, reserva.cliente_id, [(reserva.mesa_numero, fecha_inicio_obj, fecha_fin_obj)])
         conn.commit()
 
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT r.id, r.mesa_numero, r.cliente_id, c.nombre as cliente_nombre, r.fecha_hora_inicio, r.fecha_hora_fin
-                FROM reservas r
-                JOIN clientes c ON r.cliente_id = c.id
-                WHERE r.id = %s;
-            """, (reserva_id,))
-            nueva = cursor.fetchone()
-
-        log.info(f"RESERVA CREADA CON ÉXITO → ID: {reserva_id} | Mesa {reserva.mesa_numero} | {nueva['cliente_nombre']} | {fecha_inicio_obj.strftime('%Y-%m-%d %H:%M')}")
-
-        return {
-            "id": nueva['id'],
-            "mesa_numero": nueva['mesa_numero'],
-            "cliente_id": nueva['cliente_id'],
-            "cliente_nombre": nueva['cliente_nombre'],
-            "fecha_hora_inicio": str(nueva['fecha_hora_inicio']),
-            "fecha_hora_fin": str(nueva['fecha_hora_fin']) if nueva['fecha_hora_fin'] else None
-        }
+        nueva = nueva[0]
+        log.info("RESERVA CREADA CON ÉXITO → ID: %s | Mesa %s | %s | %s", nueva['id'], reserva.mesa_numero, nueva['cliente_nombre'], fecha_inicio_obj.strftime('%Y-%m-%d %H:%M'))
+        return nueva
 
+    except HTTPException:
+        raise
+    except psycopg2.errors.ExclusionViolation:
+        conn.rollback()
+        log.warning(f"Mesa {reserva.mesa_numero} ya reservada en ese horario → 409")
+        raise HTTPException(status_code=409, detail=f"La mesa {reserva.mesa_numero} ya tiene una reserva que se superpone con ese horario")
+    except psycopg2.errors.ForeignKeyViolation:
+        conn.rollback()
+        raise HTTPException(status_code=404, detail="Cliente o mesa inexistente")
     except ValueError as ve:
         log.warning(f"Error de formato de fecha en reserva → {ve}")
         raise HTTPException(status_code=400, detail=f"Formato de fecha/hora inválido: {ve}")
@@ -1100,6 +1575,77 @@ def crear_reserva_simplificada(reserva: ReservaCreate, conn = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Error interno del servidor al crear la reserva.")
 
 
+@app.post("/reservas/bulk")
+def crear_reservas_bulk(pedido: ReservaBulkRequest, conn = Depends(get_db)):
+    """
+    Crea varias reservas de un cliente de una vez: grupos (varias mesas) y/o turnos recurrentes
+    ('repeticiones' veces cada 'cada_dias' días). Valida todos los turnos con una sola consulta de
+    solapamiento e inserta con un solo INSERT ... RETURNING. Informa los conflictos por turno.
+    """
+    if not pedido.turnos:
+        raise HTTPException(status_code=400, detail="No se indicaron turnos")
+
+    turnos = []
+    for turno in pedido.turnos:
+        inicio = _parsear_fecha_hora(turno.fecha_hora_inicio, "fecha_hora_inicio")
+        fin = _parsear_fecha_hora(turno.fecha_hora_fin, "fecha_hora_fin") if turno.fecha_hora_fin else inicio + DURACION_RESERVA_DEFECTO
+        if fin <= inicio:
+            raise HTTPException(status_code=400, detail=f"Mesa {turno.mesa_numero}: la hora de fin debe ser posterior a la de inicio")
+        for k in range(pedido.repeticiones):
+            desplazamiento = timedelta(days=k * pedido.cada_dias)
+            turnos.append((turno.mesa_numero, inicio + desplazamiento, fin + desplazamiento))
+    if len(turnos) > MAX_TURNOS_RESERVA_BULK:
+        raise HTTPException(status_code=400, detail=f"Demasiados turnos ({len(turnos)}); máximo {MAX_TURNOS_RESERVA_BULK}")
+
+    log.info("POST /reservas/bulk → Cliente %s | %s turnos (%s x %s)", pedido.cliente_id, len(turnos), len(pedido.turnos), pedido.repeticiones)
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM clientes WHERE id = %s;", (pedido.cliente_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail=f"Cliente {pedido.cliente_id} no encontrado")
+
+            conflictos = buscar_conflictos_reservas(cursor, turnos)
+            libres = [t for i, t in enumerate(turnos) if i not in conflictos]
+            creadas = []
+            if libres and (not conflictos or not pedido.todo_o_nada):
+                creadas = insertar_reservas(cursor, pedido.cliente_id, libres)
+        conn.commit()
+
+        reporte_conflictos = [
+            {
+                "indice": i,
+                "mesa_numero": turnos[i][0],
+                "fecha_hora_inicio": str(turnos[i][1]),
+                "fecha_hora_fin": str(turnos[i][2]),
+                "motivos": motivos
+            }
+            for i, motivos in sorted(conflictos.items())
+        ]
+        if conflictos:
+            log.warning(f"Reservas en lote → {len(conflictos)} turnos con conflicto | {len(creadas)} creadas")
+        else:
+            log.info("Reservas en lote creadas → %s", len(creadas))
+        return {
+            "status": "ok" if not conflictos else ("parcial" if creadas else "conflicto"),
+            "solicitadas": len(turnos),
+            "creadas": creadas,
+            "conflictos": reporte_conflictos
+        }
+
+    except HTTPException:
+        raise
+    except psycopg2.errors.ExclusionViolation:
+        # Otra reserva entró entre la validación y el INSERT
+        conn.rollback()
+        log.warning("Reservas en lote → conflicto concurrente detectado por la restricción de exclusión → 409")
+        raise HTTPException(status_code=409, detail="Otra reserva ocupó alguno de los turnos mientras se procesaba. Intente de nuevo.")
+    except Exception as e:
+        log.error(f"ERROR al crear reservas en lote → {e}", exc_info=True)
+        conn.rollback()
+        raise HTTPException(status_code=500, detail="Error interno del servidor al crear las reservas.")
+
+
 @app.delete("/reservas/{reserva_id}")
 def eliminar_reserva(reserva_id: int, conn = Depends(get_db)):
     """
@@ -1133,7 +1679,7 @@ def obtener_ventas_por_hora(
     fecha: str = Query(..., description="Fecha en formato YYYY-MM-DD para filtrar ventas por hora"),
     conn: psycopg2.extensions.connection = Depends(get_db)
 ):
-    log.info(f"GET /reportes/ventas_por_hora → Generando ventas por hora del día {fecha}")
+    log.info("GET /reportes/ventas_por_hora → Generando ventas por hora del día %s", fecha)
 
     try:
         datetime.strptime(fecha, "%Y-%m-%d")
@@ -1168,7 +1714,7 @@ def obtener_ventas_por_hora(
         hora_pico = max(ventas_por_hora.items(), key=lambda x: x[1])[0] if total_del_dia > 0 else "N/A"
         monto_pico = ventas_por_hora[hora_pico]
 
-        log.info(f"VENTAS POR HORA {fecha} → Total día: ${total_del_dia:,.2f} | Hora pico: {hora_pico}h → ${monto_pico:,.2f}")
+        log.info("VENTAS POR HORA %s → Total día: $%s | Hora pico: %sh → $%s", fecha, format(total_del_dia, ",.2f"), hora_pico, format(monto_pico, ",.2f"))
         return ventas_por_hora
 
     except Exception as e:
@@ -1183,7 +1729,7 @@ def get_eficiencia_cocina(
     end_date: str,
     conn = Depends(get_db)
 ):
-    log.info(f"REPORTE EFICIENCIA COCINA → {tipo} | {start_date} → {end_date}")
+    log.info("REPORTE EFICIENCIA COCINA → %s | %s → %s", tipo, start_date, end_date)
 
     with conn.cursor() as cursor:
         query = """
@@ -1227,7 +1773,7 @@ def get_eficiencia_cocina(
         mas_rapido = min(tiempos)
         mas_lento = max(tiempos)
 
-        log.info(f"EFICIENCIA → {len(tiempos)} pedidos | Promedio: {promedio:.1f} min")
+        log.info("EFICIENCIA → %s pedidos | Promedio: %.1f min", len(tiempos), promedio)
 
         return {
             "promedio_minutos": round(promedio, 1),
@@ -1245,7 +1791,7 @@ def limpiar_mesas_fisicas(conn=Depends(get_db)):
             cursor.execute("DELETE FROM mesas WHERE numero != 99")
             eliminadas = cursor.rowcount
             conn.commit()
-        log.info(f"CONFIGURACIÓN INICIAL → {eliminadas} mesas físicas eliminadas (pedidos asociados también)")
+        log.info("CONFIGURACIÓN INICIAL → %s mesas físicas eliminadas (pedidos asociados también)", eliminadas)
         return {"status": "ok", "eliminadas": eliminadas}
     except Exception as e:
         log.error(f"Error crítico al limpiar mesas: {e}")
@@ -1258,7 +1804,8 @@ def limpiar_menu_completo(conn=Depends(get_db)):
             cursor.execute("DELETE FROM menu")
             eliminados = cursor.rowcount
             conn.commit()
-        log.info(f"Menú completo limpiado → {eliminados} ítems eliminados")
+        disponibilidad_menu.recetas_cambiadas()
+        log.info("Menú completo limpiado → %s ítems eliminados", eliminados)
         return {"status": "ok", "message": "Menú limpiado correctamente"}
     except Exception as e:
         log.error(f"Error al limpiar menú: {e}")
@@ -1277,7 +1824,7 @@ def crear_mesa(mesa: dict, conn=Depends(get_db)):
                 ON CONFLICT (numero) DO UPDATE SET capacidad = %s
             """, (numero, capacidad, capacidad))
             conn.commit()
-        log.info(f"Mesa creada/actualizada → Mesa {numero} - Capacidad: {capacidad}")
+        log.info("Mesa creada/actualizada → Mesa %s - Capacidad: %s", numero, capacidad)
         return {"status": "ok"}
     except Exception as e:
         log.error(f"Error al crear mesa: {e}")
@@ -3,16 +3,16 @@
 
 import requests
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 
 # ←←← LOGS PROFESIONALES (la línea mágica) ←←←
-log = logging.getLogger("RestaurantIA")
+log = logging.getLogger("RestaurantIA.backend_service")
 
 class BackendService:
     def __init__(self, base_url: str = "http://127.0.0.1:8000"):
         self.base_url = base_url.rstrip("/")
-        log.info(f"BackendService inicializado → Conectando a: {self.base_url}")
+        log.info("BackendService inicializado → Conectando a: %s", self.base_url)
 
     def _request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
         """
@@ -22,14 +22,14 @@ class BackendService:
         url = f"{self.base_url}{endpoint}"
         start_time = datetime.now()
         
-        log.debug(f"HTTP {method.upper()} → {url} | Params: {kwargs.get('params')} | Payload: {kwargs.get('json')}")
+        log.debug("HTTP %s → %s | Params: %s | Payload: %s", method.upper(), url, kwargs.get('params'), kwargs.get('json'))
 
         try:
             response = requests.request(method, url, timeout=15, **kwargs)
             duration = (datetime.now() - start_time).total_seconds() * 1000
             
             if response.status_code >= 200 and response.status_code < 300:
-                log.info(f"HTTP {method.upper()} ← {response.status_code} | {duration:.1f}ms | {endpoint}")
+                log.info("HTTP %s ← %s | %.1fms | %s", method.upper(), response.status_code, duration, endpoint)
             else:
                 log.warning(f"HTTP {method.upper()} ← {response.status_code} | {duration:.1f}ms | {endpoint} | Respuesta: {response.text[:200]}")
             
@@ -59,23 +59,51 @@ class BackendService:
         response = self._request("get", "/menu/items")
         return response.json()
 
-    def crear_pedido(self, mesa_numero: int, items: List[Dict[str, Any]], estado: str = "Pendiente", notas: str = "") -> Dict[str, Any]:
+    # Mapa {plato: porciones preparables} (solo platos con receta) en una sola petición.
+    def obtener_disponibilidad_menu(self) -> Dict[str, int]:
+        response = self._request("get", "/menu/disponibilidad")
+        return response.json().get("platos", {})
+
+    # Crea o renueva la retención de stock del pedido en curso. Lanza Exception si no alcanza el stock.
+    def retener_stock(self, retencion_id: Optional[str], items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        platos = {}
+        for item in items:
+            platos[item["nombre"]] = platos.get(item["nombre"], 0) + item.get("cantidad", 1)
+        payload = {"items": [{"nombre": nombre, "cantidad": cantidad} for nombre, cantidad in platos.items()]}
+        if retencion_id:
+            response = self._request("put", f"/retenciones/{retencion_id}", json=payload)
+        else:
+            response = self._request("post", "/retenciones", json=payload)
+        return response.json()
+
+    def liberar_retencion(self, retencion_id: str) -> Dict[str, Any]:
+        response = self._request("delete", f"/retenciones/{retencion_id}")
+        return response.json()
+
+    def crear_pedido(self, mesa_numero: int, items: List[Dict[str, Any]], estado: str = "Pendiente", notas: str = "", retencion_id: Optional[str] = None) -> Dict[str, Any]:
         payload = {"mesa_numero": mesa_numero, "items": items, "estado": estado, "notas": notas}
+        if retencion_id:
+            payload["retencion_id"] = retencion_id
         response = self._request("post", "/pedidos", json=payload)
         resultado = response.json()
         pedido_id = resultado.get("id")
-        log.info(f"PEDIDO CREADO DESDE APP → ID #{pedido_id} | Mesa {mesa_numero} | {len(items)} ítems")
+        log.info("PEDIDO CREADO DESDE APP → ID #%s | Mesa %s | %s ítems", pedido_id, mesa_numero, len(items))
         return resultado
 
     def obtener_pedidos_activos(self) -> List[Dict[str, Any]]:
         response = self._request("get", "/pedidos/activos")
         datos = response.json()
-        log.debug(f"Pedidos activos recibidos → {len(datos)} en cocina")
+        log.debug("Pedidos activos recibidos → %s en cocina", len(datos))
         return datos
 
+    def obtener_pedidos_atrasados(self, umbral_min: int) -> List[Dict[str, Any]]:
+        """Pedidos cuyo tiempo de espera (calculado en el servidor) supera umbral_min."""
+        response = self._request("get", "/pedidos/atrasados", params={"umbral_min": umbral_min})
+        return response.json()
+
     def actualizar_estado_pedido(self, pedido_id: int, nuevo_estado: str) -> Dict[str, Any]:
         response = self._request("patch", f"/pedidos/{pedido_id}/estado", params={"estado": nuevo_estado})
-        log.info(f"ESTADO ACTUALIZADO DESDE APP → Pedido #{pedido_id} → '{nuevo_estado}'")
+        log.info("ESTADO ACTUALIZADO DESDE APP → Pedido #%s → '%s'", pedido_id, nuevo_estado)
         return response.json()
 
     def obtener_mesas(self) -> List[Dict[str, Any]]:
@@ -84,13 +112,13 @@ class BackendService:
 
     def eliminar_ultimo_item(self, pedido_id: int) -> Dict[str, Any]:
         response = self._request("delete", f"/pedidos/{pedido_id}/ultimo_item")
-        log.info(f"ÚLTIMO ÍTEM ELIMINADO DESDE APP → Pedido #{pedido_id}")
+        log.info("ÚLTIMO ÍTEM ELIMINADO DESDE APP → Pedido #%s", pedido_id)
         return response.json()
 
     def actualizar_pedido(self, pedido_id: int, mesa_numero: int, items: List[Dict[str, Any]], estado: str = "Pendiente", notas: str = "") -> Dict[str, Any]:
         payload = {"mesa_numero": mesa_numero, "items": items, "estado": estado, "notas": notas}
         response = self._request("put", f"/pedidos/{pedido_id}", json=payload)
-        log.info(f"PEDIDO ACTUALIZADO COMPLETAMENTE → ID #{pedido_id} | {len(items)} ítems")
+        log.info("PEDIDO ACTUALIZADO COMPLETAMENTE → ID #%s | %s ítems", pedido_id, len(items))
         return response.json()
 
     def eliminar_pedido(self, pedido_id: int) -> Dict[str, Any]:
@@ -101,7 +129,7 @@ class BackendService:
     def agregar_item_menu(self, nombre: str, precio: float, tipo: str) -> Dict[str, Any]:
         payload = {"nombre": nombre, "precio": precio, "tipo": tipo}
         response = self._request("post", "/menu/items", json=payload)
-        log.info(f"ÍTEM AGREGADO AL MENÚ → '{nombre}' | ${precio}")
+        log.info("ÍTEM AGREGADO AL MENÚ → '%s' | $%s", nombre, precio)
         return response.json()
 
     def eliminar_item_menu(self, nombre: str, tipo: str) -> Dict[str, Any]:
@@ -116,7 +144,7 @@ class BackendService:
     def agregar_cliente(self, nombre: str, domicilio: str, celular: str) -> Dict[str, Any]:
         payload = {"nombre": nombre, "domicilio": domicilio, "celular": celular}
         response = self._request("post", "/clientes", json=payload)
-        log.info(f"CLIENTE AGREGADO → {nombre} | {celular}")
+        log.info("CLIENTE AGREGADO → %s | %s", nombre, celular)
         return response.json()
 
     def eliminar_cliente(self, cliente_id: int) -> Dict[str, Any]:
@@ -124,12 +152,17 @@ class BackendService:
         log.warning(f"CLIENTE ELIMINADO → ID #{cliente_id}")
         return response.json()
 
+    # Inicia el respaldo en segundo plano y devuelve el trabajo (id, estado); no espera al pg_dump.
     def crear_respaldo(self) -> Dict[str, Any]:
         log.warning("RESPALDO SOLICITADO DESDE LA APP → Iniciando backup de BD...")
         response = self._request("post", "/backup")
-        resultado = response.json()
-        log.info(f"RESPALDO CREADO CON ÉXITO → {resultado['file_path']}")
-        return resultado
+        trabajo = response.json()
+        log.info("RESPALDO EN MARCHA → Trabajo %s | %s", trabajo['id'], trabajo['estado'])
+        return trabajo
+
+    def obtener_estado_respaldo(self, trabajo_id: str) -> Dict[str, Any]:
+        response = self._request("get", f"/backup/{trabajo_id}")
+        return response.json()
 
     def obtener_reporte(self, tipo: str, fecha: datetime) -> Dict[str, Any]:
         # ... (tu lógica de fechas queda igual)
@@ -140,7 +173,7 @@ class BackendService:
 
         params = {"tipo": tipo.lower(), "start_date": start_date, "end_date": end_date}
         response = self._request("get", "/reportes/", params=params)
-        log.info(f"REPORTE GENERADO → {tipo} | {start_date} → {end_date}")
+        log.info("REPORTE GENERADO → %s | %s → %s", tipo, start_date, end_date)
         return response.json()
 
     def obtener_analisis_productos(self, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
@@ -152,20 +185,20 @@ class BackendService:
 
     def obtener_ventas_por_hora(self, fecha: str) -> Dict[str, float]:
         response = self._request("get", "/reportes/ventas_por_hora", params={"fecha": fecha})
-        log.info(f"VENTAS POR HORA OBTENIDAS → {fecha}")
+        log.info("VENTAS POR HORA OBTENIDAS → %s", fecha)
         return response.json()
 
     def obtener_eficiencia_cocina(self, tipo: str, fecha: datetime) -> Dict[str, Any]:
         # ... misma lógica de fechas ...
         params = {"tipo": tipo.lower(), "start_date": start_date, "end_date": end_date}
         response = self._request("get", "/reportes/eficiencia_cocina", params=params)
-        log.info(f"EFICIENCIA DE COCINA OBTENIDA → {tipo} | Promedio: {response.json().get('promedio_minutos', '?')} min")
+        log.info("EFICIENCIA DE COCINA OBTENIDA → %s | Promedio: %s min", tipo, response.json().get('promedio_minutos', '?'))
         return response.json()
 
     def crear_mesa(self, numero: int, capacidad: int) -> Dict[str, Any]:
         payload = {"numero": numero, "capacidad": capacidad}
         response = self._request("post", "/mesas", json=payload)
-        log.info(f"MESA CREADA → Mesa {numero} | Capacidad: {capacidad} personas")
+        log.info("MESA CREADA → Mesa %s | Capacidad: %s personas", numero, capacidad)
         return response.json()
 
     def obtener_eficiencia_cocina(self, tipo: str, fecha: datetime) -> Dict[str, Any]:
@@ -0,0 +1,543 @@
+# === BENCHMARK_CARGA.PY ===
+# Benchmarks de carga contra el backend real: uvicorn + PostgreSQL local, con clientes HTTP concurrentes.
+# 1. Prepara una base aparte (restaurant_db_benchmark por defecto): aplica SqlPRO.sql (menú incluido),
+#    le da receta a todos los platos, y carga ingredientes con stock de sobra, clientes y miles de
+#    pedidos históricos.
+# 2. Levanta el backend con uvicorn apuntando a esa base (RESTAURANTIA_DATABASE_URL).
+# 3. Corre los escenarios, midiendo cada request por operación (método + ruta):
+#      hora_pico    meseros creando pedidos en paralelo (POST /pedidos) y cocineros avanzando sus
+#                   estados (PATCH /pedidos/{id}/estado: En preparacion → Listo → Entregado)
+#      terminales   N terminales consultando /pedidos/activos y /mesas cada 'intervalo' segundos
+#      reportes     clientes pidiendo reportes sobre rangos al azar del historial
+#      concurrencia 200 clientes simultáneos sin pausa sobre las rutas calientes (GET /menu/items,
+#                   /mesas, /pedidos/activos, POST /pedidos y PATCH de estado)
+# 4. Informa throughput y p50/p95/p99 por operación, guarda el resultado en JSON y, con --comparar,
+#    lo compara contra una línea base.
+# Con --comparar-async corre los escenarios dos veces: rutas calientes por el threadpool con psycopg2
+# (RESTAURANTIA_DB_ASYNC=0, el "antes") y con el pool async de asyncpg (el "después"), y compara.
+#
+# Uso (con PostgreSQL levantado):
+#   python benchmark_carga.py --preparar                       # (re)crea y siembra la base, y corre todo
+#   python benchmark_carga.py --preparar --escala 10           # historial de generar_historial.py a 10x
+#   python benchmark_carga.py --escenarios hora_pico --duracion 60 --meseros 40
+#   python benchmark_carga.py --guardar resultados_benchmark/base.json
+#   python benchmark_carga.py --comparar resultados_benchmark/base.json --tolerancia 0.2
+#   python benchmark_carga.py --url http://127.0.0.1:8000     # contra un backend ya levantado
+#   python benchmark_carga.py --comparar-async --escenarios concurrencia --clientes-concurrentes 200
+#
+# Devuelve código de salida 1 si, con --comparar o --comparar-async, algún p95 o throughput empeora
+# más que la tolerancia.
+
+import argparse
+import importlib.util
+import json
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+import requests
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, execute_values
+
+import generar_historial
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+BASE_BENCHMARK = "restaurant_db_benchmark"
+DSN_SERVIDOR = "user=postgres password=postgres host=localhost port=5432"
+PUERTO = 8765
+DIRECTORIO_RESULTADOS = os.path.join(DIRECTORIO, "resultados_benchmark")
+TIMEOUT_HTTP_S = 30
+SEMILLA = 20260101
+
+ESCENARIOS = ("hora_pico", "terminales", "reportes", "concurrencia")
+# Variantes de --comparar-async: valor de RESTAURANTIA_DB_ASYNC en el backend levantado
+VARIANTES_DRIVER = (("threadpool", "0"), ("async", "1"))
+
+# Ingredientes para las recetas de benchmark; el stock alcanza para cualquier corrida
+INGREDIENTES_BENCHMARK = (
+    ("Arroz", "kg"), ("Pollo", "kg"), ("Camaron", "kg"), ("Verduras Mixtas", "kg"), ("Salsa de Soja", "lt"),
+    ("Res", "kg"), ("Salmon", "kg"), ("Queso Crema", "kg"), ("Aguacate", "kg"), ("Pepino", "kg"),
+    ("Alga Nori", "unidad"), ("Pan Panko", "kg"), ("Aceite", "lt"), ("Cangrejo", "kg"), ("Refresco", "unidad"),
+)
+STOCK_BENCHMARK = 1_000_000
+PEDIDOS_HISTORICOS = 5000
+DIAS_HISTORIA = 90
+CLIENTES = 500
+# Peso de cada hora del día en el historial (comida y cena)
+PESO_HORAS = {12: 2, 13: 6, 14: 8, 15: 5, 16: 2, 17: 1, 18: 2, 19: 5, 20: 7, 21: 6, 22: 2}
+ESTADOS_COCINA = ("En preparacion", "Listo", "Entregado")
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def dsn_base(base: str) -> str:
+    return f"dbname={base} {DSN_SERVIDOR}"
+
+
+# === FUNCIÓN: preparar_base ===
+# (Re)crea la base de benchmark y aplica SqlPRO.sql. Nunca toca restaurant_db.
+def preparar_base(base: str):
+    if base == "restaurant_db":
+        raise SystemExit("El benchmark no se corre sobre restaurant_db: usa una base aparte")
+    conn = psycopg2.connect(dsn_base("postgres"))
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE);").format(sql.Identifier(base)))
+            cursor.execute(sql.SQL("CREATE DATABASE {};").format(sql.Identifier(base)))
+    finally:
+        conn.close()
+
+    with open(os.path.join(DIRECTORIO, "SqlPRO.sql"), encoding="utf-8") as f:
+        esquema = f.read()
+    conn = psycopg2.connect(dsn_base(base))
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(esquema)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"   Base '{base}' creada con SqlPRO.sql")
+
+
+# === FUNCIÓN: sembrar_datos ===
+# Ingredientes, una receta por plato del menú, clientes y pedidos históricos pagados.
+def sembrar_datos(base: str, pedidos_historicos: int):
+    rng = random.Random(SEMILLA)
+    conn = psycopg2.connect(dsn_base(base), cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cursor:
+            execute_values(cursor, """
+                INSERT INTO inventario (nombre, cantidad_disponible, unidad_medida, cantidad_minima, cantidad_minima_alerta)
+                VALUES %s
+                ON CONFLICT (nombre) DO UPDATE SET cantidad_disponible = EXCLUDED.cantidad_disponible;
+            """, [(nombre, STOCK_BENCHMARK, unidad, 1, 5) for nombre, unidad in INGREDIENTES_BENCHMARK])
+            cursor.execute("SELECT id, unidad_medida FROM inventario ORDER BY id;")
+            ingredientes = cursor.fetchall()
+
+            cursor.execute("""
+                INSERT INTO recetas (nombre_plato, descripcion)
+                SELECT nombre, 'Receta de benchmark' FROM menu
+                ON CONFLICT (nombre_plato) DO NOTHING;
+            """)
+            cursor.execute("""
+                SELECT r.id FROM recetas r
+                WHERE NOT EXISTS (SELECT 1 FROM ingredientes_recetas ir WHERE ir.receta_id = r.id)
+                ORDER BY r.id;
+            """)
+            filas_recetas = []
+            for receta in cursor.fetchall():
+                for ingrediente in rng.sample(ingredientes, rng.randint(2, 4)):
+                    filas_recetas.append((receta['id'], ingrediente['id'], round(rng.uniform(0.05, 0.3), 2), ingrediente['unidad_medida'] or "unidad"))
+            execute_values(cursor, """
+                INSERT INTO ingredientes_recetas (receta_id, ingrediente_id, cantidad_necesaria, unidad_medida_necesaria)
+                VALUES %s;
+            """, filas_recetas)
+
+            execute_values(cursor, "INSERT INTO clientes (nombre, celular) VALUES %s;", [
+                (f"Cliente Benchmark {i}", f"55{rng.randint(10000000, 99999999)}") for i in range(CLIENTES)
+            ])
+
+            cursor.execute("SELECT nombre, precio FROM menu ORDER BY id;")
+            menu = [{"nombre": f['nombre'], "precio": float(f['precio'])} for f in cursor.fetchall()]
+            cursor.execute("SELECT numero FROM mesas ORDER BY numero;")
+            mesas = [f['numero'] for f in cursor.fetchall()]
+            horas, pesos = zip(*PESO_HORAS.items())
+            hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            pedidos = []
+            for _ in range(pedidos_historicos):
+                fecha = hoy - timedelta(days=rng.randint(1, DIAS_HISTORIA)) + timedelta(hours=rng.choices(horas, pesos)[0], minutes=rng.randint(0, 59))
+                inicio_cocina = fecha + timedelta(minutes=rng.randint(1, 5))
+                fin_cocina = inicio_cocina + timedelta(minutes=rng.randint(8, 25))
+                items = [rng.choice(menu) for _ in range(rng.randint(1, 5))]
+                pedidos.append((rng.choice(mesas), "Pagado", fecha, json.dumps(items), inicio_cocina, fin_cocina, fin_cocina))
+            execute_values(cursor, """
+                INSERT INTO pedidos (mesa_numero, estado, fecha_hora, items, hora_inicio_cocina, hora_fin_cocina, updated_at)
+                VALUES %s;
+            """, pedidos, page_size=1000)
+            # La siembra no es un cambio a respaldar
+            cursor.execute("TRUNCATE respaldo_cambios;")
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("ANALYZE;")
+    finally:
+        conn.close()
+    print(f"   Sembrados {len(filas_recetas)} ingredientes de recetas, {CLIENTES} clientes y {pedidos_historicos} pedidos históricos")
+
+
+# === FUNCIÓN: cerrar_pedidos_benchmark ===
+# Pasa a 'Pagado' los pedidos que dejaron corridas anteriores, para que cada corrida empiece con
+# la misma cantidad de pedidos activos.
+def cerrar_pedidos_benchmark(base: str) -> int:
+    conn = psycopg2.connect(dsn_base(base))
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("UPDATE pedidos SET estado = 'Pagado' WHERE notas = 'benchmark' AND estado <> 'Pagado';")
+            cerrados = cursor.rowcount
+        conn.commit()
+        return cerrados
+    finally:
+        conn.close()
+
+
+# === FUNCIÓN: levantar_backend ===
+# uvicorn en un proceso aparte (un worker, como en producción) contra la base de benchmark.
+def levantar_backend(base: str, puerto: int, entorno_extra=None):
+    entorno = dict(os.environ, RESTAURANTIA_DATABASE_URL=dsn_base(base), RESTAURANTIA_LOG_NIVEL="WARNING", **(entorno_extra or {}))
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend:app", "--host", "127.0.0.1", "--port", str(puerto),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=DIRECTORIO, env=entorno,
+    )
+    url = f"http://127.0.0.1:{puerto}"
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise SystemExit(f"El backend terminó al arrancar (código {proceso.returncode})")
+        try:
+            if requests.get(f"{url}/health", timeout=2).json().get("status") == "ok":
+                return proceso, url
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(0.5)
+    proceso.terminate()
+    raise SystemExit("El backend no respondió /health en 60 s")
+
+
+class Mediciones:
+    """Latencias por operación; list.append es atómico, alcanza para varios hilos."""
+
+    def __init__(self):
+        self.registros = []
+
+    def medir(self, sesion, operacion, metodo, url, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            resp = sesion.request(metodo, url, timeout=TIMEOUT_HTTP_S, **kwargs)
+            ok = resp.status_code < 400
+        except requests.RequestException:
+            resp, ok = None, False
+        self.registros.append((operacion, (time.perf_counter() - inicio) * 1000, ok))
+        return resp if ok else None
+
+    def resumen(self, duracion_s: float):
+        por_operacion = {}
+        for operacion, ms, ok in self.registros:
+            por_operacion.setdefault(operacion, []).append((ms, ok))
+        resultado = {}
+        for operacion, lista in sorted(por_operacion.items()):
+            tiempos = [ms for ms, _ in lista]
+            resultado[operacion] = {
+                "requests": len(lista),
+                "errores": sum(1 for _, ok in lista if not ok),
+                "rps": round(len(lista) / duracion_s, 2),
+                "p50_ms": round(percentil(tiempos, 50), 3),
+                "p95_ms": round(percentil(tiempos, 95), 3),
+                "p99_ms": round(percentil(tiempos, 99), 3),
+                "max_ms": round(max(tiempos), 3),
+            }
+        return resultado
+
+
+def correr_hilos(objetivos):
+    hilos = [threading.Thread(target=objetivo, daemon=True) for objetivo in objetivos]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+
+def leer_menu_y_mesas(url):
+    menu = [{"nombre": m['nombre'], "precio": float(m['precio'])} for m in requests.get(f"{url}/menu/items", timeout=TIMEOUT_HTTP_S).json()]
+    mesas = [m['numero'] for m in requests.get(f"{url}/mesas", timeout=TIMEOUT_HTTP_S).json()] + [99]
+    return menu, mesas
+
+
+# === ESCENARIO: hora_pico ===
+def escenario_hora_pico(url, args, mediciones):
+    menu, mesas = leer_menu_y_mesas(url)
+    cola = queue.Queue()
+    fin = time.monotonic() + args.duracion
+
+    def mesero(semilla):
+        rng = random.Random(semilla)
+        sesion = requests.Session()
+        while time.monotonic() < fin:
+            payload = {"mesa_numero": rng.choice(mesas), "items": [rng.choice(menu) for _ in range(rng.randint(1, 5))], "notas": "benchmark"}
+            resp = mediciones.medir(sesion, "POST /pedidos", "POST", f"{url}/pedidos", json=payload)
+            if resp is not None:
+                cola.put(resp.json()["id"])
+            time.sleep(args.pausa)
+
+    def cocinero():
+        sesion = requests.Session()
+        while time.monotonic() < fin:
+            try:
+                pedido_id = cola.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            for estado in ESTADOS_COCINA:
+                mediciones.medir(sesion, "PATCH /pedidos/{pedido_id}/estado", "PATCH", f"{url}/pedidos/{pedido_id}/estado", params={"estado": estado})
+
+    correr_hilos([lambda s=i: mesero(SEMILLA + s) for i in range(args.meseros)] + [cocinero] * args.cocineros)
+
+
+# === ESCENARIO: terminales ===
+# Antes de medir deja pedidos activos (Pendiente / En preparacion / Listo) para que la lista no esté vacía.
+def escenario_terminales(url, args, mediciones):
+    menu, mesas = leer_menu_y_mesas(url)
+    rng = random.Random(SEMILLA)
+    sesion = requests.Session()
+    for i in range(args.pedidos_activos):
+        resp = sesion.post(f"{url}/pedidos", json={"mesa_numero": rng.choice(mesas), "items": [rng.choice(menu)], "notas": "benchmark"}, timeout=TIMEOUT_HTTP_S)
+        if resp.ok and i % 3:
+            sesion.patch(f"{url}/pedidos/{resp.json()['id']}/estado", params={"estado": ESTADOS_COCINA[i % 3 - 1]}, timeout=TIMEOUT_HTTP_S)
+    fin = time.monotonic() + args.duracion
+
+    def terminal():
+        sesion = requests.Session()
+        while time.monotonic() < fin:
+            inicio = time.monotonic()
+            mediciones.medir(sesion, "GET /pedidos/activos", "GET", f"{url}/pedidos/activos")
+            mediciones.medir(sesion, "GET /mesas", "GET", f"{url}/mesas")
+            time.sleep(max(0.0, args.intervalo - (time.monotonic() - inicio)))
+
+    correr_hilos([terminal] * args.terminales)
+
+
+# === ESCENARIO: reportes ===
+def escenario_reportes(url, args, mediciones):
+    fin = time.monotonic() + args.duracion
+    hoy = datetime.now().date()
+
+    def cliente(semilla):
+        rng = random.Random(semilla)
+        sesion = requests.Session()
+        while time.monotonic() < fin:
+            desde = hoy - timedelta(days=rng.randint(7, DIAS_HISTORIA))
+            hasta = desde + timedelta(days=rng.choice((1, 7, 30)))
+            rango = {"start_date": desde.isoformat(), "end_date": hasta.isoformat()}
+            opcion = rng.randrange(4)
+            if opcion == 0:
+                mediciones.medir(sesion, "GET /reportes", "GET", f"{url}/reportes", params={"tipo": "Diario", **rango})
+            elif opcion == 1:
+                mediciones.medir(sesion, "GET /reportes/ventas_por_hora", "GET", f"{url}/reportes/ventas_por_hora", params={"fecha": desde.isoformat()})
+            elif opcion == 2:
+                mediciones.medir(sesion, "GET /reportes/eficiencia_cocina", "GET", f"{url}/reportes/eficiencia_cocina", params={"tipo": "Diario", **rango})
+            else:
+                mediciones.medir(sesion, "GET /analisis/productos", "GET", f"{url}/analisis/productos", params=rango)
+
+    correr_hilos([lambda s=i: cliente(SEMILLA + s) for i in range(args.clientes_reportes)])
+
+
+# === ESCENARIO: concurrencia ===
+# Muchos clientes a la vez sin pausa: mide cuánto aguanta un worker cuando la base espera.
+# Cada cliente alterna lecturas con pedidos propios que lleva hasta Entregado.
+def escenario_concurrencia(url, args, mediciones):
+    menu, mesas = leer_menu_y_mesas(url)
+    fin = time.monotonic() + args.duracion
+
+    def cliente(semilla):
+        rng = random.Random(semilla)
+        sesion = requests.Session()
+        pendientes = []
+        while time.monotonic() < fin:
+            opcion = rng.random()
+            if opcion < 0.3:
+                mediciones.medir(sesion, "GET /pedidos/activos", "GET", f"{url}/pedidos/activos")
+            elif opcion < 0.55:
+                mediciones.medir(sesion, "GET /mesas", "GET", f"{url}/mesas")
+            elif opcion < 0.7:
+                mediciones.medir(sesion, "GET /menu/items", "GET", f"{url}/menu/items")
+            elif opcion < 0.85 or not pendientes:
+                payload = {"mesa_numero": rng.choice(mesas), "items": [rng.choice(menu) for _ in range(rng.randint(1, 4))], "notas": "benchmark"}
+                resp = mediciones.medir(sesion, "POST /pedidos", "POST", f"{url}/pedidos", json=payload)
+                if resp is not None:
+                    pendientes.append([resp.json()["id"], 0])
+            else:
+                pedido = pendientes[0]
+                mediciones.medir(sesion, "PATCH /pedidos/{pedido_id}/estado", "PATCH", f"{url}/pedidos/{pedido[0]}/estado", params={"estado": ESTADOS_COCINA[pedido[1]]})
+                pedido[1] += 1
+                if pedido[1] == len(ESTADOS_COCINA):
+                    pendientes.pop(0)
+
+    correr_hilos([lambda s=i: cliente(SEMILLA + s) for i in range(args.clientes_concurrentes)])
+
+
+FUNCIONES_ESCENARIOS = {
+    "hora_pico": escenario_hora_pico,
+    "terminales": escenario_terminales,
+    "reportes": escenario_reportes,
+    "concurrencia": escenario_concurrencia,
+}
+
+
+def correr_escenarios(url, escenarios, args):
+    resultado = {}
+    for escenario in escenarios:
+        print(f"   Corriendo {escenario} durante {args.duracion:.0f} s...")
+        mediciones = Mediciones()
+        inicio = time.monotonic()
+        FUNCIONES_ESCENARIOS[escenario](url, args, mediciones)
+        duracion = time.monotonic() - inicio
+        resultado[escenario] = {"duracion_s": round(duracion, 2), "operaciones": mediciones.resumen(duracion)}
+    return resultado
+
+
+# === FUNCIÓN: comparar_con_base ===
+# Imprime las diferencias por operación y devuelve la lista de regresiones.
+def comparar_con_base(resultado, base, tolerancia):
+    regresiones = []
+    print(f"--- COMPARACIÓN CONTRA LÍNEA BASE ({base.get('fecha', '?')}) ---")
+    for escenario, datos in resultado["escenarios"].items():
+        anteriores = base.get("escenarios", {}).get(escenario, {}).get("operaciones", {})
+        for operacion, actual in datos["operaciones"].items():
+            anterior = anteriores.get(operacion)
+            if not anterior:
+                continue
+            delta_p95 = (actual["p95_ms"] - anterior["p95_ms"]) / anterior["p95_ms"] if anterior["p95_ms"] else 0.0
+            delta_rps = (actual["rps"] - anterior["rps"]) / anterior["rps"] if anterior["rps"] else 0.0
+            marca = ""
+            if delta_p95 > tolerancia or delta_rps < -tolerancia:
+                marca = "  ❌ REGRESIÓN"
+                regresiones.append(f"{escenario} / {operacion}")
+            print(f"   {escenario:<11} {operacion:<36} p95 {anterior['p95_ms']:>9.2f} → {actual['p95_ms']:>9.2f} ms ({delta_p95:+.0%}) | "
+                  f"rps {anterior['rps']:>8.2f} → {actual['rps']:>8.2f} ({delta_rps:+.0%}){marca}")
+    return regresiones
+
+
+def guardar_resultado(resultado, salida=None, prefijo="benchmark"):
+    salida = salida or os.path.join(DIRECTORIO_RESULTADOS, f"{prefijo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultado guardado en: {salida}")
+
+
+def imprimir_resultado(resultado):
+    for escenario, datos in resultado["escenarios"].items():
+        print(f"--- {escenario.upper()} ({datos['duracion_s']:.0f} s) ---")
+        print(f"   {'OPERACIÓN':<36} {'N':>7} {'ERR':>5} {'RPS':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+        for operacion, o in datos["operaciones"].items():
+            print(f"   {operacion:<36} {o['requests']:>7} {o['errores']:>5} {o['rps']:>8.2f} "
+                  f"{o['p50_ms']:>9.2f} {o['p95_ms']:>9.2f} {o['p99_ms']:>9.2f} {o['max_ms']:>9.2f}")
+
+
+def nuevo_resultado(url, args):
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "url": url,
+        "base": None if args.url else args.base,
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("guardar", "comparar")},
+        "escenarios": {},
+    }
+
+
+# === FUNCIÓN: comparar_drivers ===
+# --comparar-async: los mismos escenarios con las rutas calientes por el threadpool (antes) y por el
+# pool async (después). Cada variante arranca su backend y sin pedidos de corridas anteriores.
+def comparar_drivers(args, escenarios):
+    resultados = {}
+    for variante, valor in VARIANTES_DRIVER:
+        cerrados = cerrar_pedidos_benchmark(args.base)
+        print(f"--- VARIANTE {variante.upper()} (RESTAURANTIA_DB_ASYNC={valor}, {cerrados} pedidos previos cerrados) ---")
+        proceso, url = levantar_backend(args.base, args.puerto, {"RESTAURANTIA_DB_ASYNC": valor})
+        try:
+            resultados[variante] = nuevo_resultado(url, args)
+            resultados[variante]["escenarios"] = correr_escenarios(url, escenarios, args)
+        finally:
+            proceso.terminate()
+            proceso.wait(timeout=10)
+        imprimir_resultado(resultados[variante])
+    regresiones = comparar_con_base(resultados["async"], resultados["threadpool"], args.tolerancia)
+    return resultados, regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de carga del backend contra PostgreSQL local")
+    parser.add_argument("--base", default=BASE_BENCHMARK, help=f"Base de datos del benchmark (por defecto {BASE_BENCHMARK})")
+    parser.add_argument("--preparar", action="store_true", help="(Re)crear la base, aplicar SqlPRO.sql y sembrar datos")
+    parser.add_argument("--pedidos-historicos", type=int, default=PEDIDOS_HISTORICOS, help="Pedidos históricos a sembrar con --preparar")
+    parser.add_argument("--escala", type=float, help="Con --preparar: historial de generar_historial.py a esta escala (1, 10, 100) en vez de --pedidos-historicos")
+    parser.add_argument("--url", help="Usar un backend ya levantado en vez de iniciar uno")
+    parser.add_argument("--puerto", type=int, default=PUERTO, help="Puerto del backend que se levanta")
+    parser.add_argument("--escenarios", default=",".join(ESCENARIOS), help=f"Lista separada por comas ({', '.join(ESCENARIOS)})")
+    parser.add_argument("--duracion", type=float, default=30, help="Segundos por escenario")
+    parser.add_argument("--meseros", type=int, default=20, help="hora_pico: meseros creando pedidos en paralelo")
+    parser.add_argument("--cocineros", type=int, default=4, help="hora_pico: cocineros avanzando estados")
+    parser.add_argument("--pausa", type=float, default=0.1, help="hora_pico: pausa de cada mesero entre pedidos (s)")
+    parser.add_argument("--terminales", type=int, default=50, help="terminales: cantidad de terminales")
+    parser.add_argument("--intervalo", type=float, default=1.0, help="terminales: segundos entre consultas de cada terminal")
+    parser.add_argument("--pedidos-activos", type=int, default=60, help="terminales: pedidos activos antes de medir")
+    parser.add_argument("--clientes-reportes", type=int, default=4, help="reportes: clientes pidiendo reportes")
+    parser.add_argument("--clientes-concurrentes", type=int, default=200, help="concurrencia: clientes simultáneos sin pausa")
+    parser.add_argument("--comparar-async", action="store_true", help="Correr con las rutas calientes por el threadpool y por el pool async, y comparar")
+    parser.add_argument("--guardar", help="Archivo JSON de salida (por defecto resultados_benchmark/benchmark_<fecha>.json)")
+    parser.add_argument("--comparar", help="Resultado JSON anterior a usar como línea base")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento relativo admitido al comparar (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    escenarios = [e.strip() for e in args.escenarios.split(",") if e.strip()]
+    desconocidos = set(escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        raise SystemExit(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+    if args.comparar_async and args.url:
+        raise SystemExit("--comparar-async levanta sus propios backends: no se combina con --url")
+    if args.comparar_async and importlib.util.find_spec("asyncpg") is None:
+        raise SystemExit("--comparar-async necesita asyncpg instalado (pip install -r requirements.txt)")
+
+    print(f"--- BENCHMARK DE CARGA → {args.url or args.base} ---")
+    if args.preparar and not args.url:
+        preparar_base(args.base)
+        sembrar_datos(args.base, 0 if args.escala else args.pedidos_historicos)
+        if args.escala:
+            filas, segundos = generar_historial.generar(dsn_base(args.base), args.escala, DIAS_HISTORIA, SEMILLA)
+            print(f"   Historial {args.escala:g}x generado: {sum(filas.values()):,} filas en {segundos:.1f} s")
+
+    if args.comparar_async:
+        resultados, regresiones = comparar_drivers(args, escenarios)
+        guardar_resultado(resultados, args.guardar, "drivers")
+        if regresiones:
+            print(f"--- {len(regresiones)} REGRESIONES DEL POOL ASYNC (tolerancia {args.tolerancia:.0%}) ---")
+            sys.exit(1)
+        print("--- SIN REGRESIONES DEL POOL ASYNC ---")
+        return
+
+    proceso = None
+    url = args.url
+    if not url:
+        proceso, url = levantar_backend(args.base, args.puerto)
+    try:
+        resultado = nuevo_resultado(url, args)
+        resultado["escenarios"] = correr_escenarios(url, escenarios, args)
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait(timeout=10)
+
+    imprimir_resultado(resultado)
+    guardar_resultado(resultado, args.guardar)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar_con_base(resultado, base, args.tolerancia)
+        if regresiones:
+            print(f"--- {len(regresiones)} REGRESIONES (tolerancia {args.tolerancia:.0%}) ---")
+            sys.exit(1)
+        print("--- SIN REGRESIONES ---")
+
+
+if __name__ == "__main__":
+    main()
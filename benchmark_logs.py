@@ -0,0 +1,112 @@
+# === BENCHMARK_LOGS.PY ===
+# Compara la latencia de POST /pedidos con la configuración de logs anterior (handlers sincrónicos,
+# nivel DEBUG) y con la actual (QueueHandler + QueueListener, nivel INFO).
+# - Llama al endpoint en proceso con TestClient, contra la base real.
+# - Usa un ítem de menú sin receta para no tocar el inventario, y al terminar borra los pedidos creados.
+# - La consola de los logs se descarta (os.devnull) salvo con --consola.
+#
+# Uso (con PostgreSQL levantado y la base restaurant_db creada):
+#   python benchmark_logs.py [--pedidos 500] [--consola]
+
+import argparse
+import json
+import os
+import sys
+import statistics
+import tempfile
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from fastapi.testclient import TestClient
+
+from backend import app, DATABASE_URL
+from configuracion_logs import configurar_logs
+
+ITEM_BENCHMARK = "Benchmark Logs (sin receta)"
+CALENTAMIENTO = 20
+
+MODOS = {
+    "anterior_sincrono_debug": {"nivel": "DEBUG", "en_cola": False},
+    "cola_debug": {"nivel": "DEBUG", "en_cola": True},
+    "cola_info": {"nivel": "INFO", "en_cola": True},
+}
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+# === FUNCIÓN: medir_modo ===
+def medir_modo(cliente, cantidad, pedidos_creados):
+    payload = {"mesa_numero": 99, "items": [{"nombre": ITEM_BENCHMARK, "precio": 1.0}], "notas": "benchmark logs"}
+    tiempos = []
+    for i in range(CALENTAMIENTO + cantidad):
+        inicio = time.perf_counter()
+        resp = cliente.post("/pedidos", json=payload)
+        duracion = (time.perf_counter() - inicio) * 1000
+        if resp.status_code != 200:
+            raise SystemExit(f"POST /pedidos devolvió {resp.status_code}: {resp.text}")
+        pedidos_creados.append(resp.json()["id"])
+        if i >= CALENTAMIENTO:
+            tiempos.append(duracion)
+    return {
+        "pedidos": cantidad,
+        "p50_ms": round(statistics.median(tiempos), 3),
+        "p95_ms": round(percentil(tiempos, 95), 3),
+        "p99_ms": round(percentil(tiempos, 99), 3),
+        "max_ms": round(max(tiempos), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="p99 de POST /pedidos con y sin logs en cola")
+    parser.add_argument("--pedidos", type=int, default=500, help="Pedidos medidos por modo")
+    parser.add_argument("--consola", action="store_true", help="Escribir los logs de consola en la terminal")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO menu (nombre, precio, tipo) VALUES (%s, 1.0, 'Benchmark')
+            ON CONFLICT (nombre) DO NOTHING RETURNING id;
+        """, (ITEM_BENCHMARK,))
+        item_creado = cursor.fetchone() is not None
+    conn.commit()
+
+    directorio_logs = tempfile.mkdtemp(prefix="benchmark_logs_")
+    stderr_original = sys.stderr
+    pedidos_creados = []
+    resultados = {}
+    try:
+        cliente = TestClient(app)
+        for nombre, modo in MODOS.items():
+            if not args.consola:
+                sys.stderr = open(os.devnull, "w", encoding="utf-8")
+            configurar_logs(directorio=directorio_logs, nivel=modo["nivel"], en_cola=modo["en_cola"])
+            try:
+                resultados[nombre] = medir_modo(cliente, args.pedidos, pedidos_creados)
+            finally:
+                if sys.stderr is not stderr_original:
+                    sys.stderr.close()
+                    sys.stderr = stderr_original
+    finally:
+        configurar_logs(directorio=directorio_logs)
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM pedidos WHERE id = ANY(%s);", (pedidos_creados,))
+            if item_creado:
+                cursor.execute("DELETE FROM menu WHERE nombre = %s;", (ITEM_BENCHMARK,))
+        conn.commit()
+        conn.close()
+
+    print(json.dumps(resultados, indent=2))
+    base = resultados["anterior_sincrono_debug"]["p99_ms"]
+    actual = resultados["cola_info"]["p99_ms"]
+    print(f"p99 POST /pedidos → anterior {base:.2f} ms | actual {actual:.2f} ms ({(actual - base) / base * 100:+.1f}%)")
+    print(f"Logs del benchmark en: {directorio_logs}")
+
+
+if __name__ == "__main__":
+    main()
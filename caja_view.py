@@ -1,5 +1,6 @@
 # caja_view.py
 import flet as ft
+from planificador_frames import marcar_actualizacion
 from typing import List, Dict, Any
 
 def crear_vista_caja(backend_service, on_update_ui, page):
@@ -122,7 +123,7 @@ def crear_vista_caja(backend_service, on_update_ui, page):
                     item = crear_item_pedido_lista(pedido, backend_service, on_update_ui, page)
                     if item:
                         lista_cuentas.controls.append(item)
-            page.update()
+            marcar_actualizacion(page, lista_cuentas)
         except Exception as e:
             print(f"Error al cargar pedidos en vista de caja: {e}")
 
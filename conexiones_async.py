@@ -0,0 +1,178 @@
+# === CONEXIONES_ASYNC.PY ===
+# Pool async de PostgreSQL (asyncpg) para las rutas calientes del backend: POST /pedidos,
+# GET /pedidos/activos, GET /mesas, GET /menu/items y PATCH /pedidos/{pedido_id}/estado.
+# - Esas rutas son 'async def' y esperan a la base sin ocupar un hilo del threadpool ni bloquear el
+#   loop. El resto de los endpoints sigue siendo 'def' con psycopg2 en el threadpool de FastAPI.
+# - Las conexiones se reutilizan: no se abre una por request. Si el pool está lleno se espera hasta
+#   POOL_ESPERA_S y después se responde 503.
+# - ConexionAsyncMedida suma cada sentencia a las métricas del request (registro_accesos.py), igual que
+#   CursorMedido, y pasa las lentas a consultas_lentas.py con sus parámetros y el DSN, para que el
+#   muestreo les tome el plan (PREPARE + EXPLAIN EXECUTE).
+# - json/jsonb se decodifican a listas y dicts, como con psycopg2.
+# Sin asyncpg instalado, o con RESTAURANTIA_DB_ASYNC=0, el backend registra las versiones sync de esas
+# rutas (es el "antes" de benchmark_carga.py --comparar-async).
+#
+# Variables de entorno:
+#   RESTAURANTIA_DB_ASYNC        0 = rutas calientes por el threadpool con psycopg2 (por defecto 1)
+#   RESTAURANTIA_POOL_MIN        conexiones que el pool mantiene abiertas (por defecto 2)
+#   RESTAURANTIA_POOL_MAX        tope de conexiones del pool (por defecto 20)
+#   RESTAURANTIA_POOL_ESPERA_S   espera máxima por una conexión libre (por defecto 10)
+
+import os
+import json
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from psycopg2.extensions import parse_dsn
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+from consultas_lentas import consultas_lentas
+from metricas import db_conexiones_en_uso, db_conexiones_total, db_espera_conexion, db_pool_async
+from registro_accesos import metricas_actuales
+
+log = logging.getLogger("RestaurantIA.conexiones_async")
+
+POOL_MIN = int(os.environ.get("RESTAURANTIA_POOL_MIN", "2"))
+POOL_MAX = int(os.environ.get("RESTAURANTIA_POOL_MAX", "20"))
+POOL_ESPERA_S = float(os.environ.get("RESTAURANTIA_POOL_ESPERA_S", "10"))
+DB_ASYNC_ACTIVO = asyncpg is not None and os.environ.get("RESTAURANTIA_DB_ASYNC", "1").lower() not in ("0", "false", "no")
+
+# Parámetros del DSN de libpq que entiende asyncpg.connect (con su nombre)
+_PARAMETROS_DSN = {"host": "host", "port": "port", "user": "user", "password": "password", "dbname": "database", "sslmode": "ssl"}
+
+
+def decimal(valor) -> Decimal:
+    """asyncpg pide Decimal (no float) para los parámetros numeric."""
+    return valor if isinstance(valor, Decimal) else Decimal(str(valor))
+
+
+def parametros_conexion(dsn: str) -> Dict:
+    parametros = {}
+    for clave, valor in parse_dsn(dsn).items():
+        if clave in _PARAMETROS_DSN:
+            parametros[_PARAMETROS_DSN[clave]] = int(valor) if clave == "port" else valor
+        else:
+            log.warning("Parámetro '%s' del DSN ignorado por el pool async", clave)
+    return parametros
+
+
+async def _configurar_conexion(conn):
+    for tipo in ("json", "jsonb"):
+        await conn.set_type_codec(tipo, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class ConexionAsyncMedida:
+    """Conexión del pool con la misma medición que CursorMedido (sentencias, tiempo SQL, lentas)."""
+    __slots__ = ("conn", "dsn")
+
+    def __init__(self, conn, dsn: Optional[str] = None):
+        self.conn = conn
+        self.dsn = dsn  # Para el EXPLAIN de las sentencias lentas (consultas_lentas.py)
+
+    async def _medir(self, metodo, consulta: str, *args):
+        inicio = time.perf_counter()
+        try:
+            return await metodo(consulta, *args)
+        finally:
+            duracion_s = time.perf_counter() - inicio
+            metricas = metricas_actuales()
+            if metricas is not None:
+                metricas.sql_sentencias += 1
+                metricas.sql_s += duracion_s
+            if duracion_s >= consultas_lentas.umbral_s:
+                consultas_lentas.registrar(consulta, duracion_s, self.dsn, metricas.path if metricas else None, parametros=args)
+
+    async def fetch(self, consulta: str, *args):
+        return await self._medir(self.conn.fetch, consulta, *args)
+
+    async def fetchrow(self, consulta: str, *args):
+        return await self._medir(self.conn.fetchrow, consulta, *args)
+
+    async def fetchval(self, consulta: str, *args):
+        return await self._medir(self.conn.fetchval, consulta, *args)
+
+    async def execute(self, consulta: str, *args):
+        return await self._medir(self.conn.execute, consulta, *args)
+
+    def transaction(self):
+        return self.conn.transaction()
+
+
+class PoolAsync:
+    def __init__(self):
+        self._pool = None
+        self._dsn: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    # === MÉTODO: iniciar ===
+    # Se llama al arrancar la app. Si la base no responde, el pool se crea con el primer request.
+    async def iniciar(self, dsn: str):
+        self._dsn = dsn
+        try:
+            await self._asegurar()
+            log.info("Pool async listo → %s-%s conexiones (espera máx. %ss)", POOL_MIN, POOL_MAX, POOL_ESPERA_S)
+        except Exception as e:
+            log.error(f"No se pudo crear el pool async al arrancar (se reintenta con el primer request): {e}")
+
+    async def _asegurar(self):
+        if self._pool is not None:
+            return self._pool
+        async with self._lock:
+            if self._pool is None:
+                self._pool = await asyncpg.create_pool(
+                    min_size=POOL_MIN, max_size=POOL_MAX, init=_configurar_conexion, **parametros_conexion(self._dsn)
+                )
+        return self._pool
+
+    async def cerrar(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+            log.info("Pool async cerrado")
+
+    # === MÉTODO: conexion ===
+    # Toma una conexión del pool y registra la espera como abrir_conexion (métricas del request y /metrics).
+    @asynccontextmanager
+    async def conexion(self):
+        inicio = time.perf_counter()
+        try:
+            pool = await self._asegurar()
+            conn = await pool.acquire(timeout=POOL_ESPERA_S)
+        except asyncio.TimeoutError:
+            log.warning("Pool async sin conexiones libres tras %ss (%s en uso)", POOL_ESPERA_S, POOL_MAX)
+            raise HTTPException(status_code=503, detail="Base de datos saturada, intente de nuevo en unos segundos")
+        except (OSError, asyncpg.PostgresError) as e:
+            log.error(f"Pool async sin conexión a la base: {e}")
+            raise HTTPException(status_code=503, detail="Base de datos no disponible")
+        espera_s = time.perf_counter() - inicio
+        db_conexiones_en_uso.sumar(1)
+        db_conexiones_total.inc()
+        db_espera_conexion.observar(espera_s)
+        metricas = metricas_actuales()
+        if metricas is not None:
+            metricas.db_conexiones += 1
+            metricas.db_espera_s += espera_s
+        try:
+            yield ConexionAsyncMedida(conn, self._dsn)
+        finally:
+            db_conexiones_en_uso.sumar(-1)
+            await pool.release(conn)
+
+    def estado(self) -> Dict[tuple, float]:
+        if self._pool is None:
+            return {}
+        return {("abiertas",): self._pool.get_size(), ("libres",): self._pool.get_idle_size()}
+
+
+# Instancia compartida por el backend
+pool_async = PoolAsync()
+db_pool_async.funcion = pool_async.estado
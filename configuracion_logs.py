@@ -0,0 +1,181 @@
+# === CONFIGURACION_LOGS.PY ===
+# Configuración de logs compartida por el backend y el cliente.
+# - Los loggers solo tienen un QueueHandler: el request encola el registro y sigue.
+#   La consola y los archivos se escriben en el hilo de un QueueListener.
+# - Nivel por entorno: INFO en producción (por defecto), DEBUG en desarrollo.
+# - Niveles por módulo con RESTAURANTIA_LOG_NIVELES, p. ej. "respaldos=DEBUG,backend_service=WARNING".
+#   Los nombres sin punto son hijos de RestaurantIA (RestaurantIA.respaldos); con punto se usan tal cual
+#   (uvicorn.access=WARNING).
+# Variables de entorno:
+#   RESTAURANTIA_ENTORNO      produccion | desarrollo
+#   RESTAURANTIA_LOG_NIVEL    nivel base (pisa al del entorno)
+#   RESTAURANTIA_LOG_NIVELES  niveles por módulo
+# El log de accesos (RestaurantIA.accesos, ver registro_accesos.py) va solo a logs/accesos.jsonl,
+# una línea JSON por request; se apaga con RESTAURANTIA_LOG_NIVELES="accesos=WARNING".
+# En el código, los mensajes van con argumentos %s (log.debug("x → %s", valor)): si el nivel está
+# apagado no se formatea nada.
+
+import os
+import copy
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from pathlib import Path
+from typing import Dict, Optional
+
+NOMBRE_LOGGER = "RestaurantIA"
+NOMBRE_LOGGER_ACCESOS = f"{NOMBRE_LOGGER}.accesos"
+NIVEL_POR_ENTORNO = {"produccion": logging.INFO, "desarrollo": logging.DEBUG}
+
+FORMATO = "%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d | %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class ManejadorCola(QueueHandler):
+    """QueueHandler que solo resuelve el mensaje al encolar; fecha, formato y traceback
+    se formatean en el hilo del listener (mismo proceso, no hace falta serializar)."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class FiltroAccesos(logging.Filter):
+    """Separa el log de accesos del resto: solo_accesos=True lo deja pasar solo a él."""
+
+    def __init__(self, solo_accesos: bool):
+        super().__init__()
+        self.solo_accesos = solo_accesos
+
+    def filter(self, record):
+        return (record.name == NOMBRE_LOGGER_ACCESOS) == self.solo_accesos
+
+
+# === FUNCIÓN: niveles_por_modulo ===
+# Parsea "modulo=NIVEL,otro.logger=NIVEL" a {nombre_logger: nivel}.
+def niveles_por_modulo(texto: str, raiz: str = NOMBRE_LOGGER) -> Dict[str, int]:
+    niveles = {}
+    for parte in (texto or "").split(","):
+        if "=" not in parte:
+            continue
+        modulo, nivel = (p.strip() for p in parte.split("=", 1))
+        if not modulo:
+            continue
+        nombre = modulo if "." in modulo or modulo == raiz else f"{raiz}.{modulo}"
+        niveles[nombre] = logging.getLevelName(nivel.upper()) if not nivel.isdigit() else int(nivel)
+    return {n: v for n, v in niveles.items() if isinstance(v, int)}
+
+
+def _crear_handlers(directorio: Path, archivos: bool):
+    formatter = logging.Formatter(fmt=FORMATO, datefmt="%Y-%m-%d %H:%M:%S")
+    sin_accesos = FiltroAccesos(solo_accesos=False)
+    handlers = []
+
+    # === HANDLER 1: Consola (con colores si está colorlog) ===
+    consola = logging.StreamHandler()
+    try:
+        from colorlog import ColoredFormatter
+        consola.setFormatter(ColoredFormatter(
+            "%(log_color)s" + FORMATO,
+            datefmt="%H:%M:%S",
+            log_colors={
+                'DEBUG':    'cyan',
+                'INFO':     'green',
+                'WARNING':  'yellow',
+                'ERROR':    'red',
+                'CRITICAL': 'red,bg_white',
+            }
+        ))
+    except ImportError:
+        consola.setFormatter(formatter)
+    consola.setLevel(logging.DEBUG)  # Deciden los niveles de los loggers (base y por módulo)
+    consola.addFilter(sin_accesos)
+    handlers.append(consola)
+
+    if archivos:
+        directorio.mkdir(exist_ok=True)
+        # === HANDLER 2: Archivo general (rotación diaria, guarda 30 días) ===
+        diario = TimedRotatingFileHandler(directorio / "restaurantia.log", when="midnight", interval=1, backupCount=30, encoding="utf-8")
+        diario.setFormatter(formatter)
+        diario.setLevel(logging.INFO)
+        diario.addFilter(sin_accesos)
+        handlers.append(diario)
+
+        # === HANDLER 3: Archivo solo de errores (rotación por tamaño, máx 5MB cada uno) ===
+        errores = RotatingFileHandler(directorio / "errores_criticos.log", maxBytes=5_000_000, backupCount=10, encoding="utf-8")
+        errores.setFormatter(formatter)
+        errores.setLevel(logging.WARNING)
+        errores.addFilter(sin_accesos)
+        handlers.append(errores)
+
+        # === HANDLER 4: Log de accesos, una línea JSON por request (rotación diaria, guarda 14 días) ===
+        accesos = TimedRotatingFileHandler(directorio / "accesos.jsonl", when="midnight", interval=1, backupCount=14, encoding="utf-8")
+        accesos.setFormatter(logging.Formatter("%(message)s"))
+        accesos.setLevel(logging.INFO)
+        accesos.addFilter(FiltroAccesos(solo_accesos=True))
+        handlers.append(accesos)
+    return handlers
+
+
+# === FUNCIÓN: configurar_logs ===
+# Configura (o reconfigura) el logger RestaurantIA. Con en_cola=False los handlers escriben en el
+# hilo que loguea, como antes (solo para comparar en benchmark_logs.py).
+def configurar_logs(
+    directorio: str = "logs",
+    entorno: Optional[str] = None,
+    nivel: Optional[str] = None,
+    niveles: Optional[str] = None,
+    archivos: bool = True,
+    en_cola: bool = True,
+) -> logging.Logger:
+    global _listener
+    entorno = (entorno or os.environ.get("RESTAURANTIA_ENTORNO", "produccion")).lower()
+    nivel = nivel or os.environ.get("RESTAURANTIA_LOG_NIVEL")
+    nivel_base = logging.getLevelName(nivel.upper()) if nivel else NIVEL_POR_ENTORNO.get(entorno, logging.INFO)
+    if not isinstance(nivel_base, int):
+        nivel_base = logging.INFO
+
+    log = logging.getLogger(NOMBRE_LOGGER)
+    # Evitar duplicados si ya tiene handlers (importante en hot-reload de uvicorn)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+        handler.close()
+    log.setLevel(nivel_base)
+    log.propagate = False
+
+    handlers = _crear_handlers(Path(directorio), archivos)
+    if en_cola:
+        cola = queue.SimpleQueue()
+        log.addHandler(ManejadorCola(cola))
+        _listener = QueueListener(cola, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            log.addHandler(handler)
+
+    # Los accesos se registran aunque el nivel base sea WARNING (salvo que se pise por módulo)
+    logging.getLogger(NOMBRE_LOGGER_ACCESOS).setLevel(logging.INFO)
+    for nombre, nivel_modulo in niveles_por_modulo(niveles if niveles is not None else os.environ.get("RESTAURANTIA_LOG_NIVELES", "")).items():
+        logging.getLogger(nombre).setLevel(nivel_modulo)
+    return log
+
+
+# === FUNCIÓN: detener_logs ===
+# Vacía la cola y detiene el hilo del listener (se llama solo al salir del proceso).
+def detener_logs():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(detener_logs)
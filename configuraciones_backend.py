@@ -1,14 +1,18 @@
 from fastapi import FastAPI, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List
+import os
 import psycopg2
-from psycopg2.extras import RealDictCursor
 import json
+from inventario_backend import aplicar_movimientos_inventario, MovimientoInventario
+from disponibilidad_menu import disponibilidad_menu
+from registro_accesos import MiddlewareAccesos, abrir_conexion
+from perfiles import instalar_perfiles
 
-DATABASE_URL = "dbname=restaurant_db user=postgres password=postgres host=localhost port=5432"
+DATABASE_URL = os.environ.get("RESTAURANTIA_DATABASE_URL", "dbname=restaurant_db user=postgres password=postgres host=localhost port=5432")
 
 def get_db():
-    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    conn = abrir_conexion(DATABASE_URL)
     try:
         yield conn
     finally:
@@ -32,6 +36,8 @@ class ConfiguracionResponse(BaseModel):
 
 # NUEVA SUB-APP PARA CONFIGURACIONES
 configuraciones_app = FastAPI(title="Configuraciones API")
+configuraciones_app.add_middleware(MiddlewareAccesos)  # No duplica líneas si ya la mide la app principal
+instalar_perfiles(configuraciones_app, prefijo="/configuraciones")
 
 @configuraciones_app.get("/", response_model=List[ConfiguracionResponse])
 def obtener_configuraciones(conn = Depends(get_db)):
@@ -111,17 +117,18 @@ def aplicar_configuracion(config_id: int, conn = Depends(get_db)):
 
             ingredientes = json.loads(config['ingredientes'])
 
-            # Agregar ingredientes al inventario
-            for ing in ingredientes:
-                cursor.execute("""
-                    INSERT INTO inventario (nombre, cantidad_disponible, unidad_medida)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (nombre) DO UPDATE SET
-                        cantidad_disponible = inventario.cantidad_disponible + %s
-                """, (ing['nombre'], ing['cantidad'], ing['unidad'], ing['cantidad']))
+            # Agregar todos los ingredientes al inventario en una sola sentencia
+            resultado = aplicar_movimientos_inventario(cursor, [
+                MovimientoInventario(nombre=ing['nombre'], cantidad=ing['cantidad'], unidad_medida=ing['unidad'])
+                for ing in ingredientes
+            ], motivo="configuracion")
 
             conn.commit()
-            return {"status": "ok", "message": "Configuración aplicada"}
+            disponibilidad_menu.aplicar_stock({f["id"]: f["cantidad_disponible"] for f in resultado["items"]})
+            return {"status": "ok", "message": "Configuración aplicada", "alertas": resultado["alertas"]}
+        except HTTPException:
+            conn.rollback()
+            raise
         except Exception as e:
             conn.rollback()  # ✅ REVERTIR CAMBIOS EN CASO DE ERROR
             print(f"Error en aplicar_configuracion: {e}")  # ✅ IMPRIMIR ERROR
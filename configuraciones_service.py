@@ -66,17 +66,18 @@ class ConfiguracionesService:
         if not config:
             return {"status": "error", "message": "Configuración no encontrada"}
 
-        # ✅ APLICAR INGREDIENTES AL INVENTARIO
+        # ✅ APLICAR INGREDIENTES AL INVENTARIO (una sola petición POST /inventario/bulk)
         if self.inventario_service:
-            for ing in config["ingredientes"]:
-                try:
-                    # ✅ AGREGAR INGREDIENTE AL INVENTARIO
-                    self.inventario_service.agregar_item_inventario(
-                        nombre=ing["nombre"],
-                        cantidad=ing["cantidad"],
-                        unidad=ing["unidad"]
-                    )
-                except Exception as e:
-                    print(f"Error al agregar ingrediente {ing['nombre']}: {e}")
+            try:
+                resultado = self.inventario_service.aplicar_movimientos_bulk([{
+                    "nombre": ing["nombre"],
+                    "cantidad": ing["cantidad"],
+                    "unidad_medida": ing["unidad"],
+                    "cantidad_minima_alerta": ing.get("umbral_alerta")
+                } for ing in config["ingredientes"]])
+            except Exception as e:
+                print(f"Error al aplicar ingredientes de la configuración {config_id}: {e}")
+                return {"status": "error", "message": str(e)}
+            return {"status": "ok", "message": "Configuración aplicada", "alertas": resultado.get("alertas", [])}
 
         return {"status": "ok", "message": "Configuración aplicada"}
\ No newline at end of file
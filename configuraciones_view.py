@@ -1,6 +1,11 @@
 # configuraciones_view.py
 import flet as ft
+import threading
+import time
 from typing import List, Dict, Any
+from planificador_frames import marcar_actualizacion
+
+INTERVALO_CONSULTA_RESPALDO_S = 1.0
 
 def crear_vista_configuraciones(config_service, inventory_service, backend_service, on_update_ui, page):  # ✅ AGREGAR INVENTORY_SERVICE Y BACKEND_SERVICE
     # Campos de entrada
@@ -56,21 +61,14 @@ def crear_vista_configuraciones(config_service, inventory_service, backend_servi
             if not config:
                 return
 
-            # ✅ APLICAR INGREDIENTES AL INVENTARIO DIRECTAMENTE
-            for ing in config["ingredientes"]:
-                try:
-                    # ✅ AGREGAR INGREDIENTE AL INVENTARIO
-                    # Ahora pasamos el umbral personalizado del ingrediente de la configuración
-                    inventory_service.agregar_item_inventario(
-                        nombre=ing["nombre"], # El nombre ya debería estar capitalizado
-                        cantidad=ing["cantidad"],
-                        unidad=ing["unidad"],
-                        # --- PASAR EL UMBRAL DEL INGREDIENTE DE LA CONFIGURACIÓN ---
-                        cantidad_minima_alerta=ing.get("umbral_alerta", 5.0) # Usar get para evitar KeyError si no existe
-                        # --- FIN PASAR EL UMBRAL ---
-                    )
-                except Exception as e:
-                    print(f"Error al agregar ingrediente {ing['nombre']}: {e}")
+            # ✅ APLICAR TODOS LOS INGREDIENTES AL INVENTARIO EN UNA SOLA PETICIÓN
+            # Se pasa el umbral personalizado del ingrediente de la configuración
+            inventory_service.aplicar_movimientos_bulk([{
+                "nombre": ing["nombre"],
+                "cantidad": ing["cantidad"],
+                "unidad_medida": ing["unidad"],
+                "cantidad_minima_alerta": ing.get("umbral_alerta", 5.0) # Usar get para evitar KeyError si no existe
+            } for ing in config["ingredientes"]])
 
             on_update_ui()
         except Exception as ex:
@@ -238,26 +236,52 @@ def crear_vista_configuraciones(config_service, inventory_service, backend_servi
             print(f"Error al cargar configuraciones: {e}")
 
     # --- NUEVA FUNCIÓN: crear_respaldo_click ---
+    # El backend responde al instante con el id del trabajo; el avance se consulta en un hilo aparte.
+    estado_respaldo = ft.Text("", size=12, color=ft.Colors.GREY_400)
+    boton_respaldo = ft.ElevatedButton(
+        "Crear Respaldo Ahora",
+        icon=ft.Icons.SAVE,
+        on_click=lambda e: crear_respaldo_click(e),
+        style=ft.ButtonStyle(bgcolor=ft.Colors.BLUE_700, color=ft.Colors.WHITE)
+    )
+
+    def mostrar_aviso(texto: str, color):
+        page.snack_bar = ft.SnackBar(ft.Text(texto), bgcolor=color)
+        page.snack_bar.open = True
+        marcar_actualizacion(page)
+
+    def seguir_respaldo(trabajo_id: str):
+        while True:
+            time.sleep(INTERVALO_CONSULTA_RESPALDO_S)
+            try:
+                trabajo = backend_service.obtener_estado_respaldo(trabajo_id)
+            except Exception as ex:
+                estado_respaldo.value = f"No se pudo consultar el respaldo: {ex}"
+                break
+            if trabajo["estado"] in ("en_cola", "en_curso"):
+                estado_respaldo.value = f"Respaldo en curso... {trabajo['bytes_escritos'] / 1024 / 1024:.1f} MB escritos"
+                marcar_actualizacion(page, estado_respaldo)
+                continue
+            if trabajo["estado"] == "completado":
+                estado_respaldo.value = f"Último respaldo: {trabajo['archivo']} ({trabajo['bytes_escritos'] / 1024 / 1024:.1f} MB)"
+                mostrar_aviso(f"Respaldo creado con éxito en: {trabajo['archivo']}", ft.Colors.GREEN_700)
+            else:
+                estado_respaldo.value = f"El respaldo falló: {trabajo.get('error')}"
+                mostrar_aviso(f"Error al crear respaldo: {trabajo.get('error')}", ft.Colors.RED_700)
+            break
+        boton_respaldo.disabled = False
+        marcar_actualizacion(page, boton_respaldo, estado_respaldo)
+
     def crear_respaldo_click(e):
         try:
-            # Mostrar indicador de carga (opcional, o deshabilitar botón)
-            
-            respuesta = backend_service.crear_respaldo()
-            
-            if respuesta.get("status") == "ok":
-                ruta = respuesta.get("file_path", "")
-                page.snack_bar = ft.SnackBar(ft.Text(f"Respaldo creado con éxito en: {ruta}"), bgcolor=ft.Colors.GREEN_700)
-            else:
-                detalle = respuesta.get("message", "Error desconocido")
-                page.snack_bar = ft.SnackBar(ft.Text(f"Error al crear respaldo: {detalle}"), bgcolor=ft.Colors.RED_700)
-            
-            page.snack_bar.open = True
-            page.update()
+            trabajo = backend_service.crear_respaldo()
+            boton_respaldo.disabled = True
+            estado_respaldo.value = "Respaldo en cola..."
+            marcar_actualizacion(page, boton_respaldo, estado_respaldo)
+            threading.Thread(target=seguir_respaldo, args=(trabajo["id"],), daemon=True).start()
         except Exception as ex:
             print(f"Error al crear respaldo: {ex}")
-            page.snack_bar = ft.SnackBar(ft.Text(f"Error crítico al conectar: {ex}"), bgcolor=ft.Colors.RED_700)
-            page.snack_bar.open = True
-            page.update()
+            mostrar_aviso(f"Error crítico al conectar: {ex}", ft.Colors.RED_700)
     # --- FIN NUEVA FUNCIÓN ---
 
     # ✅ CARGAR CONFIGURACIONES AL INICIAR
@@ -304,13 +328,9 @@ def crear_vista_configuraciones(config_service, inventory_service, backend_servi
             ft.Container(
                 content=ft.Column([
                     ft.Text("Copia de Seguridad de la Base de Datos", size=16),
-                    ft.Text("Genera un archivo SQL con todos los datos actuales del sistema. Se guardará en la carpeta 'Backups_RestaurantPRO' en tu Escritorio.", size=12, color=ft.Colors.GREY_400),
-                    ft.ElevatedButton(
-                        "Crear Respaldo Ahora",
-                        icon=ft.Icons.SAVE,
-                        on_click=crear_respaldo_click,
-                        style=ft.ButtonStyle(bgcolor=ft.Colors.BLUE_700, color=ft.Colors.WHITE)
-                    )
+                    ft.Text("Genera un respaldo comprimido (.dump.gz) con todos los datos actuales del sistema. Se guardará en la carpeta 'Backups_RestaurantPRO' en tu Escritorio (se conservan los 14 más recientes).", size=12, color=ft.Colors.GREY_400),
+                    boton_respaldo,
+                    estado_respaldo
                 ]),
                 bgcolor=ft.Colors.BLUE_GREY_900,
                 padding=15,
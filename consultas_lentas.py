@@ -0,0 +1,194 @@
+# === CONSULTAS_LENTAS.PY ===
+# Registro de sentencias lentas, alimentado por CursorMedido (registro_accesos.py).
+# - Toda sentencia que supera el umbral se agrupa por huella: el SQL con los literales y parámetros
+#   reemplazados por '?' (así no se guardan valores de clientes ni de pedidos).
+# - A una fracción de las lentas (muestreo) se les corre EXPLAIN (ANALYZE, BUFFERS) en un hilo aparte,
+#   con su propia conexión y dentro de una transacción que se descarta. Solo SELECT/WITH de lectura:
+#   ANALYZE ejecuta la sentencia de verdad.
+# - Las sentencias del pool async (conexiones_async.py) llegan con marcadores $1, $2... y sus
+#   parámetros aparte: se preparan (PREPARE) y se explica el EXECUTE con esos valores. Los parámetros
+#   solo viajan en la cola hasta el EXPLAIN; no se guardan.
+# - Como mucho un EXPLAIN por huella cada INTERVALO_EXPLAIN_S, y una cola acotada: si el hilo está
+#   ocupado, la muestra se descarta.
+# Se consulta en GET /diagnostico/consultas_lentas.
+# Variables de entorno:
+#   RESTAURANTIA_CONSULTA_LENTA_MS   umbral en ms (por defecto 250)
+#   RESTAURANTIA_EXPLAIN_MUESTREO    fracción de lentas a las que se les toma el plan (por defecto 0.2)
+
+import os
+import re
+import queue
+import random
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import psycopg2
+from psycopg2.extras import Json
+
+log = logging.getLogger("RestaurantIA.consultas_lentas")
+
+UMBRAL_CONSULTA_LENTA_MS = float(os.environ.get("RESTAURANTIA_CONSULTA_LENTA_MS", "250"))
+MUESTREO_EXPLAIN = float(os.environ.get("RESTAURANTIA_EXPLAIN_MUESTREO", "0.2"))
+INTERVALO_EXPLAIN_S = 300
+TIMEOUT_EXPLAIN_MS = 30000
+PLANES_POR_HUELLA = 3
+MAX_HUELLAS = 200
+MAX_LARGO_CONSULTA = 4000
+
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_NUMEROS = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_MARCADORES = re.compile(r"%\((\w+)\)s|%s")
+_LISTAS = re.compile(r"\?(?:\s*,\s*\?)+")
+_ESPACIOS = re.compile(r"\s+")
+
+
+# === FUNCIÓN: huella_consulta ===
+# SQL normalizado: literales, números y marcadores → '?', listas '?, ?, ?' → '?...', espacios colapsados.
+def huella_consulta(consulta: str) -> str:
+    texto = _CADENAS.sub("?", consulta)
+    texto = _MARCADORES.sub("?", texto)
+    texto = _NUMEROS.sub("?", texto)
+    texto = _LISTAS.sub("?...", texto)
+    return _ESPACIOS.sub(" ", texto).strip().rstrip(";")
+
+
+def es_solo_lectura(huella: str) -> bool:
+    inicio = huella.lstrip("( ").upper()
+    if not (inicio.startswith("SELECT") or inicio.startswith("WITH")):
+        return False
+    return not re.search(r"\b(INSERT|UPDATE|DELETE|MERGE|FOR UPDATE|FOR SHARE|NEXTVAL|SETVAL|PG_ADVISORY)", inicio)
+
+
+class RegistroConsultasLentas:
+    def __init__(self, umbral_ms: float = UMBRAL_CONSULTA_LENTA_MS, muestreo: float = MUESTREO_EXPLAIN):
+        self.umbral_s = umbral_ms / 1000
+        self.muestreo = muestreo
+        self._lock = threading.Lock()
+        self._huellas: Dict[str, Dict] = {}
+        self._cola: "queue.Queue" = queue.Queue(maxsize=20)
+        self._hilo: Optional[threading.Thread] = None
+
+    # === MÉTODO: registrar ===
+    # Lo llama el cursor con el texto ya enviado a la base (cursor.query) si tardó más que el umbral.
+    # 'parametros' (solo el pool async) son los valores de $1, $2... de 'consulta_enviada'.
+    def registrar(self, consulta_enviada: bytes, duracion_s: float, dsn: Optional[str], path: Optional[str] = None,
+                  parametros: Optional[tuple] = None):
+        texto = consulta_enviada.decode("utf-8", "replace") if isinstance(consulta_enviada, bytes) else str(consulta_enviada)
+        huella = huella_consulta(texto)
+        clave = hashlib.sha1(huella.encode("utf-8")).hexdigest()[:12]
+        duracion_ms = duracion_s * 1000
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._huellas.get(clave)
+            if entrada is None:
+                if len(self._huellas) >= MAX_HUELLAS:
+                    vieja = min(self._huellas, key=lambda c: self._huellas[c]["_visto"])
+                    del self._huellas[vieja]
+                entrada = self._huellas[clave] = {
+                    "huella": clave,
+                    "consulta": huella[:MAX_LARGO_CONSULTA],
+                    "veces": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "planes": deque(maxlen=PLANES_POR_HUELLA),
+                    "_ultimo_explain": 0.0,
+                }
+            entrada["veces"] += 1
+            entrada["total_ms"] += duracion_ms
+            entrada["max_ms"] = max(entrada["max_ms"], duracion_ms)
+            entrada["ultimo_ms"] = round(duracion_ms, 3)
+            entrada["ultima_vez"] = datetime.now().isoformat(timespec="seconds")
+            entrada["ultimo_path"] = path
+            entrada["_visto"] = ahora
+            tomar_plan = (
+                dsn is not None
+                and ahora - entrada["_ultimo_explain"] >= INTERVALO_EXPLAIN_S
+                and random.random() < self.muestreo
+                and es_solo_lectura(huella)
+            )
+            if tomar_plan:
+                entrada["_ultimo_explain"] = ahora
+
+        log.info("Consulta lenta %s → %.1f ms | %s | %s", clave, duracion_ms, path or "-", huella[:200])
+        if tomar_plan:
+            try:
+                self._cola.put_nowait((clave, consulta_enviada, dsn, round(duracion_ms, 3), parametros))
+                self._asegurar_hilo()
+            except queue.Full:
+                with self._lock:
+                    entrada["_ultimo_explain"] = 0.0
+
+    def _asegurar_hilo(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._trabajar, name="explain-consultas-lentas", daemon=True)
+                self._hilo.start()
+
+    def _trabajar(self):
+        while True:
+            clave, consulta_enviada, dsn, duracion_ms, parametros = self._cola.get()
+            try:
+                plan = self._explicar(consulta_enviada, dsn, parametros)
+                with self._lock:
+                    entrada = self._huellas.get(clave)
+                    if entrada is not None:
+                        entrada["planes"].append({
+                            "ts": datetime.now().isoformat(timespec="seconds"),
+                            "duracion_ms": duracion_ms,
+                            "plan": plan,
+                        })
+            except Exception as e:
+                log.warning("No se pudo tomar el plan de %s → %s", clave, e)
+
+    # === MÉTODO: _explicar ===
+    # EXPLAIN (ANALYZE, BUFFERS) de la sentencia tal como se envió, en una transacción de solo lectura
+    # con timeout, que siempre se descarta. Con 'parametros' la sentencia trae $1, $2...: se prepara y
+    # se explica su EXECUTE con esos valores.
+    def _explicar(self, consulta_enviada: bytes, dsn: str, parametros: Optional[tuple] = None) -> str:
+        if isinstance(consulta_enviada, str):
+            consulta_enviada = consulta_enviada.encode("utf-8")
+        consulta_enviada = consulta_enviada.strip().rstrip(b";")
+        conn = psycopg2.connect(dsn)
+        try:
+            conn.set_session(readonly=True)
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s;", (TIMEOUT_EXPLAIN_MS,))
+                if parametros is None:
+                    cursor.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + consulta_enviada)
+                else:
+                    cursor.execute(b"PREPARE consulta_lenta AS " + consulta_enviada)
+                    valores = [Json(v) if isinstance(v, dict) else v for v in parametros]
+                    marcadores = f"({', '.join(['%s'] * len(valores))})" if valores else ""
+                    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) EXECUTE consulta_lenta{marcadores}", valores)
+                return "\n".join(fila[0] for fila in cursor.fetchall())
+        finally:
+            conn.rollback()
+            conn.close()
+
+    # === MÉTODO: listar ===
+    # Huellas ordenadas por 'total_ms', 'max_ms' o 'veces' (de mayor a menor).
+    def listar(self, orden: str = "total_ms", limite: int = 50) -> List[Dict]:
+        with self._lock:
+            filas = []
+            for entrada in self._huellas.values():
+                fila = {k: v for k, v in entrada.items() if not k.startswith("_")}
+                fila["planes"] = list(entrada["planes"])
+                fila["total_ms"] = round(entrada["total_ms"], 3)
+                fila["max_ms"] = round(entrada["max_ms"], 3)
+                fila["promedio_ms"] = round(entrada["total_ms"] / entrada["veces"], 3)
+                filas.append(fila)
+        filas.sort(key=lambda f: f.get(orden, 0), reverse=True)
+        return filas[:limite]
+
+    def limpiar(self):
+        with self._lock:
+            self._huellas.clear()
+
+
+# Instancia compartida por el backend y las sub-apps
+consultas_lentas = RegistroConsultasLentas()
@@ -0,0 +1,245 @@
+# === DISPONIBILIDAD_MENU.PY ===
+# Mapa en memoria de porciones preparables por plato: min(stock / cantidad_necesaria) sobre su receta.
+# Se mantiene incrementalmente:
+# - Los endpoints que cambian stock llaman a aplicar_stock() con las cantidades nuevas que ya tienen.
+# - Los cambios de recetas se marcan con recetas_cambiadas() y se recargan solo esos platos.
+# - sincronizar() usa la versión de inventario (sección 7 de SqlPRO.sql) para levantar cambios hechos
+#   por otros caminos (SQL manual, otro proceso) sin volver a leer todo el inventario. Cada
+#   INTERVALO_RECARGA_COMPLETA_S se hace igual una carga completa: una transacción lenta puede
+#   confirmar una versión menor a la ya vista y 'version > última' no la levantaría nunca.
+# Solo se recalculan los platos que usan un ingrediente que cambió.
+# Las retenciones de stock de pedidos en curso (retenciones_stock.py) se descuentan del stock libre.
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metricas import cache_consultas
+
+INTERVALO_SINCRONIZACION_S = 2.0
+INTERVALO_RECARGA_COMPLETA_S = 120.0
+
+
+class DisponibilidadMenu:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cargado = False
+        self.version = 0  # Última versión de inventario aplicada
+        self._ultima_sincronizacion = 0.0
+        self._ultima_carga = 0.0
+        self._stock: Dict[int, float] = {}
+        self._nombres: Dict[int, str] = {}
+        self._retenido: Dict[int, float] = {}  # ingrediente_id -> cantidad retenida por pedidos en curso
+        self._recetas: Dict[str, List[Tuple[int, float]]] = {}  # plato -> [(ingrediente_id, cantidad_necesaria)]
+        self._usos: Dict[int, set] = {}  # ingrediente_id -> platos que lo usan
+        self._porciones: Dict[str, int] = {}
+        self._recetas_pendientes: set = set()
+        self._recarga_completa = False
+
+    # === MÉTODO: cargar ===
+    # Carga completa: stock, recetas y mapa de porciones.
+    def cargar(self, cursor):
+        cursor.execute("""
+            SELECT GREATEST(
+                (SELECT COALESCE(MAX(version), 0) FROM inventario),
+                (SELECT COALESCE(MAX(version), 0) FROM inventario_eliminados)
+            ) AS version
+        """)
+        version = cursor.fetchone()['version']
+        cursor.execute("SELECT id, nombre, cantidad_disponible FROM inventario")
+        filas_inventario = cursor.fetchall()
+        stock = {row['id']: float(row['cantidad_disponible']) for row in filas_inventario}
+        nombres = {row['id']: row['nombre'] for row in filas_inventario}
+        cursor.execute("""
+            SELECT r.nombre_plato, ir.ingrediente_id, ir.cantidad_necesaria
+            FROM recetas r
+            JOIN ingredientes_recetas ir ON ir.receta_id = r.id
+        """)
+        recetas: Dict[str, List[Tuple[int, float]]] = {}
+        for row in cursor.fetchall():
+            recetas.setdefault(row['nombre_plato'], []).append((row['ingrediente_id'], float(row['cantidad_necesaria'])))
+
+        with self._lock:
+            self.version = version
+            self._stock = stock
+            self._nombres = nombres
+            self._recetas = {}
+            self._usos = {}
+            self._porciones = {}
+            for plato, ingredientes in recetas.items():
+                self._poner_receta(plato, ingredientes)
+            self._recetas_pendientes.clear()
+            self._recarga_completa = False
+            self._cargado = True
+            self._ultima_sincronizacion = self._ultima_carga = time.monotonic()
+
+    # === MÉTODO: sincronizar ===
+    # Aplica los cambios de inventario posteriores a la última versión y recarga las recetas marcadas.
+    def sincronizar(self, cursor, forzar: bool = False):
+        with self._lock:
+            if (not self._cargado or self._recarga_completa
+                    or time.monotonic() - self._ultima_carga >= INTERVALO_RECARGA_COMPLETA_S):
+                cargar = True
+            else:
+                cargar = False
+                if not forzar and time.monotonic() - self._ultima_sincronizacion < INTERVALO_SINCRONIZACION_S and not self._recetas_pendientes:
+                    cache_consultas.inc("disponibilidad_menu", "hit")
+                    return
+                version = self.version
+                pendientes = set(self._recetas_pendientes)
+        if cargar:
+            cache_consultas.inc("disponibilidad_menu", "miss")
+            self.cargar(cursor)
+            return
+        cache_consultas.inc("disponibilidad_menu", "incremental")
+
+        cursor.execute("""
+            SELECT id, nombre, cantidad_disponible, version FROM inventario WHERE version > %s
+        """, (version,))
+        cambios = cursor.fetchall()
+        cursor.execute("SELECT id, version FROM inventario_eliminados WHERE version > %s", (version,))
+        eliminados = cursor.fetchall()
+
+        recetas: Dict[str, List[Tuple[int, float]]] = {}
+        if pendientes:
+            cursor.execute("""
+                SELECT r.nombre_plato, ir.ingrediente_id, ir.cantidad_necesaria
+                FROM recetas r
+                JOIN ingredientes_recetas ir ON ir.receta_id = r.id
+                WHERE r.nombre_plato = ANY(%s)
+            """, (list(pendientes),))
+            for row in cursor.fetchall():
+                recetas.setdefault(row['nombre_plato'], []).append((row['ingrediente_id'], float(row['cantidad_necesaria'])))
+
+        with self._lock:
+            afectados = set()
+            for row in cambios:
+                self._stock[row['id']] = float(row['cantidad_disponible'])
+                self._nombres[row['id']] = row['nombre']
+                afectados |= self._usos.get(row['id'], set())
+            for row in eliminados:
+                self._stock.pop(row['id'], None)
+                self._nombres.pop(row['id'], None)
+                afectados |= self._usos.get(row['id'], set())
+            nueva_version = max([version] + [r['version'] for r in cambios] + [r['version'] for r in eliminados])
+            self.version = max(self.version, nueva_version)
+            for plato in pendientes:
+                self._poner_receta(plato, recetas.get(plato))
+                afectados.discard(plato)
+            self._recetas_pendientes -= pendientes
+            for plato in afectados:
+                self._recalcular(plato)
+            self._ultima_sincronizacion = time.monotonic()
+
+    # === MÉTODO: aplicar_stock ===
+    # Cambios de stock conocidos por quien escribió: {ingrediente_id: cantidad_disponible_nueva}.
+    def aplicar_stock(self, cantidades: Dict[int, float]):
+        with self._lock:
+            if not self._cargado:
+                return
+            afectados = set()
+            for ingrediente_id, cantidad in cantidades.items():
+                self._stock[ingrediente_id] = float(cantidad)
+                afectados |= self._usos.get(ingrediente_id, set())
+            for plato in afectados:
+                self._recalcular(plato)
+
+    # === MÉTODO: recetas_cambiadas ===
+    # Marca platos cuya receta cambió; se recargan en la próxima sincronización.
+    def recetas_cambiadas(self, platos: Optional[Iterable[str]] = None):
+        with self._lock:
+            if platos is None:
+                self._recarga_completa = True
+            else:
+                self._recetas_pendientes |= set(platos)
+
+    # === MÉTODO: necesidades ===
+    # Ingredientes que consumen {plato: cantidad} según las recetas en memoria.
+    def necesidades(self, platos: Dict[str, int]) -> Dict[int, float]:
+        with self._lock:
+            total: Dict[int, float] = {}
+            for plato, cantidad in platos.items():
+                for ingrediente_id, necesaria in self._recetas.get(plato, []):
+                    total[ingrediente_id] = total.get(ingrediente_id, 0.0) + necesaria * cantidad
+            return total
+
+    # === MÉTODO: retenido ===
+    # Copia de lo retenido por pedidos en curso {ingrediente_id: cantidad}; None si el mapa no está cargado.
+    def retenido(self) -> Optional[Dict[int, float]]:
+        with self._lock:
+            return dict(self._retenido) if self._cargado else None
+
+    # === MÉTODO: retener ===
+    # Cambia atómicamente una retención de 'previa' a 'nueva' si hay stock libre suficiente.
+    # Devuelve {} si se aplicó, o {nombre_ingrediente: (necesario, libre)} con lo que falta.
+    def retener(self, nueva: Dict[int, float], previa: Optional[Dict[int, float]] = None) -> Dict[str, Tuple[float, float]]:
+        previa = previa or {}
+        with self._lock:
+            faltantes = {}
+            for ingrediente_id, cantidad in nueva.items():
+                libre = self._stock.get(ingrediente_id, 0.0) - self._retenido.get(ingrediente_id, 0.0) + previa.get(ingrediente_id, 0.0)
+                if cantidad > libre + 1e-9:
+                    nombre = self._nombres.get(ingrediente_id, f"Ingrediente {ingrediente_id}")
+                    faltantes[nombre] = (round(cantidad, 2), round(max(libre, 0.0), 2))
+            if faltantes:
+                return faltantes
+            self._ajustar_retenido(nueva, previa)
+            return {}
+
+    # === MÉTODO: liberar ===
+    # Libera una retención; si el pedido se confirmó, 'stock' trae las cantidades nuevas ya descontadas.
+    def liberar(self, retenida: Dict[int, float], stock: Optional[Dict[int, float]] = None):
+        with self._lock:
+            if stock:
+                for ingrediente_id, cantidad in stock.items():
+                    self._stock[ingrediente_id] = float(cantidad)
+            self._ajustar_retenido({}, retenida, extra=set(stock or ()))
+
+    # === MÉTODO: mapa ===
+    # Copia del mapa {plato: porciones}. Los platos sin receta no figuran (no se controla su stock).
+    def mapa(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._porciones)
+
+    def _ajustar_retenido(self, nueva: Dict[int, float], previa: Dict[int, float], extra: Iterable[int] = ()):
+        afectados = set()
+        for ingrediente_id in set(nueva) | set(previa) | set(extra):
+            delta = nueva.get(ingrediente_id, 0.0) - previa.get(ingrediente_id, 0.0)
+            if delta:
+                restante = self._retenido.get(ingrediente_id, 0.0) + delta
+                if restante > 1e-9:
+                    self._retenido[ingrediente_id] = restante
+                else:
+                    self._retenido.pop(ingrediente_id, None)
+            afectados |= self._usos.get(ingrediente_id, set())
+        for plato in afectados:
+            self._recalcular(plato)
+
+    def _poner_receta(self, plato: str, ingredientes: Optional[List[Tuple[int, float]]]):
+        for ingrediente_id, _ in self._recetas.get(plato, []):
+            usos = self._usos.get(ingrediente_id)
+            if usos:
+                usos.discard(plato)
+        if not ingredientes:
+            self._recetas.pop(plato, None)
+            self._porciones.pop(plato, None)
+            return
+        self._recetas[plato] = ingredientes
+        for ingrediente_id, _ in ingredientes:
+            self._usos.setdefault(ingrediente_id, set()).add(plato)
+        self._recalcular(plato)
+
+    def _recalcular(self, plato: str):
+        ingredientes = self._recetas.get(plato)
+        if not ingredientes:
+            self._porciones.pop(plato, None)
+            return
+        self._porciones[plato] = max(0, min(
+            math.floor((self._stock.get(ingrediente_id, 0.0) - self._retenido.get(ingrediente_id, 0.0)) / cantidad + 1e-9) if cantidad > 0 else 0
+            for ingrediente_id, cantidad in ingredientes
+        ))
+
+
+# Instancia compartida por el backend y sus sub-apps (todas corren en el mismo proceso)
+disponibilidad_menu = DisponibilidadMenu()
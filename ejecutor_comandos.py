@@ -0,0 +1,104 @@
+# === EJECUTOR_COMANDOS.PY ===
+# Ejecuta las llamadas bloqueantes al backend fuera del hilo de eventos de Flet.
+# - Cada comando aplica primero su cambio optimista en la UI y luego corre la llamada en un pool de hilos.
+# - Si la llamada falla, se deshace el cambio optimista (rollback) y se avisa con al_fallar.
+# - Los comandos con la misma 'clave' (p. ej. el mismo pedido) se ejecutan en orden.
+# - solicitar_refresco() agrupa pedidos de refresco: N clics en ráfaga producen un solo refresco
+#   (más uno final si llegaron pedidos mientras corría).
+
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+log = logging.getLogger("RestaurantIA.ejecutor_comandos")
+
+
+class EjecutorComandos:
+    def __init__(self, max_workers: int = 4):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="comando")
+        self._lock = threading.Lock()
+        self._ultimo_por_clave: Dict[Any, Any] = {}
+        # Estado del refresco agrupado
+        self._refresco_en_curso = False
+        self._refresco_pendiente = False
+
+    # === MÉTODO: ejecutar ===
+    # Aplica 'optimista' en el hilo que llama y ejecuta 'accion' en el pool.
+    def ejecutar(
+        self,
+        nombre: str,
+        accion: Callable[[], Any],
+        optimista: Optional[Callable[[], None]] = None,
+        rollback: Optional[Callable[[], None]] = None,
+        al_terminar: Optional[Callable[[Any], None]] = None,
+        al_fallar: Optional[Callable[[Exception], None]] = None,
+        clave: Any = None,
+    ):
+        if optimista:
+            try:
+                optimista()
+            except Exception as e:
+                log.error(f"Error aplicando cambio optimista de '{nombre}': {e}")
+
+        with self._lock:
+            previo = self._ultimo_por_clave.get(clave) if clave is not None else None
+
+            def tarea():
+                # Mantener el orden de los comandos sobre el mismo recurso. El anterior ya está
+                # delante en la cola FIFO del pool, así que esta espera no puede bloquearse.
+                if previo is not None:
+                    try:
+                        previo.result()
+                    except Exception:
+                        pass
+                try:
+                    resultado = accion()
+                except Exception as e:
+                    log.error(f"Comando '{nombre}' falló: {e}")
+                    if rollback:
+                        try:
+                            rollback()
+                        except Exception as ex:
+                            log.error(f"Error en rollback de '{nombre}': {ex}")
+                    if al_fallar:
+                        al_fallar(e)
+                    raise
+                log.debug(f"Comando '{nombre}' completado")
+                if al_terminar:
+                    al_terminar(resultado)
+                return resultado
+
+            futuro = self.pool.submit(tarea)
+            if clave is not None:
+                self._ultimo_por_clave[clave] = futuro
+                futuro.add_done_callback(lambda f, c=clave: self._liberar_clave(c, f))
+        return futuro
+
+    def _liberar_clave(self, clave, futuro):
+        with self._lock:
+            if self._ultimo_por_clave.get(clave) is futuro:
+                del self._ultimo_por_clave[clave]
+
+    # === MÉTODO: solicitar_refresco ===
+    # Agrupa solicitudes de refresco: si ya hay uno corriendo, solo se marca como pendiente.
+    def solicitar_refresco(self, refrescar: Callable[[], None]):
+        with self._lock:
+            if self._refresco_en_curso:
+                self._refresco_pendiente = True
+                return
+            self._refresco_en_curso = True
+        self.pool.submit(self._bucle_refresco, refrescar)
+
+    def _bucle_refresco(self, refrescar: Callable[[], None]):
+        while True:
+            try:
+                refrescar()
+            except Exception as e:
+                log.error(f"Error en refresco agrupado de UI: {e}")
+            with self._lock:
+                if not self._refresco_pendiente:
+                    self._refresco_en_curso = False
+                    return
+                self._refresco_pendiente = False
+                log.debug("Refresco de UI agrupado: se ejecuta una vez más por solicitudes acumuladas")
@@ -0,0 +1,388 @@
+# === GENERAR_HISTORIAL.PY ===
+# Generador de historial sintético para probar el backend a 1x, 10x y 100x nuestro volumen.
+# - Pedidos pagados con curvas realistas: peso por hora (comida y cena) y por día de la semana, más
+#   ruido diario. Los ítems salen de 'menu' con una popularidad tipo Zipf; la cantidad depende de la
+#   capacidad de la mesa (mesa 99 = pedidos de la app, con numero_app correlativo).
+# - Tiempos de cocina (hora_inicio_cocina / hora_fin_cocina) que crecen con la carga de la hora y la
+#   cantidad de ítems.
+# - Consumo de inventario coherente con las recetas: un movimiento 'pedido' por ingrediente y pedido
+#   (igual que POST /pedidos) y una 'entrada' semanal que repone lo consumido. El stock actual no se toca:
+#   el historial es lo que llevó hasta él. Al final se crean checkpoints diarios (inventario_snapshots).
+# - Clientes, y reservas sin solapamiento (turnos de 2 h por mesa, se respetan las reservas existentes).
+# - Mesas físicas: 6 por cada 1x de escala.
+# La carga usa COPY en una sola transacción: un hilo genera bloques de texto y otro los envía, con
+# session_replication_role = replica (sin triggers de respaldo ni FKs; requiere superusuario, si no se
+# avisa y se carga igual, más lento). Pensado para bases nuevas, como la de benchmark_carga.py.
+#
+# Uso (con PostgreSQL levantado y SqlPRO.sql aplicado):
+#   python generar_historial.py --base restaurant_db_benchmark --escala 10
+#   python generar_historial.py --base restaurant_db_benchmark --escala 100 --dias 30 --sin-checkpoints
+#   python generar_historial.py --dsn "dbname=otra user=postgres host=localhost" --escala 1
+
+import argparse
+import io
+import json
+import math
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+DSN_SERVIDOR = "user=postgres password=postgres host=localhost port=5432"
+SEMILLA = 20260101
+DIAS_HISTORIA = 90
+
+# Volumen de referencia (1x)
+PEDIDOS_DIA = 150
+RESERVAS_DIA = 12
+CLIENTES = 2000
+MESAS_FISICAS = 6
+CAPACIDADES_MESAS = (2, 2, 4, 4, 6, 6)
+FRACCION_APP = 0.2  # Pedidos de la mesa virtual 99
+
+# Peso de cada hora del día y de cada día de la semana (0 = lunes)
+PESO_HORAS = {11: 1, 12: 3, 13: 7, 14: 9, 15: 6, 16: 2, 17: 1, 18: 2, 19: 5, 20: 8, 21: 7, 22: 3, 23: 1}
+PESO_DIAS = {0: 0.75, 1: 0.8, 2: 0.9, 3: 1.0, 4: 1.3, 5: 1.5, 6: 1.25}
+# Turnos de reserva (hora de inicio); cada reserva dura 90 min y empieza dentro de los primeros 30 del turno
+TURNOS_RESERVA = (13, 15, 19, 21)
+DURACION_RESERVA = timedelta(minutes=90)
+OCUPACION_MAXIMA_RESERVAS = 0.7
+
+NOTAS = ("Sin cebolla", "Para llevar", "Extra salsa", "Alergia a mariscos", "Sin picante", "Cubiertos extra")
+NOMBRES = ("Ana", "Luis", "María", "José", "Carmen", "Jorge", "Lucía", "Pedro", "Sofía", "Miguel", "Elena", "Diego")
+APELLIDOS = ("García", "López", "Martínez", "Hernández", "Pérez", "Sánchez", "Ramírez", "Torres", "Flores", "Díaz")
+
+FILAS_POR_BLOQUE = 100_000
+TABLAS_LOCK = ("clientes", "pedidos", "reservas", "inventario_movimientos")
+
+
+def dsn_base(base: str) -> str:
+    return f"dbname={base} {DSN_SERVIDOR}"
+
+
+def _texto(valor) -> str:
+    """Valor en formato texto de COPY (NULL = \\N)."""
+    if valor is None:
+        return "\\N"
+    return str(valor).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _linea(*valores) -> str:
+    return "\t".join(_texto(v) for v in valores) + "\n"
+
+
+class CargaCopy:
+    """Envía bloques de filas con COPY desde un hilo aparte mientras el hilo principal sigue generando."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.filas = {}
+        self.error = None
+        self._cola = queue.Queue(maxsize=4)
+        self._hilo = threading.Thread(target=self._trabajar, name="copy-historial", daemon=True)
+        self._hilo.start()
+
+    def enviar(self, tabla: str, columnas: tuple, lineas: list):
+        if self.error is not None:
+            raise self.error
+        if lineas:
+            self._cola.put((tabla, columnas, lineas))
+
+    def _trabajar(self):
+        with self.conn.cursor() as cursor:
+            while True:
+                tarea = self._cola.get()
+                if tarea is None:
+                    return
+                if self.error is not None:
+                    continue  # Se vacía la cola sin cargar: el principal se entera en el próximo enviar
+                tabla, columnas, lineas = tarea
+                try:
+                    cursor.copy_expert(f"COPY {tabla} ({', '.join(columnas)}) FROM STDIN", io.StringIO("".join(lineas)))
+                    self.filas[tabla] = self.filas.get(tabla, 0) + len(lineas)
+                except Exception as e:
+                    self.error = e
+
+    def cerrar(self):
+        self._cola.put(None)
+        self._hilo.join()
+        if self.error is not None:
+            raise self.error
+
+
+class Bloques:
+    """Junta líneas por tabla y las envía a CargaCopy cada FILAS_POR_BLOQUE."""
+
+    def __init__(self, carga: CargaCopy, tabla: str, columnas: tuple):
+        self.carga = carga
+        self.tabla = tabla
+        self.columnas = columnas
+        self.lineas = []
+
+    def agregar(self, linea: str):
+        self.lineas.append(linea)
+        if len(self.lineas) >= FILAS_POR_BLOQUE:
+            self.vaciar()
+
+    def vaciar(self):
+        self.carga.enviar(self.tabla, self.columnas, self.lineas)
+        self.lineas = []
+
+
+# === FUNCIÓN: reservar_ids ===
+# Bloque contiguo de ids de una secuencia serial (con la tabla bloqueada nadie más la avanza).
+def reservar_ids(cursor, tabla: str, cantidad: int) -> int:
+    if cantidad <= 0:
+        return 0
+    cursor.execute(f"SELECT nextval(pg_get_serial_sequence('{tabla}', 'id'));")
+    primero = cursor.fetchone()[0]
+    cursor.execute(f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), %s);", (primero + cantidad - 1,))
+    return primero
+
+
+# === FUNCIÓN: asegurar_mesas ===
+# Deja MESAS_FISICAS × escala mesas físicas (además de la 99) y devuelve [(numero, capacidad), ...].
+def asegurar_mesas(cursor, escala: float):
+    objetivo = max(MESAS_FISICAS, round(MESAS_FISICAS * escala))
+    numeros = [n for n in range(1, objetivo + 2) if n != 99][:objetivo]
+    filas = [(n, CAPACIDADES_MESAS[(n - 1) % len(CAPACIDADES_MESAS)]) for n in numeros]
+    cursor.execute("""
+        INSERT INTO mesas (numero, capacidad)
+        SELECT * FROM unnest(%s::int[], %s::int[])
+        ON CONFLICT (numero) DO NOTHING;
+    """, ([n for n, _ in filas], [c for _, c in filas]))
+    cursor.execute("SELECT numero, capacidad FROM mesas WHERE numero <> 99 ORDER BY numero;")
+    return cursor.fetchall()
+
+
+def leer_menu_y_recetas(cursor):
+    cursor.execute("SELECT nombre, precio FROM menu ORDER BY id;")
+    menu = [(nombre, float(precio)) for nombre, precio in cursor.fetchall()]
+    cursor.execute("""
+        SELECT r.nombre_plato, ir.ingrediente_id, ir.cantidad_necesaria
+        FROM recetas r
+        JOIN ingredientes_recetas ir ON ir.receta_id = r.id;
+    """)
+    recetas = {}
+    for plato, ingrediente_id, cantidad in cursor.fetchall():
+        recetas.setdefault(plato, []).append((ingrediente_id, float(cantidad)))
+    return menu, recetas
+
+
+# === FUNCIÓN: planificar_dias ===
+# Cantidad de pedidos y reservas de cada día, de más viejo a más nuevo (el último es ayer).
+def planificar_dias(rng, escala: float, dias: int):
+    hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    media = sum(PESO_DIAS.values()) / len(PESO_DIAS)
+    plan = []
+    for atras in range(dias, 0, -1):
+        fecha = hoy - timedelta(days=atras)
+        factor = PESO_DIAS[fecha.weekday()] / media * max(0.5, rng.gauss(1.0, 0.08))
+        plan.append((fecha, round(PEDIDOS_DIA * escala * factor), round(RESERVAS_DIA * escala * factor)))
+    return plan
+
+
+def turnos_ocupados(cursor, desde: datetime, hasta: datetime) -> set:
+    """(mesa, fecha, turno) que ya tienen una reserva solapada en la base."""
+    cursor.execute("""
+        SELECT mesa_numero, lower(periodo), upper(periodo) FROM reservas
+        WHERE periodo && tsrange(%s, %s);
+    """, (desde, hasta))
+    ocupados = set()
+    for mesa, inicio, fin in cursor.fetchall():
+        dia = inicio.replace(hour=0, minute=0, second=0, microsecond=0)
+        while dia < fin:
+            for turno, hora in enumerate(TURNOS_RESERVA):
+                inicio_turno = dia + timedelta(hours=hora)
+                if inicio < inicio_turno + timedelta(hours=2) and fin > inicio_turno:
+                    ocupados.add((mesa, dia.date(), turno))
+            dia += timedelta(days=1)
+    return ocupados
+
+
+# === FUNCIÓN: generar ===
+# Genera y carga el historial en la base 'dsn'. Devuelve {tabla: filas} y los segundos que tardó.
+def generar(dsn: str, escala: float = 1, dias: int = DIAS_HISTORIA, semilla: int = SEMILLA, checkpoints: bool = True):
+    rng = random.Random(semilla)
+    inicio = time.monotonic()
+    conn = psycopg2.connect(dsn)
+    try:
+        if conn.info.dbname == "restaurant_db":
+            raise SystemExit("El generador no se corre sobre restaurant_db: usa una base aparte")
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute("SET LOCAL session_replication_role = replica;")
+            except psycopg2.errors.InsufficientPrivilege:
+                conn.rollback()
+                print("   ⚠️ Sin permiso para session_replication_role: se cargará con triggers y FKs activos (más lento)")
+            for tabla in TABLAS_LOCK:
+                cursor.execute(f"LOCK TABLE {tabla} IN SHARE ROW EXCLUSIVE MODE;")
+
+            menu, recetas = leer_menu_y_recetas(cursor)
+            if not menu:
+                raise SystemExit("El menú está vacío: aplica SqlPRO.sql antes de generar")
+            mesas = asegurar_mesas(cursor, escala)
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM mesas WHERE numero = 99);")
+            hay_app = cursor.fetchone()[0]
+            cursor.execute("SELECT COALESCE(MAX(numero_app), 0) FROM pedidos WHERE mesa_numero = 99;")
+            numero_app = cursor.fetchone()[0]
+
+            plan = planificar_dias(rng, escala, dias)
+            desde, hasta = plan[0][0], plan[-1][0] + timedelta(days=1)
+            ocupados = turnos_ocupados(cursor, desde, hasta)
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM inventario_snapshots WHERE ts >= %s);", (desde,))
+            if cursor.fetchone()[0]:
+                print("   ⚠️ Ya hay checkpoints de inventario dentro del rango: su consumo acumulado no incluirá este historial")
+
+            total_clientes = round(CLIENTES * escala)
+            primer_cliente = reservar_ids(cursor, "clientes", total_clientes)
+            primer_pedido = reservar_ids(cursor, "pedidos", sum(p for _, p, _ in plan))
+
+            carga = CargaCopy(conn)
+            try:
+                clientes = Bloques(carga, "clientes", ("id", "nombre", "domicilio", "celular", "fecha_registro"))
+                for i in range(total_clientes):
+                    registro = desde - timedelta(days=rng.randint(0, 365)) + timedelta(seconds=rng.randint(0, 86399))
+                    domicilio = f"Calle {rng.choice(APELLIDOS)} #{rng.randint(1, 999)}" if rng.random() < 0.6 else None
+                    clientes.agregar(_linea(
+                        primer_cliente + i, f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {i}", domicilio,
+                        f"55{rng.randint(10000000, 99999999)}", registro,
+                    ))
+                clientes.vaciar()
+
+                numero_app = _generar_pedidos(carga, rng, plan, menu, recetas, mesas, hay_app, numero_app,
+                                              primer_pedido, primer_cliente, total_clientes)
+                _generar_reservas(carga, rng, plan, mesas, ocupados, primer_cliente, total_clientes)
+            finally:
+                carga.cerrar()
+        conn.commit()
+
+        if checkpoints:
+            with conn.cursor() as cursor:
+                for fecha, _, _ in plan[1:]:
+                    cursor.execute("SELECT crear_checkpoint_inventario(%s);", (fecha,))
+                cursor.execute("SELECT crear_checkpoint_inventario(%s);", (hasta,))
+            conn.commit()
+
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            for tabla in TABLAS_LOCK + ("mesas", "inventario_snapshots"):
+                cursor.execute(f"ANALYZE {tabla};")
+        return carga.filas, time.monotonic() - inicio
+    finally:
+        conn.close()
+
+
+def _generar_pedidos(carga, rng, plan, menu, recetas, mesas, hay_app, numero_app, primer_pedido, primer_cliente, total_clientes):
+    pedidos = Bloques(carga, "pedidos", (
+        "id", "mesa_numero", "cliente_id", "estado", "fecha_hora", "items", "numero_app", "notas",
+        "updated_at", "hora_inicio_cocina", "hora_fin_cocina",
+    ))
+    movimientos = Bloques(carga, "inventario_movimientos", ("ingrediente_id", "delta", "motivo", "pedido_id", "ts"))
+
+    # Popularidad tipo Zipf con un orden al azar de los platos
+    platos = list(range(len(menu)))
+    rng.shuffle(platos)
+    acumulado, pesos_platos = 0.0, []
+    for rango, _ in enumerate(platos, start=1):
+        acumulado += 1 / rango ** 0.8
+        pesos_platos.append(acumulado)
+    items_json = [_texto(json.dumps({"nombre": nombre, "precio": precio}, ensure_ascii=False)) for nombre, precio in menu]
+    consumo_plato = [recetas.get(nombre, []) for nombre, _ in menu]
+
+    horas = list(PESO_HORAS)
+    pesos_horas = list(PESO_HORAS.values())
+    carga_hora = {h: p / max(pesos_horas) for h, p in PESO_HORAS.items()}
+    consumo_semana = {}
+    pedido_id = primer_pedido
+
+    for fecha, cantidad, _ in plan:
+        if fecha.weekday() == 0 and consumo_semana:
+            # Entrada semanal que repone lo consumido la semana anterior
+            repuesto = fecha + timedelta(hours=8)
+            for ingrediente_id, consumido in sorted(consumo_semana.items()):
+                movimientos.agregar(f"{ingrediente_id}\t{math.ceil(consumido * 1.05):.2f}\tentrada\t\\N\t{repuesto}\n")
+            consumo_semana = {}
+
+        momentos = sorted(
+            fecha + timedelta(hours=hora, seconds=rng.randint(0, 3599))
+            for hora in rng.choices(horas, pesos_horas, k=cantidad)
+        )
+        for fecha_hora in momentos:
+            if hay_app and rng.random() < FRACCION_APP:
+                mesa, comensales = 99, rng.randint(1, 3)
+                numero_app += 1
+                app = numero_app
+                cliente = primer_cliente + rng.randrange(total_clientes) if total_clientes and rng.random() < 0.6 else None
+            else:
+                mesa, capacidad = rng.choice(mesas)
+                comensales, app = rng.randint(1, capacidad), None
+                cliente = primer_cliente + rng.randrange(total_clientes) if total_clientes and rng.random() < 0.15 else None
+            elegidos = rng.choices(platos, cum_weights=pesos_platos, k=max(1, comensales + rng.randint(-1, 2)))
+
+            inicio_cocina = fecha_hora + timedelta(minutes=rng.uniform(0.5, 2) + 4 * carga_hora[fecha_hora.hour])
+            fin_cocina = inicio_cocina + timedelta(minutes=min(60, 5 + 1.5 * len(elegidos) + rng.expovariate(1 / 3)))
+            pagado = fin_cocina + timedelta(minutes=rng.randint(15, 70))
+            nota = rng.choice(NOTAS) if rng.random() < 0.1 else ""
+            pedidos.agregar(
+                f"{pedido_id}\t{mesa}\t{_texto(cliente)}\tPagado\t{fecha_hora}\t[{', '.join(items_json[p] for p in elegidos)}]\t"
+                f"{_texto(app)}\t{nota}\t{pagado.replace(microsecond=0)}\t{inicio_cocina.replace(microsecond=0)}\t{fin_cocina.replace(microsecond=0)}\n"
+            )
+
+            consumo = {}
+            for p in elegidos:
+                for ingrediente_id, necesaria in consumo_plato[p]:
+                    consumo[ingrediente_id] = consumo.get(ingrediente_id, 0.0) + necesaria
+            for ingrediente_id, total in consumo.items():
+                movimientos.agregar(f"{ingrediente_id}\t{-total:.2f}\tpedido\t{pedido_id}\t{fecha_hora}\n")
+                consumo_semana[ingrediente_id] = consumo_semana.get(ingrediente_id, 0.0) + total
+            pedido_id += 1
+
+    pedidos.vaciar()
+    movimientos.vaciar()
+    return numero_app
+
+
+def _generar_reservas(carga, rng, plan, mesas, ocupados, primer_cliente, total_clientes):
+    if not total_clientes:
+        return
+    reservas = Bloques(carga, "reservas", ("mesa_numero", "cliente_id", "fecha_hora_inicio", "fecha_hora_fin", "created_at"))
+    for fecha, _, cantidad in plan:
+        libres = [
+            (mesa, turno) for mesa, _ in mesas for turno in range(len(TURNOS_RESERVA))
+            if (mesa, fecha.date(), turno) not in ocupados
+        ]
+        cantidad = min(cantidad, int(len(libres) * OCUPACION_MAXIMA_RESERVAS))
+        for mesa, turno in rng.sample(libres, cantidad):
+            inicio = fecha + timedelta(hours=TURNOS_RESERVA[turno], minutes=rng.choice((0, 15, 30)))
+            creada = inicio - timedelta(days=rng.randint(0, 14), minutes=rng.randint(30, 600))
+            reservas.agregar(_linea(mesa, primer_cliente + rng.randrange(total_clientes), inicio, inicio + DURACION_RESERVA, creada))
+    reservas.vaciar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera historial sintético (pedidos, consumo, clientes, reservas) y lo carga con COPY")
+    parser.add_argument("--base", default="restaurant_db_benchmark", help="Base de datos destino (por defecto restaurant_db_benchmark)")
+    parser.add_argument("--dsn", help="DSN completo (tiene prioridad sobre --base)")
+    parser.add_argument("--escala", type=float, default=1, help=f"Múltiplo del volumen de referencia ({PEDIDOS_DIA} pedidos/día): 1, 10, 100...")
+    parser.add_argument("--dias", type=int, default=DIAS_HISTORIA, help=f"Días de historia hasta ayer (por defecto {DIAS_HISTORIA})")
+    parser.add_argument("--semilla", type=int, default=SEMILLA, help="Semilla del generador (misma semilla = mismos datos)")
+    parser.add_argument("--sin-checkpoints", action="store_true", help="No crear checkpoints diarios de inventario")
+    args = parser.parse_args()
+    if args.escala <= 0 or args.dias <= 0:
+        raise SystemExit("--escala y --dias deben ser positivos")
+
+    dsn = args.dsn or dsn_base(args.base)
+    print(f"--- GENERANDO HISTORIAL {args.escala:g}x × {args.dias} días ---")
+    filas, segundos = generar(dsn, args.escala, args.dias, args.semilla, not args.sin_checkpoints)
+    total = sum(filas.values())
+    for tabla, cantidad in sorted(filas.items()):
+        print(f"   {tabla:<24} {cantidad:>12,} filas")
+    print(f"   {'TOTAL':<24} {total:>12,} filas en {segundos:.1f} s ({total / segundos * 60:,.0f} filas/min)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,25 @@
 # inventario_backend.py
 # Backend API para gestionar el inventario de ingredientes.
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from datetime import datetime, timedelta
+import os
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import execute_values
+from pronostico_inventario import pronostico_inventario
+from disponibilidad_menu import disponibilidad_menu
+from registro_accesos import MiddlewareAccesos, abrir_conexion
+from perfiles import instalar_perfiles
 # --- IMPORTAR LA EXCEPCIÓN DE INTEGRIDAD ---
 import psycopg2.errors
 # --- FIN IMPORTAR ---
 
-DATABASE_URL = "dbname=restaurant_db user=postgres password=postgres host=localhost port=5432"
+DATABASE_URL = os.environ.get("RESTAURANTIA_DATABASE_URL", "dbname=restaurant_db user=postgres password=postgres host=localhost port=5432")
 
 def get_db():
-    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    conn = abrir_conexion(DATABASE_URL)
     try:
         yield conn
     finally:
@@ -51,8 +57,37 @@ class InventarioResponse(BaseModel):
     fecha_registro: str
     fecha_actualizacion: str
 
+# --- MODELO: AlertasStockResponse ---
+# Respuesta de GET /alertas. Con 'since' solo trae lo que cambió desde esa versión.
+class AlertasStockResponse(BaseModel):
+    version: int # Versión actual del inventario; el cliente la manda como 'since' la próxima vez
+    completo: bool # True si 'items' es la lista completa de ítems en stock bajo
+    items: List[dict] # Ítems en stock bajo (completo) o ítems cambiados con su bandera 'en_alerta'
+    eliminados: List[int] # IDs eliminados desde 'since'
+
+# --- MODELO: MovimientoInventario ---
+# Un renglón de POST /bulk (p. ej. un ítem de una entrega de proveedor).
+class MovimientoInventario(BaseModel):
+    nombre: str
+    cantidad: float # Delta a sumar (modo "delta") o valor final (modo "absoluto")
+    unidad_medida: str = "unidad" # Solo se usa si el ítem se crea
+    cantidad_minima_alerta: Optional[float] = None # None = conservar el umbral actual (5.0 si se crea)
+
+# --- MODELO: InventarioBulkRequest ---
+class InventarioBulkRequest(BaseModel):
+    modo: str = "delta" # "delta" suma a lo disponible, "absoluto" fija la cantidad
+    motivo: Optional[str] = None # Motivo en el libro de movimientos (por defecto 'entrada' o 'ajuste' según el modo)
+    items: List[MovimientoInventario]
+
+# --- MODELO: InventarioBulkResponse ---
+class InventarioBulkResponse(BaseModel):
+    items: List[dict] # Filas afectadas, con 'creado' y 'en_alerta'
+    alertas: List[dict] # Subconjunto de 'items' que quedó en stock bajo
+
 # NUEVA API PARA INVENTARIO
 inventario_app = FastAPI(title="Inventory API")
+inventario_app.add_middleware(MiddlewareAccesos)  # No duplica líneas si ya la mide la app principal
+instalar_perfiles(inventario_app, prefijo="/inventario")
 
 @inventario_app.get("/", response_model=List[InventarioResponse])
 def obtener_inventario(conn: psycopg2.extensions.connection = Depends(get_db)):
@@ -78,6 +113,312 @@ def obtener_inventario(conn: psycopg2.extensions.connection = Depends(get_db)):
             })
         return items
 
+# --- ALERTAS DE STOCK INCREMENTALES ---
+# Sin 'since' devuelve solo los ítems en stock bajo (cantidad_disponible <= cantidad_minima_alerta,
+# índice parcial idx_inventario_stock_bajo, sección 7 de SqlPRO.sql). Con 'since' devuelve los ítems cuya versión cambió y los
+# eliminados, para que el cliente mantenga su estado de alertas sin bajar todo el inventario.
+@inventario_app.get("/alertas", response_model=AlertasStockResponse)
+def obtener_alertas_stock(since: Optional[int] = None, conn: psycopg2.extensions.connection = Depends(get_db)):
+    with conn.cursor() as cursor:
+        # La versión se lee ANTES que los ítems: si algo cambia entre ambas consultas,
+        # el cliente lo vuelve a recibir en el siguiente ciclo (aplicar un cambio dos veces es inocuo).
+        cursor.execute("""
+            SELECT GREATEST(
+                (SELECT COALESCE(MAX(version), 0) FROM inventario),
+                (SELECT COALESCE(MAX(version), 0) FROM inventario_eliminados)
+            ) AS version
+        """)
+        version_actual = cursor.fetchone()['version']
+
+        # Versión desconocida (p. ej. base restaurada) -> respuesta completa
+        if since is None or since > version_actual:
+            cursor.execute("""
+                SELECT id, nombre, cantidad_disponible, unidad_medida, cantidad_minima_alerta, TRUE AS en_alerta
+                FROM inventario
+                WHERE cantidad_disponible <= cantidad_minima_alerta
+                ORDER BY nombre
+            """)
+            items = cursor.fetchall()
+            eliminados = []
+            completo = True
+        else:
+            cursor.execute("""
+                SELECT id, nombre, cantidad_disponible, unidad_medida, cantidad_minima_alerta,
+                       (cantidad_disponible <= cantidad_minima_alerta) AS en_alerta
+                FROM inventario
+                WHERE version > %s
+                ORDER BY nombre
+            """, (since,))
+            items = cursor.fetchall()
+            cursor.execute("SELECT id FROM inventario_eliminados WHERE version > %s", (since,))
+            eliminados = [row['id'] for row in cursor.fetchall()]
+            completo = False
+
+        return {
+            "version": version_actual,
+            "completo": completo,
+            "items": [{
+                "id": row['id'],
+                "nombre": row['nombre'],
+                "cantidad_disponible": float(row['cantidad_disponible']),
+                "unidad_medida": row['unidad_medida'],
+                "cantidad_minima_alerta": float(row['cantidad_minima_alerta']),
+                "en_alerta": row['en_alerta']
+            } for row in items],
+            "eliminados": eliminados
+        }
+# --- FIN ALERTAS DE STOCK INCREMENTALES ---
+
+# --- LIBRO DE MOVIMIENTOS DE INVENTARIO ---
+# Todo cambio de stock se registra en inventario_movimientos (ver sección 8 de SqlPRO.sql).
+MOTIVOS_MOVIMIENTO = ("pedido", "entrada", "ajuste", "configuracion", "baja")
+# Los checkpoints se cortan un poco hacia atrás para no dejar afuera transacciones en curso
+MARGEN_CHECKPOINT = timedelta(minutes=1)
+
+def registrar_movimientos_inventario(cursor, movimientos) -> int:
+    """
+    Inserta en un solo INSERT los movimientos [(ingrediente_id, delta, motivo, pedido_id), ...].
+    Los deltas en cero se omiten. No hace commit.
+    """
+    filas = [m for m in movimientos if m[1]]
+    if not filas:
+        return 0
+    execute_values(cursor, """
+        INSERT INTO inventario_movimientos (ingrediente_id, delta, motivo, pedido_id)
+        VALUES %s
+    """, filas, page_size=len(filas))
+    return len(filas)
+
+def crear_checkpoint_inventario(cursor) -> int:
+    """Crea un checkpoint de stock y consumo acumulado de todos los ingredientes. No hace commit."""
+    cursor.execute("SELECT crear_checkpoint_inventario(%s) AS filas", (datetime.now() - MARGEN_CHECKPOINT,))
+    return cursor.fetchone()['filas']
+
+# Historial de movimientos (auditoría de mermas, ajustes y consumo por pedido)
+@inventario_app.get("/movimientos")
+def obtener_movimientos(
+    ingrediente_id: Optional[int] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    motivo: Optional[str] = None,
+    limite: int = Query(200, ge=1, le=5000),
+    conn: psycopg2.extensions.connection = Depends(get_db)
+):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT m.id, m.ingrediente_id, i.nombre, m.delta, m.motivo, m.pedido_id, m.ts
+            FROM inventario_movimientos m
+            LEFT JOIN inventario i ON i.id = m.ingrediente_id
+            WHERE (%(ingrediente_id)s::int IS NULL OR m.ingrediente_id = %(ingrediente_id)s)
+              AND (%(desde)s::timestamp IS NULL OR m.ts >= %(desde)s)
+              AND (%(hasta)s::timestamp IS NULL OR m.ts <= %(hasta)s)
+              AND (%(motivo)s::text IS NULL OR m.motivo = %(motivo)s)
+            ORDER BY m.ts DESC, m.id DESC
+            LIMIT %(limite)s
+        """, {"ingrediente_id": ingrediente_id, "desde": desde, "hasta": hasta, "motivo": motivo, "limite": limite})
+        return [{
+            "id": row['id'],
+            "ingrediente_id": row['ingrediente_id'],
+            "nombre": row['nombre'], # None si el ítem ya fue eliminado
+            "delta": float(row['delta']),
+            "motivo": row['motivo'],
+            "pedido_id": row['pedido_id'],
+            "ts": str(row['ts'])
+        } for row in cursor.fetchall()]
+
+# Stock de cada ingrediente en un instante pasado (checkpoint anterior + movimientos posteriores)
+@inventario_app.get("/stock_en")
+def obtener_stock_en(ts: datetime, ingrediente_id: Optional[int] = None, conn: psycopg2.extensions.connection = Depends(get_db)):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT i.id, i.nombre, i.unidad_medida, stock_inventario_en(i.id, %(ts)s) AS cantidad
+            FROM inventario i
+            WHERE (%(ingrediente_id)s::int IS NULL OR i.id = %(ingrediente_id)s)
+            ORDER BY i.nombre
+        """, {"ts": ts, "ingrediente_id": ingrediente_id})
+        return [{
+            "id": row['id'],
+            "nombre": row['nombre'],
+            "unidad_medida": row['unidad_medida'],
+            "cantidad": float(row['cantidad'])
+        } for row in cursor.fetchall()]
+
+# Consumo por pedidos de cada ingrediente en [desde, hasta]
+@inventario_app.get("/consumo")
+def obtener_consumo(desde: datetime, hasta: Optional[datetime] = None, ingrediente_id: Optional[int] = None, conn: psycopg2.extensions.connection = Depends(get_db)):
+    hasta = hasta or datetime.now()
+    if hasta < desde:
+        raise HTTPException(status_code=400, detail="'hasta' debe ser posterior a 'desde'.")
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT i.id, i.nombre, i.unidad_medida,
+                   consumo_inventario_hasta(i.id, %(hasta)s) - consumo_inventario_hasta(i.id, %(desde)s) AS consumo
+            FROM inventario i
+            WHERE (%(ingrediente_id)s::int IS NULL OR i.id = %(ingrediente_id)s)
+            ORDER BY consumo DESC, i.nombre
+        """, {"desde": desde, "hasta": hasta, "ingrediente_id": ingrediente_id})
+        return [{
+            "id": row['id'],
+            "nombre": row['nombre'],
+            "unidad_medida": row['unidad_medida'],
+            "consumo": float(row['consumo'])
+        } for row in cursor.fetchall()]
+
+# Fuerza un checkpoint (el backend principal también los crea periódicamente)
+@inventario_app.post("/movimientos/checkpoint")
+def forzar_checkpoint_inventario(conn: psycopg2.extensions.connection = Depends(get_db)):
+    with conn.cursor() as cursor:
+        filas = crear_checkpoint_inventario(cursor)
+        conn.commit()
+        return {"status": "ok", "ingredientes": filas}
+# --- FIN LIBRO DE MOVIMIENTOS DE INVENTARIO ---
+
+# --- PRONÓSTICO DE CONSUMO ---
+# Días de cobertura y reposición sugerida según el consumo real (pedidos × recetas),
+# no solo el umbral fijo cantidad_minima_alerta. El modelo se cachea en pronostico_inventario.
+@inventario_app.get("/pronostico")
+def obtener_pronostico(
+    horizonte_dias: int = Query(30, ge=1, le=120),
+    dias_entrega: int = Query(2, ge=0, le=60, description="Días que tarda en llegar un pedido al proveedor"),
+    dias_objetivo: int = Query(7, ge=1, le=60, description="Días de consumo que debe cubrir la reposición"),
+    z_servicio: float = Query(1.65, ge=0, le=4, description="Factor del stock de seguridad (1.65 ≈ 95%)"),
+    conn: psycopg2.extensions.connection = Depends(get_db)
+):
+    with conn.cursor() as cursor:
+        try:
+            return pronostico_inventario.calcular(cursor, horizonte_dias, dias_entrega, dias_objetivo, z_servicio)
+        except Exception as e:
+            print(f"Error en obtener_pronostico: {e}")
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail="Error interno del servidor al calcular el pronóstico.")
+# --- FIN PRONÓSTICO DE CONSUMO ---
+
+# --- CARGA DE INVENTARIO POR LOTES ---
+MODOS_BULK = ("delta", "absoluto")
+
+def aplicar_movimientos_inventario(cursor, items: List[MovimientoInventario], modo: str = "delta", motivo: Optional[str] = None) -> dict:
+    """
+    Aplica muchos movimientos de inventario en UNA sola sentencia (unnest + CTEs):
+    actualiza los ítems existentes por nombre, inserta los que no existen y registra los deltas
+    en inventario_movimientos. No hace commit. Devuelve {'items': [...], 'alertas': [...]}.
+    """
+    if modo not in MODOS_BULK:
+        raise HTTPException(status_code=400, detail=f"Modo no válido: {modo}. Use {' o '.join(MODOS_BULK)}.")
+    motivo = motivo or ("entrada" if modo == "delta" else "ajuste")
+    if motivo not in MOTIVOS_MOVIMIENTO:
+        raise HTTPException(status_code=400, detail=f"Motivo no válido: {motivo}. Use uno de: {', '.join(MOTIVOS_MOVIMIENTO)}.")
+
+    # Nombres repetidos en el mismo lote: en modo delta se suman, en modo absoluto gana el último
+    por_nombre = {}
+    for item in items:
+        previo = por_nombre.get(item.nombre)
+        if previo is not None and modo == "delta":
+            item = item.copy(update={
+                "cantidad": previo.cantidad + item.cantidad,
+                "cantidad_minima_alerta": item.cantidad_minima_alerta if item.cantidad_minima_alerta is not None else previo.cantidad_minima_alerta,
+            })
+        por_nombre[item.nombre] = item
+    lote = list(por_nombre.values())
+    if not lote:
+        return {"items": [], "alertas": []}
+
+    # Si otro lote crea a la vez el mismo ítem nuevo, el INSERT choca con UNIQUE (nombre): se reintenta
+    # una vez desde un savepoint y en el segundo intento el ítem ya figura en 'previos'.
+    for intento in range(2):
+        cursor.execute("SAVEPOINT movimientos_bulk")
+        try:
+            filas_db = _ejecutar_movimientos_bulk(cursor, lote, modo, motivo)
+            cursor.execute("RELEASE SAVEPOINT movimientos_bulk")
+            break
+        except psycopg2.errors.UniqueViolation:
+            cursor.execute("ROLLBACK TO SAVEPOINT movimientos_bulk")
+            if intento:
+                raise HTTPException(status_code=409, detail="Otro lote está creando los mismos ítems. Intente de nuevo.")
+    filas = [{
+        "id": row['id'],
+        "nombre": row['nombre'],
+        "cantidad_disponible": float(row['cantidad_disponible']),
+        "unidad_medida": row['unidad_medida'],
+        "cantidad_minima_alerta": float(row['cantidad_minima_alerta']),
+        "creado": row['creado'],
+        "en_alerta": row['en_alerta']
+    } for row in filas_db]
+    return {"items": filas, "alertas": [f for f in filas if f["en_alerta"]]}
+
+def _ejecutar_movimientos_bulk(cursor, lote: List[MovimientoInventario], modo: str, motivo: str) -> list:
+    cursor.execute("""
+        WITH datos AS (
+            SELECT * FROM unnest(%s::text[], %s::numeric[], %s::text[], %s::numeric[])
+                AS d(nombre, cantidad, unidad_medida, cantidad_minima_alerta)
+        ),
+        -- Valor previo bloqueado: el delta del libro es exacto aunque haya escrituras concurrentes
+        previos AS (
+            SELECT i.id, i.nombre, i.cantidad_disponible AS anterior
+            FROM inventario i
+            JOIN datos d ON d.nombre = i.nombre
+            FOR UPDATE OF i
+        ),
+        actualizados AS (
+            UPDATE inventario i
+            SET cantidad_disponible = CASE WHEN %s THEN d.cantidad ELSE p.anterior + d.cantidad END,
+                cantidad_minima_alerta = COALESCE(d.cantidad_minima_alerta, i.cantidad_minima_alerta),
+                fecha_actualizacion = CURRENT_TIMESTAMP
+            FROM datos d
+            JOIN previos p ON p.nombre = d.nombre
+            WHERE i.id = p.id
+            RETURNING i.id, i.nombre, i.cantidad_disponible, i.unidad_medida, i.cantidad_minima_alerta,
+                      FALSE AS creado, i.cantidad_disponible - p.anterior AS delta
+        ),
+        insertados AS (
+            INSERT INTO inventario (nombre, cantidad_disponible, unidad_medida, cantidad_minima_alerta)
+            SELECT d.nombre, d.cantidad, d.unidad_medida, COALESCE(d.cantidad_minima_alerta, 5.0)
+            FROM datos d
+            WHERE NOT EXISTS (SELECT 1 FROM previos p WHERE p.nombre = d.nombre)
+            RETURNING id, nombre, cantidad_disponible, unidad_medida, cantidad_minima_alerta,
+                      TRUE AS creado, cantidad_disponible AS delta
+        ),
+        afectados AS (
+            SELECT * FROM actualizados
+            UNION ALL
+            SELECT * FROM insertados
+        ),
+        movimientos AS (
+            INSERT INTO inventario_movimientos (ingrediente_id, delta, motivo)
+            SELECT id, delta, %s FROM afectados WHERE delta <> 0
+        )
+        SELECT id, nombre, cantidad_disponible, unidad_medida, cantidad_minima_alerta, creado,
+               (cantidad_disponible <= cantidad_minima_alerta) AS en_alerta
+        FROM afectados
+        ORDER BY nombre
+    """, (
+        [i.nombre for i in lote],
+        [i.cantidad for i in lote],
+        [i.unidad_medida for i in lote],
+        [i.cantidad_minima_alerta for i in lote],
+        modo == "absoluto",
+        motivo,
+    ))
+    return cursor.fetchall()
+
+# Recibe una entrega completa (o un conteo físico en modo "absoluto") en una sola petición.
+@inventario_app.post("/bulk", response_model=InventarioBulkResponse)
+def aplicar_inventario_bulk(lote: InventarioBulkRequest, conn: psycopg2.extensions.connection = Depends(get_db)):
+    with conn.cursor() as cursor:
+        try:
+            resultado = aplicar_movimientos_inventario(cursor, lote.items, lote.modo, lote.motivo)
+            conn.commit()
+            disponibilidad_menu.aplicar_stock({f["id"]: f["cantidad_disponible"] for f in resultado["items"]})
+            return resultado
+        except psycopg2.errors.CheckViolation as e:
+            conn.rollback()
+            # cantidad_disponible >= 0: un delta negativo dejaría stock negativo
+            raise HTTPException(status_code=400, detail=f"El lote dejaría cantidades inválidas (stock negativo): {str(e)}")
+        except HTTPException:
+            conn.rollback()
+            raise
+# --- FIN CARGA DE INVENTARIO POR LOTES ---
+
 @inventario_app.post("/", response_model=InventarioResponse)
 def agregar_item_inventario(item: InventarioItem, conn: psycopg2.extensions.connection = Depends(get_db)):
     with conn.cursor() as cursor:
@@ -99,7 +440,9 @@ def agregar_item_inventario(item: InventarioItem, conn: psycopg2.extensions.conn
             item.cantidad_disponible  # Valor para la suma en UPDATE de cantidad_disponible
         ))
         result = cursor.fetchone()
+        registrar_movimientos_inventario(cursor, [(result['id'], item.cantidad_disponible, "entrada", None)])
         conn.commit()
+        disponibilidad_menu.aplicar_stock({result['id']: result['cantidad_disponible']})
         return {
             "id": result['id'],
             "nombre": result['nombre'],
@@ -115,6 +458,11 @@ def agregar_item_inventario(item: InventarioItem, conn: psycopg2.extensions.conn
 @inventario_app.put("/{item_id}", response_model=InventarioResponse)
 def actualizar_item_inventario(item_id: int, update_data: InventarioUpdate, conn: psycopg2.extensions.connection = Depends(get_db)):
     with conn.cursor() as cursor:
+        # Valor previo (bloqueado) para registrar el ajuste como delta en el libro de movimientos
+        cursor.execute("SELECT cantidad_disponible FROM inventario WHERE id = %s FOR UPDATE", (item_id,))
+        previo = cursor.fetchone()
+        if not previo:
+            raise HTTPException(status_code=404, detail="Ítem no encontrado")
         # --- ACTUALIZAR CONSULTA: Incluir cantidad_minima_alerta en SET ---
         cursor.execute("""
             UPDATE inventario
@@ -125,7 +473,9 @@ def actualizar_item_inventario(item_id: int, update_data: InventarioUpdate, conn
         result = cursor.fetchone()
         if not result:
             raise HTTPException(status_code=404, detail="Ítem no encontrado")
+        registrar_movimientos_inventario(cursor, [(item_id, result['cantidad_disponible'] - previo['cantidad_disponible'], "ajuste", None)])
         conn.commit()
+        disponibilidad_menu.aplicar_stock({item_id: result['cantidad_disponible']})
         return {
             "id": result['id'],
             "nombre": result['nombre'],
@@ -143,9 +493,12 @@ def actualizar_item_inventario(item_id: int, update_data: InventarioUpdate, conn
 def eliminar_item_inventario(item_id: int, conn = Depends(get_db)):
     with conn.cursor() as cursor:
         try:
-            cursor.execute("DELETE FROM inventario WHERE id = %s", (item_id,))
-            if cursor.rowcount == 0:
+            cursor.execute("DELETE FROM inventario WHERE id = %s RETURNING cantidad_disponible", (item_id,))
+            eliminado = cursor.fetchone()
+            if not eliminado:
                 raise HTTPException(status_code=404, detail="Ítem no encontrado")
+            # El stock que quedaba sale del inventario como 'baja'
+            registrar_movimientos_inventario(cursor, [(item_id, -eliminado['cantidad_disponible'], "baja", None)])
             conn.commit()
             return {"status": "ok"}
         # Capturar la excepción específica de PostgreSQL por la restricción ON DELETE RESTRICT
@@ -2,7 +2,7 @@
 # Cliente HTTP para interactuar con la API de inventario del sistema de restaurante.
 
 import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class InventoryService:
     def __init__(self, base_url: str = "http://127.0.0.1:8000"):
@@ -16,6 +16,24 @@ class InventoryService:
         r.raise_for_status()
         return r.json() # El JSON devuelto por el backend ya incluye 'cantidad_minima_alerta'
 
+    # === MÉTODO: obtener_alertas_stock ===
+    # Obtiene solo los ítems en stock bajo (sin 'since') o los cambios desde una versión.
+    # Devuelve {'version', 'completo', 'items' (con 'en_alerta'), 'eliminados'}.
+    def obtener_alertas_stock(self, since: Optional[int] = None) -> Dict[str, Any]:
+        params = {"since": since} if since is not None else None
+        r = requests.get(f"{self.base_url}/inventario/alertas", params=params, timeout=10)
+        r.raise_for_status()
+        return r.json()
+
+    # === MÉTODO: obtener_pronostico ===
+    # Pronóstico de consumo por ingrediente: días de cobertura y cantidad sugerida de reposición.
+    # Devuelve {'generado', 'dias_historia', 'horizonte_dias', 'items': [...]}.
+    def obtener_pronostico(self, dias_entrega: int = 2, dias_objetivo: int = 7) -> Dict[str, Any]:
+        params = {"dias_entrega": dias_entrega, "dias_objetivo": dias_objetivo}
+        r = requests.get(f"{self.base_url}/inventario/pronostico", params=params, timeout=15)
+        r.raise_for_status()
+        return r.json()
+
     # === MÉTODO: agregar_item_inventario ===
     # Agrega un nuevo ítem al inventario en el backend o suma la cantidad si ya existe.
     # ✅ AHORA ACEPTA 'cantidad_minima_alerta' COMO PARÁMETRO.
@@ -34,6 +52,25 @@ class InventoryService:
         r.raise_for_status()
         return r.json() # El JSON devuelto por el backend ya incluye 'cantidad_minima_alerta'
 
+    # === MÉTODO: aplicar_movimientos_bulk ===
+    # Aplica muchos movimientos en una sola petición (POST /inventario/bulk).
+    # items: [{"nombre", "cantidad", "unidad_medida", "cantidad_minima_alerta" (opcional)}, ...]
+    # modo: "delta" suma las cantidades, "absoluto" las fija. Devuelve {'items', 'alertas'}.
+    def aplicar_movimientos_bulk(self, items: List[Dict[str, Any]], modo: str = "delta") -> Dict[str, Any]:
+        payload = {
+            "modo": modo,
+            "items": [{
+                # Mismo formato de nombre que agregar_item_inventario
+                "nombre": item["nombre"].strip().capitalize(),
+                "cantidad": item["cantidad"],
+                "unidad_medida": item.get("unidad_medida", "unidad"),
+                "cantidad_minima_alerta": item.get("cantidad_minima_alerta")
+            } for item in items]
+        }
+        r = requests.post(f"{self.base_url}/inventario/bulk", json=payload)
+        r.raise_for_status()
+        return r.json()
+
     # === MÉTODO: actualizar_item_inventario ===
     # Actualiza la cantidad, unidad y umbral de un ítem existente en el inventario.
     # ✅ AHORA ACEPTA 'cantidad_minima_alerta' COMO PARÁMETRO.
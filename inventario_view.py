@@ -1,5 +1,6 @@
 # inventario_view.py
 import flet as ft
+from planificador_frames import marcar_actualizacion
 from typing import List, Dict, Any
 import threading
 import time
@@ -78,6 +79,8 @@ def crear_vista_inventario(inventory_service, on_update_ui, page):
                 else:
                     alerta_umbral.visible = False # Ocultar si no hay alertas
                 # --- FIN VERIFICACIÓN ---
+                marcar_actualizacion(page, alerta_umbral)
+                time.sleep(5) # Antes no había pausa: el hilo pedía el inventario sin parar
                 
             except Exception as e:
                 print(f"Error en verificación periódica: {e}")
@@ -97,6 +100,12 @@ def crear_vista_inventario(inventory_service, on_update_ui, page):
         print("Actualizando lista de inventario...") # Mensaje de depuración
         try:
             items = inventory_service.obtener_inventario()
+            # Pronóstico de consumo (opcional: si falla, la lista se muestra igual sin cobertura)
+            try:
+                pronostico = {p['id']: p for p in inventory_service.obtener_pronostico()["items"]}
+            except Exception as e:
+                print(f"No se pudo obtener el pronóstico de inventario: {e}")
+                pronostico = {}
             
             # --- VERIFICAR ALERTAS DE INGREDIENTES BAJOS - USAR UMBRAL PERSONALIZADO ---
             # umbral_bajo = 5 # UMBRAL PARA AVISAR (PUEDES CAMBIAR ESTE VALOR) # <-- COMENTAR ESTA LINEA
@@ -202,6 +211,7 @@ def crear_vista_inventario(inventory_service, on_update_ui, page):
                         ft.Text(f"{item['nombre']}", size=18, weight=ft.FontWeight.BOLD),
                         ft.Text(f"Cantidad: {item['cantidad_disponible']} {item['unidad_medida']}", size=14),
                         ft.Text(f"Umbral Alerta: {item['cantidad_minima_alerta']}", size=14), # Mostrar umbral actual
+                        texto_pronostico(pronostico.get(item_id)),
                         ft.Text(f"Registrado: {item['fecha_registro']}", size=12, color=ft.Colors.GREY_500),
                         ft.Row([
                             nuevo_cantidad_input, # Campo de texto para nueva cantidad
@@ -215,11 +225,25 @@ def crear_vista_inventario(inventory_service, on_update_ui, page):
                     border_radius=10
                 )
                 lista_inventario.controls.append(item_row)
-            page.update()
+            marcar_actualizacion(page, lista_inventario, alerta_umbral)
         except Exception as e:
             print(f"Error al cargar inventario: {e}")
             alerta_umbral.visible = False # Asegurar que no se muestre alerta si hay error al cargar
-            page.update()
+            marcar_actualizacion(page, alerta_umbral)
+
+    # --- FUNCIÓN: texto_pronostico ---
+    # Línea con días de cobertura y reposición sugerida según el consumo real.
+    def texto_pronostico(p):
+        if not p or p['consumo_diario'] <= 0:
+            return ft.Text("Cobertura: sin consumo registrado", size=12, color=ft.Colors.GREY_500)
+        if p['dias_cobertura'] is None:
+            texto = "Cobertura: no se agota en los próximos 30 días"
+        else:
+            texto = f"Cobertura: {p['dias_cobertura']} días (se agota ~{p['fecha_agotamiento']})"
+        if p['reponer']:
+            texto += f" · Reponer: {p['cantidad_sugerida']} {p['unidad_medida']}"
+        color = ft.Colors.ORANGE_300 if p['reponer'] else ft.Colors.GREEN_300
+        return ft.Text(texto, size=12, color=color)
 
     # --- FUNCIÓN: actualizar_ingrediente_y_umbral ---
     # Actualiza la cantidad Y el umbral de un ingrediente específico.
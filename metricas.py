@@ -0,0 +1,233 @@
+# === METRICAS.PY ===
+# Métricas en memoria del proceso, expuestas en GET /metrics con el formato de texto de Prometheus
+# (0.0.4), para leerlas con curl o con un Prometheus local. Sin dependencias externas.
+# - Contador, Medidor e Histograma guardan un valor por combinación de etiquetas, bajo un lock propio:
+#   registrar un valor es un acceso a dict (y un bisect en los histogramas).
+# - Los medidores con 'funcion' se calculan recién al exponer (ratios, ventanas de tiempo).
+# Las métricas de la app están definidas al final, así cualquier módulo las usa sin importar backend.
+
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence, extra: Optional[Tuple[str, str]] = None) -> str:
+    pares = list(zip(nombres, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{n}="{_escapar(v)}"' for n, v in pares) + "}"
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._valores: Dict[tuple, object] = {}
+
+    def _lineas(self) -> Iterable[str]:
+        return ()
+
+    def exponer(self) -> str:
+        encabezado = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        return "\n".join(encabezado + list(self._lineas()))
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, *valores, cantidad: float = 1.0):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0.0) + cantidad
+
+    def valores(self) -> Dict[tuple, float]:
+        with self._lock:
+            return dict(self._valores)
+
+    def _lineas(self):
+        for clave, valor in sorted(self.valores().items()):
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+
+
+class Medidor(_Metrica):
+    """Gauge. Con 'funcion' el valor se calcula al exponer: devuelve un número o {etiquetas: valor}."""
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), funcion: Optional[Callable] = None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+
+    def sumar(self, cantidad: float, *valores):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0.0) + cantidad
+
+    def fijar(self, valor: float, *valores):
+        with self._lock:
+            self._valores[valores] = float(valor)
+
+    def _lineas(self):
+        if self.funcion is not None:
+            resultado = self.funcion()
+            valores = resultado if isinstance(resultado, dict) else {(): resultado}
+        else:
+            with self._lock:
+                valores = dict(self._valores)
+        for clave, valor in sorted(valores.items()):
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), limites: Sequence[float] = ()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(sorted(limites))
+
+    def observar(self, valor: float, *valores):
+        indice = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            estado = self._valores.get(valores)
+            if estado is None:
+                estado = self._valores[valores] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            estado[0][indice] += 1
+            estado[1] += valor
+            estado[2] += 1
+
+    def _lineas(self):
+        with self._lock:
+            copia = {clave: ([*e[0]], e[1], e[2]) for clave, e in self._valores.items()}
+        for clave, (cubetas, suma, cantidad) in sorted(copia.items()):
+            acumulado = 0
+            for limite, n in zip(self.limites + (float("inf"),), cubetas):
+                acumulado += n
+                yield f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, ('le', _numero(limite)))} {acumulado}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(round(suma, 6))}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {cantidad}"
+
+
+class VentanaEventos:
+    """Cuenta eventos de los últimos 'segundos' (p. ej. pedidos del último minuto)."""
+
+    def __init__(self, segundos: float):
+        self.segundos = segundos
+        self._lock = threading.Lock()
+        self._eventos: deque = deque()
+
+    def registrar(self):
+        ahora = time.monotonic()
+        with self._lock:
+            self._eventos.append(ahora)
+            self._podar(ahora)
+
+    def contar(self) -> int:
+        with self._lock:
+            self._podar(time.monotonic())
+            return len(self._eventos)
+
+    def _podar(self, ahora: float):
+        while self._eventos and ahora - self._eventos[0] > self.segundos:
+            self._eventos.popleft()
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._metricas: List[_Metrica] = []
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+        return self._agregar(Contador(nombre, ayuda, etiquetas))
+
+    def medidor(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), funcion: Optional[Callable] = None) -> Medidor:
+        return self._agregar(Medidor(nombre, ayuda, etiquetas, funcion))
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), limites: Sequence[float] = ()) -> Histograma:
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, limites))
+
+    def _agregar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    # === MÉTODO: exponer ===
+    # Texto completo para GET /metrics.
+    def exponer(self) -> str:
+        return "\n".join(m.exponer() for m in self._metricas) + "\n"
+
+
+metricas = RegistroMetricas()
+
+# === MÉTRICAS DE LA APP ===
+LIMITES_LATENCIA_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_ESPERA_DB_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LIMITES_RESPALDO_S = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+requests_total = metricas.contador(
+    "restaurantia_http_requests_total", "Requests HTTP atendidos", ("metodo", "ruta", "status"))
+duracion_requests = metricas.histograma(
+    "restaurantia_http_duracion_segundos", "Tiempo total de los requests HTTP", ("metodo", "ruta"), LIMITES_LATENCIA_S)
+requests_en_curso = metricas.medidor(
+    "restaurantia_http_en_curso", "Requests HTTP en curso")
+requests_en_curso.fijar(0)
+
+# Las rutas sync abren su conexión por request (registro_accesos.abrir_conexion); las calientes la
+# toman del pool async (conexiones_async.py). Ambas cuentan en estas métricas.
+db_conexiones_en_uso = metricas.medidor(
+    "restaurantia_db_conexiones_en_uso", "Conexiones a PostgreSQL tomadas por requests y todavía sin devolver")
+db_conexiones_en_uso.fijar(0)
+db_conexiones_total = metricas.contador(
+    "restaurantia_db_conexiones_total", "Conexiones a PostgreSQL tomadas por requests (abiertas o del pool async)")
+db_conexiones_total.inc(cantidad=0)
+db_espera_conexion = metricas.histograma(
+    "restaurantia_db_espera_conexion_segundos", "Tiempo hasta obtener una conexión a PostgreSQL", (), LIMITES_ESPERA_DB_S)
+# El valor lo calcula conexiones_async.pool_async al exponer
+db_pool_async = metricas.medidor(
+    "restaurantia_db_pool_async_conexiones", "Conexiones del pool async por estado (abiertas, libres)", ("estado",))
+
+pedidos_creados = metricas.contador(
+    "restaurantia_pedidos_creados_total", "Pedidos creados con POST /pedidos")
+pedidos_creados.inc(cantidad=0)
+ventana_pedidos = VentanaEventos(60)
+metricas.medidor(
+    "restaurantia_pedidos_ultimo_minuto", "Pedidos creados en los últimos 60 segundos", funcion=ventana_pedidos.contar)
+
+alertas_total = metricas.contador(
+    "restaurantia_alertas_total", "Alertas emitidas por /ws/alertas (stock_bajo, pedido_atrasado)", ("tipo",))
+
+cache_consultas = metricas.contador(
+    "restaurantia_cache_consultas_total", "Consultas a cachés en memoria por resultado (hit, incremental, miss)", ("cache", "resultado"))
+
+
+def _ratio_aciertos_cache() -> Dict[tuple, float]:
+    totales: Dict[str, List[float]] = {}
+    for (cache, resultado), valor in cache_consultas.valores().items():
+        par = totales.setdefault(cache, [0.0, 0.0])
+        par[1] += valor
+        if resultado == "hit":
+            par[0] += valor
+    return {(cache,): round(aciertos / total, 4) for cache, (aciertos, total) in totales.items() if total}
+
+
+metricas.medidor(
+    "restaurantia_cache_ratio_aciertos", "Fracción de consultas resueltas sin ir a la base", ("cache",), funcion=_ratio_aciertos_cache)
+
+respaldo_duracion = metricas.histograma(
+    "restaurantia_respaldo_duracion_segundos", "Duración de los trabajos de respaldo", ("tipo", "estado"), LIMITES_RESPALDO_S)
+respaldo_ultimo = metricas.medidor(
+    "restaurantia_respaldo_ultimo_timestamp_segundos", "Hora (unix) del último respaldo terminado bien", ("tipo",))
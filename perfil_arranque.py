@@ -0,0 +1,106 @@
+# === PERFIL_ARRANQUE.PY ===
+# Perfila el tiempo de import del cliente de escritorio usando `python -X importtime`
+# y verifica el presupuesto de arranque:
+#   1. Importar app.py y las vistas que RestauranteGUI.main() importa en cada inicio
+#      (MODULOS_ARRANQUE) no debe tardar más de PRESUPUESTO_MS en total.
+#   2. Ningún módulo pesado (plotly, kaleido, reportlab, pandas) debe cargarse al arrancar;
+#      solo se importan cuando se usa la función que los necesita (p. ej. la pestaña Reportes).
+#
+# Uso:
+#   python perfil_arranque.py                 -> top 25 módulos más lentos + chequeo de presupuesto
+#   python perfil_arranque.py --top 50
+#   python perfil_arranque.py --modulo reportes_view --presupuesto 3000
+#   python perfil_arranque.py --modulo app caja_view
+#
+# Devuelve código de salida 1 si se excede el presupuesto (útil para seguirlo en CI o a mano).
+
+import argparse
+import subprocess
+import sys
+import os
+
+PRESUPUESTO_MS = 1500
+MODULOS_PESADOS = ("plotly", "kaleido", "reportlab", "pandas")
+# app.py más las vistas que RestauranteGUI.main() importa al construir la ventana (reportes_view no:
+# se importa al abrir su pestaña). Si main() pasa a importar otra vista al arrancar, agregarla acá.
+MODULOS_ARRANQUE = ("app", "inventario_view", "configuraciones_view", "caja_view", "reservas_view", "recetas_view")
+
+
+# === FUNCIÓN: medir_imports ===
+# Ejecuta un intérprete limpio con -X importtime que importa 'modulos' y devuelve las filas parseadas.
+def medir_imports(modulos):
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modulos)}"],
+        cwd=directorio,
+        capture_output=True,
+        text=True,
+    )
+    filas = []
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        _, datos = linea.split(":", 1)
+        partes = datos.split("|")
+        if len(partes) != 3:
+            continue
+        nombre_crudo = partes[2].rstrip()
+        filas.append({
+            "self_us": int(partes[0].strip()),
+            "acumulado_us": int(partes[1].strip()),
+            "nombre": nombre_crudo.strip(),
+            "nivel": (len(nombre_crudo) - len(nombre_crudo.lstrip())) // 2,
+        })
+    return resultado.returncode, resultado.stderr, filas
+
+
+# === FUNCIÓN: imprimir_top ===
+def imprimir_top(filas, top):
+    print(f"\n{'acumulado (ms)':>15} | {'propio (ms)':>12} | módulo")
+    print("-" * 60)
+    for fila in sorted(filas, key=lambda f: f["acumulado_us"], reverse=True)[:top]:
+        print(f"{fila['acumulado_us'] / 1000:>15.1f} | {fila['self_us'] / 1000:>12.1f} | {fila['nombre']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de tiempo de import del cliente RestaurantIA")
+    parser.add_argument("--modulo", nargs="+", default=list(MODULOS_ARRANQUE),
+                        help=f"Módulos a importar (por defecto: {' '.join(MODULOS_ARRANQUE)})")
+    parser.add_argument("--top", type=int, default=25, help="Cantidad de módulos a listar")
+    parser.add_argument("--presupuesto", type=float, default=PRESUPUESTO_MS, help="Presupuesto de arranque en ms")
+    args = parser.parse_args()
+
+    importados = ", ".join(args.modulo)
+    print(f"--- PERFIL DE ARRANQUE: import {importados} ---")
+    codigo, stderr, filas = medir_imports(args.modulo)
+    if codigo != 0:
+        print(f"❌ Error al importar '{importados}':")
+        print("\n".join(l for l in stderr.splitlines() if not l.startswith("import time:")))
+        sys.exit(1)
+
+    imprimir_top(filas, args.top)
+
+    # Cada módulo pedido es una fila de nivel superior con su nombre (si otro ya lo importó, su
+    # tiempo queda dentro del acumulado de ese otro)
+    total_us = sum(f["acumulado_us"] for f in filas if f["nivel"] == 0 and f["nombre"] in args.modulo)
+    pesados = sorted({f["nombre"] for f in filas if f["nombre"].split(".")[0] in MODULOS_PESADOS})
+
+    print("\n--- PRESUPUESTO DE ARRANQUE ---")
+    ok = True
+    if total_us / 1000 > args.presupuesto:
+        print(f"❌ import {importados}: {total_us / 1000:.0f} ms (presupuesto {args.presupuesto:.0f} ms)")
+        ok = False
+    else:
+        print(f"✅ import {importados}: {total_us / 1000:.0f} ms (presupuesto {args.presupuesto:.0f} ms)")
+
+    if pesados:
+        print(f"❌ Módulos pesados cargados al arrancar: {', '.join(pesados[:10])}")
+        ok = False
+    else:
+        print(f"✅ Ningún módulo pesado ({', '.join(MODULOS_PESADOS)}) cargado al arrancar")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# === PERFILES.PY ===
+# Perfilado opcional de requests, para ver en el lugar por qué POST /pedidos o /pedidos/activos se
+# ponen lentos bajo carga.
+# - Apagado (por defecto) no se instala nada: ni middleware ni envoltura de endpoints.
+# - Encendido, las rutas de las apps usan RutaPerfilada: el endpoint se ejecuta bajo un perfilador
+#   si el request lo pidió con el encabezado 'X-Perfil' o si su ruta está en RESTAURANTIA_PERFILES_RUTAS
+#   (a una fracción RESTAURANTIA_PERFILES_MUESTREO de esos requests).
+# - Modos:
+#     muestreo      un hilo toma la pila del hilo del endpoint cada INTERVALO_MUESTREO_S y guarda
+#                   pilas colapsadas (.collapsed; flamegraph.pl, speedscope). Casi no altera los tiempos.
+#     determinista  cProfile; guarda .pstats (python -m pstats, snakeviz). Mide cada llamada, más lento.
+#   En endpoints async las muestras en que la corrutina está suspendida se descartan; con cProfile
+#   también se miden las otras tareas del loop que corran durante los await.
+# - Un perfil a la vez: si ya hay uno en curso, el request corre normal.
+# Los perfiles quedan en logs/perfiles/ (con un .json de metadatos) y se listan en GET /diagnostico/perfiles.
+#
+# Variables de entorno:
+#   RESTAURANTIA_PERFILES            1 = habilita el encabezado X-Perfil (valor: muestreo | determinista)
+#   RESTAURANTIA_PERFILES_RUTAS      p. ej. "POST /pedidos,GET /pedidos/activos"
+#   RESTAURANTIA_PERFILES_MUESTREO   fracción de requests de esas rutas que se perfilan (por defecto 0.05)
+#   RESTAURANTIA_PERFILES_MODO       modo para las rutas configuradas (por defecto muestreo)
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import cProfile
+import logging
+import functools
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi.routing import APIRoute
+
+log = logging.getLogger("RestaurantIA.perfiles")
+
+DIRECTORIO_PERFILES = Path("logs") / "perfiles"
+MAX_PERFILES = 200
+INTERVALO_MUESTREO_S = 0.001
+MODOS = ("muestreo", "determinista")
+ENCABEZADO = b"x-perfil"
+
+
+def _rutas_configuradas(texto: str) -> set:
+    rutas = set()
+    for parte in (texto or "").split(","):
+        if " " in parte.strip():
+            metodo, ruta = parte.strip().split(None, 1)
+            rutas.add(f"{metodo.upper()} {ruta.strip()}")
+    return rutas
+
+
+PERFILES_POR_ENCABEZADO = os.environ.get("RESTAURANTIA_PERFILES", "").lower() in ("1", "true", "si", "sí")
+RUTAS_PERFILADAS = _rutas_configuradas(os.environ.get("RESTAURANTIA_PERFILES_RUTAS", ""))
+MUESTREO_RUTAS = float(os.environ.get("RESTAURANTIA_PERFILES_MUESTREO", "0.05"))
+MODO_RUTAS = os.environ.get("RESTAURANTIA_PERFILES_MODO", "muestreo").lower()
+PERFILES_ACTIVOS = PERFILES_POR_ENCABEZADO or bool(RUTAS_PERFILADAS)
+
+_modo_pedido: ContextVar[Optional[str]] = ContextVar("modo_perfil_pedido", default=None)
+_un_perfil_a_la_vez = threading.Lock()
+
+
+def _modo_desde_encabezado(valor: str) -> Optional[str]:
+    valor = valor.strip().lower()
+    if valor in ("determinista", "cprofile"):
+        return "determinista"
+    if valor in ("1", "si", "sí", "true", "muestreo"):
+        return "muestreo"
+    return None
+
+
+def _etiqueta_marco(marco) -> str:
+    codigo = marco.f_code
+    return f"{getattr(codigo, 'co_qualname', codigo.co_name)} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+
+class Perfil:
+    """Un perfil de un request: arranca y termina en el hilo que ejecuta el endpoint."""
+
+    def __init__(self, modo: str, metodo: str, ruta: str, marco_raiz):
+        self.modo = modo
+        self.metodo = metodo
+        self.ruta = ruta
+        self.marco_raiz = marco_raiz
+        self.hilo = threading.get_ident()
+        self.pilas: Counter = Counter()
+        self.muestras = 0
+        self._detener = threading.Event()
+        self._muestreador: Optional[threading.Thread] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._inicio = 0.0
+
+    def iniciar(self):
+        self._inicio = time.perf_counter()
+        if self.modo == "determinista":
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        else:
+            self._muestreador = threading.Thread(target=self._muestrear, name="perfil-muestreo", daemon=True)
+            self._muestreador.start()
+
+    def _muestrear(self):
+        while not self._detener.wait(INTERVALO_MUESTREO_S):
+            marco = sys._current_frames().get(self.hilo)
+            pila = []
+            while marco is not None and marco is not self.marco_raiz:
+                pila.append(_etiqueta_marco(marco))
+                marco = marco.f_back
+            if self._detener.is_set():
+                break
+            self.muestras += 1
+            if marco is None:
+                continue  # El hilo está en otra cosa (otra tarea del loop mientras el endpoint espera)
+            self.pilas[";".join(reversed(pila))] += 1
+
+    # === MÉTODO: terminar ===
+    # Detiene el perfilador y escribe los archivos; devuelve el nombre base.
+    def terminar(self) -> str:
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._muestreador is not None:
+            self._detener.set()
+            self._muestreador.join()
+        duracion_ms = (time.perf_counter() - self._inicio) * 1000
+
+        DIRECTORIO_PERFILES.mkdir(parents=True, exist_ok=True)
+        ahora = datetime.now()
+        ruta_archivo = "".join(c if c.isalnum() else "_" for c in self.ruta).strip("_") or "raiz"
+        base = f"{ahora.strftime('%Y%m%d_%H%M%S_%f')}_{self.metodo}_{ruta_archivo}"
+        if self._cprofile is not None:
+            archivo = f"{base}.pstats"
+            self._cprofile.dump_stats(str(DIRECTORIO_PERFILES / archivo))
+        else:
+            archivo = f"{base}.collapsed"
+            with open(DIRECTORIO_PERFILES / archivo, "w", encoding="utf-8") as f:
+                for pila, cantidad in self.pilas.most_common():
+                    f.write(f"{pila or '<endpoint>'} {cantidad}\n")
+        metadatos = {
+            "id": base,
+            "ts": ahora.isoformat(timespec="milliseconds"),
+            "metodo": self.metodo,
+            "ruta": self.ruta,
+            "modo": self.modo,
+            "duracion_ms": round(duracion_ms, 3),
+            "muestras": sum(self.pilas.values()) if self._muestreador is not None else None,
+            "muestras_descartadas": self.muestras - sum(self.pilas.values()) if self._muestreador is not None else None,
+            "archivo": archivo,
+        }
+        with open(DIRECTORIO_PERFILES / f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(metadatos, f, ensure_ascii=False)
+        podar_perfiles()
+        log.info("Perfil guardado → %s (%s, %.1f ms)", archivo, self.modo, duracion_ms)
+        return base
+
+
+def _modo_para(metodo: str, ruta: str) -> Optional[str]:
+    modo = _modo_pedido.get()
+    if modo is None and f"{metodo} {ruta}" in RUTAS_PERFILADAS and random.random() < MUESTREO_RUTAS:
+        modo = MODO_RUTAS if MODO_RUTAS in MODOS else "muestreo"
+    return modo
+
+
+def _envolver(funcion, metodo: str, ruta: str):
+    if asyncio.iscoroutinefunction(funcion):
+        @functools.wraps(funcion)
+        async def envoltura_async(*args, **kwargs):
+            modo = _modo_para(metodo, ruta)
+            if modo is None or not _un_perfil_a_la_vez.acquire(blocking=False):
+                return await funcion(*args, **kwargs)
+            try:
+                perfil = Perfil(modo, metodo, ruta, sys._getframe())
+                perfil.iniciar()
+                try:
+                    return await funcion(*args, **kwargs)
+                finally:
+                    perfil.terminar()
+            finally:
+                _un_perfil_a_la_vez.release()
+        return envoltura_async
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        modo = _modo_para(metodo, ruta)
+        if modo is None or not _un_perfil_a_la_vez.acquire(blocking=False):
+            return funcion(*args, **kwargs)
+        try:
+            perfil = Perfil(modo, metodo, ruta, sys._getframe())
+            perfil.iniciar()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                perfil.terminar()
+        finally:
+            _un_perfil_a_la_vez.release()
+    return envoltura
+
+
+class RutaPerfilada(APIRoute):
+    """APIRoute que envuelve el endpoint (FastAPI llama a dependant.call en cada request)."""
+    prefijo = ""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        metodo = ",".join(sorted(self.methods or ())) or "GET"
+        self.dependant.call = _envolver(self.dependant.call, metodo, self.prefijo + self.path)
+
+
+class MiddlewarePerfiles:
+    """Lee el encabezado X-Perfil y deja el modo pedido en un ContextVar para RutaPerfilada."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _modo_pedido.get() is not None:
+            await self.app(scope, receive, send)
+            return
+        modo = None
+        for nombre, valor in scope.get("headers", ()):
+            if nombre == ENCABEZADO:
+                modo = _modo_desde_encabezado(valor.decode("latin-1"))
+                break
+        if modo is None:
+            await self.app(scope, receive, send)
+            return
+        token = _modo_pedido.set(modo)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _modo_pedido.reset(token)
+
+
+# === FUNCIÓN: instalar_perfiles ===
+# Se llama justo después de crear cada app, antes de declarar sus rutas. Con el perfilado apagado no
+# hace nada. 'prefijo' es donde se monta la sub-app (para que las rutas configuradas coincidan).
+def instalar_perfiles(app, prefijo: str = ""):
+    if not PERFILES_ACTIVOS:
+        return
+    app.router.route_class = type("RutaPerfilada", (RutaPerfilada,), {"prefijo": prefijo})
+    if PERFILES_POR_ENCABEZADO:
+        app.add_middleware(MiddlewarePerfiles)
+
+
+# === FUNCIÓN: listar_perfiles ===
+# Metadatos de los perfiles guardados, del más nuevo al más viejo.
+def listar_perfiles(limite: int = 100) -> List[Dict]:
+    if not DIRECTORIO_PERFILES.exists():
+        return []
+    perfiles = []
+    for archivo in sorted(DIRECTORIO_PERFILES.glob("*.json"), reverse=True)[:limite]:
+        try:
+            with open(archivo, encoding="utf-8") as f:
+                perfiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return perfiles
+
+
+# === FUNCIÓN: ruta_archivo_perfil ===
+# Ruta de un archivo de perfil por nombre (None si no existe o el nombre sale de la carpeta).
+def ruta_archivo_perfil(nombre: str) -> Optional[Path]:
+    if os.path.basename(nombre) != nombre or not nombre.endswith((".pstats", ".collapsed", ".json")):
+        return None
+    ruta = DIRECTORIO_PERFILES / nombre
+    return ruta if ruta.is_file() else None
+
+
+def podar_perfiles():
+    metadatos = sorted(DIRECTORIO_PERFILES.glob("*.json"), reverse=True)
+    for viejo in metadatos[MAX_PERFILES:]:
+        base = viejo.name[:-len(".json")]
+        for extension in (".json", ".pstats", ".collapsed"):
+            try:
+                (DIRECTORIO_PERFILES / f"{base}{extension}").unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,124 @@
+# === PLANIFICADOR_FRAMES.PY ===
+# Agrupa las actualizaciones de la UI de Flet en "frames".
+# En vez de llamar a page.update() desde cada vista, hilo o hover, se marcan los controles
+# como sucios con marcar_actualizacion(page, *controles) y un hilo los envía juntos
+# con a lo sumo un page.update() por intervalo (100 ms por defecto).
+
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Dict
+
+log = logging.getLogger("RestaurantIA.planificador_frames")
+
+
+class PlanificadorFrames:
+    def __init__(self, page, intervalo: float = 0.1, intervalo_reporte: float = 60.0):
+        self.page = page
+        self.intervalo = intervalo
+        self.intervalo_reporte = intervalo_reporte
+        self._lock = threading.Lock()
+        self._sucios = []  # Controles a actualizar en el próximo frame
+        self._pagina_completa = False  # Si se pidió page.update() sin controles
+        self._hilo = None
+        # Contadores
+        self.flushes_totales = 0
+        self.marcas_totales = 0
+        self._marcas_flushes = deque()  # instantes de cada flush (ventana de 1 s)
+        self._marcas_solicitudes = deque()  # instantes de cada marca (ventana de 1 s)
+
+    # === MÉTODO: marcar ===
+    # Marca controles como sucios. Sin argumentos marca la página completa.
+    # Se puede llamar desde cualquier hilo.
+    def marcar(self, *controles):
+        with self._lock:
+            self.marcas_totales += 1
+            self._marcas_solicitudes.append(time.monotonic())
+            if not controles:
+                self._pagina_completa = True
+            elif not self._pagina_completa:
+                for control in controles:
+                    if not any(control is c for c in self._sucios):
+                        self._sucios.append(control)
+
+    # === MÉTODO: iniciar ===
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, daemon=True, name="planificador_frames")
+            self._hilo.start()
+            log.info(f"Planificador de frames iniciado (1 page.update() cada {self.intervalo * 1000:.0f} ms como máximo)")
+
+    def _bucle(self):
+        ultimo_reporte = time.monotonic()
+        while True:
+            time.sleep(self.intervalo)
+            self.flush()
+            with self._lock:
+                self._podar_ventana()
+            ahora = time.monotonic()
+            if ahora - ultimo_reporte >= self.intervalo_reporte:
+                ultimo_reporte = ahora
+                stats = self.estadisticas()
+                log.info(
+                    f"Frames UI → {stats['flushes_por_segundo']} flushes/s | "
+                    f"{stats['marcas_por_segundo']} marcas/s | totales: {stats['flushes_totales']} flushes, {stats['marcas_totales']} marcas"
+                )
+
+    # === MÉTODO: flush ===
+    # Envía en un solo update todo lo marcado desde el frame anterior.
+    def flush(self):
+        with self._lock:
+            if not self._pagina_completa and not self._sucios:
+                return
+            pagina_completa = self._pagina_completa
+            sucios = self._sucios
+            self._pagina_completa = False
+            self._sucios = []
+        try:
+            if pagina_completa:
+                self.page.update()
+            else:
+                # Solo controles ya montados en la página (las vistas aún no agregadas se ignoran)
+                montados = [c for c in sucios if getattr(c, "page", None) is not None]
+                if not montados:
+                    return
+                self.page.update(*montados)
+        except Exception as e:
+            log.error(f"Error en flush del planificador de frames: {e}")
+            return
+        with self._lock:
+            self.flushes_totales += 1
+            self._marcas_flushes.append(time.monotonic())
+
+    # === MÉTODO: estadisticas ===
+    # Contadores de la última ventana de un segundo y totales.
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            self._podar_ventana()
+            return {
+                "flushes_por_segundo": len(self._marcas_flushes),
+                "marcas_por_segundo": len(self._marcas_solicitudes),
+                "flushes_totales": self.flushes_totales,
+                "marcas_totales": self.marcas_totales,
+            }
+
+    def _podar_ventana(self):
+        limite = time.monotonic() - 1.0
+        for cola in (self._marcas_flushes, self._marcas_solicitudes):
+            while cola and cola[0] < limite:
+                cola.popleft()
+
+
+# === FUNCIÓN: marcar_actualizacion ===
+# Punto único para pedir un refresco de UI desde vistas y hilos.
+# Si la página no tiene planificador (p. ej. asistente inicial) se actualiza directo.
+def marcar_actualizacion(page, *controles):
+    planificador = getattr(page, "planificador_frames", None) if page is not None else None
+    if planificador is not None:
+        planificador.marcar(*controles)
+    elif page is not None:
+        if controles:
+            page.update(*controles)
+        else:
+            page.update()
@@ -0,0 +1,246 @@
+# === PRONOSTICO_INVENTARIO.PY ===
+# Pronóstico de consumo de ingredientes a partir de los pedidos y las recetas (bill of materials).
+#
+# - El consumo diario por ingrediente sale de (platos vendidos por día) × (receta de cada plato),
+#   calculado como un producto de matrices con NumPy sobre todo el historial.
+# - La tasa diaria es un promedio exponencial (EWMA) de la serie desestacionalizada y la
+#   estacionalidad semanal es un factor por día de la semana y por ingrediente.
+# - El modelo (historial, receta, tasas, factores) se cachea y se actualiza incrementalmente:
+#   solo se consultan los días completos que faltan. El consumo de HOY y el stock actual se leen
+#   en cada petición (dos consultas chicas), así el pronóstico acompaña los pedidos que van llegando.
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from metricas import cache_consultas
+
+DIAS_HISTORIA = 84  # 12 semanas de historial
+MEDIA_VIDA_DIAS = 7.0  # Peso de un día de hace una semana = la mitad del de ayer
+MIN_SEMANAS_ESTACIONALIDAD = 2  # Con menos observaciones de un día de la semana el factor queda en 1
+TTL_MODELO_S = 600  # Las recetas pueden cambiar: el modelo se rearma como mucho cada 10 minutos
+
+
+class PronosticoInventario:
+    def __init__(self, dias_historia: int = DIAS_HISTORIA, media_vida_dias: float = MEDIA_VIDA_DIAS):
+        self.dias_historia = dias_historia
+        self.alpha = 1.0 - 0.5 ** (1.0 / media_vida_dias)
+        self._lock = threading.Lock()
+        # Historial de platos vendidos: matriz (días × platos) y sus índices
+        self._inicio: Optional[date] = None
+        self._ultimo_dia: Optional[date] = None  # Último día COMPLETO cargado (ayer, como mucho)
+        self._platos: Dict[str, int] = {}
+        self._ventas = np.zeros((0, 0))
+        # Modelo derivado
+        self._modelo: Optional[Dict[str, Any]] = None
+        self._modelo_ts = 0.0
+
+    # === MÉTODO: _cargar_ventas ===
+    # Agrega al historial los días completos que faltan (solo consulta ese rango).
+    def _cargar_ventas(self, cursor, hoy: date):
+        ayer = hoy - timedelta(days=1)
+        inicio_ventana = hoy - timedelta(days=self.dias_historia)
+        if self._ultimo_dia is None or self._ultimo_dia < inicio_ventana:
+            # Primera carga (o el servidor estuvo parado más que la ventana): historial completo
+            self._inicio = inicio_ventana
+            self._platos = {}
+            self._ventas = np.zeros((0, 0))
+            desde = inicio_ventana
+        else:
+            desde = self._ultimo_dia + timedelta(days=1)
+
+        if desde <= ayer:
+            cursor.execute("""
+                SELECT p.fecha_hora::date AS dia, item->>'nombre' AS plato, COUNT(*) AS cantidad
+                FROM pedidos p
+                CROSS JOIN LATERAL jsonb_array_elements(p.items) AS item
+                WHERE p.fecha_hora >= %s AND p.fecha_hora < %s
+                GROUP BY 1, 2
+            """, (desde, hoy))
+            filas = cursor.fetchall()
+
+            nuevos = [f['plato'] for f in filas if f['plato'] not in self._platos]
+            for plato in dict.fromkeys(nuevos):
+                self._platos[plato] = len(self._platos)
+
+            dias_totales = (ayer - self._inicio).days + 1
+            ventas = np.zeros((dias_totales, len(self._platos)))
+            ventas[:self._ventas.shape[0], :self._ventas.shape[1]] = self._ventas
+            if filas:
+                idx_dia = np.fromiter(((f['dia'] - self._inicio).days for f in filas), dtype=np.int64, count=len(filas))
+                idx_plato = np.fromiter((self._platos[f['plato']] for f in filas), dtype=np.int64, count=len(filas))
+                cantidades = np.fromiter((f['cantidad'] for f in filas), dtype=float, count=len(filas))
+                np.add.at(ventas, (idx_dia, idx_plato), cantidades)
+            self._ventas = ventas
+            self._ultimo_dia = ayer
+
+        # Mantener solo la ventana de días_historia
+        sobrantes = (inicio_ventana - self._inicio).days
+        if sobrantes > 0:
+            self._ventas = self._ventas[sobrantes:]
+            self._inicio = inicio_ventana
+
+    # === MÉTODO: _armar_modelo ===
+    # Consumo diario por ingrediente (ventas @ receta), tasa EWMA y estacionalidad semanal.
+    def _armar_modelo(self, cursor, hoy: date):
+        cursor.execute("""
+            SELECT r.nombre_plato, ir.ingrediente_id, ir.cantidad_necesaria
+            FROM recetas r
+            JOIN ingredientes_recetas ir ON ir.receta_id = r.id
+        """)
+        receta_filas = cursor.fetchall()
+        ingredientes = sorted({f['ingrediente_id'] for f in receta_filas})
+        col_ingrediente = {ing_id: i for i, ing_id in enumerate(ingredientes)}
+
+        # Matriz receta (platos × ingredientes); platos sin ventas en el historial no aportan
+        receta = np.zeros((len(self._platos), len(ingredientes)))
+        filas_validas = [f for f in receta_filas if f['nombre_plato'] in self._platos]
+        if filas_validas:
+            np.add.at(
+                receta,
+                (np.array([self._platos[f['nombre_plato']] for f in filas_validas]),
+                 np.array([col_ingrediente[f['ingrediente_id']] for f in filas_validas])),
+                np.array([float(f['cantidad_necesaria']) for f in filas_validas])
+            )
+
+        consumo = self._ventas @ receta  # (días × ingredientes)
+        dias = consumo.shape[0]
+        dia_semana = (np.arange(dias) + self._inicio.weekday()) % 7 if dias else np.zeros(0, dtype=np.int64)
+
+        # Estacionalidad semanal: media por día de la semana / media general
+        sumas = np.zeros((7, len(ingredientes)))
+        np.add.at(sumas, dia_semana, consumo)
+        observaciones = np.bincount(dia_semana, minlength=7).astype(float)
+        media_general = consumo.mean(axis=0) if dias else np.zeros(len(ingredientes))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            factores = (sumas / observaciones[:, None]) / media_general[None, :]
+        factores = np.where(np.isfinite(factores) & (observaciones[:, None] >= MIN_SEMANAS_ESTACIONALIDAD), factores, 1.0)
+
+        # Tasa EWMA sobre la serie desestacionalizada (ayer pesa 1, cada día anterior (1 - alpha) menos)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            desestacionalizado = np.where(factores[dia_semana] > 0, consumo / factores[dia_semana], 0.0)
+        pesos = (1.0 - self.alpha) ** np.arange(dias - 1, -1, -1) if dias else np.zeros(0)
+        tasa = (pesos @ desestacionalizado) / pesos.sum() if dias else np.zeros(len(ingredientes))
+
+        # Dispersión diaria alrededor del pronóstico (para el stock de seguridad)
+        residuo = consumo - tasa[None, :] * factores[dia_semana] if dias else np.zeros((0, len(ingredientes)))
+        sigma = residuo.std(axis=0) if dias > 1 else np.zeros(len(ingredientes))
+
+        self._modelo = {
+            "dia": hoy,
+            "ingredientes": ingredientes,
+            "col_ingrediente": col_ingrediente,
+            "tasa": tasa,
+            "factores": factores,
+            "sigma": sigma,
+            "dias_historia": dias,
+        }
+        self._modelo_ts = time.monotonic()
+
+    def _modelo_vigente(self, cursor, hoy: date) -> Dict[str, Any]:
+        if (self._modelo is None or self._modelo["dia"] != hoy
+                or time.monotonic() - self._modelo_ts > TTL_MODELO_S):
+            cache_consultas.inc("pronostico_inventario", "miss")
+            self._cargar_ventas(cursor, hoy)
+            self._armar_modelo(cursor, hoy)
+        else:
+            cache_consultas.inc("pronostico_inventario", "hit")
+        return self._modelo
+
+    # === MÉTODO: invalidar ===
+    # Fuerza rearmar el modelo en la próxima consulta (p. ej. tras importar recetas).
+    def invalidar(self):
+        with self._lock:
+            self._modelo = None
+
+    # === MÉTODO: calcular ===
+    # Días de cobertura y cantidad sugerida de reposición para cada ingrediente del inventario.
+    def calcular(
+        self,
+        cursor,
+        horizonte_dias: int = 30,
+        dias_entrega: int = 2,
+        dias_objetivo: int = 7,
+        z_servicio: float = 1.65,
+    ) -> Dict[str, Any]:
+        ahora = datetime.now()
+        hoy = ahora.date()
+        with self._lock:
+            modelo = self._modelo_vigente(cursor, hoy)
+
+        cursor.execute("SELECT id, nombre, unidad_medida, cantidad_disponible FROM inventario ORDER BY nombre")
+        inventario = cursor.fetchall()
+        # Consumo de hoy hasta ahora (del libro de movimientos): descuenta lo ya consumido del pronóstico de hoy
+        cursor.execute("""
+            SELECT ingrediente_id, -SUM(delta) AS consumido
+            FROM inventario_movimientos
+            WHERE motivo = 'pedido' AND ts >= %s
+            GROUP BY ingrediente_id
+        """, (datetime.combine(hoy, datetime.min.time()),))
+        consumido_hoy_por_id = {f['ingrediente_id']: float(f['consumido']) for f in cursor.fetchall()}
+
+        n = len(inventario)
+        ids = [f['id'] for f in inventario]
+        stock = np.array([float(f['cantidad_disponible']) for f in inventario])
+        consumido_hoy = np.array([consumido_hoy_por_id.get(i, 0.0) for i in ids])
+
+        # Parámetros del modelo alineados con el orden del inventario (ingredientes sin receta -> 0)
+        cols = np.array([modelo["col_ingrediente"].get(i, -1) for i in ids], dtype=np.int64)
+        tiene_modelo = cols >= 0
+        tasa = np.where(tiene_modelo, modelo["tasa"][cols] if len(modelo["tasa"]) else 0.0, 0.0)
+        sigma = np.where(tiene_modelo, modelo["sigma"][cols] if len(modelo["sigma"]) else 0.0, 0.0)
+        factores = np.ones((7, n))
+        if len(modelo["ingredientes"]):
+            factores[:, tiene_modelo] = modelo["factores"][:, cols[tiene_modelo]]
+
+        # Pronóstico diario (horizonte × ingredientes); hoy solo cuenta lo que falta consumir
+        dias_semana = (np.arange(horizonte_dias) + hoy.weekday()) % 7
+        pronostico = tasa[None, :] * factores[dias_semana]
+        pronostico[0] = np.maximum(pronostico[0] - consumido_hoy, 0.0)
+        acumulado = np.cumsum(pronostico, axis=0)
+
+        # Días de cobertura: primer día en que el acumulado supera el stock (interpolado dentro del día)
+        agotado = acumulado >= stock[None, :]
+        se_agota = agotado.any(axis=0) & (tasa > 0)
+        idx = agotado.argmax(axis=0)
+        previo = np.where(idx > 0, acumulado[np.maximum(idx - 1, 0), np.arange(n)], 0.0)
+        del_dia = pronostico[idx, np.arange(n)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraccion = np.where(del_dia > 0, (stock - previo) / del_dia, 0.0)
+        dias_cobertura = np.where(se_agota, idx + fraccion, np.inf)
+
+        # Reposición: demanda hasta que llegue el pedido + días objetivo, más stock de seguridad
+        periodo = min(dias_entrega + dias_objetivo, horizonte_dias)
+        demanda = acumulado[periodo - 1] if periodo > 0 else np.zeros(n)
+        seguridad = z_servicio * sigma * np.sqrt(max(periodo, 1))
+        sugerido = np.maximum(np.ceil((demanda + seguridad - stock) * 100) / 100, 0.0)
+
+        items = []
+        for i, fila in enumerate(inventario):
+            cobertura = None if not np.isfinite(dias_cobertura[i]) else round(float(dias_cobertura[i]), 1)
+            items.append({
+                "id": fila['id'],
+                "nombre": fila['nombre'],
+                "unidad_medida": fila['unidad_medida'],
+                "stock": float(stock[i]),
+                "consumo_diario": round(float(tasa[i]), 3),
+                "consumido_hoy": round(float(consumido_hoy[i]), 2),
+                "dias_cobertura": cobertura,  # None = no se agota dentro del horizonte (o sin consumo)
+                "fecha_agotamiento": (ahora + timedelta(days=cobertura)).strftime("%Y-%m-%d") if cobertura is not None else None,
+                "reponer": float(sugerido[i]) > 0 and (cobertura is None or cobertura <= dias_entrega + dias_objetivo),
+                "cantidad_sugerida": float(sugerido[i]),
+                "factores_semana": [round(float(f), 2) for f in factores[:, i]],  # lunes..domingo
+            })
+        return {
+            "generado": ahora.strftime("%Y-%m-%d %H:%M:%S"),
+            "dias_historia": modelo["dias_historia"],
+            "horizonte_dias": horizonte_dias,
+            "items": items,
+        }
+
+
+# Instancia compartida por el backend (el modelo se cachea entre peticiones)
+pronostico_inventario = PronosticoInventario()
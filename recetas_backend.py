@@ -1,18 +1,26 @@
 # recetas_backend.py
 # Backend API para gestionar recetas e ingredientes de recetas.
 
-from fastapi import FastAPI, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional, Dict
+import os
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import execute_values
 import json
+import csv
+import io
+from disponibilidad_menu import disponibilidad_menu
+from pronostico_inventario import pronostico_inventario
+from registro_accesos import MiddlewareAccesos, abrir_conexion
+from perfiles import instalar_perfiles
 
 # Configuración directa de PostgreSQL
-DATABASE_URL = "dbname=restaurant_db user=postgres password=postgres host=localhost port=5432"
+DATABASE_URL = os.environ.get("RESTAURANTIA_DATABASE_URL", "dbname=restaurant_db user=postgres password=postgres host=localhost port=5432")
 
 def get_db():
-    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    conn = abrir_conexion(DATABASE_URL)
     try:
         yield conn
     finally:
@@ -39,7 +47,7 @@ class RecetaUpdate(BaseModel):
     nombre_plato: str = None # Opcional para renombrar el plato
     descripcion: str = None
     instrucciones: str = None
-    ingredientes: List[IngredienteRecetaUpdate] = [] # Lista de ingredientes para actualizar/reemplazar
+    ingredientes: Optional[List[IngredienteRecetaUpdate]] = None # Lista completa deseada; None = no tocar los ingredientes
 
 class RecetaResponse(BaseModel):
     id: int
@@ -50,56 +58,110 @@ class RecetaResponse(BaseModel):
     fecha_actualizacion: str
     ingredientes: List[dict] # Lista de diccionarios con detalles del ingrediente
 
+class RecetaListadoResponse(BaseModel):
+    # Igual que RecetaResponse pero con todos los campos opcionales, para ?fields=
+    id: Optional[int]
+    nombre_plato: Optional[str]
+    descripcion: Optional[str]
+    instrucciones: Optional[str]
+    fecha_creacion: Optional[str]
+    fecha_actualizacion: Optional[str]
+    ingredientes: Optional[List[dict]]
+
+class ImportacionRecetasResponse(BaseModel):
+    recetas_creadas: int
+    recetas_actualizadas: int # Solo las que cambiaron descripción o instrucciones
+    ingredientes_insertados: int
+    ingredientes_actualizados: int
+    ingredientes_eliminados: int
+    recetas: List[str]
+
 # Nueva sub-app para Recetas
 recetas_app = FastAPI(title="Recetas API")
+recetas_app.add_middleware(MiddlewareAccesos)  # No duplica líneas si ya la mide la app principal
+instalar_perfiles(recetas_app, prefijo="/recetas")
 
 # --- ENDPOINTS PARA RECETAS ---
 
-@recetas_app.get("/", response_model=List[RecetaResponse])
-def obtener_recetas(conn = Depends(get_db)):
+# Campos que se pueden pedir con ?fields= en GET /recetas/
+CAMPOS_RECETA = ("id", "nombre_plato", "descripcion", "instrucciones", "fecha_creacion", "fecha_actualizacion", "ingredientes")
+
+def consultar_recetas(cursor, nombre_plato: Optional[str] = None, limite: Optional[int] = None, offset: int = 0, campos=CAMPOS_RECETA) -> List[dict]:
+    """
+    Obtiene recetas con sus ingredientes en UNA sola consulta (json_agg).
+    Si no se piden los ingredientes, ni siquiera se hace el JOIN.
     """
-    Obtiene todas las recetas con sus ingredientes.
+    filtro = "WHERE r.nombre_plato = %s" if nombre_plato is not None else ""
+    params = [nombre_plato] if nombre_plato is not None else []
+    paginacion = ""
+    if limite is not None:
+        paginacion = "LIMIT %s OFFSET %s"
+        params += [limite, offset]
+
+    if "ingredientes" in campos:
+        cursor.execute(f"""
+            SELECT r.id, r.nombre_plato, r.descripcion, r.instrucciones, r.fecha_creacion, r.fecha_actualizacion,
+                   COALESCE(
+                       json_agg(json_build_object(
+                           'ingrediente_id', ir.ingrediente_id,
+                           'nombre_ingrediente', i.nombre,
+                           'cantidad_necesaria', ir.cantidad_necesaria,
+                           'unidad_medida_necesaria', ir.unidad_medida_necesaria
+                       ) ORDER BY ir.id) FILTER (WHERE ir.id IS NOT NULL),
+                       '[]'::json
+                   ) AS ingredientes
+            FROM recetas r
+            LEFT JOIN ingredientes_recetas ir ON ir.receta_id = r.id
+            LEFT JOIN inventario i ON i.id = ir.ingrediente_id
+            {filtro}
+            GROUP BY r.id
+            ORDER BY r.nombre_plato
+            {paginacion};
+        """, params)
+    else:
+        cursor.execute(f"""
+            SELECT r.id, r.nombre_plato, r.descripcion, r.instrucciones, r.fecha_creacion, r.fecha_actualizacion
+            FROM recetas r
+            {filtro}
+            ORDER BY r.nombre_plato
+            {paginacion};
+        """, params)
+
+    resultado = []
+    for receta_db in cursor.fetchall():
+        receta = {
+            "id": receta_db['id'],
+            "nombre_plato": receta_db['nombre_plato'],
+            "descripcion": receta_db['descripcion'],
+            "instrucciones": receta_db['instrucciones'],
+            "fecha_creacion": str(receta_db['fecha_creacion']),
+            "fecha_actualizacion": str(receta_db['fecha_actualizacion']),
+        }
+        if "ingredientes" in campos:
+            receta["ingredientes"] = receta_db['ingredientes']
+        resultado.append({k: v for k, v in receta.items() if k in campos})
+    return resultado
+
+
+@recetas_app.get("/", response_model=List[RecetaListadoResponse], response_model_exclude_unset=True)
+def obtener_recetas(
+    limite: Optional[int] = Query(None, ge=1, le=500, description="Máximo de recetas a devolver (sin límite si se omite)"),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description="Campos separados por coma, ej: id,nombre_plato"),
+    conn = Depends(get_db)
+):
     """
+    Obtiene las recetas con sus ingredientes (una sola consulta, paginable y con proyección de campos).
+    """
+    campos = CAMPOS_RECETA
+    if fields:
+        campos = tuple(c.strip() for c in fields.split(",") if c.strip())
+        invalidos = [c for c in campos if c not in CAMPOS_RECETA]
+        if invalidos:
+            raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(invalidos)}. Permitidos: {', '.join(CAMPOS_RECETA)}")
     try:
         with conn.cursor() as cursor:
-            # Obtener recetas
-            cursor.execute("""
-                SELECT id, nombre_plato, descripcion, instrucciones, fecha_creacion, fecha_actualizacion
-                FROM recetas
-                ORDER BY nombre_plato;
-            """)
-            recetas_db = cursor.fetchall()
-
-            resultado = []
-            for receta_db in recetas_db:
-                # Obtener ingredientes para cada receta
-                cursor.execute("""
-                    SELECT ir.ingrediente_id, i.nombre as nombre_ingrediente, ir.cantidad_necesaria, ir.unidad_medida_necesaria
-                    FROM ingredientes_recetas ir
-                    JOIN inventario i ON ir.ingrediente_id = i.id
-                    WHERE ir.receta_id = %s;
-                """, (receta_db['id'],))
-                ingredientes_db = cursor.fetchall()
-
-                resultado.append({
-                    "id": receta_db['id'],
-                    "nombre_plato": receta_db['nombre_plato'],
-                    "descripcion": receta_db['descripcion'],
-                    "instrucciones": receta_db['instrucciones'],
-                    "fecha_creacion": str(receta_db['fecha_creacion']),
-                    "fecha_actualizacion": str(receta_db['fecha_actualizacion']),
-                    "ingredientes": [
-                        {
-                            "ingrediente_id": ing['ingrediente_id'],
-                            "nombre_ingrediente": ing['nombre_ingrediente'],
-                            "cantidad_necesaria": ing['cantidad_necesaria'],
-                            "unidad_medida_necesaria": ing['unidad_medida_necesaria']
-                        }
-                        for ing in ingredientes_db
-                    ]
-                })
-
-            return resultado
+            return consultar_recetas(cursor, limite=limite, offset=offset, campos=campos)
     except Exception as e:
         print(f"Error en obtener_recetas: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor al obtener recetas.")
@@ -112,43 +174,10 @@ def obtener_receta_por_plato(nombre_plato: str, conn = Depends(get_db)):
     """
     try:
         with conn.cursor() as cursor:
-            # Obtener receta
-            cursor.execute("""
-                SELECT id, nombre_plato, descripcion, instrucciones, fecha_creacion, fecha_actualizacion
-                FROM recetas
-                WHERE nombre_plato = %s;
-            """, (nombre_plato,))
-            receta_db = cursor.fetchone()
-
-            if not receta_db:
+            recetas = consultar_recetas(cursor, nombre_plato=nombre_plato)
+            if not recetas:
                 raise HTTPException(status_code=404, detail="Receta no encontrada para el plato especificado.")
-
-            # Obtener ingredientes para la receta
-            cursor.execute("""
-                SELECT ir.ingrediente_id, i.nombre as nombre_ingrediente, ir.cantidad_necesaria, ir.unidad_medida_necesaria
-                FROM ingredientes_recetas ir
-                JOIN inventario i ON ir.ingrediente_id = i.id
-                WHERE ir.receta_id = %s;
-            """, (receta_db['id'],))
-            ingredientes_db = cursor.fetchall()
-
-            return {
-                "id": receta_db['id'],
-                "nombre_plato": receta_db['nombre_plato'],
-                "descripcion": receta_db['descripcion'],
-                "instrucciones": receta_db['instrucciones'],
-                "fecha_creacion": str(receta_db['fecha_creacion']),
-                "fecha_actualizacion": str(receta_db['fecha_actualizacion']),
-                "ingredientes": [
-                    {
-                        "ingrediente_id": ing['ingrediente_id'],
-                        "nombre_ingrediente": ing['nombre_ingrediente'],
-                        "cantidad_necesaria": ing['cantidad_necesaria'],
-                        "unidad_medida_necesaria": ing['unidad_medida_necesaria']
-                    }
-                    for ing in ingredientes_db
-                ]
-            }
+            return recetas[0]
     except HTTPException:
         # Re-raise HTTP exceptions (como 404)
         raise
@@ -157,6 +186,201 @@ def obtener_receta_por_plato(nombre_plato: str, conn = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Error interno del servidor al obtener la receta.")
 
 
+# --- ESCRITURA DE RECETAS POR LOTES ---
+# Validación y escritura con una cantidad fija de sentencias, sin importar cuántas recetas
+# o ingredientes vengan: los IDs se validan con un solo "= ANY(%s)" y las filas se escriben
+# con execute_values. Los ingredientes se aplican como diff mínimo (solo se tocan las filas que cambian).
+
+def validar_platos_e_ingredientes(cursor, nombres_platos: List[str], ingrediente_ids: List[int]):
+    """
+    Verifica en dos consultas que existan todos los platos en 'menu' y todos los ingredientes en 'inventario'.
+    Lanza HTTPException 404 con la lista de faltantes.
+    """
+    if nombres_platos:
+        cursor.execute("SELECT nombre FROM menu WHERE nombre = ANY(%s)", (list(nombres_platos),))
+        existentes = {row['nombre'] for row in cursor.fetchall()}
+        faltantes = sorted(set(nombres_platos) - existentes)
+        if faltantes:
+            raise HTTPException(status_code=404, detail=f"Platos no encontrados en el menú: {', '.join(faltantes)}")
+    if ingrediente_ids:
+        cursor.execute("SELECT id FROM inventario WHERE id = ANY(%s)", (list(ingrediente_ids),))
+        existentes = {row['id'] for row in cursor.fetchall()}
+        faltantes = sorted(set(ingrediente_ids) - existentes)
+        if faltantes:
+            raise HTTPException(status_code=404, detail=f"Ingredientes no encontrados en el inventario (IDs): {', '.join(map(str, faltantes))}")
+
+
+def sincronizar_ingredientes(cursor, ingredientes_por_receta: Dict[int, list]) -> Dict[str, int]:
+    """
+    Deja los ingredientes de cada receta igual a la lista deseada aplicando un diff mínimo:
+    borra los que ya no están, inserta los nuevos y actualiza solo los que cambiaron.
+    ingredientes_por_receta: {receta_id: [IngredienteRecetaCreate, ...]}
+    """
+    receta_ids = list(ingredientes_por_receta.keys())
+    filas = [
+        (receta_id, ing.ingrediente_id, ing.cantidad_necesaria, ing.unidad_medida_necesaria)
+        for receta_id, ingredientes in ingredientes_por_receta.items()
+        for ing in ingredientes
+    ]
+    if not receta_ids:
+        return {"insertados": 0, "actualizados": 0, "eliminados": 0}
+
+    # 1. Borrar los ingredientes que ya no forman parte de la receta
+    cursor.execute("""
+        DELETE FROM ingredientes_recetas ir
+        WHERE ir.receta_id = ANY(%s)
+          AND (ir.receta_id, ir.ingrediente_id) NOT IN (
+              SELECT * FROM unnest(%s::int[], %s::int[])
+          );
+    """, (receta_ids, [f[0] for f in filas], [f[1] for f in filas]))
+    eliminados = cursor.rowcount
+
+    # 2. Insertar nuevos / actualizar solo los que cambiaron (xmax = 0 -> fila recién insertada)
+    insertados = actualizados = 0
+    if filas:
+        resultado = execute_values(cursor, """
+            INSERT INTO ingredientes_recetas (receta_id, ingrediente_id, cantidad_necesaria, unidad_medida_necesaria)
+            VALUES %s
+            ON CONFLICT (receta_id, ingrediente_id) DO UPDATE SET
+                cantidad_necesaria = EXCLUDED.cantidad_necesaria,
+                unidad_medida_necesaria = EXCLUDED.unidad_medida_necesaria
+            WHERE (ingredientes_recetas.cantidad_necesaria, ingredientes_recetas.unidad_medida_necesaria)
+                  IS DISTINCT FROM (EXCLUDED.cantidad_necesaria, EXCLUDED.unidad_medida_necesaria)
+            RETURNING (xmax = 0) AS insertado;
+        """, filas, page_size=len(filas), fetch=True)
+        insertados = sum(1 for row in resultado if row['insertado'])
+        actualizados = len(resultado) - insertados
+
+    return {"insertados": insertados, "actualizados": actualizados, "eliminados": eliminados}
+
+
+def guardar_recetas(cursor, recetas: List[RecetaCreate]) -> dict:
+    """
+    Crea o actualiza (por nombre_plato) muchas recetas a la vez. No hace commit.
+    """
+    nombres = [r.nombre_plato for r in recetas]
+    duplicados = sorted({n for n in nombres if nombres.count(n) > 1})
+    if duplicados:
+        raise HTTPException(status_code=400, detail=f"Platos repetidos en la importación: {', '.join(duplicados)}")
+    for receta in recetas:
+        ids = [ing.ingrediente_id for ing in receta.ingredientes]
+        if len(ids) != len(set(ids)):
+            raise HTTPException(status_code=400, detail=f"La receta de '{receta.nombre_plato}' repite ingredientes.")
+
+    validar_platos_e_ingredientes(
+        cursor, nombres, sorted({ing.ingrediente_id for r in recetas for ing in r.ingredientes})
+    )
+
+    # Upsert de las recetas: solo se actualizan las que cambiaron de descripción o instrucciones
+    cambiadas = execute_values(cursor, """
+        INSERT INTO recetas (nombre_plato, descripcion, instrucciones)
+        VALUES %s
+        ON CONFLICT (nombre_plato) DO UPDATE SET
+            descripcion = EXCLUDED.descripcion,
+            instrucciones = EXCLUDED.instrucciones
+        WHERE (recetas.descripcion, recetas.instrucciones)
+              IS DISTINCT FROM (EXCLUDED.descripcion, EXCLUDED.instrucciones)
+        RETURNING (xmax = 0) AS insertada;
+    """, [(r.nombre_plato, r.descripcion, r.instrucciones) for r in recetas], page_size=len(recetas), fetch=True)
+    creadas = sum(1 for row in cambiadas if row['insertada'])
+
+    cursor.execute("SELECT id, nombre_plato FROM recetas WHERE nombre_plato = ANY(%s)", (nombres,))
+    id_por_plato = {row['nombre_plato']: row['id'] for row in cursor.fetchall()}
+
+    resumen_ingredientes = sincronizar_ingredientes(
+        cursor, {id_por_plato[r.nombre_plato]: r.ingredientes for r in recetas}
+    )
+    return {
+        "recetas_creadas": creadas,
+        "recetas_actualizadas": len(cambiadas) - creadas,
+        "ingredientes_insertados": resumen_ingredientes["insertados"],
+        "ingredientes_actualizados": resumen_ingredientes["actualizados"],
+        "ingredientes_eliminados": resumen_ingredientes["eliminados"],
+    }
+
+
+def leer_recetas_csv(texto: str) -> List[RecetaCreate]:
+    """
+    Convierte un CSV (una fila por ingrediente) en recetas. Columnas:
+    nombre_plato,descripcion,instrucciones,ingrediente_id,cantidad_necesaria,unidad_medida_necesaria
+    Una receta sin ingredientes se indica con una fila con ingrediente_id vacío.
+    """
+    recetas: Dict[str, dict] = {}
+    lector = csv.DictReader(io.StringIO(texto))
+    faltantes = {"nombre_plato", "ingrediente_id", "cantidad_necesaria", "unidad_medida_necesaria"} - set(lector.fieldnames or [])
+    if faltantes:
+        raise HTTPException(status_code=400, detail=f"Faltan columnas en el CSV: {', '.join(sorted(faltantes))}")
+    for numero, fila in enumerate(lector, start=2):
+        nombre = (fila.get("nombre_plato") or "").strip()
+        if not nombre:
+            raise HTTPException(status_code=400, detail=f"CSV línea {numero}: falta nombre_plato.")
+        receta = recetas.setdefault(nombre, {
+            "nombre_plato": nombre,
+            "descripcion": fila.get("descripcion") or "",
+            "instrucciones": fila.get("instrucciones") or "",
+            "ingredientes": [],
+        })
+        if (fila.get("ingrediente_id") or "").strip():
+            try:
+                receta["ingredientes"].append(IngredienteRecetaCreate(
+                    ingrediente_id=int(fila["ingrediente_id"]),
+                    cantidad_necesaria=float(fila["cantidad_necesaria"]),
+                    unidad_medida_necesaria=fila["unidad_medida_necesaria"].strip(),
+                ))
+            except (ValueError, TypeError, AttributeError):
+                raise HTTPException(status_code=400, detail=f"CSV línea {numero}: ingrediente_id/cantidad_necesaria/unidad_medida_necesaria inválidos.")
+    return [RecetaCreate(**r) for r in recetas.values()]
+
+# --- FIN ESCRITURA DE RECETAS POR LOTES ---
+
+
+@recetas_app.post("/bulk", response_model=ImportacionRecetasResponse)
+async def importar_recetas(request: Request, conn = Depends(get_db)):
+    """
+    Importa muchas recetas en una sola petición.
+    Acepta JSON ({"recetas": [...]} o una lista de RecetaCreate) o CSV (Content-Type: text/csv).
+    Las recetas que ya existen se actualizan y sus ingredientes se sincronizan con un diff mínimo.
+    """
+    tipo = request.headers.get("content-type", "")
+    cuerpo = await request.body()
+    try:
+        if "csv" in tipo:
+            recetas = leer_recetas_csv(cuerpo.decode("utf-8-sig"))
+        else:
+            datos = json.loads(cuerpo or b"[]")
+            if isinstance(datos, dict):
+                datos = datos.get("recetas", [])
+            recetas = [RecetaCreate(**r) for r in datos]
+    except HTTPException:
+        raise
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Formato de importación inválido: {e}")
+    if not recetas:
+        raise HTTPException(status_code=400, detail="No se recibieron recetas para importar.")
+    # La escritura es bloqueante (psycopg2): se ejecuta en el threadpool como los endpoints 'def'
+    return await run_in_threadpool(_importar_recetas_db, recetas, conn)
+
+
+def _importar_recetas_db(recetas: List[RecetaCreate], conn) -> dict:
+    try:
+        with conn.cursor() as cursor:
+            resumen = guardar_recetas(cursor, recetas)
+        conn.commit()
+        disponibilidad_menu.recetas_cambiadas(r.nombre_plato for r in recetas)
+        pronostico_inventario.invalidar()
+        resumen["recetas"] = [r.nombre_plato for r in recetas]
+        return resumen
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        print(f"Error en importar_recetas: {e}")
+        import traceback
+        traceback.print_exc() # Imprime el traceback completo
+        conn.rollback() # Revertir la transacción en caso de error inesperado
+        raise HTTPException(status_code=500, detail="Error interno del servidor al importar recetas.")
+
+
 @recetas_app.post("/", response_model=RecetaResponse)
 def crear_receta(receta: RecetaCreate, conn = Depends(get_db)):
     """
@@ -164,10 +388,8 @@ def crear_receta(receta: RecetaCreate, conn = Depends(get_db)):
     """
     try:
         with conn.cursor() as cursor:
-            # Verificar que el plato exista en la tabla 'menu'
-            cursor.execute("SELECT 1 FROM menu WHERE nombre = %s", (receta.nombre_plato,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=404, detail="Plato no encontrado en el menú.")
+            # Validar plato e ingredientes de una sola vez
+            validar_platos_e_ingredientes(cursor, [receta.nombre_plato], [ing.ingrediente_id for ing in receta.ingredientes])
 
             # Insertar la receta
             cursor.execute("""
@@ -177,26 +399,19 @@ def crear_receta(receta: RecetaCreate, conn = Depends(get_db)):
             """, (receta.nombre_plato, receta.descripcion, receta.instrucciones))
             receta_id = cursor.fetchone()['id']
 
-            # Insertar los ingredientes de la receta
-            for ing in receta.ingredientes:
-                # Verificar que el ingrediente exista en la tabla 'inventario'
-                cursor.execute("SELECT 1 FROM inventario WHERE id = %s", (ing.ingrediente_id,))
-                if not cursor.fetchone():
-                    conn.rollback() # Revertir si un ingrediente no existe
-                    raise HTTPException(status_code=404, detail=f"Ingrediente con ID {ing.ingrediente_id} no encontrado en el inventario.")
-                
-                cursor.execute("""
-                    INSERT INTO ingredientes_recetas (receta_id, ingrediente_id, cantidad_necesaria, unidad_medida_necesaria)
-                    VALUES (%s, %s, %s, %s);
-                """, (receta_id, ing.ingrediente_id, ing.cantidad_necesaria, ing.unidad_medida_necesaria))
+            # Insertar los ingredientes de la receta en un solo INSERT
+            sincronizar_ingredientes(cursor, {receta_id: receta.ingredientes})
 
             conn.commit()
+            disponibilidad_menu.recetas_cambiadas([receta.nombre_plato])
+            pronostico_inventario.invalidar()
             
             # Retornar la receta creada (opcional: llamar a obtener_receta_por_plato)
             return obtener_receta_por_plato(receta.nombre_plato, conn)
 
     except HTTPException:
         # Re-raise HTTP exceptions (como 404)
+        conn.rollback()
         raise
     except Exception as e:
         print(f"Error en crear_receta: {e}")
@@ -210,6 +425,7 @@ def crear_receta(receta: RecetaCreate, conn = Depends(get_db)):
 def actualizar_receta(nombre_plato: str, receta_actualizada: RecetaUpdate, conn = Depends(get_db)):
     """
     Actualiza una receta existente por el nombre del plato.
+    Si no se envían ingredientes, los actuales no se tocan.
     """
     try:
         with conn.cursor() as cursor:
@@ -221,43 +437,40 @@ def actualizar_receta(nombre_plato: str, receta_actualizada: RecetaUpdate, conn
             
             receta_id = receta_db['id']
 
-            # Actualizar campos básicos de la receta si se proporcionan
-            if receta_actualizada.nombre_plato is not None:
-                # Verificar que el nuevo nombre_plato exista en la tabla 'menu'
-                cursor.execute("SELECT 1 FROM menu WHERE nombre = %s", (receta_actualizada.nombre_plato,))
-                if not cursor.fetchone():
-                    raise HTTPException(status_code=404, detail="Nuevo plato no encontrado en el menú.")
-                cursor.execute("UPDATE recetas SET nombre_plato = %s WHERE id = %s", (receta_actualizada.nombre_plato, receta_id))
-            
-            if receta_actualizada.descripcion is not None:
-                cursor.execute("UPDATE recetas SET descripcion = %s WHERE id = %s", (receta_actualizada.descripcion, receta_id))
-            
-            if receta_actualizada.instrucciones is not None:
-                cursor.execute("UPDATE recetas SET instrucciones = %s WHERE id = %s", (receta_actualizada.instrucciones, receta_id))
+            # Validar el nuevo plato (si se renombra) y los ingredientes de una sola vez
+            validar_platos_e_ingredientes(
+                cursor,
+                [receta_actualizada.nombre_plato] if receta_actualizada.nombre_plato is not None else [],
+                [ing.ingrediente_id for ing in (receta_actualizada.ingredientes or [])]
+            )
+
+            # Actualizar en un solo UPDATE los campos básicos que se proporcionan
+            cambios = {
+                campo: valor for campo, valor in (
+                    ("nombre_plato", receta_actualizada.nombre_plato),
+                    ("descripcion", receta_actualizada.descripcion),
+                    ("instrucciones", receta_actualizada.instrucciones),
+                ) if valor is not None
+            }
+            if cambios:
+                asignaciones = ", ".join(f"{campo} = %s" for campo in cambios)
+                cursor.execute(f"UPDATE recetas SET {asignaciones} WHERE id = %s", (*cambios.values(), receta_id))
             
-            # Actualizar ingredientes: BORRAR TODOS Y REINSERTAR (simplificación)
-            # Opcional: Implementar lógica de borrado/selección individual si se desea mayor precisión
-            cursor.execute("DELETE FROM ingredientes_recetas WHERE receta_id = %s", (receta_id,))
-            for ing in receta_actualizada.ingredientes:
-                # Verificar que el ingrediente exista en la tabla 'inventario'
-                cursor.execute("SELECT 1 FROM inventario WHERE id = %s", (ing.ingrediente_id,))
-                if not cursor.fetchone():
-                    conn.rollback() # Revertir si un ingrediente no existe
-                    raise HTTPException(status_code=404, detail=f"Ingrediente con ID {ing.ingrediente_id} no encontrado en el inventario.")
-                
-                cursor.execute("""
-                    INSERT INTO ingredientes_recetas (receta_id, ingrediente_id, cantidad_necesaria, unidad_medida_necesaria)
-                    VALUES (%s, %s, %s, %s);
-                """, (receta_id, ing.ingrediente_id, ing.cantidad_necesaria, ing.unidad_medida_necesaria))
+            # Actualizar ingredientes con un diff mínimo (solo si se enviaron)
+            if receta_actualizada.ingredientes is not None:
+                sincronizar_ingredientes(cursor, {receta_id: receta_actualizada.ingredientes})
 
             conn.commit()
             
             # Retornar la receta actualizada (opcional: llamar a obtener_receta_por_plato)
             nombre_para_retorno = receta_actualizada.nombre_plato if receta_actualizada.nombre_plato is not None else nombre_plato
+            disponibilidad_menu.recetas_cambiadas({nombre_plato, nombre_para_retorno})
+            pronostico_inventario.invalidar()
             return obtener_receta_por_plato(nombre_para_retorno, conn)
 
     except HTTPException:
         # Re-raise HTTP exceptions (como 404)
+        conn.rollback()
         raise
     except Exception as e:
         print(f"Error en actualizar_receta: {e}")
@@ -283,6 +496,8 @@ def eliminar_receta(nombre_plato: str, conn = Depends(get_db)):
             # La FK con ON DELETE CASCADE hará el resto
             cursor.execute("DELETE FROM recetas WHERE nombre_plato = %s", (nombre_plato,))
             conn.commit()
+            disponibilidad_menu.recetas_cambiadas([nombre_plato])
+            pronostico_inventario.invalidar()
             return {"status": "ok", "message": "Receta eliminada"}
 
     except HTTPException:
@@ -2,16 +2,30 @@
 # Cliente HTTP para interactuar con la API de recetas del sistema de restaurante.
 
 import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class RecetasService:
     def __init__(self, base_url: str = "http://127.0.0.1:8000"):
         self.base_url = base_url.rstrip("/")
 
     # === MÉTODO: obtener_recetas ===
-    # Obtiene todas las recetas desde el backend.
-    def obtener_recetas(self) -> List[Dict[str, Any]]:
-        r = requests.get(f"{self.base_url}/recetas/")
+    # Obtiene las recetas desde el backend (una sola consulta SQL en el servidor).
+    def obtener_recetas(self, limite: Optional[int] = None, offset: int = 0, campos: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Args:
+            limite (int, optional): Máximo de recetas a devolver. Sin límite si es None.
+            offset (int): Cantidad de recetas a saltar (paginación).
+            campos (List[str], optional): Proyección de campos, ej: ["id", "nombre_plato"].
+        Returns:
+            List[Dict[str, Any]]: Lista de recetas con los campos pedidos.
+        """
+        params = {}
+        if limite is not None:
+            params["limite"] = limite
+            params["offset"] = offset
+        if campos:
+            params["fields"] = ",".join(campos)
+        r = requests.get(f"{self.base_url}/recetas/", params=params)
         r.raise_for_status()
         return r.json()
 
@@ -70,6 +84,37 @@ class RecetasService:
         r.raise_for_status()
         return r.json()
 
+    # === MÉTODO: importar_recetas ===
+    # Crea o actualiza muchas recetas en una sola petición (POST /recetas/bulk).
+    def importar_recetas(self, recetas: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Args:
+            recetas (List[Dict[str, Any]]): Recetas con el mismo formato que crear_receta.
+                Si una receta ya existe, sus ingredientes se reemplazan por los enviados (solo se tocan los que cambian).
+        Returns:
+            Dict[str, Any]: Resumen con recetas creadas/actualizadas e ingredientes insertados/actualizados/eliminados.
+        """
+        r = requests.post(f"{self.base_url}/recetas/bulk", json={"recetas": recetas})
+        r.raise_for_status()
+        return r.json()
+
+    # === MÉTODO: importar_recetas_csv ===
+    # Igual que importar_recetas pero a partir de un CSV (una fila por ingrediente).
+    def importar_recetas_csv(self, contenido_csv: str) -> Dict[str, Any]:
+        """
+        Args:
+            contenido_csv (str): Columnas nombre_plato,descripcion,instrucciones,ingrediente_id,cantidad_necesaria,unidad_medida_necesaria
+        Returns:
+            Dict[str, Any]: Resumen de la importación.
+        """
+        r = requests.post(
+            f"{self.base_url}/recetas/bulk",
+            data=contenido_csv.encode("utf-8"),
+            headers={"Content-Type": "text/csv"}
+        )
+        r.raise_for_status()
+        return r.json()
+
     # === MÉTODO: eliminar_receta ===
     # Elimina una receta por el nombre del plato.
     def eliminar_receta(self, nombre_plato: str) -> Dict[str, Any]:
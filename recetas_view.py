@@ -1,5 +1,6 @@
 # recetas_view.py
 import flet as ft
+from planificador_frames import marcar_actualizacion
 from typing import List, Dict, Any
 
 def crear_vista_recetas(recetas_service, menu_service, inventario_service, on_update_ui, page):
@@ -74,7 +75,7 @@ def crear_vista_recetas(recetas_service, menu_service, inventario_service, on_up
             inventario_items = inventario_service.obtener_inventario()
             ingrediente_dropdown.options = [ft.dropdown.Option(text=item["nombre"], key=str(item["id"])) for item in inventario_items]
             # No seleccionar ninguno por defecto
-            page.update() # Asegurar que la UI se actualice
+            marcar_actualizacion(page, ingrediente_dropdown) # Se envía en el próximo frame
             print(f"Dropdown de ingredientes actualizado con {len(inventario_items)} items.")
         except Exception as e:
             print(f"Error al actualizar datos de recetas: {e}")
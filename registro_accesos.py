@@ -0,0 +1,181 @@
+# === REGISTRO_ACCESOS.PY ===
+# Log de accesos estructurado: una línea JSON por request en logs/accesos.jsonl.
+# - MiddlewareAccesos (ASGI puro) mide el tiempo total, el status y los bytes de la respuesta.
+# - abrir_conexion() reemplaza a psycopg2.connect en los get_db: mide cuánto se esperó la conexión
+#   y usa CursorMedido, que cuenta las sentencias SQL y suma su tiempo.
+# - Las métricas del request viajan en un ContextVar. Los endpoints sync corren en el threadpool con
+#   una copia del contexto, que apunta al mismo objeto MetricasRequest.
+# El mismo middleware alimenta las métricas por ruta de GET /metrics (metricas.py), y el cursor pasa
+# las sentencias que superan el umbral a consultas_lentas.py.
+# Las sub-apps montadas también tienen el middleware, pero si el request ya viene medido por la app
+# principal no hacen nada (así funcionan igual si se levantan solas).
+#
+# Campos: ts, metodo, ruta (plantilla, p. ej. /pedidos/{pedido_id}), path, status, total_ms,
+#         db_espera_ms, db_conexiones, sql_sentencias, sql_ms, bytes_respuesta
+# Para agregarlos por ruta: python analizar_accesos.py
+
+import json
+import time
+import logging
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from configuracion_logs import NOMBRE_LOGGER_ACCESOS
+from consultas_lentas import consultas_lentas
+from metricas import (
+    requests_total, duracion_requests, requests_en_curso,
+    db_conexiones_en_uso, db_conexiones_total, db_espera_conexion,
+)
+
+log_accesos = logging.getLogger(NOMBRE_LOGGER_ACCESOS)
+
+RUTA_NO_ENCONTRADA = "<sin ruta>"
+
+
+class MetricasRequest:
+    __slots__ = ("path", "db_espera_s", "db_conexiones", "sql_sentencias", "sql_s")
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.db_espera_s = 0.0
+        self.db_conexiones = 0
+        self.sql_sentencias = 0
+        self.sql_s = 0.0
+
+
+_metricas: ContextVar[Optional[MetricasRequest]] = ContextVar("metricas_request", default=None)
+
+
+# === FUNCIÓN: metricas_actuales ===
+# Métricas del request en curso (None fuera de un request, p. ej. en los loops de fondo).
+def metricas_actuales() -> Optional[MetricasRequest]:
+    return _metricas.get()
+
+
+class CursorMedido(RealDictCursor):
+    """RealDictCursor que suma cada execute/executemany a las métricas del request en curso y
+    registra las que superan el umbral de consultas lentas.
+    execute_values pasa por execute, así que cuenta una sentencia por página."""
+
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._medir(time.perf_counter() - inicio)
+
+    def executemany(self, query, vars_list):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._medir(time.perf_counter() - inicio)
+
+    def _medir(self, duracion_s: float):
+        metricas = _metricas.get()
+        if metricas is not None:
+            metricas.sql_sentencias += 1
+            metricas.sql_s += duracion_s
+        if duracion_s >= consultas_lentas.umbral_s and self.query:
+            consultas_lentas.registrar(
+                self.query, duracion_s, getattr(self.connection, "dsn_original", None), metricas.path if metricas else None
+            )
+
+
+class ConexionMedida(psycopg2.extensions.connection):
+    """Conexión que descuenta el medidor de conexiones en uso al cerrarse. Guarda el DSN completo
+    (conn.dsn oculta la contraseña) para que consultas_lentas abra la suya al tomar planes."""
+    _en_uso = False
+    dsn_original = None
+
+    def close(self):
+        if self._en_uso:
+            self._en_uso = False
+            db_conexiones_en_uso.sumar(-1)
+        super().close()
+
+
+# === FUNCIÓN: abrir_conexion ===
+# Lo que usan los get_db del backend y de las sub-apps en lugar de psycopg2.connect.
+def abrir_conexion(dsn: str):
+    inicio = time.perf_counter()
+    conn = psycopg2.connect(dsn, connection_factory=ConexionMedida, cursor_factory=CursorMedido)
+    espera_s = time.perf_counter() - inicio
+    conn._en_uso = True
+    conn.dsn_original = dsn
+    db_conexiones_en_uso.sumar(1)
+    db_conexiones_total.inc()
+    db_espera_conexion.observar(espera_s)
+    metricas = _metricas.get()
+    if metricas is not None:
+        metricas.db_conexiones += 1
+        metricas.db_espera_s += espera_s
+    return conn
+
+
+# === FUNCIÓN: plantilla_ruta ===
+# Reconstruye la ruta declarada (/pedidos/{pedido_id}) a partir del path y de los path_params que
+# dejó el router en el scope; así el log no tiene una ruta distinta por cada id.
+def plantilla_ruta(path: str, scope) -> str:
+    if "endpoint" not in scope:
+        return RUTA_NO_ENCONTRADA
+    parametros = scope.get("path_params") or {}
+    if not parametros:
+        return path
+    por_valor = {str(valor): nombre for nombre, valor in parametros.items()}
+    return "/".join(f"{{{por_valor[s]}}}" if s in por_valor else s for s in path.split("/"))
+
+
+class MiddlewareAccesos:
+    """Middleware ASGI (sin BaseHTTPMiddleware, que agrega una tarea y copia el body)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _metricas.get() is not None:
+            await self.app(scope, receive, send)
+            return
+
+        # En Starlette, Mount reescribe scope["path"]: se guarda el original
+        path = scope.get("root_path", "") + scope["path"]
+        metricas = MetricasRequest(path)
+        token = _metricas.set(metricas)
+        respuesta = {"status": 500, "bytes": 0}
+        requests_en_curso.sumar(1)
+        inicio = time.perf_counter()
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                respuesta["status"] = mensaje["status"]
+            elif mensaje["type"] == "http.response.body":
+                respuesta["bytes"] += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            total_s = time.perf_counter() - inicio
+            _metricas.reset(token)
+            requests_en_curso.sumar(-1)
+            ruta = plantilla_ruta(path, scope)
+            requests_total.inc(scope["method"], ruta, str(respuesta["status"]))
+            duracion_requests.observar(total_s, scope["method"], ruta)
+            if log_accesos.isEnabledFor(logging.INFO):
+                log_accesos.info("%s", json.dumps({
+                    "ts": datetime.now().isoformat(timespec="milliseconds"),
+                    "metodo": scope["method"],
+                    "ruta": ruta,
+                    "path": path,
+                    "status": respuesta["status"],
+                    "total_ms": round(total_s * 1000, 3),
+                    "db_espera_ms": round(metricas.db_espera_s * 1000, 3),
+                    "db_conexiones": metricas.db_conexiones,
+                    "sql_sentencias": metricas.sql_sentencias,
+                    "sql_ms": round(metricas.sql_s * 1000, 3),
+                    "bytes_respuesta": respuesta["bytes"],
+                }, ensure_ascii=False))
@@ -1,13 +1,11 @@
 # reportes_view.py
 import flet as ft
-# --- IMPORTAR PLOTLY Y IO ---
-import plotly.graph_objects as go
-import plotly.express as px
+# --- IMPORTAR IO ---
+# plotly (y kaleido a través de to_image) y reportlab se importan dentro de
+# actualizar_reporte / guardar_pdf: tardan segundos en cargar y solo se
+# necesitan cuando se abre un reporte, no al arrancar el punto de venta.
 import io
 import base64
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
 import os
 # --- FIN IMPORTAR ---
 from typing import List, Dict, Any
@@ -162,6 +160,11 @@ def crear_vista_reportes(backend_service, on_update_ui, page):
     def guardar_pdf(e: ft.FilePickerResultEvent):
         if e.path:
             try:
+                # Import diferido: reportlab solo se carga al exportar
+                from reportlab.lib.pagesizes import letter
+                from reportlab.pdfgen import canvas
+                from reportlab.lib.utils import ImageReader
+
                 c = canvas.Canvas(e.path, pagesize=letter)
                 width, height = letter
                 
@@ -325,6 +328,10 @@ def crear_vista_reportes(backend_service, on_update_ui, page):
 
     def actualizar_reporte(e):
         try:
+            # Import diferido: plotly solo se carga al generar el primer reporte
+            import plotly.graph_objects as go
+            import plotly.express as px
+
             # Obtener tipo de reporte y fecha
             tipo = tipo_reporte_dropdown.value
             # Corrección para extraer la fecha
@@ -48,6 +48,31 @@ class ReservasService:
         r.raise_for_status()
         return r.json()
 
+    # === MÉTODO: crear_reservas_bulk ===
+    # Crea varias reservas de un cliente en una sola llamada (grupos y/o turnos recurrentes).
+    def crear_reservas_bulk(self, cliente_id: int, turnos: List[Dict[str, Any]], repeticiones: int = 1, cada_dias: int = 7, todo_o_nada: bool = True) -> Dict[str, Any]:
+        """
+        Crea reservas en lote.
+        Args:
+            cliente_id (int): ID del cliente.
+            turnos (List[Dict[str, Any]]): [{"mesa_numero", "fecha_hora_inicio", "fecha_hora_fin"}].
+            repeticiones (int): Veces que se repite cada turno (ej. 8 semanas).
+            cada_dias (int): Días entre repeticiones.
+            todo_o_nada (bool): Si hay algún conflicto no se crea ninguna reserva.
+        Returns:
+            Dict[str, Any]: {"status", "solicitadas", "creadas": [...], "conflictos": [...]}.
+        """
+        payload = {
+            "cliente_id": cliente_id,
+            "turnos": turnos,
+            "repeticiones": repeticiones,
+            "cada_dias": cada_dias,
+            "todo_o_nada": todo_o_nada
+        }
+        r = requests.post(f"{self.base_url}/reservas/bulk", json=payload)
+        r.raise_for_status()
+        return r.json()
+
     # === MÉTODO: eliminar_reserva ===
     # Elimina una reserva existente por su ID.
     def eliminar_reserva(self, reserva_id: int) -> Dict[str, Any]:
@@ -91,17 +116,41 @@ class ReservasService:
         return r.json()
 
     # === MÉTODO: obtener_mesas_disponibles ===
-    # Obtiene la lista de mesas disponibles para una fecha y hora específica.
-    def obtener_mesas_disponibles(self, fecha_hora: str) -> List[Dict[str, Any]]:
+    # Obtiene las mesas libres durante un intervalo con capacidad para 'personas'.
+    def obtener_mesas_disponibles(self, desde: str, hasta: str = None, personas: int = 1) -> List[Dict[str, Any]]:
+        """
+        Obtiene mesas disponibles durante un intervalo.
+        Args:
+            desde (str): Inicio del intervalo (formato: 'YYYY-MM-DD HH:MM:SS').
+            hasta (str, optional): Fin del intervalo; por defecto el backend asume 1 hora.
+            personas (int): Cantidad de comensales.
+        Returns:
+            List[Dict[str, Any]]: Lista de mesas disponibles, de menor a mayor capacidad.
+        """
+        params = {"desde": desde, "personas": personas}
+        if hasta:
+            params["hasta"] = hasta
+        r = requests.get(f"{self.base_url}/mesas/disponibles", params=params)
+        r.raise_for_status()
+        return r.json()
+
+    # === MÉTODO: obtener_grilla_disponibilidad ===
+    # Obtiene la grilla de turnos libres por mesa para una noche completa.
+    def obtener_grilla_disponibilidad(self, fecha: str, desde: str = "18:00", hasta: str = "23:00", intervalo: int = 15, duracion: int = 60, personas: int = 1) -> Dict[str, Any]:
         """
-        Obtiene mesas disponibles para una fecha y hora específica.
+        Obtiene la disponibilidad de todas las mesas en turnos de 'intervalo' minutos.
         Args:
-            fecha_hora (str): Fecha y hora para verificar disponibilidad (formato: 'YYYY-MM-DD HH:MM:SS').
+            fecha (str): Fecha en formato 'YYYY-MM-DD'.
+            desde (str): Hora del primer turno (HH:MM).
+            hasta (str): Hora de cierre (HH:MM).
+            intervalo (int): Minutos entre turnos.
+            duracion (int): Minutos que ocuparía la reserva.
+            personas (int): Cantidad de comensales.
         Returns:
-            List[Dict[str, Any]]: Lista de mesas disponibles.
+            Dict[str, Any]: {"turnos": [...], "mesas": [{"numero", "capacidad", "libres": [bool, ...]}]}.
         """
-        params = {"fecha_hora": fecha_hora}
-        r = requests.get(f"{self.base_url}/mesas/disponibles/", params=params)
+        params = {"fecha": fecha, "desde": desde, "hasta": hasta, "intervalo": intervalo, "duracion": duracion, "personas": personas}
+        r = requests.get(f"{self.base_url}/mesas/disponibilidad", params=params)
         r.raise_for_status()
         return r.json()
 
@@ -1,5 +1,6 @@
 # reservas_view.py
 import flet as ft
+from planificador_frames import marcar_actualizacion
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
 
@@ -27,6 +28,10 @@ def crear_vista_reservas(reservas_service, clientes_service, mesas_service, on_u
 
     hora_inicio = ft.TextField(label="Hora Inicio (HH:MM)", width=150)
     duracion_horas = ft.TextField(label="Duración (Horas)", width=150, value="1")
+    repetir_semanas = ft.TextField(label="Repetir (Semanas)", width=150, value="1")
+
+    # Grilla de disponibilidad de la noche (turnos de 15 minutos por mesa)
+    grilla_disponibilidad = ft.Column(spacing=2)
 
     # Lista de reservas
     lista_reservas = ft.ListView(
@@ -42,13 +47,62 @@ def crear_vista_reservas(reservas_service, clientes_service, mesas_service, on_u
             clientes = clientes_service.obtener_clientes()
             # CORREGIDO: Usar text=c["nombre"] para mostrar el nombre, y key=str(c["id"]) para el ID interno
             cliente_dropdown.options = [ft.dropdown.Option(text=c["nombre"], key=str(c["id"])) for c in clientes]
-            page.update()
+            marcar_actualizacion(page, cliente_dropdown)
         except Exception as e:
             print(f"Error al cargar clientes: {e}")
             # CORREGIDO: Usar text= para el mensaje de error, y key= para un identificador único
             cliente_dropdown.options = [ft.dropdown.Option(text="Error al cargar clientes", key="-1")]
 
 
+    def seleccionar_turno(mesa_numero: int, turno: str):
+        """Completa el formulario con la mesa y hora del turno libre elegido en la grilla."""
+        mesa_dropdown.value = str(mesa_numero)
+        hora_inicio.value = turno
+        marcar_actualizacion(page, mesa_dropdown, hora_inicio)
+
+    def actualizar_grilla(fecha: str):
+        """Pide al backend la grilla de la noche (una sola consulta) y la dibuja."""
+        try:
+            duracion_min = max(int(float(duracion_horas.value or 1) * 60), 5)
+        except ValueError:
+            duracion_min = 60
+        try:
+            grilla = reservas_service.obtener_grilla_disponibilidad(fecha=fecha, duracion=duracion_min)
+        except Exception as e:
+            print(f"Error al cargar disponibilidad de mesas: {e}")
+            return
+        turnos = grilla["turnos"]
+        grilla_disponibilidad.controls.clear()
+        # Encabezado: solo las horas en punto
+        grilla_disponibilidad.controls.append(ft.Row(
+            [ft.Container(width=90)] + [
+                ft.Container(
+                    content=ft.Text(t if t.endswith(":00") else "", size=10, no_wrap=True, overflow=ft.TextOverflow.VISIBLE),
+                    width=16
+                )
+                for t in turnos
+            ],
+            spacing=2
+        ))
+        for mesa in grilla["mesas"]:
+            celdas = [
+                ft.Container(
+                    width=16,
+                    height=16,
+                    border_radius=3,
+                    bgcolor=ft.Colors.GREEN_700 if libre else ft.Colors.RED_700,
+                    tooltip=f"Mesa {mesa['numero']} {turno}: {'libre' if libre else 'reservada'}",
+                    on_click=(lambda e, n=mesa['numero'], t=turno: seleccionar_turno(n, t)) if libre else None
+                )
+                for turno, libre in zip(turnos, mesa["libres"])
+            ]
+            grilla_disponibilidad.controls.append(ft.Row(
+                [ft.Text(f"Mesa {mesa['numero']} ({mesa['capacidad']})", width=90, size=12)] + celdas,
+                spacing=2
+            ))
+        # Las mesas del dropdown salen de la misma respuesta
+        mesa_dropdown.options = [ft.dropdown.Option(str(m["numero"])) for m in grilla["mesas"]]
+
     def actualizar_reservas_fecha(e):
         try:
             fecha_str = fecha_reservas_text.value.split(": ")[1]
@@ -78,6 +132,7 @@ def crear_vista_reservas(reservas_service, clientes_service, mesas_service, on_u
                     border_radius=10
                 )
                 lista_reservas.controls.append(item_row)
+            actualizar_grilla(fecha)
             page.update()
         except Exception as e:
             print(f"Error al cargar reservas: {e}")
@@ -98,15 +153,8 @@ def crear_vista_reservas(reservas_service, clientes_service, mesas_service, on_u
             cliente_id = int(cliente_id_str)
             print(f"Usando cliente con ID: {cliente_id}")
 
-            # CORREGIDO: No es necesario buscar en la lista de clientes_existentes aquí
-            # ya que el ID lo obtuvimos directamente del key del dropdown.
-            # Si se quisiera mostrar el nombre en un mensaje, se podría hacer una
-            # pequeña búsqueda local o asumir que el backend validará el ID.
-            clientes_existentes = clientes_service.obtener_clientes()
-            cliente_nombre = next((c["nombre"] for c in clientes_existentes if c["id"] == cliente_id), "Cliente No Encontrado")
-            if cliente_nombre == "Cliente No Encontrado":
-                 print(f"Cliente con ID {cliente_id} no encontrado en la lista cargada.")
-                 return # Salir si el cliente no está en la lista (raro si se seleccionó del dropdown)
+            # El nombre sale de las opciones ya cargadas; el backend valida que el cliente exista
+            cliente_nombre = next((o.text for o in cliente_dropdown.options if o.key == cliente_id_str), f"Cliente {cliente_id}")
 
 
             mesa_numero = int(mesa_numero_str)
@@ -144,6 +192,14 @@ def crear_vista_reservas(reservas_service, clientes_service, mesas_service, on_u
             except ValueError:
                 print(f"Formato de duración inválido: {duracion_horas_str}. Use un número (ej. 1.5).")
                 return
+
+            try:
+                semanas = int(repetir_semanas.value or 1)
+                if not 1 <= semanas <= 52:
+                    raise ValueError
+            except ValueError:
+                print(f"Cantidad de semanas inválida: {repetir_semanas.value}. Use un número entre 1 y 52.")
+                return
             # --- FIN VALIDACIONES ---
 
             # Construir datetime para inicio y fin
@@ -151,20 +207,32 @@ def crear_vista_reservas(reservas_service, clientes_service, mesas_service, on_u
             duracion = timedelta(hours=duracion_horas_float)
             fin_dt = inicio_dt + duracion
 
-            # Crear reserva
-            print(f"Intentando crear reserva para Mesa {mesa_numero}, Cliente ID {cliente_id}, Fecha {fecha_base}, Hora Inicio {hora_inicio_str}, Duración {duracion_horas_float} horas.")
-            resultado = reservas_service.crear_reserva(
-                mesa_numero=mesa_numero,
-                cliente_id=cliente_id, # CORREGIDO: Usar el ID obtenido del key del dropdown
-                fecha_hora_inicio=inicio_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                fecha_hora_fin=fin_dt.strftime("%Y-%m-%d %H:%M:%S")
+            # Crear reserva(s): el backend valida solapamientos de todos los turnos en una sola consulta
+            print(f"Intentando crear reserva para Mesa {mesa_numero}, Cliente ID {cliente_id}, Fecha {fecha_base}, Hora Inicio {hora_inicio_str}, Duración {duracion_horas_float} horas, {semanas} semana(s).")
+            resultado = reservas_service.crear_reservas_bulk(
+                cliente_id=cliente_id,
+                turnos=[{
+                    "mesa_numero": mesa_numero,
+                    "fecha_hora_inicio": inicio_dt.strftime("%Y-%m-%d %H:%M:%S"),
+                    "fecha_hora_fin": fin_dt.strftime("%Y-%m-%d %H:%M:%S")
+                }],
+                repeticiones=semanas,
+                cada_dias=7
             )
-            print(f"Reserva creada exitosamente: {resultado}")
+            if resultado["conflictos"]:
+                for conflicto in resultado["conflictos"]:
+                    print(f"Conflicto Mesa {conflicto['mesa_numero']} {conflicto['fecha_hora_inicio']}: {'; '.join(conflicto['motivos'])}")
+                print(f"No se creó ninguna reserva: {len(resultado['conflictos'])} de {resultado['solicitadas']} turnos tienen conflicto.")
+                actualizar_grilla(fecha_base.strftime("%Y-%m-%d"))
+                marcar_actualizacion(page)
+                return
+            print(f"{len(resultado['creadas'])} reserva(s) creada(s) exitosamente.")
             # Limpiar campos y actualizar vista
             cliente_dropdown.value = "" # Limpiar la selección de cliente
             mesa_dropdown.value = "" # Limpiar la selección de mesa
             hora_inicio.value = ""
             duracion_horas.value = "1" # Reiniciar a valor por defecto
+            repetir_semanas.value = "1"
             actualizar_reservas_fecha(None) # Actualizar la lista de esta vista
             on_update_ui() # Actualizar la vista de mesas también
             print(f"Reserva para {cliente_nombre} (ID: {cliente_id}) en Mesa {mesa_numero} el {fecha_base} a las {hora_inicio_str} creada exitosamente.")
@@ -188,7 +256,7 @@ def crear_vista_reservas(reservas_service, clientes_service, mesas_service, on_u
 
 
     # Configurar DatePicker
-    fecha_reservas_picker.on_change = lambda e: setattr(fecha_reservas_text, 'value', f"Fecha: {e.control.value.strftime('%Y-%m-%d')}") or page.update()
+    fecha_reservas_picker.on_change = lambda e: setattr(fecha_reservas_text, 'value', f"Fecha: {e.control.value.strftime('%Y-%m-%d')}") or actualizar_reservas_fecha(None)
 
     # Cargar clientes al inicializar la vista
     cargar_clientes()
@@ -207,13 +275,16 @@ def crear_vista_reservas(reservas_service, clientes_service, mesas_service, on_u
             cliente_dropdown,  # Dropdown para cliente existente
             mesa_dropdown,     # Dropdown para seleccionar mesa (1-6)
             # --- FIN CAMPOS MODIFICADOS ---
-            ft.Row([hora_inicio, duracion_horas]),
+            ft.Row([hora_inicio, duracion_horas, repetir_semanas]),
             ft.ElevatedButton(
                 "Crear Reserva",
                 on_click=crear_reserva_click,
                 style=ft.ButtonStyle(bgcolor=ft.Colors.GREEN_700, color=ft.Colors.WHITE)
             ),
             ft.Divider(),
+            ft.Text("Disponibilidad de la Noche (verde = libre, clic para elegir)", size=18, weight=ft.FontWeight.BOLD),
+            ft.Row([grilla_disponibilidad], scroll=ft.ScrollMode.AUTO),
+            ft.Divider(),
             ft.Text("Reservas para la Fecha", size=18, weight=ft.FontWeight.BOLD),
             lista_reservas
         ]),
@@ -0,0 +1,373 @@
+# === RESPALDOS.PY ===
+# Respaldos de la base de datos como trabajos en segundo plano.
+# - POST /backup crea un trabajo y responde al instante con su id; GET /backup/{id} informa el avance.
+# - Un solo pg_dump a la vez: si ya hay uno en cola o corriendo, se devuelve ese mismo trabajo.
+# - La salida de 'pg_dump -Fc -Z0' se lee por bloques y se comprime con gzip directo a disco
+#   (archivo .parcial que se renombra al terminar bien).
+# - Al completar se podan los respaldos viejos de la carpeta (RETENCION_RESPALDOS).
+# Respaldo incremental (sección 10 de SqlPRO.sql):
+# - Los triggers anotan cada cambio de pedidos, inventario, reservas, clientes y menu en respaldo_cambios.
+# - volcar_segmentos() pasa esas filas a segmentos .jsonl.gz en 'incrementales/' y las borra de la tabla.
+# - Cada respaldo completo se toma sobre un snapshot exportado y guarda su txid_current_snapshot()
+#   en un .json al lado; así restaurar_respaldo.py sabe qué cambios de los segmentos ya contiene.
+# Con esto alcanza con un respaldo completo semanal (INTERVALO_RESPALDO_COMPLETO_S).
+#
+# Restaurar: python restaurar_respaldo.py --hasta "YYYY-MM-DD HH:MM:SS"
+
+import os
+import glob
+import gzip
+import shutil
+import logging
+import subprocess
+import threading
+import time
+import uuid
+import json
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import psycopg2
+from psycopg2.extensions import parse_dsn
+from psycopg2.extras import RealDictCursor
+
+from metricas import respaldo_duracion, respaldo_ultimo
+
+log = logging.getLogger("RestaurantIA.respaldos")
+
+# Conexión usada por pg_dump: la misma base que DATABASE_URL del backend (RESTAURANTIA_DATABASE_URL),
+# así el backend de benchmark_carga.py respalda su propia base y no restaurant_db.
+_DSN = parse_dsn(os.environ.get("RESTAURANTIA_DATABASE_URL", "dbname=restaurant_db user=postgres password=postgres host=localhost port=5432"))
+PG_CONEXION = {
+    "usuario": _DSN.get("user", "postgres"),
+    "password": _DSN.get("password", "postgres"),
+    "host": _DSN.get("host", "localhost"),
+    "puerto": _DSN.get("port", "5432"),
+    "base": _DSN.get("dbname", "restaurant_db"),
+}
+
+DIRECTORIO_RESPALDOS = os.path.join(os.path.expanduser("~"), "Desktop", "Backups_RestaurantPRO")
+# Otra base no comparte segmentos con restaurant_db (restaurar_respaldo.py los reaplicaría todos)
+CARPETA_INCREMENTALES = "incrementales" if PG_CONEXION["base"] == "restaurant_db" else f"incrementales_{PG_CONEXION['base']}"
+DIRECTORIO_INCREMENTALES = os.path.join(DIRECTORIO_RESPALDOS, CARPETA_INCREMENTALES)
+PREFIJO_RESPALDO = f"backup_{PG_CONEXION['base']}_"
+PREFIJO_SEGMENTO = "incremental_"
+RETENCION_RESPALDOS = 14  # Respaldos completos que se conservan
+MAX_TRABAJOS_EN_MEMORIA = 50
+TAMANO_BLOQUE = 1024 * 1024
+NIVEL_GZIP = 6
+INTERVALO_SEGMENTO_RESPALDO_S = 900  # Cada 15 minutos se vuelca el registro de cambios
+INTERVALO_RESPALDO_COMPLETO_S = 7 * 24 * 3600  # Respaldo completo semanal
+MAX_CAMBIOS_POR_SEGMENTO = 50000
+
+
+# === FUNCIÓN: find_pg_dump ===
+# Busca un binario de PostgreSQL (pg_dump, pg_restore, psql) en el PATH o en la instalación de Windows.
+def find_pg_dump(binario: str = "pg_dump"):
+    path_in_path = shutil.which(binario)
+    if path_in_path:
+        log.debug(f"{binario} encontrado en PATH: {path_in_path}")
+        return path_in_path
+
+    possible_paths = glob.glob(f"C:/Program Files/PostgreSQL/*/bin/{binario}.exe")
+    if possible_paths:
+        possible_paths.sort()
+        elegido = possible_paths[-1]
+        log.debug(f"{binario} encontrado en instalación: {elegido}")
+        return elegido
+
+    log.error(f"{binario} NO ENCONTRADO en el sistema")
+    return None
+
+
+def entorno_pg() -> Dict[str, str]:
+    env = os.environ.copy()
+    env["PGPASSWORD"] = PG_CONEXION["password"]
+    return env
+
+
+def argumentos_conexion_pg(base: Optional[str] = None) -> List[str]:
+    return ["-U", PG_CONEXION["usuario"], "-h", PG_CONEXION["host"], "-p", PG_CONEXION["puerto"], "-d", base or PG_CONEXION["base"]]
+
+
+def dsn_pg(base: Optional[str] = None) -> str:
+    return (
+        f"dbname={base or PG_CONEXION['base']} user={PG_CONEXION['usuario']} password={PG_CONEXION['password']} "
+        f"host={PG_CONEXION['host']} port={PG_CONEXION['puerto']}"
+    )
+
+
+def metadatos_respaldo(archivo: str) -> Optional[Dict]:
+    """Lee el .json que acompaña a un respaldo completo (snapshot y fecha). None si no tiene."""
+    try:
+        with open(archivo + ".json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def listar_respaldos_completos(directorio: str = DIRECTORIO_RESPALDOS) -> List[str]:
+    """Respaldos completos .dump.gz, del más nuevo al más viejo."""
+    return sorted(glob.glob(os.path.join(directorio, f"{PREFIJO_RESPALDO}*.dump.gz")), key=os.path.getmtime, reverse=True)
+
+
+def listar_segmentos(directorio: str = DIRECTORIO_INCREMENTALES) -> List[str]:
+    """Segmentos incrementales en orden de volcado (el nombre empieza con la fecha)."""
+    return sorted(glob.glob(os.path.join(directorio, f"{PREFIJO_SEGMENTO}*.jsonl.gz")))
+
+
+@dataclass
+class TrabajoRespaldo:
+    id: str
+    estado: str  # en_cola | en_curso | completado | error
+    archivo: Optional[str] = None
+    bytes_leidos: int = 0  # Salida de pg_dump sin comprimir
+    bytes_escritos: int = 0  # Bytes comprimidos en disco
+    creado: str = ""
+    iniciado: Optional[str] = None
+    terminado: Optional[str] = None
+    error: Optional[str] = None
+    eliminados: int = 0  # Respaldos viejos podados al terminar
+
+    def a_dict(self) -> Dict:
+        return asdict(self)
+
+
+class GestorRespaldos:
+    def __init__(self, directorio: str = DIRECTORIO_RESPALDOS, retencion: int = RETENCION_RESPALDOS):
+        self.directorio = directorio
+        self.retencion = retencion
+        self._lock = threading.Lock()
+        self._trabajos: Dict[str, TrabajoRespaldo] = {}
+        self._activo: Optional[str] = None
+        self._lock_segmentos = threading.Lock()
+        self.directorio_incrementales = os.path.join(directorio, CARPETA_INCREMENTALES)
+
+    # === MÉTODO: iniciar ===
+    # Devuelve (trabajo, creado). Si ya hay un respaldo en cola o en curso, devuelve ese (creado=False).
+    def iniciar(self):
+        with self._lock:
+            if self._activo:
+                return self._trabajos[self._activo], False
+            trabajo = TrabajoRespaldo(id=uuid.uuid4().hex[:12], estado="en_cola", creado=datetime.now().isoformat(timespec="seconds"))
+            self._trabajos[trabajo.id] = trabajo
+            self._activo = trabajo.id
+            self._podar_trabajos()
+        threading.Thread(target=self._ejecutar, args=(trabajo,), daemon=True, name=f"respaldo_{trabajo.id}").start()
+        return trabajo, True
+
+    # === MÉTODO: obtener ===
+    def obtener(self, trabajo_id: str) -> Optional[TrabajoRespaldo]:
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    # === MÉTODO: listar ===
+    def listar(self) -> List[TrabajoRespaldo]:
+        with self._lock:
+            return sorted(self._trabajos.values(), key=lambda t: t.creado, reverse=True)
+
+    def _ejecutar(self, trabajo: TrabajoRespaldo):
+        parcial = None
+        conn_snapshot = None
+        inicio_trabajo = time.monotonic()
+        try:
+            pg_dump_exe = find_pg_dump()
+            if not pg_dump_exe:
+                raise RuntimeError("No se encontró pg_dump. Instala PostgreSQL o agrégalo al PATH.")
+
+            os.makedirs(self.directorio, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            destino = os.path.join(self.directorio, f"{PREFIJO_RESPALDO}{timestamp}.dump.gz")
+            parcial = destino + ".parcial"
+            with self._lock:
+                trabajo.estado = "en_curso"
+                trabajo.archivo = destino
+                trabajo.iniciado = datetime.now().isoformat(timespec="seconds")
+
+            # Snapshot exportado: el dump ve exactamente lo mismo que esta transacción, y su
+            # txid_current_snapshot() indica qué cambios del registro incremental ya están incluidos.
+            conn_snapshot = psycopg2.connect(dsn_pg(), cursor_factory=RealDictCursor)
+            conn_snapshot.set_session(isolation_level="REPEATABLE READ", readonly=True)
+            with conn_snapshot.cursor() as cursor:
+                cursor.execute("SELECT pg_export_snapshot() AS snapshot, txid_current_snapshot()::text AS txids, LOCALTIMESTAMP AS ts;")
+                snapshot = cursor.fetchone()
+
+            comando = [pg_dump_exe] + argumentos_conexion_pg() + [
+                "-Fc", "-Z0", f"--snapshot={snapshot['snapshot']}", "--exclude-table-data=respaldo_cambios"
+            ]
+            log.warning(f"RESPALDO {trabajo.id} → pg_dump en curso → {destino}")
+            inicio = time.monotonic()
+            proceso = subprocess.Popen(comando, env=entorno_pg(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            # stderr en otro hilo para que no se llene su buffer mientras se lee stdout
+            errores = []
+            lector_errores = threading.Thread(target=lambda: errores.append(proceso.stderr.read()), daemon=True)
+            lector_errores.start()
+
+            with open(parcial, "wb") as salida_cruda, gzip.GzipFile(fileobj=salida_cruda, mode="wb", compresslevel=NIVEL_GZIP) as salida:
+                while True:
+                    bloque = proceso.stdout.read(TAMANO_BLOQUE)
+                    if not bloque:
+                        break
+                    salida.write(bloque)
+                    with self._lock:
+                        trabajo.bytes_leidos += len(bloque)
+                        trabajo.bytes_escritos = salida_cruda.tell()
+            codigo = proceso.wait()
+            lector_errores.join(timeout=5)
+            if codigo != 0:
+                detalle = b"".join(errores).decode("utf-8", "replace").strip()
+                raise RuntimeError(f"pg_dump terminó con código {codigo}: {detalle}")
+
+            os.replace(parcial, destino)
+            parcial = None
+            with open(destino + ".json", "w", encoding="utf-8") as f:
+                json.dump({"txid_snapshot": snapshot['txids'], "snapshot_ts": snapshot['ts'].isoformat(), "trabajo": trabajo.id}, f)
+            eliminados = self.podar_respaldos()
+            with self._lock:
+                trabajo.bytes_escritos = os.path.getsize(destino)
+                trabajo.estado = "completado"
+                trabajo.eliminados = eliminados
+                trabajo.terminado = datetime.now().isoformat(timespec="seconds")
+            log.info(
+                f"RESPALDO {trabajo.id} COMPLETADO → {destino} | {trabajo.bytes_leidos / 1024 / 1024:.1f} MB → "
+                f"{trabajo.bytes_escritos / 1024 / 1024:.1f} MB en {time.monotonic() - inicio:.1f}s | {eliminados} viejos eliminados"
+            )
+        except Exception as e:
+            log.error(f"RESPALDO {trabajo.id} FALLÓ → {e}", exc_info=True)
+            with self._lock:
+                trabajo.estado = "error"
+                trabajo.error = str(e)
+                trabajo.terminado = datetime.now().isoformat(timespec="seconds")
+            if parcial and os.path.exists(parcial):
+                try:
+                    os.remove(parcial)
+                except OSError:
+                    pass
+        finally:
+            if conn_snapshot is not None:
+                conn_snapshot.close()
+            with self._lock:
+                if self._activo == trabajo.id:
+                    self._activo = None
+            respaldo_duracion.observar(time.monotonic() - inicio_trabajo, "completo", trabajo.estado)
+            if trabajo.estado == "completado":
+                respaldo_ultimo.fijar(time.time(), "completo")
+
+    # === MÉTODO: podar_respaldos ===
+    # Conserva los 'retencion' respaldos completos más recientes de la carpeta. Devuelve cuántos borró.
+    def podar_respaldos(self) -> int:
+        archivos = sorted(
+            glob.glob(os.path.join(self.directorio, f"{PREFIJO_RESPALDO}*.dump.gz"))
+            + glob.glob(os.path.join(self.directorio, f"{PREFIJO_RESPALDO}*.sql")),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        eliminados = 0
+        for archivo in archivos[self.retencion:]:
+            try:
+                os.remove(archivo)
+                if os.path.exists(archivo + ".json"):
+                    os.remove(archivo + ".json")
+                eliminados += 1
+                log.info(f"Respaldo viejo eliminado por retención → {archivo}")
+            except OSError as e:
+                log.warning(f"No se pudo eliminar respaldo viejo {archivo} → {e}")
+        self.podar_segmentos()
+        return eliminados
+
+    # === MÉTODO: podar_segmentos ===
+    # Borra los segmentos volcados antes del snapshot del respaldo completo más viejo que se conserva:
+    # todos sus cambios ya están dentro de ese respaldo.
+    def podar_segmentos(self) -> int:
+        completos = listar_respaldos_completos(self.directorio)
+        metadatos = metadatos_respaldo(completos[-1]) if completos else None
+        if not metadatos:
+            return 0
+        corte = datetime.fromisoformat(metadatos["snapshot_ts"]).strftime("%Y%m%d_%H%M%S")
+        eliminados = 0
+        for segmento in listar_segmentos(self.directorio_incrementales):
+            volcado = os.path.basename(segmento)[len(PREFIJO_SEGMENTO):len(PREFIJO_SEGMENTO) + 15]
+            if volcado < corte:
+                try:
+                    os.remove(segmento)
+                    eliminados += 1
+                except OSError as e:
+                    log.warning(f"No se pudo eliminar segmento viejo {segmento} → {e}")
+        if eliminados:
+            log.info(f"{eliminados} segmentos incrementales eliminados (anteriores al respaldo completo más viejo)")
+        return eliminados
+
+    # === MÉTODO: volcar_segmentos ===
+    # Pasa el registro de cambios a segmentos .jsonl.gz y borra de la tabla lo ya escrito.
+    # Solo se borran los ids volcados: un cambio con id menor que confirme más tarde entra en el próximo.
+    def volcar_segmentos(self) -> List[str]:
+        if not self._lock_segmentos.acquire(blocking=False):
+            return []
+        creados = []
+        inicio = time.monotonic()
+        estado = "error"
+        try:
+            os.makedirs(self.directorio_incrementales, exist_ok=True)
+            conn = psycopg2.connect(dsn_pg(), cursor_factory=RealDictCursor)
+            try:
+                while True:
+                    with conn.cursor() as cursor:
+                        cursor.execute("""
+                            SELECT id, txid, ts, tabla, operacion, registro_id, fila
+                            FROM respaldo_cambios
+                            ORDER BY id
+                            LIMIT %s;
+                        """, (MAX_CAMBIOS_POR_SEGMENTO,))
+                        cambios = cursor.fetchall()
+                    if not cambios:
+                        conn.rollback()
+                        break
+                    ahora = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    destino = os.path.join(
+                        self.directorio_incrementales,
+                        f"{PREFIJO_SEGMENTO}{ahora}_{cambios[0]['id']}-{cambios[-1]['id']}.jsonl.gz"
+                    )
+                    with open(destino + ".parcial", "wb") as salida_cruda:
+                        with gzip.GzipFile(fileobj=salida_cruda, mode="wb", compresslevel=NIVEL_GZIP) as salida:
+                            for cambio in cambios:
+                                cambio["ts"] = cambio["ts"].isoformat()
+                                salida.write(json.dumps(cambio, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+                        salida_cruda.flush()
+                        os.fsync(salida_cruda.fileno())
+                    os.replace(destino + ".parcial", destino)
+                    with conn.cursor() as cursor:
+                        cursor.execute("DELETE FROM respaldo_cambios WHERE id = ANY(%s);", ([c['id'] for c in cambios],))
+                    conn.commit()
+                    creados.append(destino)
+                    log.info(f"Segmento incremental volcado → {os.path.basename(destino)} | {len(cambios)} cambios")
+                    if len(cambios) < MAX_CAMBIOS_POR_SEGMENTO:
+                        break
+            finally:
+                conn.close()
+            estado = "completado"
+        finally:
+            self._lock_segmentos.release()
+            respaldo_duracion.observar(time.monotonic() - inicio, "segmento", estado)
+            if estado == "completado":
+                respaldo_ultimo.fijar(time.time(), "segmento")
+        return creados
+
+    # === MÉTODO: respaldo_completo_vencido ===
+    # True si el respaldo completo más nuevo es más viejo que INTERVALO_RESPALDO_COMPLETO_S (o no hay).
+    def respaldo_completo_vencido(self) -> bool:
+        completos = listar_respaldos_completos(self.directorio)
+        if not completos:
+            return True
+        antiguedad = datetime.now() - datetime.fromtimestamp(os.path.getmtime(completos[0]))
+        return antiguedad > timedelta(seconds=INTERVALO_RESPALDO_COMPLETO_S)
+
+    def _podar_trabajos(self):
+        terminados = [t for t in self._trabajos.values() if t.estado in ("completado", "error")]
+        terminados.sort(key=lambda t: t.creado)
+        for trabajo in terminados[:max(0, len(self._trabajos) - MAX_TRABAJOS_EN_MEMORIA)]:
+            del self._trabajos[trabajo.id]
+
+
+# Instancia compartida por el backend
+gestor_respaldos = GestorRespaldos()
@@ -0,0 +1,233 @@
+# === RESTAURAR_RESPALDO.PY ===
+# Restaura la base a un instante cualquiera: respaldo completo (.dump.gz) + segmentos incrementales.
+# 1. Elige el respaldo completo más nuevo tomado antes de --hasta (o el indicado con --base).
+# 2. Lo carga con pg_restore en la base destino (descomprimiendo al vuelo).
+# 3. Reaplica, en orden, los cambios de los segmentos que el respaldo no contiene (según el snapshot
+#    guardado en su .json) y cuya transacción terminó antes de --hasta.
+# El fin de una transacción es aproximado: se toma el clock_timestamp() del último cambio que registró,
+# no el instante real del COMMIT (PostgreSQL no lo expone). Una transacción que escribió su último
+# cambio justo antes de --hasta pero confirmó después se reaplica igual; conviene dejar un margen de
+# unos segundos respecto del incidente.
+# Solo pedidos, inventario, reservas, clientes y menu tienen registro incremental; el resto de las
+# tablas queda como en el respaldo completo.
+#
+# Uso:
+#   python restaurar_respaldo.py --hasta "2026-10-18 21:30:00" --crear
+#   python restaurar_respaldo.py --destino restaurant_db_prueba --simular
+#   python restaurar_respaldo.py --base <archivo.dump.gz> --destino restaurant_db --forzar
+#
+# Por defecto restaura en 'restaurant_db_restaurada' para no pisar la base en uso.
+
+import argparse
+import gzip
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor
+
+from respaldos import (
+    CARPETA_INCREMENTALES, DIRECTORIO_RESPALDOS, PG_CONEXION, TAMANO_BLOQUE, dsn_pg, entorno_pg, argumentos_conexion_pg,
+    find_pg_dump, listar_respaldos_completos, listar_segmentos, metadatos_respaldo,
+)
+
+TABLAS_INCREMENTALES = ("pedidos", "inventario", "reservas", "clientes", "menu")
+DESTINO_POR_DEFECTO = "restaurant_db_restaurada"
+
+
+# === FUNCIÓN: visible_en_snapshot ===
+# True si la transacción 'txid' ya había confirmado cuando se tomó el snapshot "xmin:xmax:xip1,xip2"
+# (mismo criterio que txid_visible_in_snapshot de PostgreSQL).
+def visible_en_snapshot(txid: int, snapshot: str) -> bool:
+    xmin, xmax, xip = snapshot.split(":")
+    en_curso = {int(x) for x in xip.split(",") if x}
+    if txid < int(xmin):
+        return True
+    return txid < int(xmax) and txid not in en_curso
+
+
+# === FUNCIÓN: elegir_base ===
+def elegir_base(directorio: str, hasta: datetime):
+    for archivo in listar_respaldos_completos(directorio):
+        metadatos = metadatos_respaldo(archivo)
+        if metadatos and datetime.fromisoformat(metadatos["snapshot_ts"]) <= hasta:
+            return archivo, metadatos
+    return None, None
+
+
+# === FUNCIÓN: cambios_a_reaplicar ===
+# Lee los segmentos y devuelve los cambios posteriores al snapshot, de transacciones terminadas
+# antes de 'hasta', ordenados por id (orden en que se registraron).
+def cambios_a_reaplicar(directorio_segmentos: str, snapshot: str, hasta: datetime):
+    por_txid = {}
+    for segmento in listar_segmentos(directorio_segmentos):
+        with gzip.open(segmento, "rt", encoding="utf-8") as f:
+            for linea in f:
+                cambio = json.loads(linea)
+                if visible_en_snapshot(cambio["txid"], snapshot):
+                    continue
+                por_txid.setdefault(cambio["txid"], []).append(cambio)
+
+    cambios = []
+    for lista in por_txid.values():
+        # Una transacción se aplica entera o no se aplica. Su último cambio registrado aproxima el COMMIT
+        # (lo antecede por lo que tarde en confirmar): ver la nota del encabezado.
+        if max(datetime.fromisoformat(c["ts"]) for c in lista) <= hasta:
+            cambios.extend(lista)
+    cambios.sort(key=lambda c: c["id"])
+    return cambios
+
+
+# === FUNCIÓN: crear_base ===
+def crear_base(destino: str):
+    conn = psycopg2.connect(dsn_pg("postgres"))
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s;", (destino,))
+            if cursor.fetchone():
+                print(f"   La base '{destino}' ya existe; se limpia al restaurar")
+                return
+            cursor.execute(sql.SQL("CREATE DATABASE {};").format(sql.Identifier(destino)))
+            print(f"   Base '{destino}' creada")
+    finally:
+        conn.close()
+
+
+# === FUNCIÓN: restaurar_base ===
+# Descomprime el .dump.gz por bloques hacia la entrada de pg_restore.
+def restaurar_base(archivo: str, destino: str):
+    pg_restore_exe = find_pg_dump("pg_restore")
+    if not pg_restore_exe:
+        raise SystemExit("No se encontró pg_restore. Instala PostgreSQL o agrégalo al PATH.")
+    comando = [pg_restore_exe] + argumentos_conexion_pg(destino) + ["--clean", "--if-exists", "--no-owner", "--single-transaction"]
+    proceso = subprocess.Popen(comando, env=entorno_pg(), stdin=subprocess.PIPE)
+    try:
+        with gzip.open(archivo, "rb") as entrada:
+            while True:
+                bloque = entrada.read(TAMANO_BLOQUE)
+                if not bloque:
+                    break
+                proceso.stdin.write(bloque)
+    finally:
+        proceso.stdin.close()
+    if proceso.wait() != 0:
+        raise SystemExit(f"pg_restore terminó con código {proceso.returncode}")
+
+
+def columnas_tabla(cursor, tabla: str):
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position;
+    """, (tabla,))
+    return [row['column_name'] for row in cursor.fetchall()]
+
+
+# === FUNCIÓN: reaplicar_cambios ===
+# Aplica los cambios en una transacción con los triggers apagados (session_replication_role = replica):
+# las filas ya traen sus valores finales (versiones, fechas) y el orden por id respeta las dependencias.
+def reaplicar_cambios(destino: str, cambios):
+    conn = psycopg2.connect(dsn_pg(destino), cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL session_replication_role = replica;")
+            sentencias = {}
+            for tabla in TABLAS_INCREMENTALES:
+                columnas = columnas_tabla(cursor, tabla)
+                lista = sql.SQL(", ").join(map(sql.Identifier, columnas))
+                sentencias[tabla] = {
+                    "upsert": sql.SQL("""
+                        INSERT INTO {tabla} ({columnas})
+                        SELECT {columnas} FROM jsonb_populate_record(NULL::{tabla}, %s::jsonb)
+                        ON CONFLICT (id) DO UPDATE SET {asignaciones};
+                    """).format(
+                        tabla=sql.Identifier(tabla),
+                        columnas=lista,
+                        asignaciones=sql.SQL(", ").join(
+                            sql.SQL("{c} = EXCLUDED.{c}").format(c=sql.Identifier(c)) for c in columnas if c != "id"
+                        ),
+                    ),
+                    "delete": sql.SQL("DELETE FROM {} WHERE id = %s;").format(sql.Identifier(tabla)),
+                }
+
+            for cambio in cambios:
+                sentencia = sentencias[cambio["tabla"]]
+                if cambio["operacion"] == "D":
+                    cursor.execute(sentencia["delete"], (cambio["registro_id"],))
+                else:
+                    cursor.execute(sentencia["upsert"], (json.dumps(cambio["fila"]),))
+
+            for tabla in TABLAS_INCREMENTALES:
+                cursor.execute(
+                    sql.SQL("SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST((SELECT MAX(id) FROM {}), 1));").format(sql.Identifier(tabla)),
+                    (tabla,)
+                )
+            cursor.execute("TRUNCATE respaldo_cambios;")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restaura un respaldo completo más los segmentos incrementales hasta un instante.")
+    parser.add_argument("--hasta", help="Instante objetivo 'YYYY-MM-DD HH:MM:SS' (por defecto: todo lo registrado). "
+                                        "Aproximado: una transacción cuenta como terminada en la hora de su último "
+                                        "cambio registrado, no en la de su COMMIT")
+    parser.add_argument("--base", help="Respaldo completo .dump.gz a usar (por defecto el más nuevo anterior a --hasta)")
+    parser.add_argument("--destino", default=DESTINO_POR_DEFECTO, help=f"Base de datos destino (por defecto {DESTINO_POR_DEFECTO})")
+    parser.add_argument("--directorio", default=DIRECTORIO_RESPALDOS, help="Carpeta de respaldos")
+    parser.add_argument("--crear", action="store_true", help="Crear la base destino si no existe")
+    parser.add_argument("--forzar", action="store_true", help=f"Permitir restaurar sobre {PG_CONEXION['base']}")
+    parser.add_argument("--simular", action="store_true", help="Solo mostrar qué se restauraría")
+    args = parser.parse_args()
+
+    hasta = datetime.fromisoformat(args.hasta.replace(" ", "T")) if args.hasta else datetime.max
+    if args.destino == PG_CONEXION["base"] and not args.forzar and not args.simular:
+        raise SystemExit(f"Restaurar sobre '{PG_CONEXION['base']}' (la base en uso) requiere --forzar")
+
+    if args.base:
+        base, metadatos = args.base, metadatos_respaldo(args.base)
+        if not metadatos:
+            raise SystemExit(f"{args.base} no tiene su .json de snapshot: no se puede combinar con los segmentos")
+    else:
+        base, metadatos = elegir_base(args.directorio, hasta)
+        if not base:
+            raise SystemExit("No hay un respaldo completo (con snapshot) anterior al instante pedido")
+
+    cambios = cambios_a_reaplicar(os.path.join(args.directorio, CARPETA_INCREMENTALES), metadatos["txid_snapshot"], hasta)
+    resumen = {}
+    for cambio in cambios:
+        clave = f"{cambio['tabla']}.{cambio['operacion']}"
+        resumen[clave] = resumen.get(clave, 0) + 1
+
+    print(f"--- RESTAURACIÓN {'(SIMULADA) ' if args.simular else ''}→ {args.destino} ---")
+    print(f"   Respaldo completo: {os.path.basename(base)} (snapshot {metadatos['snapshot_ts']})")
+    print(f"   Hasta: {args.hasta or 'último cambio registrado'}")
+    print(f"   Cambios a reaplicar: {len(cambios)} {json.dumps(resumen, sort_keys=True)}")
+    if cambios:
+        print(f"   Último cambio: {cambios[-1]['ts']}")
+    if args.simular:
+        return
+
+    if args.crear:
+        crear_base(args.destino)
+    print("   Cargando respaldo completo con pg_restore...")
+    restaurar_base(base, args.destino)
+    print("   Reaplicando cambios incrementales...")
+    reaplicar_cambios(args.destino, cambios)
+    print("--- RESTAURACIÓN COMPLETADA ---")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(1)
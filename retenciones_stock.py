@@ -0,0 +1,113 @@
+# === RETENCIONES_STOCK.PY ===
+# Retenciones "blandas" de stock para pedidos que se están armando en el panel de gestión.
+# - Cada retención guarda los platos del pedido en curso y los ingredientes que necesitan,
+#   y los descuenta del stock libre (disponibilidad_menu) durante TTL segundos.
+# - El cliente renueva la retención cada vez que cambia el pedido; si la abandona, el barrido
+#   periódico la libera al vencer.
+# - crear_pedido usa una retención vigente que cubra exactamente sus platos para descontar
+#   los ingredientes directamente, sin volver a consultar recetas ni stock plato por plato.
+# - Un pedido sin retención vigente se verifica contra el stock menos lo que retienen los demás
+#   pedidos en curso (409 si no alcanza), así no toma las porciones que otro mesero tiene apartadas.
+# Todo vive en memoria: si el backend se reinicia, los pedidos confirman por el camino normal.
+
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from disponibilidad_menu import disponibilidad_menu
+
+TTL_RETENCION_S = 300  # 5 minutos sin tocar el pedido
+INTERVALO_BARRIDO_RETENCIONES_S = 15
+
+
+@dataclass
+class Retencion:
+    id: str
+    platos: Dict[str, int]
+    ingredientes: Dict[int, float]
+    expira: float  # time.monotonic()
+    expira_ts: float = field(default=0.0)  # time.time(), para mostrar al cliente
+
+
+class RetencionesStock:
+    def __init__(self, disponibilidad=disponibilidad_menu):
+        self.disponibilidad = disponibilidad
+        self._lock = threading.Lock()
+        self._retenciones: Dict[str, Retencion] = {}
+
+    # === MÉTODO: retener ===
+    # Crea (retencion_id None) o reemplaza una retención con los platos actuales del pedido.
+    # Devuelve (retencion, faltantes); si faltan ingredientes la retención anterior queda como estaba.
+    def retener(self, retencion_id: Optional[str], platos: Dict[str, int], ttl_s: int = TTL_RETENCION_S) -> Tuple[Optional[Retencion], Dict[str, Tuple[float, float]]]:
+        platos = {nombre: cantidad for nombre, cantidad in platos.items() if cantidad > 0}
+        ingredientes = self.disponibilidad.necesidades(platos)
+        with self._lock:
+            previa = self._retenciones.get(retencion_id) if retencion_id else None
+            faltantes = self.disponibilidad.retener(ingredientes, previa.ingredientes if previa else None)
+            if faltantes:
+                return None, faltantes
+            retencion = Retencion(
+                id=previa.id if previa else (retencion_id or uuid.uuid4().hex),
+                platos=platos,
+                ingredientes=ingredientes,
+                expira=time.monotonic() + ttl_s,
+                expira_ts=time.time() + ttl_s,
+            )
+            self._retenciones[retencion.id] = retencion
+            return retencion, {}
+
+    # === MÉTODO: obtener_vigente ===
+    # La retención sirve para crear el pedido solo si no venció y cubre exactamente sus platos.
+    def obtener_vigente(self, retencion_id: str, platos: Dict[str, int]) -> Optional[Retencion]:
+        with self._lock:
+            retencion = self._retenciones.get(retencion_id)
+            if not retencion or retencion.expira < time.monotonic():
+                return None
+            if retencion.platos != {n: c for n, c in platos.items() if c > 0}:
+                return None
+            return retencion
+
+    # === MÉTODO: ingredientes_de ===
+    # Ingredientes apartados por una retención aunque haya vencido o no coincida con el pedido ({} si no existe).
+    def ingredientes_de(self, retencion_id: str) -> Dict[int, float]:
+        with self._lock:
+            retencion = self._retenciones.get(retencion_id)
+            return dict(retencion.ingredientes) if retencion else {}
+
+    # === MÉTODO: consumir ===
+    # El pedido se confirmó: la retención se convierte en descuento real de stock.
+    def consumir(self, retencion_id: str, stock_actualizado: Dict[int, float]):
+        with self._lock:
+            retencion = self._retenciones.pop(retencion_id, None)
+        self.disponibilidad.liberar(retencion.ingredientes if retencion else {}, stock_actualizado)
+
+    # === MÉTODO: liberar ===
+    def liberar(self, retencion_id: str) -> bool:
+        with self._lock:
+            retencion = self._retenciones.pop(retencion_id, None)
+        if retencion:
+            self.disponibilidad.liberar(retencion.ingredientes)
+        return retencion is not None
+
+    # === MÉTODO: barrer ===
+    # Libera las retenciones vencidas. Devuelve cuántas se liberaron.
+    def barrer(self) -> int:
+        ahora = time.monotonic()
+        with self._lock:
+            vencidas = [r for r in self._retenciones.values() if r.expira < ahora]
+            for retencion in vencidas:
+                del self._retenciones[retencion.id]
+        for retencion in vencidas:
+            self.disponibilidad.liberar(retencion.ingredientes)
+        return len(vencidas)
+
+    # === MÉTODO: activas ===
+    def activas(self) -> List[Retencion]:
+        with self._lock:
+            return list(self._retenciones.values())
+
+
+# Instancia compartida por el backend
+retenciones_stock = RetencionesStock()
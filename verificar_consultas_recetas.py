@@ -0,0 +1,119 @@
+# === VERIFICAR_CONSULTAS_RECETAS.PY ===
+# Chequeo de regresión del N+1 en GET /recetas/.
+# Llama al endpoint en proceso (TestClient) con una conexión que cuenta las sentencias SQL
+# y verifica que el listado se resuelva en UNA sola consulta, sin importar cuántas recetas haya.
+# Antes siembra RECETAS_SEMBRADAS recetas con ingredientes en esa misma conexión (sin commit: al
+# terminar se hace ROLLBACK), así con una base vacía el chequeo igual distingue 1 consulta de N+1.
+#
+# Uso (con PostgreSQL levantado y la base restaurant_db creada):
+#   python verificar_consultas_recetas.py
+#
+# Devuelve código de salida 1 si alguna verificación falla.
+
+import sys
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+from fastapi.testclient import TestClient
+
+from recetas_backend import recetas_app, get_db, DATABASE_URL
+
+MAX_SENTENCIAS_LISTADO = 1
+RECETAS_SEMBRADAS = 3
+
+
+class CursorContador(RealDictCursor):
+    def execute(self, query, vars=None):
+        self.connection.sentencias.append(query)
+        return super().execute(query, vars)
+
+
+class ConexionContadora(psycopg2.extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sentencias = []
+
+
+conexion = psycopg2.connect(DATABASE_URL, connection_factory=ConexionContadora, cursor_factory=CursorContador)
+
+
+def get_db_contador():
+    yield conexion
+
+
+# === FUNCIÓN: sembrar_recetas ===
+# Platos, ingredientes y recetas de prueba dentro de la transacción abierta de 'conexion'.
+def sembrar_recetas(cantidad):
+    with conexion.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO inventario (nombre, cantidad_disponible, unidad_medida)
+            SELECT 'Ingrediente Verificación ' || i, 100, 'unidad' FROM generate_series(1, 2) AS i
+            RETURNING id
+        """)
+        ingredientes = [row['id'] for row in cursor.fetchall()]
+        for n in range(1, cantidad + 1):
+            plato = f"Plato Verificación Recetas {n}"
+            cursor.execute("INSERT INTO menu (nombre, precio, tipo) VALUES (%s, 1, 'Verificación')", (plato,))
+            cursor.execute("INSERT INTO recetas (nombre_plato) VALUES (%s) RETURNING id", (plato,))
+            receta_id = cursor.fetchone()['id']
+            for ingrediente_id in ingredientes:
+                cursor.execute("""
+                    INSERT INTO ingredientes_recetas (receta_id, ingrediente_id, cantidad_necesaria, unidad_medida_necesaria)
+                    VALUES (%s, %s, 1, 'unidad')
+                """, (receta_id, ingrediente_id))
+
+
+# === FUNCIÓN: verificar ===
+# Hace la petición y compara la cantidad de sentencias ejecutadas contra el máximo permitido.
+def verificar(cliente, ruta, maximo):
+    conexion.sentencias.clear()
+    resp = cliente.get(ruta)
+    cantidad = len(conexion.sentencias)
+    if resp.status_code != 200:
+        print(f"❌ GET /recetas{ruta}: HTTP {resp.status_code} {resp.text}")
+        return False
+    if cantidad > maximo:
+        print(f"❌ GET /recetas{ruta}: {cantidad} sentencias SQL (máximo {maximo}) para {len(resp.json())} recetas")
+        return False
+    if len(resp.json()) <= 1:
+        # Con 0 o 1 recetas el listado viejo (N+1) también usaba una sola sentencia
+        print(f"❌ GET /recetas{ruta}: devolvió {len(resp.json())} recetas; hacen falta más de 1 para medir el N+1")
+        return False
+    print(f"✅ GET /recetas{ruta}: {cantidad} sentencia(s) SQL para {len(resp.json())} recetas")
+    return True
+
+
+def main():
+    print("--- VERIFICANDO CANTIDAD DE CONSULTAS EN /recetas ---")
+    recetas_app.dependency_overrides[get_db] = get_db_contador
+    cliente = TestClient(recetas_app)
+    ok = True
+    try:
+        sembrar_recetas(RECETAS_SEMBRADAS)
+        ok &= verificar(cliente, "/", MAX_SENTENCIAS_LISTADO)
+        ok &= verificar(cliente, "/?limite=10&offset=0", MAX_SENTENCIAS_LISTADO)
+        ok &= verificar(cliente, "/?fields=id,nombre_plato", MAX_SENTENCIAS_LISTADO)
+
+        # Proyección: sin ingredientes no se deben devolver ingredientes
+        resp = cliente.get("/?fields=id,nombre_plato&limite=5")
+        if any(set(r.keys()) != {"id", "nombre_plato"} for r in resp.json()):
+            print("❌ ?fields=id,nombre_plato devolvió campos de más")
+            ok = False
+        else:
+            print("✅ ?fields=id,nombre_plato devuelve solo esos campos")
+
+        if cliente.get("/?fields=id,precio").status_code != 400:
+            print("❌ ?fields con un campo inexistente debería devolver 400")
+            ok = False
+        else:
+            print("✅ ?fields con un campo inexistente devuelve 400")
+    finally:
+        recetas_app.dependency_overrides.pop(get_db, None)
+        conexion.rollback()  # Descarta las recetas sembradas
+        conexion.close()
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# === VERIFICAR_PLAN_MESAS.PY ===
+# Benchmark y chequeo del plan de GET /mesas con un historial grande de reservas.
+# - Carga 10.000 reservas históricas (más unas pocas futuras por mesa) dentro de una transacción.
+# - Verifica con EXPLAIN que la consulta no recorra 'reservas' secuencialmente y que devuelva
+#   exactamente una fila por mesa.
+# - Mide la consulta nueva contra la anterior (LEFT JOIN a todos los pedidos y reservas).
+# Al terminar hace ROLLBACK: la base queda como estaba.
+#
+# Uso (con PostgreSQL levantado y SqlPRO.sql aplicado):
+#   python verificar_plan_mesas.py [cantidad_reservas] [repeticiones]
+#
+# Devuelve código de salida 1 si alguna verificación falla.
+
+import sys
+import json
+import time
+import statistics
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from backend import CONSULTA_MESAS, DATABASE_URL
+
+RESERVAS_HISTORICAS = 10000
+RESERVAS_FUTURAS_POR_MESA = 5
+REPETICIONES = 200
+
+# Consulta anterior de /mesas, para comparar filas y tiempos
+CONSULTA_ANTERIOR = """
+    SELECT m.numero, m.capacidad,
+           CASE WHEN p.id IS NOT NULL THEN TRUE ELSE FALSE END AS ocupada,
+           CASE WHEN r.id IS NOT NULL THEN TRUE ELSE FALSE END AS reservada,
+           c.nombre AS cliente_reservado_nombre,
+           r.fecha_hora_inicio AS fecha_hora_reserva
+    FROM mesas m
+    LEFT JOIN pedidos p ON m.numero = p.mesa_numero
+        AND p.estado IN ('Tomando pedido', 'Pendiente', 'En preparacion', 'Listo', 'Entregado')
+    LEFT JOIN reservas r ON m.numero = r.mesa_numero
+        AND DATE(r.fecha_hora_inicio) >= CURRENT_DATE
+    LEFT JOIN clientes c ON r.cliente_id = c.id
+    WHERE m.numero != 99
+    ORDER BY m.numero;
+"""
+
+
+# === FUNCIÓN: sembrar_reservas ===
+# Reservas de 2 horas en tres turnos por día hacia atrás; no se solapan (restricción de exclusión).
+# Los turnos que ya tienen una reserva real en la base se saltean, así corre también sobre una base en uso.
+def sembrar_reservas(cursor, cantidad):
+    cursor.execute("INSERT INTO clientes (nombre) VALUES ('Cliente Benchmark Mesas') RETURNING id;")
+    cliente_id = cursor.fetchone()['id']
+    cursor.execute("SELECT count(*) AS n FROM mesas WHERE numero != 99;")
+    mesas = cursor.fetchone()['n']
+    if not mesas:
+        raise SystemExit("No hay mesas físicas cargadas")
+    cursor.execute("""
+        INSERT INTO reservas (mesa_numero, cliente_id, fecha_hora_inicio, fecha_hora_fin)
+        SELECT m.numero, %(cliente)s, t.inicio, t.inicio + INTERVAL '2 hours'
+        FROM generate_series(0, %(turnos)s) AS g
+        CROSS JOIN LATERAL (
+            SELECT CURRENT_DATE - (g / 3 + 1) * INTERVAL '1 day' + (12 + (g %% 3) * 3) * INTERVAL '1 hour' AS inicio
+        ) t
+        CROSS JOIN mesas m
+        WHERE m.numero != 99
+          AND NOT EXISTS (
+              SELECT 1 FROM reservas r
+              WHERE r.mesa_numero = m.numero
+                AND r.periodo && tsrange(t.inicio, t.inicio + INTERVAL '2 hours', '[)')
+          )
+        ORDER BY g, m.numero
+        LIMIT %(cantidad)s;
+    """, {"cliente": cliente_id, "turnos": cantidad // mesas + 1, "cantidad": cantidad})
+    historicas = cursor.rowcount
+    # Reservas futuras: con la consulta anterior cada una multiplicaba las filas de su mesa.
+    # Los turnos ya ocupados en la base se saltean (reservas_sin_solapamiento los rechazaría).
+    cursor.execute("""
+        INSERT INTO reservas (mesa_numero, cliente_id, fecha_hora_inicio, fecha_hora_fin)
+        SELECT m.numero, %(cliente)s, t.inicio, t.inicio + INTERVAL '1 hour'
+        FROM generate_series(1, %(futuras)s) AS d
+        CROSS JOIN LATERAL (SELECT CURRENT_DATE + d * INTERVAL '1 day' + INTERVAL '20 hours' AS inicio) t
+        CROSS JOIN mesas m
+        WHERE m.numero != 99
+          AND NOT EXISTS (
+              SELECT 1 FROM reservas r
+              WHERE r.mesa_numero = m.numero
+                AND r.periodo && tsrange(t.inicio, t.inicio + INTERVAL '1 hour', '[)')
+          );
+    """, {"cliente": cliente_id, "futuras": RESERVAS_FUTURAS_POR_MESA})
+    futuras = cursor.rowcount
+    cursor.execute("ANALYZE reservas;")
+    return historicas, futuras, mesas
+
+
+def nodos_plan(nodo):
+    yield nodo
+    for hijo in nodo.get("Plans", []):
+        yield from nodos_plan(hijo)
+
+
+# === FUNCIÓN: verificar_plan ===
+def verificar_plan(cursor):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + CONSULTA_MESAS)
+    plan = cursor.fetchone()['QUERY PLAN'][0]
+    nodos = list(nodos_plan(plan["Plan"]))
+    ok = True
+
+    secuenciales = [n for n in nodos if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == "reservas"]
+    if secuenciales:
+        print("❌ EXPLAIN: 'reservas' se recorre con Seq Scan")
+        ok = False
+    else:
+        indices = sorted({n.get("Index Name") for n in nodos if n.get("Relation Name") == "reservas" and n.get("Index Name")})
+        print(f"✅ EXPLAIN: 'reservas' se lee por índice ({', '.join(indices) or 'bitmap'})")
+
+    if not any(n["Node Type"] == "Limit" for n in nodos):
+        print("❌ EXPLAIN: la próxima reserva no se resuelve con LIMIT 1 por mesa")
+        ok = False
+
+    print(f"   Tiempo de ejecución según EXPLAIN: {plan['Execution Time']:.2f} ms")
+    return ok
+
+
+# === FUNCIÓN: verificar_filas ===
+def verificar_filas(cursor, mesas):
+    cursor.execute(CONSULTA_MESAS)
+    filas = cursor.fetchall()
+    numeros = [f['numero'] for f in filas]
+    cursor.execute(CONSULTA_ANTERIOR)
+    filas_anteriores = len(cursor.fetchall())
+    print(f"   Filas: consulta nueva {len(filas)} | consulta anterior {filas_anteriores} | mesas físicas {mesas}")
+    if len(numeros) != mesas or len(set(numeros)) != len(numeros):
+        print("❌ /mesas no devuelve exactamente una fila por mesa")
+        return False
+    print("✅ /mesas devuelve exactamente una fila por mesa")
+    return True
+
+
+def medir(cursor, consulta, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cursor.execute(consulta)
+        cursor.fetchall()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return statistics.median(tiempos), tiempos[int(len(tiempos) * 0.95) - 1]
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else RESERVAS_HISTORICAS
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else REPETICIONES
+    print(f"--- VERIFICANDO PLAN DE /mesas CON {cantidad} RESERVAS HISTÓRICAS ---")
+
+    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cursor:
+            historicas, futuras, mesas = sembrar_reservas(cursor, cantidad)
+            print(f"   Sembradas {historicas} reservas históricas y {futuras} futuras en {mesas} mesas")
+
+            ok = verificar_plan(cursor)
+            ok = verificar_filas(cursor, mesas) and ok
+
+            p50_nueva, p95_nueva = medir(cursor, CONSULTA_MESAS, repeticiones)
+            p50_anterior, p95_anterior = medir(cursor, CONSULTA_ANTERIOR, repeticiones)
+            print(json.dumps({
+                "reservas": historicas + futuras,
+                "repeticiones": repeticiones,
+                "consulta_nueva_ms": {"p50": round(p50_nueva, 3), "p95": round(p95_nueva, 3)},
+                "consulta_anterior_ms": {"p50": round(p50_anterior, 3), "p95": round(p95_anterior, 3)},
+            }, indent=2))
+    finally:
+        conn.rollback()
+        conn.close()
+
+    if not ok:
+        print("--- VERIFICACIÓN FALLIDA ---")
+        sys.exit(1)
+    print("--- VERIFICACIÓN COMPLETADA ---")
+
+
+if __name__ == "__main__":
+    main()